@@ -1,5 +1,9 @@
 import os, sys, json, sqlite3, datetime, urllib.request
 
+from app.migrations import migrate
+from app.near_dupes import index_listing
+from app.sqlite_tuning import connect
+
 API = "http://127.0.0.1:8000"
 
 def parse_price(s):
@@ -9,13 +13,16 @@ def parse_price(s):
     m = re.search(r'(\d[\d,]*\.?\d*)', s)
     return float(m.group(1).replace(',', '')) if m else None
 
-def insert_listing(title, price, url, currency="CAD", location=None, label=None, note=None, source="facebook"):
+def open_db():
+    """Connection to the listings DB, schema brought up to date once."""
     db = os.getenv("DATABASE_URL","sqlite:///flipfinder.db").replace("sqlite:///","")
-    con = sqlite3.connect(db)
-    cur = con.cursor()
-    cols = [c[1] for c in cur.execute("PRAGMA table_info(listings)").fetchall()]
+    con = connect(db)
+    migrate(con)
+    return con
 
-    now = datetime.datetime.now(datetime.UTC).isoformat(timespec="seconds")
+def insert_listing(con, title, price, url, currency="CAD", location=None, label=None, note=None, source="facebook"):
+    # same created_at format as the scraper, so dashboard ordering holds
+    now = datetime.datetime.now(datetime.UTC).strftime("%Y-%m-%d %H:%M:%S")
     row = {
         "title": title,
         "price": price,
@@ -27,13 +34,18 @@ def insert_listing(title, price, url, currency="CAD", location=None, label=None,
         "source": source,
         "created_at": now,
     }
-    avail = [k for k in row if k in cols]
-    sql = "INSERT INTO listings ({}) VALUES ({})".format(",".join(avail), ",".join(["?"]*len(avail)))
-    cur.execute(sql, [row[k] for k in avail])
+    sql = "INSERT INTO listings ({}) VALUES ({})".format(",".join(row), ",".join(["?"]*len(row)))
+    try:
+        cur = con.execute(sql, list(row.values()))
+    except sqlite3.IntegrityError:
+        # already saved (unique source + url): reuse it
+        return con.execute(
+            "SELECT id FROM listings WHERE source=? AND url=?", (source, url)
+        ).fetchone()[0]
+    # link relists / cross-posts of something we already have
+    index_listing(con, cur.lastrowid, title, price, location)
     con.commit()
-    new_id = cur.execute("SELECT id FROM listings ORDER BY id DESC LIMIT 1").fetchone()[0]
-    con.close()
-    return new_id
+    return cur.lastrowid
 
 def refresh(id, notify=True):
     url = f"{API}/listing/{id}/refresh_comps" + ("?notify=true" if notify else "")
@@ -51,7 +63,11 @@ def main():
     currency = sys.argv[4] if len(sys.argv) >= 5 else "CAD"
     location = sys.argv[5] if len(sys.argv) >= 6 else None
 
-    new_id = insert_listing(title, price, fb_url, currency=currency, location=location)
+    con = open_db()
+    try:
+        new_id = insert_listing(con, title, price, fb_url, currency=currency, location=location)
+    finally:
+        con.close()
     print("Inserted ID:", new_id)
     out = refresh(new_id, notify=True)
     print(json.dumps(out, indent=2))
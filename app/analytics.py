@@ -0,0 +1,310 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+# Analytics rollups: deal rate, average ROI and profit distribution per
+# search keyword, pricing rule, location and day.
+#
+# analytics_rollup holds one row of running totals per (dim, key). Triggers
+# keep it current the way the FTS triggers keep listings_fts_pending
+# current (app/fts.py): every insert, re-score, edit or delete of a listing,
+# and every listing_rule_matches change, adds the new row's contribution and
+# subtracts the old one's. Any writer is covered (the API, the scrape
+# router, comps, retention, raw sqlite3 scripts) and nothing is ever
+# recomputed; /analytics reads the rollup rows and never touches listings.
+#
+# Averages and the deal rate are derived at read time from the sums
+# (roi_sum / roi_n, deals / scored), which is what makes them delta-able.
+# Listings that haven't been scored count in `listings` only. The rule
+# dimension covers scored listings (those with a listing_rule_matches
+# row); key '' is "no rule matched". Rollups follow the hot table, so
+# archived listings drop out of them like they drop out of every other
+# view.
+#
+# check_rollups() compares the table with a full GROUP BY recompute
+# (scripts/check_analytics.py); rebuild_rollups() replaces it with one.
+
+ROLLUP_TABLE = "analytics_rollup"
+
+# "day" keys are created_at's date; locations are the part before the first
+# comma ("Toronto, ON" and "Toronto" are one city); keys are lowercased
+DIMENSIONS: Dict[str, str] = {
+    "keyword": "COALESCE(lower(trim({x}.search_keyword)), '')",
+    "rule": "COALESCE({m}.rule_name, '')",
+    "location": (
+        "COALESCE(lower(trim(CASE WHEN instr({x}.location, ',') > 0 "
+        "THEN substr({x}.location, 1, instr({x}.location, ',') - 1) "
+        "ELSE {x}.location END)), '')"
+    ),
+    "day": "COALESCE(substr({x}.created_at, 1, 10), '')",
+}
+
+# profit histogram edges: bucket i is [EDGES[i-1], EDGES[i]), open-ended
+# below the first edge and above the last
+PROFIT_EDGES: Tuple[float, ...] = (0, 50, 100, 150, 250, 500, 1000)
+
+
+def _bucket_exprs() -> List[Tuple[str, str]]:
+    out = [("p0", "IFNULL({x}.profit < %s, 0)" % PROFIT_EDGES[0])]
+    for i in range(1, len(PROFIT_EDGES)):
+        lo, hi = PROFIT_EDGES[i - 1], PROFIT_EDGES[i]
+        out.append((f"p{i}", f"IFNULL({{x}}.profit >= {lo} AND {{x}}.profit < {hi}, 0)"))
+    out.append((f"p{len(PROFIT_EDGES)}", "IFNULL({x}.profit >= %s, 0)" % PROFIT_EDGES[-1]))
+    return out
+
+
+# (column, what one listing contributes); all additive
+MEASURES: List[Tuple[str, str]] = [
+    ("listings", "1"),
+    ("scored", "({x}.profit IS NOT NULL)"),
+    ("deals", "(COALESCE({x}.is_deal, 0) != 0)"),
+    ("roi_n", "({x}.roi IS NOT NULL)"),
+    ("roi_sum", "COALESCE({x}.roi, 0.0)"),
+    ("profit_sum", "COALESCE({x}.profit, 0.0)"),
+] + _bucket_exprs()
+
+COLUMNS = [name for name, _expr in MEASURES]
+_REAL_COLUMNS = {"roi_sum", "profit_sum"}
+
+# listings columns the rollups read; updates of anything else don't fire
+_WATCHED = ("created_at", "location", "search_keyword", "profit", "roi", "is_deal")
+
+_DDL = [
+    f"CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (\n"
+    "    dim TEXT NOT NULL,\n"
+    "    key TEXT NOT NULL,\n"
+    + "".join(
+        f"    {c} {'REAL' if c in _REAL_COLUMNS else 'INTEGER'} NOT NULL DEFAULT 0,\n"
+        for c in COLUMNS
+    )
+    + "    PRIMARY KEY (dim, key)\n"
+    ") WITHOUT ROWID",
+]
+
+
+def _contribution(x: str, sign: int) -> str:
+    neg = "-" if sign < 0 else ""
+    return ", ".join(f"{neg}({expr.format(x=x)})" for _name, expr in MEASURES)
+
+
+def _change() -> str:
+    """new's contribution minus old's, for an UPDATE that keeps the key."""
+    return ", ".join(
+        f"({expr.format(x='new')}) - ({expr.format(x='old')})" for _name, expr in MEASURES
+    )
+
+
+def _upsert(select: str) -> str:
+    cols = ", ".join(COLUMNS)
+    sets = ", ".join(f"{c} = {c} + excluded.{c}" for c in COLUMNS)
+    return (
+        f"INSERT INTO {ROLLUP_TABLE} (dim, key, {cols}) {select} "
+        f"ON CONFLICT (dim, key) DO UPDATE SET {sets};"
+    )
+
+
+def _apply_listing(x: str, sign: int) -> str:
+    """Statements adding (sign=1) or removing (-1) listing row `x` (new/old)."""
+    stmts = []
+    for dim, key in DIMENSIONS.items():
+        if dim == "rule":
+            stmts.append(_upsert(
+                f"SELECT 'rule', {key.format(m='m')}, {_contribution(x, sign)} "
+                f"FROM listing_rule_matches m WHERE m.listing_id = {x}.id"
+            ))
+        else:
+            # WHERE true: an UPSERT's SELECT needs one (SQLite parser quirk)
+            stmts.append(_upsert(
+                f"SELECT '{dim}', {key.format(x=x)}, {_contribution(x, sign)} WHERE true"
+            ))
+    return "\n".join(stmts)
+
+
+def _apply_listing_update() -> str:
+    """
+    Statements moving an updated listing's contribution. A re-score keeps
+    every key, so each dimension gets one upsert of the difference; a key
+    that changed (location, keyword, day) gets a remove and an add.
+    """
+    stmts = [_upsert(
+        f"SELECT 'rule', {DIMENSIONS['rule'].format(m='m')}, {_change()} "
+        f"FROM listing_rule_matches m WHERE m.listing_id = new.id"
+    )]
+    for dim, key in DIMENSIONS.items():
+        if dim == "rule":
+            continue
+        old_key, new_key = key.format(x="old"), key.format(x="new")
+        stmts.append(_upsert(
+            f"SELECT '{dim}', {new_key}, {_change()} WHERE {old_key} = {new_key}"
+        ))
+        stmts.append(_upsert(
+            f"SELECT '{dim}', {old_key}, {_contribution('old', -1)} WHERE {old_key} != {new_key}"
+        ))
+        stmts.append(_upsert(
+            f"SELECT '{dim}', {new_key}, {_contribution('new', 1)} WHERE {old_key} != {new_key}"
+        ))
+    return "\n".join(stmts)
+
+
+def _apply_match(m: str, sign: int) -> str:
+    """Statements adding / removing listing_rule_matches row `m`'s listing."""
+    return _upsert(
+        f"SELECT 'rule', {DIMENSIONS['rule'].format(m=m)}, {_contribution('l', sign)} "
+        f"FROM listings l WHERE l.id = {m}.listing_id"
+    )
+
+
+def _triggers() -> List[str]:
+    changed = " OR ".join(f"old.{c} IS NOT new.{c}" for c in _WATCHED)
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {ROLLUP_TABLE}_listings_ai AFTER INSERT ON listings BEGIN\n"
+        f"{_apply_listing('new', 1)}\nEND",
+        f"CREATE TRIGGER IF NOT EXISTS {ROLLUP_TABLE}_listings_ad AFTER DELETE ON listings BEGIN\n"
+        f"{_apply_listing('old', -1)}\nEND",
+        f"CREATE TRIGGER IF NOT EXISTS {ROLLUP_TABLE}_listings_au "
+        f"AFTER UPDATE OF {', '.join(_WATCHED)} ON listings WHEN {changed} BEGIN\n"
+        f"{_apply_listing_update()}\nEND",
+        f"CREATE TRIGGER IF NOT EXISTS {ROLLUP_TABLE}_matches_ai AFTER INSERT ON listing_rule_matches BEGIN\n"
+        f"{_apply_match('new', 1)}\nEND",
+        f"CREATE TRIGGER IF NOT EXISTS {ROLLUP_TABLE}_matches_ad AFTER DELETE ON listing_rule_matches BEGIN\n"
+        f"{_apply_match('old', -1)}\nEND",
+        f"CREATE TRIGGER IF NOT EXISTS {ROLLUP_TABLE}_matches_au "
+        f"AFTER UPDATE OF rule_name, listing_id ON listing_rule_matches "
+        f"WHEN old.rule_name IS NOT new.rule_name OR old.listing_id != new.listing_id BEGIN\n"
+        f"{_apply_match('old', -1)}\n{_apply_match('new', 1)}\nEND",
+    ]
+
+
+def _recompute_sql(dim: str) -> str:
+    """Full GROUP BY over listings for one dimension: (dim, key, COLUMNS...)."""
+    sums = ", ".join(f"SUM({expr.format(x='l')})" for _name, expr in MEASURES)
+    if dim == "rule":
+        key = DIMENSIONS["rule"].format(m="m")
+        source = "listings l JOIN listing_rule_matches m ON m.listing_id = l.id"
+    else:
+        key = DIMENSIONS[dim].format(x="l")
+        source = "listings l"
+    return f"SELECT '{dim}', {key}, {sums} FROM {source} GROUP BY 2"
+
+
+def ensure_analytics(conn) -> None:
+    """Create the rollup table and triggers, and fill it (no commit)."""
+    cur = conn.cursor()
+    for ddl in _DDL + _triggers():
+        cur.execute(ddl)
+    rebuild_rollups(conn)
+
+
+def rebuild_rollups(conn) -> None:
+    """Replace the rollups with a full recompute (no commit)."""
+    cur = conn.cursor()
+    cur.execute(f"DELETE FROM {ROLLUP_TABLE}")
+    for dim in DIMENSIONS:
+        cur.execute(
+            f"INSERT INTO {ROLLUP_TABLE} (dim, key, {', '.join(COLUMNS)}) {_recompute_sql(dim)}"
+        )
+
+
+def _rows(cur, sql: str) -> Dict[Tuple[str, str], Tuple]:
+    cur.execute(sql)
+    # all-zero rows are what's left of a key whose listings all went away
+    return {(r[0], r[1]): tuple(r[2:]) for r in cur.fetchall() if r[2] != 0 or any(r[3:])}
+
+
+def check_rollups(conn, tolerance: float = 1e-6) -> List[Dict[str, Any]]:
+    """
+    Compare analytics_rollup with a full recompute. Returns one dict per
+    (dim, key) that differs (empty list: consistent). Sums of floats may
+    differ by rounding; they're compared with `tolerance` per listing.
+    """
+    cur = conn.cursor()
+    stored = _rows(cur, f"SELECT dim, key, {', '.join(COLUMNS)} FROM {ROLLUP_TABLE}")
+    fresh: Dict[Tuple[str, str], Tuple] = {}
+    for dim in DIMENSIONS:
+        fresh.update(_rows(cur, _recompute_sql(dim)))
+
+    zero = (0,) * len(COLUMNS)
+    diffs = []
+    for dim_key in sorted(set(stored) | set(fresh)):
+        have, want = stored.get(dim_key, zero), fresh.get(dim_key, zero)
+        bad = {}
+        for name, a, b in zip(COLUMNS, have, want):
+            if name in _REAL_COLUMNS:
+                if abs((a or 0) - (b or 0)) > tolerance * max(1, want[0]):
+                    bad[name] = (a, b)
+            elif a != b:
+                bad[name] = (a, b)
+        if bad:
+            diffs.append({"dim": dim_key[0], "key": dim_key[1], "stored_vs_recomputed": bad})
+    return diffs
+
+
+def _summary(key: str, row: Dict[str, Any]) -> Dict[str, Any]:
+    scored, roi_n = row["scored"], row["roi_n"]
+    edges = (None,) + PROFIT_EDGES + (None,)
+    return {
+        "key": key,
+        "listings": row["listings"],
+        "scored": scored,
+        "deals": row["deals"],
+        "deal_rate": round(row["deals"] / scored, 4) if scored else None,
+        "avg_roi": round(row["roi_sum"] / roi_n, 4) if roi_n else None,
+        "avg_profit": round(row["profit_sum"] / scored, 2) if scored else None,
+        "profit_distribution": [
+            {"min": edges[i], "max": edges[i + 1], "count": row[f"p{i}"]}
+            for i in range(len(PROFIT_EDGES) + 1)
+        ],
+    }
+
+
+ORDERS = {
+    "listings": "listings DESC",
+    "deals": "deals DESC",
+    "deal_rate": "CAST(deals AS REAL) / MAX(scored, 1) DESC",
+    "avg_roi": "roi_sum / MAX(roi_n, 1) DESC",
+    "key": "key",
+}
+
+
+def read_rollups(
+    conn,
+    dim: str,
+    order: str = "listings",
+    limit: int = 50,
+    min_scored: int = 0,
+    key_from: Optional[str] = None,
+    key_to: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Rollup rows for one dimension (the primary key makes this one index
+    range). key_from / key_to bound the keys inclusively, e.g. a date
+    range for dim="day".
+    """
+    if dim not in DIMENSIONS:
+        raise ValueError(f"unknown dimension {dim!r}; expected one of {', '.join(DIMENSIONS)}")
+    if order not in ORDERS:
+        raise ValueError(f"unknown order {order!r}; expected one of {', '.join(ORDERS)}")
+    where, params = ["dim = ?", "listings > 0", "scored >= ?"], [dim, min_scored]
+    if key_from is not None:
+        where.append("key >= ?")
+        params.append(key_from)
+    if key_to is not None:
+        where.append("key <= ?")
+        params.append(key_to)
+    cur = conn.cursor()
+    cur.execute(
+        f"SELECT key, {', '.join(COLUMNS)} FROM {ROLLUP_TABLE} "
+        f"WHERE {' AND '.join(where)} ORDER BY {ORDERS[order]}, key LIMIT ?",
+        (*params, limit),
+    )
+    return [_summary(r[0], dict(zip(COLUMNS, r[1:]))) for r in cur.fetchall()]
+
+
+__all__ = [
+    "ROLLUP_TABLE",
+    "DIMENSIONS",
+    "PROFIT_EDGES",
+    "ORDERS",
+    "ensure_analytics",
+    "rebuild_rollups",
+    "check_rollups",
+    "read_rollups",
+]
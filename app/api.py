@@ -1,12 +1,19 @@
 from fastapi import FastAPI, Query, HTTPException
-from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.encoders import jsonable_encoder
 from decimal import Decimal
 from typing import Optional, List
-import sqlite3, os, csv, io
 
 from .fbm_analyzer import analyze_fbm_url, save_listing
-from .db import Base, engine, SessionLocal
+from .db import database, engine, SessionLocal, migrate_db, search_index_ready
+from .fts import anchor_score, candidate_window, fts_match_query, fts_pending, search_sql, sync_fts
+from .pagination import decode_cursor, encode_cursor, split_page
+from .live_routes import router as live_deals_router
+from .near_dupes import claim_notification
+from .price_model import record_sold_comps
+from .analytics import DIMENSIONS, read_rollups
+from .retention import archived_row, archived_rows, start_retention, stop_retention
+from .export import FORMATS, build_export_sql, parse_columns, stream_export
 from .models import Listing
 from sqlalchemy import func
 from .ebay_api import find_completed_items, summarize_prices
@@ -14,8 +21,42 @@ from .notify_email import send_deal_email
 from .estimator import estimate_profit, decision_label
 from .score import deal_score
 
-Base.metadata.create_all(bind=engine)
+# set in on_startup, once the schema is known to be current
+FTS_ENABLED = False
 app = FastAPI(title="FB Marketplace Analyzer")
+app.include_router(live_deals_router)  # /ws/deals, /sse/deals
+
+
+def _record_sold(items, listing_id=None):
+    # training data for the local resale model (app/price_model.py); CAD
+    # only, the currency everything else here is priced in
+    rows = [
+        {"title": i.get("title"), "price": i.get("price"), "source": "ebay_sold", "listing_id": listing_id}
+        for i in items
+        if i.get("sold") and i.get("currency") == "CAD"
+    ]
+    if rows:
+        try:
+            database.write(lambda s: record_sold_comps(s.connection().connection, rows))
+        except Exception as e:
+            print(f"[WARN] could not record {len(rows)} sold comps: {e}")
+
+
+@app.on_event("startup")
+def on_startup():
+    # schema setup runs here rather than at import, so scripts importing
+    # app.api (or anything under it) don't pay for it
+    global FTS_ENABLED
+    migrate_db()
+    FTS_ENABLED = search_index_ready()
+    # archive old / passed listings in the background (app/retention.py)
+    start_retention(database)
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    stop_retention()
+
 
 @app.get("/health")
 async def health():
@@ -44,6 +85,7 @@ async def analyze_full(
     fb_currency = fb.get("currency") or "CAD"
 
     comps = find_completed_items(fb_title, max_results=20)
+    _record_sold(comps)
     summary = summarize_prices(comps)
 
     est = estimate_profit(fb_price, summary["avg"], fee_rate=0.13)
@@ -148,6 +190,7 @@ def refresh_comps(listing_id: int, notify: bool = Query(False)):
         fb_price = float(row.price) if row.price is not None else None
 
         comps = find_completed_items(title, max_results=20)
+        _record_sold(comps, listing_id)
         summary = summarize_prices(comps)
         est = estimate_profit(fb_price, summary["avg"], fee_rate=0.13)
         label = decision_label(est["profit"], est["roi_percent"])
@@ -169,6 +212,11 @@ def refresh_comps(listing_id: int, notify: bool = Query(False)):
             if score is not None:
                 cond = cond or (score >= SCORE_BAR)
 
+            if cond and not database.run_raw(lambda c: claim_notification(c, listing_id)):
+                # a relist / cross-post of this item was already emailed
+                print(f"[DEBUG] listing {listing_id}: duplicate group already notified")
+                cond = False
+
             if cond:
                 subj = "[FlipFinder] {} — {}".format(label, (row.title or "")[:60])
                 body = (
@@ -195,18 +243,19 @@ def refresh_comps(listing_id: int, notify: bool = Query(False)):
 
 # ---------- Day 3: browse/search/export ----------
 
-def _sqlite_path_from_env() -> str:
-    # Works for DATABASE_URL=sqlite:///flipfinder.db only (your default)
-    url = os.getenv("DATABASE_URL", "sqlite:///flipfinder.db")
-    return url.replace("sqlite:///","")
-
 @app.get("/recent")
 def recent(
     limit: int = Query(20, ge=1, le=100),
     label: str | None = Query(None, description="Filter by label (e.g., watch, buy, pass)"),
     min_price: float | None = Query(None, ge=0, description="Minimum price"),
     max_price: float | None = Query(None, ge=0, description="Maximum price"),
+    cursor: str | None = Query(None, description="next_cursor from the previous page"),
 ):
+    try:
+        after = decode_cursor(cursor, "recent")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     db = SessionLocal()
     try:
         q = db.query(Listing)
@@ -216,8 +265,10 @@ def recent(
             q = q.filter(Listing.price.isnot(None)).filter(Listing.price >= min_price)
         if max_price is not None:
             q = q.filter(Listing.price.isnot(None)).filter(Listing.price <= max_price)
+        if after is not None:
+            q = q.filter(Listing.id < after[0])
 
-        rows = q.order_by(Listing.id.desc()).limit(limit).all()
+        rows, more = split_page(q.order_by(Listing.id.desc()).limit(limit + 1).all(), limit)
         out = []
         for r in rows:
             out.append({
@@ -229,7 +280,8 @@ def recent(
                 "location": r.location,
                 "label": r.label,
             })
-        return {"rows": out}
+        next_cursor = encode_cursor("recent", [rows[-1].id]) if more else None
+        return {"rows": out, "next_cursor": next_cursor}
     finally:
         db.close()
 
@@ -240,7 +292,60 @@ def search(
     label: str | None = Query(None, description="Filter by label"),
     min_price: float | None = Query(None, ge=0),
     max_price: float | None = Query(None, ge=0),
+    cursor: str | None = Query(None, description="next_cursor from the previous page"),
 ):
+    match = fts_match_query(q) if FTS_ENABLED else None
+    if match is not None:
+        # BM25-ranked full-text search; label/price filter the matched rows.
+        # The cursor carries the first page's candidate window plus the last
+        # row seen, so new listings can't reshuffle the pages that follow.
+        try:
+            after = decode_cursor(cursor, "search")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        raw = engine.raw_connection()
+        try:
+            if fts_pending(raw):
+                # applying the log is a write: hand it to the writer thread
+                database.run_raw(sync_fts)
+            window = (after[2], after[3]) if after else candidate_window(
+                raw, match, label=label, min_price=min_price, max_price=max_price,
+            )
+            if after is not None:
+                score = anchor_score(raw, match, after[1])
+                after = (after[0] if score is None else score, after[1])
+            rows = []
+            if window is not None:
+                sql, params = search_sql(
+                    match, "l.id, l.title, l.price, l.url, l.label", limit + 1, window,
+                    label=label, min_price=min_price, max_price=max_price, after=after,
+                )
+                cur = raw.cursor()
+                cur.execute(sql, params)
+                rows = cur.fetchall()
+        finally:
+            raw.close()
+        rows, more = split_page(rows, limit)
+        out = [{
+            "id": rid,
+            "title": title,
+            "price": float(price) if price is not None else None,
+            "url": url,
+            "label": lbl,
+        } for rid, title, price, url, lbl, _ in rows]
+        next_cursor = None
+        if more:
+            last = rows[-1]
+            next_cursor = encode_cursor("search", [last[5], last[0], window[0], window[1]])
+        # only the newest SEARCH_CANDIDATES filtered matches were ranked
+        truncated = window is not None and window[0] > 0
+        return {"rows": out, "query": q, "next_cursor": next_cursor, "truncated": truncated}
+
+    # No FTS5 (or nothing searchable in q): substring scan, newest first
+    try:
+        after = decode_cursor(cursor, "search_like")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     db = SessionLocal()
     try:
         pat = f"%{q}%"
@@ -251,8 +356,10 @@ def search(
             qry = qry.filter(Listing.price.isnot(None)).filter(Listing.price >= min_price)
         if max_price is not None:
             qry = qry.filter(Listing.price.isnot(None)).filter(Listing.price <= max_price)
+        if after is not None:
+            qry = qry.filter(Listing.id < after[0])
 
-        rows = qry.order_by(Listing.id.desc()).limit(limit).all()
+        rows, more = split_page(qry.order_by(Listing.id.desc()).limit(limit + 1).all(), limit)
         out = []
         for r in rows:
             out.append({
@@ -262,56 +369,112 @@ def search(
                 "url": r.url,
                 "label": r.label,
             })
-        return {"rows": out, "query": q}
+        next_cursor = encode_cursor("search_like", [rows[-1].id]) if more else None
+        return {"rows": out, "query": q, "next_cursor": next_cursor}
     finally:
         db.close()
 
 @app.post("/listing/{listing_id}/note")
 def set_note(listing_id: int, label: Optional[str] = None, note: Optional[str] = None):
-    # write directly via sqlite to avoid orm/migration complexity
-    dbfile = _sqlite_path_from_env()
-    conn = sqlite3.connect(dbfile)
-    cur = conn.cursor()
-    # ensure columns exist
-    for col, t in [("label","TEXT"), ("note","TEXT")]:
-        cur.execute("PRAGMA table_info(listings)")
-        cols = {r[1] for r in cur.fetchall()}
-        if col not in cols:
-            cur.execute(f"ALTER TABLE listings ADD COLUMN {col} {t}")
-    cur.execute("SELECT id FROM listings WHERE id=?", (listing_id,))
-    if not cur.fetchone():
-        conn.close()
+    # label/note columns are guaranteed by the startup migrations
+    def job(s):
+        row = s.get(Listing, listing_id)
+        if row is None:
+            return False
+        if label is not None:
+            row.label = label
+        if note is not None:
+            row.note = note
+        return True
+
+    if not database.write(job):
         raise HTTPException(status_code=404, detail="Listing not found")
-    cur.execute("UPDATE listings SET label=COALESCE(?,label), note=COALESCE(?,note) WHERE id=?", (label, note, listing_id))
-    conn.commit()
-    conn.close()
     return {"ok": True, "id": listing_id, "label": label, "note": note}
 
-@app.get("/export.csv")
-def export_csv(limit: int = Query(200, ge=1, le=5000)):
-    db = SessionLocal()
+@app.get("/export")
+def export(
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    columns: str | None = Query(
+        None, description="Comma-separated, e.g. id,title,price,estimated_resale,profit,roi"
+    ),
+    label: str | None = Query(None, description="Filter by label"),
+    min_price: float | None = Query(None, ge=0),
+    max_price: float | None = Query(None, ge=0),
+    deals_only: bool = Query(False, description="Only rows flagged is_deal"),
+    min_profit: float | None = Query(None),
+    min_roi: float | None = Query(None),
+    limit: int | None = Query(None, ge=1, description="Default: every matching row"),
+):
+    """
+    Stream listings (newest first) as CSV or NDJSON. Rows are read through
+    a streaming cursor and sent in chunks, so memory stays flat and the
+    download starts right away even for millions of rows.
+    """
     try:
-        rows = (
-            db.query(Listing)
-              .order_by(Listing.id.desc())
-              .limit(limit)
-              .all()
+        cols = parse_columns(columns)
+        stmt, params = build_export_sql(
+            cols,
+            label=label, min_price=min_price, max_price=max_price,
+            deals_only=deals_only, min_profit=min_profit, min_roi=min_roi,
+            limit=limit,
         )
-        buf = io.StringIO()
-        w = csv.writer(buf)
-        w.writerow(["id","title","price","currency","location","url"])
-        for r in rows:
-            w.writerow([
-                r.id,
-                (r.title or "").replace("\n"," ").strip(),
-                float(r.price) if r.price is not None else "",
-                r.currency or "",
-                (r.location or "").replace("\n"," ").strip(),
-                r.url or "",
-            ])
-        return PlainTextResponse(buf.getvalue(), media_type="text/csv")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        stream_export(engine, fmt, cols, stmt, params),
+        media_type=FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="listings.{fmt}"'},
+    )
+
+@app.get("/export.csv")
+def export_csv(
+    limit: int = Query(200, ge=1),
+    columns: str | None = Query(None, description="Comma-separated column names"),
+    label: str | None = Query(None, description="Filter by label"),
+    min_price: float | None = Query(None, ge=0),
+    max_price: float | None = Query(None, ge=0),
+):
+    # kept for existing links; same streaming path as /export
+    return export(
+        fmt="csv", columns=columns, label=label, min_price=min_price,
+        max_price=max_price, deals_only=False, min_profit=None, min_roi=None,
+        limit=limit,
+    )
+
+# ---------- Retention: archived listings ----------
+
+@app.get("/archive")
+def archive(
+    limit: int = Query(20, ge=1, le=100),
+    label: str | None = Query(None, description="Filter by label (e.g., pass)"),
+    cursor: str | None = Query(None, description="next_cursor from the previous page"),
+):
+    """Listings moved to the archive file, newest id first."""
+    try:
+        after = decode_cursor(cursor, "archive")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    raw = engine.raw_connection()
+    try:
+        rows = archived_rows(raw, limit + 1, label=label, before_id=after[0] if after else None)
     finally:
-        db.close()
+        raw.close()
+    rows, more = split_page(rows, limit)
+    for r in rows:
+        r["price"] = float(r["price"]) if r["price"] is not None else None
+    next_cursor = encode_cursor("archive", [rows[-1]["id"]]) if more else None
+    return {"rows": rows, "next_cursor": next_cursor}
+
+@app.get("/archive/{listing_id}")
+def archive_listing(listing_id: int, html: bool = Query(False, description="Include raw_html")):
+    raw = engine.raw_connection()
+    try:
+        row = archived_row(raw, listing_id, with_html=html)
+    finally:
+        raw.close()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Listing not in the archive")
+    return jsonable_encoder(row, custom_encoder={Decimal: float})
 
 from fastapi.responses import HTMLResponse
 
@@ -362,6 +525,7 @@ def home():
     </thead>
     <tbody></tbody>
   </table>
+  <button id="more" onclick="loadMore()" style="display:none">Load more</button>
 
   <pre id="out" class="mono"></pre>
 
@@ -397,7 +561,7 @@ function rowHtml(r) {
   return `
     <tr data-id="${r.id}">
       <td>${r.id}</td>
-      <td>${(r.title||'').replaceAll('\n',' ')}</td>
+      <td>${(r.title||'').replaceAll('\\n',' ')}</td>
       <td>${price}</td>
       <td>${url}</td>
       <td class="row-actions">
@@ -407,13 +571,37 @@ function rowHtml(r) {
     </tr>`;
 }
 
+// Keyset paging: remember the query the table came from plus the server's
+// next_cursor; "Load more" appends the following page.
+let pageBase = null, nextCursor = null;
+
+function showPage(base, data, append) {
+  const rows = data.rows || [];
+  const tbody = document.querySelector('#tbl tbody');
+  if (append) tbody.insertAdjacentHTML('beforeend', rows.map(rowHtml).join(''));
+  else tbody.innerHTML = rows.map(rowHtml).join('');
+  pageBase = base;
+  nextCursor = data.next_cursor || null;
+  document.getElementById('more').style.display = nextCursor ? '' : 'none';
+  return tbody.rows.length;
+}
+
+async function loadMore() {
+  if (!nextCursor) return;
+  setStatus('Loading more…');
+  try {
+    const data = await jsonGET(pageBase + '&cursor=' + encodeURIComponent(nextCursor));
+    const shown = showPage(pageBase, data, true);
+    setStatus('Showing ' + shown + ' listings');
+  } catch (e) { setStatus('Error: ' + e.message); }
+}
+
 async function loadRecent() {
   setStatus('Loading recent…');
   try {
-    const data = await jsonGET('/recent?limit=25' + getFiltersQS());
-    const rows = data.rows || [];
-    document.querySelector('#tbl tbody').innerHTML = rows.map(rowHtml).join('');
-    setStatus(\`Showing \${rows.length} recent listings\`);
+    const base = '/recent?limit=25' + getFiltersQS();
+    const shown = showPage(base, await jsonGET(base), false);
+    setStatus('Showing ' + shown + ' recent listings');
   } catch (e) { setStatus('Error: ' + e.message); }
 }
 
@@ -422,10 +610,9 @@ async function doSearch() {
   if (!q) return loadRecent();
   setStatus('Searching…');
   try {
-    const data = await jsonGET('/search?q=' + q + '&limit=50' + getFiltersQS());
-    const rows = data.rows || [];
-    document.querySelector('#tbl tbody').innerHTML = rows.map(rowHtml).join('');
-    setStatus(\`Search "\${decodeURIComponent(q)}": \${rows.length} result(s)\`);
+    const base = '/search?q=' + q + '&limit=50' + getFiltersQS();
+    const shown = showPage(base, await jsonGET(base), false);
+    setStatus('Search "' + decodeURIComponent(q) + '": ' + shown + ' result(s)');
   } catch (e) { setStatus('Error: ' + e.message); }
 }
 
@@ -438,7 +625,7 @@ async function refreshComps(id) {
     const c = res.ebay?.count ?? 0;
     const avg = res.ebay?.avg ?? null;
     const dec = res.estimate?.decision ?? '';
-    setStatus(\`Comps: \${c} item(s); avg=\${avg ?? 'n/a'} | \${dec}\`);
+    setStatus(`Comps: ${c} item(s); avg=${avg ?? 'n/a'} | ${dec}`);
   } catch (e) { setStatus('Error: ' + e.message); }
 }
 
@@ -451,7 +638,37 @@ async function addNote(id) {
     setStatus('Saved label/note for #' + id);
   } catch (e) { setStatus('Error: ' + e.message); }
 }
+
+// Live feed (/ws/deals, or /sse/deals where WebSockets don't get through):
+// new listings go on top of the unfiltered Recent table and deals show in
+// the status line, without reloading.
+function onLive(ev) {
+  const r = ev.listing || {};
+  if (ev.type === 'deal') {
+    setStatus('New deal #' + r.id + ': ' + (r.title || '') + ' (profit $' + Math.round(r.profit) + ', ROI ' + r.roi.toFixed(2) + ')');
+  } else if (pageBase && pageBase.startsWith('/recent') && !getFiltersQS()
+             && !document.querySelector('#tbl tr[data-id="' + r.id + '"]')) {
+    document.querySelector('#tbl tbody').insertAdjacentHTML('afterbegin', rowHtml(r));
+  }
+}
+function connectSSE() {
+  if (!window.EventSource) return;
+  const es = new EventSource('/sse/deals');  // reconnects by itself
+  const handler = (m) => onLive(JSON.parse(m.data));
+  es.addEventListener('new', handler);
+  es.addEventListener('deal', handler);
+}
+function connectLive() {
+  if (!window.WebSocket) return connectSSE();
+  const ws = new WebSocket((location.protocol === 'https:' ? 'wss://' : 'ws://') + location.host + '/ws/deals');
+  let opened = false;
+  ws.onopen = () => { opened = true; };
+  ws.onmessage = (m) => onLive(JSON.parse(m.data));
+  ws.onclose = () => opened ? setTimeout(connectLive, 5000) : connectSSE();
+}
+
 loadRecent();
+connectLive();
 </script>
 </body>
 </html>"""
@@ -465,6 +682,34 @@ def labels_counts():
     finally:
         db.close()
 
+@app.get("/analytics")
+def analytics(
+    dim: str | None = Query(None, description="keyword, rule, location or day; all four when omitted"),
+    order: str = Query("listings", description="listings, deals, deal_rate, avg_roi or key"),
+    limit: int = Query(50, ge=1, le=1000),
+    min_scored: int = Query(0, ge=0, description="Skip keys with fewer scored listings"),
+    key_from: str | None = Query(None, alias="from", description="Lowest key, e.g. 2025-01-01 for dim=day"),
+    key_to: str | None = Query(None, alias="to", description="Highest key"),
+):
+    """
+    Deal rate, average ROI / profit and profit distribution per keyword,
+    pricing rule, location or day. Reads the rollup table only
+    (app/analytics.py), so it costs the same however many listings exist.
+    """
+    dims = [dim] if dim else list(DIMENSIONS)
+    raw = engine.raw_connection()
+    try:
+        out = {
+            d: read_rollups(raw, d, order=order, limit=limit, min_scored=min_scored,
+                            key_from=key_from, key_to=key_to)
+            for d in dims
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        raw.close()
+    return out if dim is None else {"dim": dim, "rows": out[dim]}
+
 @app.post("/ebay-account-deletion")
 def ebay_account_deletion(payload: dict):
     # Minimal handler for eBay Marketplace Account Deletion/Closure notifications.
@@ -1,11 +1,44 @@
 import os
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
 
+from .db_access import open_database
+
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///flipfinder.db")
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
-engine = create_engine(DATABASE_URL, pool_pre_ping=True, future=True, connect_args=connect_args)
+# Reads go through `engine` (read-only pool); writes go through
+# database.write(...) / db_access.write(session, ...) to the writer thread.
+database = open_database(DATABASE_URL, pool_pre_ping=True)
+engine = database.read_engine
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 Base = declarative_base()
+
+
+
+def migrate_db() -> None:
+    """
+    Bring the schema up to date (app/migrations.py). Call once at startup;
+    request handlers assume it's current. Non-SQLite databases just get
+    create_all().
+    """
+    if not DATABASE_URL.startswith("sqlite"):
+        from . import models  # noqa: F401  (registers the listings table)
+
+        Base.metadata.create_all(bind=database.write_engine)
+        return
+    from .migrations import migrate
+
+    database.run_raw(migrate)
+
+
+def search_index_ready() -> bool:
+    """True if the FTS5 search index (app/fts.py) exists; checked once at startup."""
+    if not DATABASE_URL.startswith("sqlite"):
+        return False
+    from .fts import fts_exists
+
+    raw = engine.raw_connection()
+    try:
+        return fts_exists(raw)
+    finally:
+        raw.close()
@@ -0,0 +1,297 @@
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from .sqlite_tuning import BUSY_TIMEOUT_S, apply_pragmas
+
+# One access layer per SQLite file: a pool of read-only WAL connections
+# for reads and a single writer thread that owns the only write connection.
+#
+# Write requests are jobs, fn(session) -> result, queued to the writer. It
+# takes whatever is queued (up to MAX_BATCH jobs) and runs them in one
+# BEGIN IMMEDIATE transaction, each inside its own SAVEPOINT so a failing
+# job is rolled back and raised to its caller without sinking the batch,
+# then commits once. In-process writers therefore never contend for the
+# lock, and a burst of small writes costs one commit instead of one each.
+# Other processes (CLI scripts, a second uvicorn worker) still queue on the
+# SQLite lock via busy_timeout; BEGIN IMMEDIATE takes it up front, so they
+# wait instead of failing with "database is locked" mid-transaction.
+#
+# app/db.py, flipfinder/db.py and flipfinder/database.py all open their
+# engines here, and modules pointing at the same file share one instance.
+#
+# `generation` goes up after every committed write batch and run_raw() job,
+# so caches of query results (app/page_cache.py) can tell they're stale
+# without asking the database. It only counts this process's writes.
+
+T = TypeVar("T")
+
+MAX_BATCH = 100
+READ_POOL_SIZE = max(4, os.cpu_count() or 4)
+
+_STOP = object()
+
+
+class Database:
+    def __init__(self, url: str, **engine_kwargs):
+        self.url = url
+        self.is_sqlite = url.startswith("sqlite")
+        self._local = threading.local()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.generation = 0
+
+        if not self.is_sqlite:
+            # no single-writer problem to solve: one ordinary engine
+            self.read_engine = self.write_engine = create_engine(url, future=True, **engine_kwargs)
+            return
+
+        connect_args = {"check_same_thread": False, "timeout": BUSY_TIMEOUT_S}
+        engine_kwargs.setdefault("pool_size", READ_POOL_SIZE)
+        engine_kwargs.setdefault("max_overflow", READ_POOL_SIZE)
+        self.read_engine = create_engine(
+            url, future=True, connect_args=connect_args, **engine_kwargs
+        )
+
+        @event.listens_for(self.read_engine, "connect")
+        def _reader(dbapi_conn, _record):
+            apply_pragmas(dbapi_conn)
+            dbapi_conn.execute("PRAGMA query_only=ON")
+
+        # One connection, only ever used on the writer thread.
+        self.write_engine = create_engine(
+            url, future=True, connect_args=connect_args, pool_size=1, max_overflow=0
+        )
+
+        @event.listens_for(self.write_engine, "connect")
+        def _writer(dbapi_conn, _record):
+            apply_pragmas(dbapi_conn)
+            # let SQLAlchemy emit BEGIN itself (pysqlite's implicit BEGIN
+            # is deferred and breaks SAVEPOINTs)
+            dbapi_conn.isolation_level = None
+
+        @event.listens_for(self.write_engine, "begin")
+        def _begin(conn):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    # -- writes -------------------------------------------------------------
+
+    def submit(self, job: Callable[[Session], T]) -> "Future[T]":
+        """Queue job(session) for the writer; the Future resolves after its batch commits."""
+        fut: "Future[T]" = Future()
+        if not self.is_sqlite:
+            try:
+                with Session(self.write_engine, expire_on_commit=False) as s, s.begin():
+                    value = job(s)
+                self._bump()
+                fut.set_result(value)
+            except Exception as e:
+                fut.set_exception(e)
+            return fut
+        self._start()
+        self._queue.put(("job", job, fut))
+        return fut
+
+    def write(self, job: Callable[[Session], T]) -> T:
+        """
+        Run job(session) on the writer and return its result once committed.
+        Exceptions raised by the job (IntegrityError, ...) come back here.
+        Called from inside another job, it just runs in that job's session.
+        """
+        current = getattr(self._local, "session", None)
+        if current is not None:
+            with current.begin_nested():
+                return job(current)
+        return self.submit(job).result()
+
+    def run_raw(self, fn: Callable[[Any], T]) -> T:
+        """
+        Run fn(dbapi_connection) on the writer, alone, with the usual sqlite3
+        transaction handling (fn commits itself). For migrations and the FTS
+        sync, which are written against a plain DB-API connection.
+        """
+        if getattr(self._local, "session", None) is not None:
+            raise RuntimeError("run_raw() can't be nested inside a write job")
+        if not self.is_sqlite:
+            raw = self.write_engine.raw_connection()
+            try:
+                return fn(raw)
+            finally:
+                raw.close()
+                self._bump()
+        fut: "Future[T]" = Future()
+        self._start()
+        self._queue.put(("raw", fn, fut))
+        return fut.result()
+
+    def _bump(self) -> None:
+        with self._lock:
+            self.generation += 1
+
+    def close(self) -> None:
+        """Finish queued writes and stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+        self.write_engine.dispose()
+        self.read_engine.dispose()
+
+    # -- writer thread --------------------------------------------------------
+
+    def _start(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"sqlite-writer:{self.url}", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            while len(batch) < MAX_BATCH:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._queue.put(_STOP)
+                    break
+                batch.append(item)
+
+            jobs = []
+            for kind, fn, fut in batch:
+                if kind == "job":
+                    jobs.append((fn, fut))
+                    continue
+                # raw work runs between batches, in submission order
+                self._run_jobs(jobs)
+                jobs = []
+                self._run_raw(fn, fut)
+            self._run_jobs(jobs)
+
+    def _run_jobs(self, jobs) -> None:
+        if not jobs:
+            return
+        results = []
+        try:
+            with Session(self.write_engine, expire_on_commit=False) as s:
+                self._local.session = s
+                try:
+                    s.begin()
+                    for fn, fut in jobs:
+                        if not fut.set_running_or_notify_cancel():
+                            continue
+                        try:
+                            with s.begin_nested():
+                                value = fn(s)
+                            results.append((fut, value, None))
+                        except Exception as e:
+                            results.append((fut, None, e))
+                    s.commit()
+                finally:
+                    self._local.session = None
+            # after the commit: anything read before it was tagged with an
+            # older generation, and callers see the new one once they return
+            self._bump()
+        except Exception as e:
+            # BEGIN or COMMIT failed: nothing in this batch was written
+            print("[ERROR] write batch failed:", e)
+            for fut, _value, _err in results:
+                fut.set_exception(e)
+            for _fn, fut in jobs[len(results):]:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for fut, value, err in results:
+            if err is None:
+                fut.set_result(value)
+            else:
+                fut.set_exception(err)
+
+    def _run_raw(self, fn, fut: Future) -> None:
+        if not fut.set_running_or_notify_cancel():
+            return
+        raw = self.write_engine.raw_connection()
+        dbapi_conn = raw.driver_connection
+        dbapi_conn.isolation_level = ""
+        try:
+            value = fn(dbapi_conn)
+        except Exception as e:
+            value, error = None, e
+        else:
+            error = None
+        finally:
+            if dbapi_conn.in_transaction:
+                dbapi_conn.rollback()
+            dbapi_conn.isolation_level = None
+            raw.close()
+        self._bump()  # fn may have committed part of its work even if it raised
+        if error is None:
+            fut.set_result(value)
+        else:
+            fut.set_exception(error)
+
+
+_databases: Dict[str, Database] = {}
+_by_engine: Dict[int, Database] = {}
+_registry_lock = threading.Lock()
+
+
+def _key(url: str) -> str:
+    if not url.startswith("sqlite"):
+        return url
+    return "sqlite:" + os.path.abspath(make_url(url).database or ":memory:")
+
+
+def open_database(url: str, **engine_kwargs) -> Database:
+    """The shared Database for `url` (same file -> same instance)."""
+    key = _key(url)
+    with _registry_lock:
+        db = _databases.get(key)
+        if db is None:
+            db = _databases[key] = Database(url, **engine_kwargs)
+            _by_engine[id(db.read_engine)] = db
+        return db
+
+
+def database_for(session: Session) -> Optional[Database]:
+    return _by_engine.get(id(session.get_bind()))
+
+
+def write(session: Session, job: Callable[[Session], T]) -> T:
+    """
+    Run a write job for the database `session` reads from, then expire the
+    session so its objects reload with what was written. Sessions on an
+    engine that isn't managed here (ad-hoc engines in scripts and benches)
+    just run the job themselves and commit.
+    """
+    db = database_for(session)
+    if db is None:
+        try:
+            value = job(session)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        return value
+    value = db.write(job)
+    session.expire_all()
+    return value
+
+
+__all__ = ["Database", "open_database", "database_for", "write", "MAX_BATCH"]
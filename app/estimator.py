@@ -1,6 +1,17 @@
 from typing import Optional, Dict
 
-def estimate_profit(fb_price: Optional[float], ebay_avg: Optional[float], fee_rate: float = 0.13) -> Dict[str, Optional[float]]:
+DEFAULT_FEE_RATE = 0.13
+
+# decision_label thresholds: profit in dollars, roi in percent
+BUY_MIN_PROFIT, BUY_MIN_ROI = 50, 40
+MAYBE_MIN_PROFIT, MAYBE_MIN_ROI = 20, 20
+
+NO_DATA_LABEL = "🤷 Not enough data"
+BUY_LABEL = "✅ Buy — strong flip potential"
+MAYBE_LABEL = "👍 Maybe — moderate upside"
+PASS_LABEL = "⚠️ Pass — weak margins"
+
+def estimate_profit(fb_price: Optional[float], ebay_avg: Optional[float], fee_rate: float = DEFAULT_FEE_RATE) -> Dict[str, Optional[float]]:
     if fb_price is None or ebay_avg is None:
         return {"profit": None, "roi_percent": None}
     net = ebay_avg * (1.0 - fee_rate)
@@ -10,9 +21,9 @@ def estimate_profit(fb_price: Optional[float], ebay_avg: Optional[float], fee_ra
 
 def decision_label(profit: Optional[float], roi: Optional[float]) -> str:
     if profit is None or roi is None:
-        return "🤷 Not enough data"
-    if profit >= 50 and roi >= 40:
-        return "✅ Buy — strong flip potential"
-    if profit >= 20 and roi >= 20:
-        return "👍 Maybe — moderate upside"
-    return "⚠️ Pass — weak margins"
+        return NO_DATA_LABEL
+    if profit >= BUY_MIN_PROFIT and roi >= BUY_MIN_ROI:
+        return BUY_LABEL
+    if profit >= MAYBE_MIN_PROFIT and roi >= MAYBE_MIN_ROI:
+        return MAYBE_LABEL
+    return PASS_LABEL
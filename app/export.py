@@ -0,0 +1,165 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from sqlalchemy import text
+
+# Streaming listing export (CSV / NDJSON).
+#
+# Rows come through a streaming cursor in yield_per-sized partitions and are
+# encoded one partition at a time, so memory stays flat at any row count and
+# the first bytes go out as soon as the first partition is read.
+#
+# Plain SQL rows rather than ORM objects: building a Listing per row was
+# most of the old export's time and memory.
+
+# Everything a client may ask for, in default-ish order. raw_html and photos
+# are left out on purpose (huge, and useless in a spreadsheet).
+EXPORT_COLUMNS = [
+    "id", "source", "title", "description", "price", "currency", "location",
+    "distance_km", "url", "seller", "label", "note", "created_at",
+    "posted_at", "posted_at_text", "external_id",
+    "estimated_resale", "profit", "roi", "is_deal",
+]
+DEFAULT_COLUMNS = ["id", "title", "price", "currency", "location", "url"]
+
+# NUMERIC columns come back as int, float or Decimal depending on the stored
+# value and the driver; export them all as floats like the ORM-based export.
+FLOAT_COLUMNS = {"price", "distance_km", "estimated_resale", "profit", "roi"}
+
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+CHUNK_ROWS = 1000
+
+
+def parse_columns(spec: Optional[str]) -> List[str]:
+    """
+    "id,title,profit" -> ["id", "title", "profit"]; None/"" -> the defaults.
+    Raises ValueError naming any unknown column.
+    """
+    if not spec:
+        return list(DEFAULT_COLUMNS)
+    cols = [c.strip() for c in spec.split(",") if c.strip()]
+    unknown = [c for c in cols if c not in EXPORT_COLUMNS]
+    if unknown:
+        raise ValueError(
+            f"Unknown column(s): {', '.join(unknown)}. Allowed: {', '.join(EXPORT_COLUMNS)}"
+        )
+    return cols
+
+
+def build_export_sql(
+    columns: Sequence[str],
+    label: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    deals_only: bool = False,
+    min_profit: Optional[float] = None,
+    min_roi: Optional[float] = None,
+    limit: Optional[int] = None,
+):
+    """
+    SELECT for the export, newest first. `columns` must come from
+    parse_columns(); the startup migrations guarantee they all exist.
+    """
+    where, params = [], {}
+    if label:
+        where.append("label = :label")
+        params["label"] = label
+    if min_price is not None:
+        where.append("price IS NOT NULL AND price >= :min_price")
+        params["min_price"] = min_price
+    if max_price is not None:
+        where.append("price IS NOT NULL AND price <= :max_price")
+        params["max_price"] = max_price
+    if deals_only:
+        where.append("is_deal = 1")
+    if min_profit is not None:
+        where.append("profit >= :min_profit")
+        params["min_profit"] = min_profit
+    if min_roi is not None:
+        where.append("roi >= :min_roi")
+        params["min_roi"] = min_roi
+
+    sql = f"SELECT {', '.join(columns)} FROM listings"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY id DESC"
+    if limit is not None:
+        sql += " LIMIT :limit"
+        params["limit"] = limit
+    return text(sql), params
+
+
+def _clean(value: Any) -> Any:
+    if isinstance(value, str):
+        return value.replace("\n", " ").strip()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _as_float(value: Any) -> Any:
+    return None if value is None else float(value)
+
+
+def _converters(columns: Sequence[str]):
+    return [_as_float if c in FLOAT_COLUMNS else _clean for c in columns]
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _encode_csv(columns: Sequence[str], partitions) -> Iterator[str]:
+    convs = _converters(columns)
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(columns)
+    for rows in partitions:
+        for row in rows:
+            w.writerow(["" if v is None else conv(v) for conv, v in zip(convs, row)])
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def _encode_ndjson(columns: Sequence[str], partitions) -> Iterator[str]:
+    convs = list(zip(columns, _converters(columns)))
+    dumps = json.JSONEncoder(ensure_ascii=False, default=_json_default).encode
+    for rows in partitions:
+        yield "".join(
+            dumps({c: conv(v) for (c, conv), v in zip(convs, row)}) + "\n" for row in rows
+        )
+
+
+def stream_export(engine, fmt: str, columns: Sequence[str], stmt, params: Dict[str, Any],
+                  chunk_rows: int = CHUNK_ROWS) -> Iterator[str]:
+    """
+    Generator of encoded chunks, one per `chunk_rows` rows. It owns its
+    connection, which is released when the generator finishes or is closed
+    (e.g. the client disconnects mid-download).
+    """
+    encode = _encode_csv if fmt == "csv" else _encode_ndjson
+    with engine.connect() as conn:
+        result = conn.execution_options(
+            stream_results=True, yield_per=chunk_rows
+        ).execute(stmt, params)
+        yield from encode(columns, result.partitions())
+
+
+__all__ = [
+    "EXPORT_COLUMNS",
+    "DEFAULT_COLUMNS",
+    "FORMATS",
+    "parse_columns",
+    "build_export_sql",
+    "stream_export",
+]
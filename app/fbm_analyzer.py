@@ -1,10 +1,11 @@
 import os, asyncio
 from typing import Optional, List, Dict, Any
-from playwright.async_api import async_playwright
 from sqlalchemy.exc import IntegrityError
 
-from .db import SessionLocal
+from .db import database
+from .live_deals import listing_payload, publish_new
 from .models import Listing
+from .near_dupes import index_listing
 from .utils import parse_price
 
 # Reuse a persistent browser profile so Facebook login is kept
@@ -70,6 +71,9 @@ async def _first_image(page, selectors: List[str]) -> Optional[str]:
 
 async def analyze_fbm_url(url: str, headless: bool = True) -> Dict[str, Any]:
     """Open a Marketplace item URL with Playwright and extract details."""
+    # imported here so importing this module (app.api, scripts) stays cheap
+    from playwright.async_api import async_playwright
+
     async with async_playwright() as p:
         ctx = await p.chromium.launch_persistent_context(
             USER_DATA_DIR,
@@ -118,17 +122,18 @@ async def analyze_fbm_url(url: str, headless: bool = True) -> Dict[str, Any]:
 
 def save_listing(row: dict) -> int:
     """Persist a listing; return 1 if added, 0 if duplicate or failed."""
-    db = SessionLocal()
+    def add(s):
+        listing = Listing(**row)
+        s.add(listing)
+        s.flush()
+        index_listing(s.connection().connection, listing.id, listing.title, listing.price, listing.location)
+        return listing_payload(listing)  # the session closes with the job
+
     try:
-        db.add(Listing(**row))
-        db.commit()
+        publish_new([database.write(add)])
         return 1
     except IntegrityError:
-        db.rollback()
         return 0
     except Exception as e:
-        db.rollback()
         print("Save error:", e)
         return 0
-    finally:
-        db.close()
@@ -0,0 +1,280 @@
+import re
+import sqlite3
+from typing import Any, List, Optional, Tuple
+
+# SQLite FTS5 index over listings.title / listings.description.
+#
+# It's an external-content table (the text lives only in `listings`). Triggers
+# inside the DB log every insert/update/delete to a small pending table, so
+# every writer -- the API, the scrape router, raw sqlite3 scripts -- is
+# tracked without knowing the index exists. sync_fts() replays that log into
+# the index in one statement before each search.
+#
+# Writing to the FTS table straight from the triggers would be simpler, but
+# FTS5 flushes its buffer at the end of every statement that touches it from
+# a trigger, which made each listing insert ~15x slower.
+
+FTS_TABLE = "listings_fts"
+PENDING_TABLE = "listings_fts_pending"
+
+_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, description,
+        content='listings', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    # op is NULL for "index these values" and 'delete' for "un-index these
+    # values" -- exactly what the FTS5 command column expects on replay.
+    f"""
+    CREATE TABLE IF NOT EXISTS {PENDING_TABLE} (
+        seq INTEGER PRIMARY KEY,
+        op TEXT,
+        listing_id INTEGER NOT NULL,
+        title TEXT,
+        description TEXT
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON listings BEGIN
+        INSERT INTO {PENDING_TABLE}(op, listing_id, title, description)
+        VALUES (NULL, new.id, new.title, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON listings BEGIN
+        INSERT INTO {PENDING_TABLE}(op, listing_id, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, description ON listings BEGIN
+        INSERT INTO {PENDING_TABLE}(op, listing_id, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {PENDING_TABLE}(op, listing_id, title, description)
+        VALUES (NULL, new.id, new.title, new.description);
+    END
+    """,
+]
+
+# bm25 column weights: a hit in the title counts far more than one buried
+# in a long description.
+TITLE_WEIGHT, DESCRIPTION_WEIGHT = 10.0, 1.0
+
+# Only the newest this-many matches (after the label / price filters) get
+# ranked. Scoring is per match, so a very common word would otherwise cost
+# ~1 µs for every listing containing it. Searches that hit the cap say so.
+SEARCH_CANDIDATES = 5000
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_exists(conn) -> bool:
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (FTS_TABLE,))
+    return cur.fetchone() is not None
+
+
+def ensure_fts(conn) -> bool:
+    """
+    Create the FTS table, pending log and triggers if missing, backfilling
+    every existing listing the first time. Safe to call repeatedly. Returns
+    False if this SQLite build has no FTS5 (callers fall back to LIKE search).
+    """
+    created = not fts_exists(conn)
+    cur = conn.cursor()
+    try:
+        for ddl in _DDL:
+            cur.execute(ddl)
+    except sqlite3.OperationalError as e:
+        if "fts5" in str(e).lower():
+            print("[WARN] SQLite has no FTS5; search falls back to LIKE:", e)
+            conn.rollback()
+            return False
+        raise
+    if created:
+        rebuild_fts(conn)
+    conn.commit()
+    sync_fts(conn)
+    return True
+
+
+def rebuild_fts(conn) -> None:
+    """Re-index every listing from scratch (no commit)."""
+    cur = conn.cursor()
+    cur.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    cur.execute(f"DELETE FROM {PENDING_TABLE}")
+
+
+def fts_pending(conn) -> bool:
+    """Whether listing changes are waiting for sync_fts() (a cheap read)."""
+    cur = conn.cursor()
+    cur.execute(f"SELECT 1 FROM {PENDING_TABLE} LIMIT 1")
+    return cur.fetchone() is not None
+
+
+def sync_fts(conn) -> int:
+    """
+    Apply logged listing changes to the index, oldest first, and commit.
+    Returns how many log entries were applied (0 is the cheap common case).
+    """
+    cur = conn.cursor()
+    cur.execute(f"SELECT MAX(seq) FROM {PENDING_TABLE}")
+    upto = cur.fetchone()[0]
+    if upto is None:
+        return 0
+    try:
+        cur.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description) "
+            f"SELECT op, listing_id, title, description FROM {PENDING_TABLE} "
+            f"WHERE seq <= ? ORDER BY seq",
+            (upto,),
+        )
+        cur.execute(f"DELETE FROM {PENDING_TABLE} WHERE seq <= ?", (upto,))
+        n = cur.rowcount
+        conn.commit()
+    except sqlite3.OperationalError as e:
+        # Another connection holds the write lock; it (or the next search)
+        # will catch up, and this search sees a slightly stale index.
+        conn.rollback()
+        print("[WARN] FTS sync skipped:", e)
+        return 0
+    return n
+
+
+def fts_match_query(q: str, column: Optional[str] = None) -> Optional[str]:
+    """
+    Turn free text into a safe FTS5 MATCH expression: every word becomes a
+    quoted prefix term, all of which must match ("mac pro" finds
+    "MacBook Pro"). Returns None if there are no searchable words.
+    """
+    tokens = _TOKEN_RE.findall(q or "")
+    if not tokens:
+        return None
+    expr = " ".join(f'"{t}"*' for t in tokens)
+    if column:
+        expr = f"{{{column}}} : ({expr})"
+    return expr
+
+
+def _filters(
+    label: Optional[str],
+    min_price: Optional[float],
+    max_price: Optional[float],
+    extra_where: str,
+    extra_params: Tuple[Any, ...],
+) -> Tuple[List[str], List[Any]]:
+    """WHERE terms (on listings `l`) for the usual label / price filters."""
+    where: List[str] = []
+    params: List[Any] = []
+    if label:
+        where.append("l.label = ?")
+        params.append(label)
+    if min_price is not None:
+        where.append("l.price IS NOT NULL AND l.price >= ?")
+        params.append(min_price)
+    if max_price is not None:
+        where.append("l.price IS NOT NULL AND l.price <= ?")
+        params.append(max_price)
+    if extra_where:
+        where.append(extra_where)
+        params.extend(extra_params)
+    return where, params
+
+
+def candidate_window(
+    conn,
+    match: str,
+    label: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    extra_where: str = "",
+    extra_params: Tuple[Any, ...] = (),
+) -> Optional[Tuple[int, int]]:
+    """
+    (lowest, highest) rowid of the newest SEARCH_CANDIDATES matches that
+    pass the filters, or None if nothing does. Pass the same filters as to
+    search_sql(): the cap is counted after them, so a filtered search on a
+    common word still reaches older rows that qualify.
+
+    lowest is 0 when the window holds every qualifying match, so
+    `window[0] > 0` means older ones were left out (callers report that as
+    truncated). Unfiltered, each bound is a single rowid-ordered walk of the
+    index; filtered, the walk also looks each match up in listings, but
+    still never scores anything. Paginated callers keep the window in their
+    cursor so later pages rank the same candidates.
+    """
+    where, params = _filters(label, min_price, max_price, extra_where, extra_params)
+    sql = f"SELECT {FTS_TABLE}.rowid FROM {FTS_TABLE} "
+    if where:
+        sql += f"JOIN listings l ON l.id = {FTS_TABLE}.rowid "
+    sql += (
+        f"WHERE {' AND '.join([f'{FTS_TABLE} MATCH ?'] + where)} "
+        f"ORDER BY {FTS_TABLE}.rowid DESC LIMIT ? OFFSET ?"
+    )
+    cur = conn.cursor()
+    cur.execute(sql, [match, *params, 1, 0])
+    hi = cur.fetchone()
+    if hi is None:
+        return None
+    # the last candidate and, if there is one, the first match past the cap
+    cur.execute(sql, [match, *params, 2, SEARCH_CANDIDATES - 1])
+    edge = cur.fetchall()
+    return (edge[0][0] if len(edge) == 2 else 0), hi[0]
+
+
+def anchor_score(conn, match: str, listing_id: int) -> Optional[float]:
+    """
+    Current bm25 score of one listing for `match` (None if it no longer
+    matches). New listings shift the corpus statistics every score depends
+    on, so a page boundary is re-scored rather than trusted from the cursor.
+    """
+    cur = conn.cursor()
+    cur.execute(
+        f"SELECT bm25({FTS_TABLE}, {TITLE_WEIGHT}, {DESCRIPTION_WEIGHT}) FROM {FTS_TABLE} "
+        f"WHERE {FTS_TABLE} MATCH ? AND rowid = ?",
+        (match, listing_id),
+    )
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def search_sql(
+    match: str,
+    columns: str,
+    limit: int,
+    window: Tuple[int, int],
+    label: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    after: Optional[Tuple[float, int]] = None,
+    extra_where: str = "",
+    extra_params: Tuple[Any, ...] = (),
+) -> Tuple[str, List[Any]]:
+    """
+    SQL (qmark style) for a BM25-ranked FTS search joined back to listings,
+    with the usual label / price filters applied to the matched rows.
+    `window` comes from candidate_window() called with the same filters.
+
+    The selected columns are followed by `score` (lower is better). Rows are
+    ordered by (score, id DESC); pass the last row's (score, id) as `after`
+    for the next page.
+    """
+    filters, filter_params = _filters(label, min_price, max_price, extra_where, extra_params)
+    where = [f"{FTS_TABLE} MATCH ?", f"{FTS_TABLE}.rowid BETWEEN ? AND ?", *filters]
+    params: List[Any] = [match, window[0], window[1], *filter_params]
+    if after is not None:
+        where.append("(score > ? OR (score = ? AND l.id < ?))")
+        params.extend([after[0], after[0], after[1]])
+    params.append(limit)
+
+    sql = (
+        f"SELECT {columns}, bm25({FTS_TABLE}, {TITLE_WEIGHT}, {DESCRIPTION_WEIGHT}) AS score "
+        f"FROM {FTS_TABLE} "
+        f"JOIN listings l ON l.id = {FTS_TABLE}.rowid "
+        f"WHERE {' AND '.join(where)} "
+        f"ORDER BY score, l.id DESC "
+        f"LIMIT ?"
+    )
+    return sql, params
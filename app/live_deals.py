@@ -0,0 +1,171 @@
+import asyncio
+import threading
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Mapping, Optional, Set
+
+# Live deal feed: /ws/deals (WebSocket) and /sse/deals (Server-Sent Events
+# fallback) push listings to open dashboards instead of them reloading.
+#
+# Writers call publish_new() / publish_deals() after their write job has
+# committed. publish() runs on whatever thread did the write; it checks
+# each subscriber's filter there and hands matching events to that
+# client's asyncio queue with call_soon_threadsafe. An idle client is one
+# suspended coroutine waiting on its queue: no polling and no queries,
+# just an SSE comment every HEARTBEAT_S so proxies keep the stream open
+# (WebSocket pings are the server's job).
+#
+# Events are JSON: {"type": "new" | "deal", "listing": {...}}.
+# - "new": a listing was just saved (not scored yet); sent to clients
+#   subscribed with new=true.
+# - "deal": comps turned a listing into a deal; sent to clients whose
+#   min_profit / min_roi it meets (the dashboard's deals-table filter).
+#
+# The feed is per process: a client sees the writes made by the process
+# it's connected to (the scrape router, comps, intake and save_listing
+# all run inside the app). CLI scripts writing from their own process
+# don't reach it.
+#
+# The endpoints themselves are in app/live_routes.py, so writers (comps,
+# the CLI) can publish without importing FastAPI.
+
+DEFAULT_MIN_PROFIT = 150.0
+DEFAULT_MIN_ROI = 0.35
+QUEUE_SIZE = 100  # per client; a client this far behind loses its oldest events
+HEARTBEAT_S = 15.0
+
+LISTING_FIELDS = (
+    "id", "title", "price", "currency", "location", "url",
+    "estimated_resale", "profit", "roi", "is_deal", "created_at",
+)
+
+
+def listing_payload(listing: Any) -> Dict[str, Any]:
+    """The event's "listing" dict, from an ORM object or a mapping."""
+    get = listing.get if isinstance(listing, Mapping) else (lambda k: getattr(listing, k, None))
+    out = {}
+    for field in LISTING_FIELDS:
+        value = get(field)
+        if isinstance(value, Decimal):
+            value = float(value)
+        elif field == "is_deal" and value is not None:
+            value = bool(value)
+        out[field] = value
+    return out
+
+
+class Subscription:
+    """One connected client: its filter and the queue its coroutine waits on."""
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        min_profit: float,
+        min_roi: float,
+        new_listings: bool,
+    ):
+        self.loop = loop
+        self.queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(QUEUE_SIZE)
+        self.dropped = 0
+        self.update(min_profit=min_profit, min_roi=min_roi, new=new_listings)
+
+    def update(self, min_profit=None, min_roi=None, new=None) -> None:
+        if min_profit is not None:
+            self.min_profit = float(min_profit)
+        if min_roi is not None:
+            self.min_roi = float(min_roi)
+        if new is not None:
+            self.new_listings = bool(new)
+
+    def wants(self, event: Dict[str, Any]) -> bool:
+        if event["type"] == "new":
+            return self.new_listings
+        listing = event["listing"]
+        profit, roi = listing.get("profit"), listing.get("roi")
+        return (
+            profit is not None and roi is not None
+            and profit >= self.min_profit and roi >= self.min_roi
+        )
+
+    def _put(self, event: Optional[Dict[str, Any]]) -> None:
+        # on the client's loop
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    def offer(self, event: Optional[Dict[str, Any]]) -> bool:
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+            return True
+        except RuntimeError:  # the client's loop is gone
+            return False
+
+
+class DealFeed:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subs: Set[Subscription] = set()
+
+    def subscribe(
+        self,
+        min_profit: float = DEFAULT_MIN_PROFIT,
+        min_roi: float = DEFAULT_MIN_ROI,
+        new_listings: bool = True,
+    ) -> Subscription:
+        """Call from the client's event loop."""
+        sub = Subscription(asyncio.get_running_loop(), min_profit, min_roi, new_listings)
+        with self._lock:
+            self._subs.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            self._subs.discard(sub)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subs)
+
+    def publish(self, events: Iterable[Dict[str, Any]]) -> int:
+        """Hand events to every matching client (any thread). Returns deliveries."""
+        events = list(events)
+        with self._lock:
+            subs = list(self._subs)
+        if not events or not subs:
+            return 0
+        sent = 0
+        gone = []
+        for sub in subs:
+            for event in events:
+                if not sub.wants(event):
+                    continue
+                if not sub.offer(event):
+                    gone.append(sub)
+                    break
+                sent += 1
+        for sub in gone:
+            self.unsubscribe(sub)
+        return sent
+
+
+feed = DealFeed()
+
+
+def publish_new(listings: Iterable[Any]) -> int:
+    """Announce just-saved listings (ORM objects or dicts). Call after commit."""
+    return feed.publish({"type": "new", "listing": listing_payload(l)} for l in listings)
+
+
+def publish_deals(listings: Iterable[Any]) -> int:
+    """Announce listings comps just turned into deals. Call after commit."""
+    return feed.publish({"type": "deal", "listing": listing_payload(l)} for l in listings)
+
+
+__all__ = [
+    "feed",
+    "publish_new",
+    "publish_deals",
+    "listing_payload",
+    "DealFeed",
+    "Subscription",
+]
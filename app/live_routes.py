@@ -0,0 +1,108 @@
+import asyncio
+import json
+from typing import Any, Dict
+
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from .live_deals import DEFAULT_MIN_PROFIT, DEFAULT_MIN_ROI, HEARTBEAT_S, feed
+
+# /ws/deals and /sse/deals: the endpoints of the live deal feed
+# (app/live_deals.py). Both apps include `router`.
+
+
+def _filters_from(message: Any) -> Dict[str, Any]:
+    if not isinstance(message, dict):
+        return {}
+    out = {}
+    for key in ("min_profit", "min_roi"):
+        try:
+            if message.get(key) is not None:
+                out[key] = float(message[key])
+        except (TypeError, ValueError):
+            pass
+    if "new" in message:
+        out["new"] = bool(message["new"])
+    return out
+
+
+router = APIRouter(tags=["live"])
+
+
+@router.websocket("/ws/deals")
+async def ws_deals(
+    websocket: WebSocket,
+    min_profit: float = DEFAULT_MIN_PROFIT,
+    min_roi: float = DEFAULT_MIN_ROI,
+    new: bool = True,
+):
+    """
+    Push feed. The client may send {"min_profit": .., "min_roi": .., "new": ..}
+    at any time to change its filter.
+    """
+    await websocket.accept()
+    sub = feed.subscribe(min_profit, min_roi, new)
+
+    async def read_filters():
+        try:
+            while True:
+                try:
+                    sub.update(**_filters_from(await websocket.receive_json()))
+                except (ValueError, json.JSONDecodeError):
+                    continue
+        except WebSocketDisconnect:
+            pass
+        finally:
+            sub._put(None)  # wakes the sender up to finish
+
+    reader = asyncio.create_task(read_filters())
+    try:
+        while True:
+            event = await sub.queue.get()
+            if event is None:
+                break
+            await websocket.send_json(event)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        feed.unsubscribe(sub)
+        reader.cancel()
+
+
+def _sse(event: Dict[str, Any]) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+@router.get("/sse/deals")
+async def sse_deals(
+    min_profit: float = Query(DEFAULT_MIN_PROFIT),
+    min_roi: float = Query(DEFAULT_MIN_ROI),
+    new: bool = Query(True),
+):
+    """Server-Sent Events version of /ws/deals, for clients without WebSockets."""
+    sub = feed.subscribe(min_profit, min_roi, new)
+
+    async def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), HEARTBEAT_S)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    break
+                yield _sse(event)
+        finally:
+            # also runs when the client goes away and the response is cancelled
+            feed.unsubscribe(sub)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+__all__ = ["router"]
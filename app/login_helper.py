@@ -1,9 +1,10 @@
 import os, asyncio
-from playwright.async_api import async_playwright
 
 STORAGE_PATH = os.getenv("PLAYWRIGHT_STORAGE", "storage_state.json")
 
 async def main():
+    from playwright.async_api import async_playwright
+
     async with async_playwright() as p:
         # Ephemeral browser (no persistent profile -> no lock)
         browser = await p.chromium.launch(headless=False, args=["--no-sandbox"])
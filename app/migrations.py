@@ -0,0 +1,399 @@
+from datetime import datetime, timezone
+from typing import Callable, List, Tuple
+
+# Versioned schema migrations for flipfinder.db.
+#
+# Each step runs once, in order, and is recorded in schema_version. The apps
+# call migrate() at startup, so request handlers and scripts can assume the
+# schema is current and never look at it themselves.
+#
+# Steps are idempotent (IF NOT EXISTS, add-only-missing-columns), so a
+# database created before this runner -- by app/models.py or by
+# flipfinder/models.py, whose column sets had drifted apart -- converges on
+# the same schema, and a step interrupted by a crash just runs again.
+#
+# Never edit a released step; append a new one.
+
+VERSION_TABLE = "schema_version"
+
+# Every listings column either model had mapped when the runner shipped, as
+# (name, SQL type). Step 1 creates new databases with these; step 2 adds
+# whichever are missing from older ones. Frozen with those steps: a later
+# column goes in its own list below, added by its own step.
+_BASE_LISTING_COLUMNS: List[Tuple[str, str]] = [
+    ("source", "VARCHAR(50) NOT NULL"),
+    ("url", "VARCHAR(800) NOT NULL"),
+    ("title", "VARCHAR(400)"),
+    ("description", "TEXT"),
+    ("price", "NUMERIC(12, 2)"),
+    ("currency", "VARCHAR(10)"),
+    ("location", "VARCHAR(200)"),
+    ("posted_at_text", "VARCHAR(120)"),
+    ("seller", "VARCHAR(200)"),
+    ("photos", "TEXT"),
+    ("raw_html", "TEXT"),
+    ("created_at", "VARCHAR"),
+    ("label", "TEXT"),
+    ("note", "TEXT"),
+    ("distance_km", "FLOAT"),
+    ("external_id", "VARCHAR"),
+    ("source_url", "VARCHAR"),
+    ("posted_at", "DATETIME"),
+    ("estimated_resale", "NUMERIC"),
+    ("profit", "NUMERIC"),
+    ("roi", "FLOAT"),
+    ("is_deal", "INTEGER"),
+]
+
+# step 9: the scrape query that first found the listing
+_ANALYTICS_COLUMNS: List[Tuple[str, str]] = [
+    ("search_keyword", "VARCHAR(200)"),
+]
+
+# step 10: app/ranking.py's profit weighted by ROI, and when profit / roi /
+# rank_score were computed
+_RANK_COLUMNS: List[Tuple[str, str]] = [
+    ("rank_score", "FLOAT"),
+    ("comps_at", "VARCHAR"),
+]
+
+# step 14: flipfinder/services/recrawl.py's available / pending / sold /
+# removed, when the listing page was last revisited and when it's next due
+_RECRAWL_COLUMNS: List[Tuple[str, str]] = [
+    ("status", "VARCHAR(20)"),
+    ("checked_at", "VARCHAR"),
+    ("next_check_at", "VARCHAR"),
+]
+
+# Every listings column a fully migrated database has, in table order (for
+# code that copies whole rows, e.g. app/retention.py).
+LISTING_COLUMNS: List[Tuple[str, str]] = (
+    _BASE_LISTING_COLUMNS + _ANALYTICS_COLUMNS + _RANK_COLUMNS + _RECRAWL_COLUMNS
+)
+
+# LISTING_INDEXES (app/sqlite_tuning.py) each step creates, by name; frozen
+# the same way
+_BASE_LISTING_INDEXES = (
+    "ix_listings_deals",
+    "ix_listings_created_at",
+    "ix_listings_label",
+    "ix_listings_price",
+    "ix_listings_source_url",
+    "ix_listings_external_id",
+)
+_RANK_INDEXES = ("ix_listings_rank_score", "ix_listings_comps_at")
+_RECRAWL_INDEXES = ("ix_listings_next_check_at",)
+
+
+def _create_listings(conn) -> None:
+    cols = ",\n".join(f"    {name} {ddl}" for name, ddl in _BASE_LISTING_COLUMNS)
+    conn.cursor().execute(
+        "CREATE TABLE IF NOT EXISTS listings (\n"
+        "    id INTEGER NOT NULL PRIMARY KEY,\n"
+        f"{cols},\n"
+        "    CONSTRAINT uq_source_url UNIQUE (source, url)\n"
+        ")"
+    )
+
+
+def _add_listing_columns(conn, columns: List[Tuple[str, str]]) -> None:
+    cur = conn.cursor()
+    cur.execute("PRAGMA table_info(listings)")
+    have = {r[1] for r in cur.fetchall()}
+    for name, ddl in columns:
+        if name not in have:
+            # ADD COLUMN can't add NOT NULL without a default; the only such
+            # columns (source, url) exist in every schema that ever shipped
+            cur.execute(f"ALTER TABLE listings ADD COLUMN {name} {ddl.replace(' NOT NULL', '')}")
+
+
+def _add_missing_listing_columns(conn) -> None:
+    _add_listing_columns(conn, _BASE_LISTING_COLUMNS)
+
+
+def _create_rule_matches(conn) -> None:
+    cur = conn.cursor()
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS listing_rule_matches (\n"
+        "    listing_id INTEGER NOT NULL PRIMARY KEY,\n"
+        "    rule_name VARCHAR(100),\n"
+        "    rules_version VARCHAR(40),\n"
+        "    comps_version VARCHAR(40),\n"
+        "    inputs_fingerprint VARCHAR(40)\n"
+        ")"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS ix_listing_rule_matches_rule_name "
+        "ON listing_rule_matches (rule_name)"
+    )
+
+
+def _listing_indexes(conn) -> None:
+    from .sqlite_tuning import ensure_indexes
+
+    ensure_indexes(conn, _BASE_LISTING_INDEXES)
+
+
+def _search_index(conn) -> None:
+    # a SQLite without FTS5 only warns; /search falls back to LIKE and
+    # scripts/migrate_fts.py can build the index later
+    from .fts import ensure_fts
+
+    ensure_fts(conn)
+
+
+def _raw_html_retention_index(conn) -> None:
+    # app/retention.py strips raw_html from old listings; this partial
+    # index holds only the rows that still have it, so finding the next
+    # batch doesn't walk every old listing
+    conn.cursor().execute(
+        "CREATE INDEX IF NOT EXISTS ix_listings_raw_html_pending "
+        "ON listings (created_at) WHERE raw_html IS NOT NULL"
+    )
+
+
+def _create_price_history(conn) -> None:
+    # one row per observed price change (never for an unchanged re-scrape);
+    # prev_price is on the row so a drop is just price < prev_price
+    cur = conn.cursor()
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS price_history (\n"
+        "    id INTEGER NOT NULL PRIMARY KEY,\n"
+        "    listing_id INTEGER NOT NULL,\n"
+        "    observed_at VARCHAR NOT NULL,\n"
+        "    price NUMERIC(12, 2),\n"
+        "    prev_price NUMERIC(12, 2)\n"
+        ")"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS ix_price_history_listing "
+        "ON price_history (listing_id, observed_at)"
+    )
+    # "latest drops" / "drops in the last 24 h" only ever look at drops
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS ix_price_history_drops "
+        "ON price_history (observed_at) WHERE price < prev_price"
+    )
+
+
+def _create_near_dupe_index(conn) -> None:
+    # app/near_dupes.py: each listing's duplicate group and LSH band keys,
+    # and the band keys pointing back at listings
+    cur = conn.cursor()
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS listing_minhash (\n"
+        "    listing_id INTEGER NOT NULL PRIMARY KEY,\n"
+        "    band_keys BLOB NOT NULL,\n"
+        "    group_id INTEGER NOT NULL,\n"
+        "    notified_at VARCHAR\n"
+        ")"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS ix_listing_minhash_group ON listing_minhash (group_id)"
+    )
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS listing_lsh (\n"
+        "    lsh_key INTEGER NOT NULL,\n"
+        "    listing_id INTEGER NOT NULL,\n"
+        "    PRIMARY KEY (lsh_key, listing_id)\n"
+        ") WITHOUT ROWID"
+    )
+
+
+def _analytics_rollups(conn) -> None:
+    from .analytics import ensure_analytics
+
+    # the rollups group by search_keyword
+    _add_listing_columns(conn, _ANALYTICS_COLUMNS)
+    ensure_analytics(conn)
+
+
+def _rank_score(conn) -> None:
+    from .ranking import RANK_SCORE_SQL
+    from .sqlite_tuning import ensure_indexes
+
+    # Backfill the score from the stored profit / roi before indexing it;
+    # comps_at stays NULL (when those were computed is unknown), so the
+    # first ranking run refreshes them.
+    _add_listing_columns(conn, _RANK_COLUMNS)
+    conn.cursor().execute(
+        f"UPDATE listings SET rank_score = {RANK_SCORE_SQL} "
+        "WHERE profit IS NOT NULL AND rank_score IS NULL"
+    )
+    ensure_indexes(conn, _RANK_INDEXES)
+
+
+def _create_sold_comps(conn) -> None:
+    # app/price_model.py trains on these: every eBay sold price / median we
+    # fetch. Training reads them in id order from its last_id, so the
+    # primary key is the only index needed.
+    conn.cursor().execute(
+        "CREATE TABLE IF NOT EXISTS sold_comps (\n"
+        "    id INTEGER NOT NULL PRIMARY KEY,\n"
+        "    title VARCHAR(400) NOT NULL,\n"
+        "    price FLOAT NOT NULL,\n"
+        "    source VARCHAR(20) NOT NULL,\n"
+        "    listing_id INTEGER,\n"
+        "    observed_at VARCHAR NOT NULL\n"
+        ")"
+    )
+
+
+def _crawl_planner(conn) -> None:
+    # flipfinder/services/planner.py: one row per keyword crawl, plus a
+    # running (time-decayed) total per keyword that the planner reads
+    cur = conn.cursor()
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS crawl_runs (\n"
+        "    id INTEGER NOT NULL PRIMARY KEY,\n"
+        "    keyword VARCHAR(200) NOT NULL,\n"
+        "    started_at VARCHAR NOT NULL,\n"
+        "    seconds FLOAT NOT NULL,\n"
+        "    found INTEGER NOT NULL,\n"
+        "    new_listings INTEGER NOT NULL,\n"
+        "    deals INTEGER NOT NULL\n"
+        ")"
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_crawl_runs_keyword ON crawl_runs (keyword, started_at)")
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS keyword_stats (\n"
+        "    keyword VARCHAR(200) NOT NULL PRIMARY KEY,\n"
+        "    runs INTEGER NOT NULL,\n"
+        "    weight FLOAT NOT NULL,\n"
+        "    minutes FLOAT NOT NULL,\n"
+        "    new_listings FLOAT NOT NULL,\n"
+        "    deals FLOAT NOT NULL,\n"
+        "    last_run_at VARCHAR\n"
+        ")"
+    )
+
+
+def _crawl_queue(conn) -> None:
+    # flipfinder/services/crawler.py: (keyword, location) searches waiting
+    # for a worker process. due_at is epoch seconds: for a queued task the
+    # earliest it may be leased (retry backoff), for a leased one when the
+    # lease runs out.
+    cur = conn.cursor()
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS crawl_queue (\n"
+        "    id INTEGER NOT NULL PRIMARY KEY,\n"
+        "    keyword VARCHAR(200) NOT NULL,\n"
+        "    location VARCHAR(200) NOT NULL,\n"
+        "    status VARCHAR(10) NOT NULL,\n"
+        "    due_at FLOAT NOT NULL,\n"
+        "    attempts INTEGER NOT NULL,\n"
+        "    worker VARCHAR(64),\n"
+        "    heartbeat_at FLOAT,\n"
+        "    enqueued_at VARCHAR NOT NULL,\n"
+        "    finished_at VARCHAR,\n"
+        "    found INTEGER,\n"
+        "    error TEXT\n"
+        ")"
+    )
+    # the lease query: next queued task that's due / leases that ran out
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_crawl_queue_due ON crawl_queue (status, due_at)")
+    # a search is queued at most once until it has run
+    cur.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_crawl_queue_open ON crawl_queue (keyword, location) "
+        "WHERE status IN ('queued', 'leased')"
+    )
+
+
+def _recrawl_schedule(conn) -> None:
+    from .near_dupes import forget_listings, index_listing
+    from .sqlite_tuning import ensure_indexes
+    from .utils import parse_status
+
+    # Titles scraped with a "Pending · " marker get it moved into status.
+    # Everything derived from the old title follows: the listing is signed
+    # again for near-duplicates, and comps_at goes NULL so its comps count
+    # as stale (app/ranking.py: stale_ids) -- the rule fingerprint no
+    # longer matches either, so rescore_stale() picks it up too. Nothing is
+    # scheduled here: the recrawler schedules never-checked listings
+    # itself.
+    _add_listing_columns(conn, _RECRAWL_COLUMNS)
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT id, title, price, location FROM listings WHERE title LIKE '%·%' AND status IS NULL"
+    )
+    moved = []
+    for listing_id, title, price, location in cur.fetchall():
+        status, clean = parse_status(title)
+        if status:
+            cur.execute(
+                "UPDATE listings SET status = ?, title = ?, comps_at = NULL WHERE id = ?",
+                (status, clean, listing_id),
+            )
+            moved.append((listing_id, clean, price, location))
+    for i in range(0, len(moved), 900):  # ids per "IN (...)"
+        chunk = {row[0]: row for row in moved[i:i + 900]}
+        marks = ",".join("?" * len(chunk))
+        cur.execute(f"SELECT listing_id FROM listing_minhash WHERE listing_id IN ({marks})", list(chunk))
+        signed = [r[0] for r in cur.fetchall()]
+        forget_listings(conn, signed)
+        for listing_id in signed:
+            index_listing(conn, *chunk[listing_id])
+    # revisits started per UTC hour ("%Y-%m-%d %H"), shared by every
+    # process that runs the recrawler
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS recrawl_budget (\n"
+        "    hour VARCHAR NOT NULL PRIMARY KEY,\n"
+        "    used INTEGER NOT NULL\n"
+        ")"
+    )
+    ensure_indexes(conn, _RECRAWL_INDEXES)
+
+
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, "listings table", _create_listings),
+    (2, "reconcile listings columns (app vs flipfinder models)", _add_missing_listing_columns),
+    (3, "listing_rule_matches table", _create_rule_matches),
+    (4, "listings indexes", _listing_indexes),
+    (5, "listings full-text index", _search_index),
+    (6, "raw_html retention index", _raw_html_retention_index),
+    (7, "price_history table", _create_price_history),
+    (8, "near-duplicate MinHash/LSH index", _create_near_dupe_index),
+    (9, "analytics rollups (keyword / rule / location / day)", _analytics_rollups),
+    (10, "deal ranking score (rank_score, comps_at)", _rank_score),
+    (11, "sold_comps table (local resale model)", _create_sold_comps),
+    (12, "crawl planner (crawl_runs, keyword_stats)", _crawl_planner),
+    (13, "crawl work queue (crawl_queue)", _crawl_queue),
+    (14, "listing status and recrawl schedule", _recrawl_schedule),
+]
+
+LATEST = MIGRATIONS[-1][0]
+
+
+def current_version(conn) -> int:
+    cur = conn.cursor()
+    cur.execute(
+        f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} ("
+        "version INTEGER PRIMARY KEY, name TEXT, applied_at TEXT)"
+    )
+    cur.execute(f"SELECT MAX(version) FROM {VERSION_TABLE}")
+    return cur.fetchone()[0] or 0
+
+
+def migrate(conn) -> List[int]:
+    """
+    Apply every pending step on a DB-API connection, committing after each.
+    Returns the versions applied (empty when already up to date).
+    """
+    applied = []
+    version = current_version(conn)
+    conn.commit()
+    for number, name, step in MIGRATIONS:
+        if number <= version:
+            continue
+        print(f"[DEBUG] schema migration {number}: {name}")
+        step(conn)
+        conn.cursor().execute(
+            f"INSERT OR IGNORE INTO {VERSION_TABLE} (version, name, applied_at) VALUES (?, ?, ?)",
+            (number, name, datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")),
+        )
+        conn.commit()
+        applied.append(number)
+    return applied
+
+
+__all__ = ["MIGRATIONS", "LATEST", "current_version", "migrate"]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, Text, UniqueConstraint, JSON
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, Float, Text, UniqueConstraint, JSON
 from .db import Base
 
 class Listing(Base):
@@ -6,7 +6,7 @@ class Listing(Base):
     id = Column(Integer, primary_key=True)
     source = Column(String(50), nullable=False)
     url = Column(String(800), nullable=False)
-    created_at = Column(DateTime, nullable=True)
+    created_at = Column(String, nullable=True)  # TEXT "%Y-%m-%d %H:%M:%S", as flipfinder writes it
     label = Column(String(32), nullable=True)
     note = Column(Text, nullable=True)
 
@@ -21,4 +21,21 @@ class Listing(Base):
     photos = Column(JSON, nullable=True)
     raw_html = Column(Text, nullable=True)
 
+    # Same table as flipfinder/models.py; the schema itself is owned by
+    # app/migrations.py, so both models map every column.
+    distance_km = Column(Float, nullable=True)
+    external_id = Column(String, nullable=True)
+    source_url = Column(String, nullable=True)
+    posted_at = Column(DateTime, nullable=True)
+    estimated_resale = Column(Numeric, nullable=True)
+    profit = Column(Numeric, nullable=True)
+    roi = Column(Float, nullable=True)
+    is_deal = Column(Integer, nullable=True)
+    search_keyword = Column(String(200), nullable=True)
+    rank_score = Column(Float, nullable=True)
+    comps_at = Column(String, nullable=True)
+    status = Column(String(20), nullable=True)
+    checked_at = Column(String, nullable=True)
+    next_check_at = Column(String, nullable=True)
+
     __table_args__ = (UniqueConstraint('source', 'url', name='uq_source_url'),)
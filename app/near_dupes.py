@@ -0,0 +1,412 @@
+import re
+import zlib
+from collections import Counter
+from datetime import datetime, timezone
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+# Near-duplicate detection for relisted / cross-posted items (MinHash LSH).
+#
+# Each new listing gets a MinHash signature over its normalized title
+# (words and in-word character trigrams, so reordering, a typo or "OBO"
+# doesn't matter) plus a price bucket and its city. The signature is cut
+# into BANDS bands of ROWS values; each band hashes to one key in
+# listing_lsh. Two listings share a key with high probability once their
+# Jaccard similarity is past ~(1/BANDS)^(1/ROWS), so finding candidates is
+# BANDS index seeks instead of a scan of every listing. The candidates
+# sharing the most bands (at most MAX_CANDIDATES of them) are then
+# confirmed on the exact shingle similarity (the 60-value estimate is too
+# noisy to decide on), the actual prices, and any model numbers in the
+# titles (see _models_conflict()).
+#
+# A confirmed match joins the candidate's duplicate group: group_id is the
+# id of the group's first listing. Callers score and notify once per group
+# (see duplicate_groups() and claim_notification()). index_listings() does
+# the same for a batch of inserts (bulk imports) with one band-index read.
+#
+# Everything here takes a DB-API connection; ORM writer jobs pass
+# s.connection().connection so it runs inside their transaction.
+
+NUM_PERM = 60
+BANDS, ROWS = 10, 6  # BANDS * ROWS == NUM_PERM; candidate threshold ~0.68
+MATCH_SIMILARITY = 0.7
+PRICE_TOLERANCE = 0.25  # prices within 25% of the higher one
+MAX_CANDIDATES = 50  # the ones sharing the most bands
+_SIG_BLOCK = 1024  # shingle sets per numpy pass in signatures()
+_IN_CHUNK = 900  # ids / keys per "IN (...)" (old SQLite builds cap at 999)
+
+# tokens that come and go between relists of the same item
+STOPWORDS = {
+    "a", "an", "and", "the", "for", "with", "in", "of", "to", "on",
+    "obo", "firm", "new", "like", "used", "barely", "great", "good",
+    "condition", "must", "go", "sale", "pickup", "only", "asap", "cheap",
+}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_MODEL_RE = re.compile(r"[a-z0-9]*[0-9][a-z0-9]*")
+_PRIME = (1 << 32) + 15
+_rng = np.random.RandomState(39)
+_A = _rng.randint(1, 1 << 31, size=NUM_PERM).astype(np.uint64)
+_B = _rng.randint(0, 1 << 31, size=NUM_PERM).astype(np.uint64)
+# band key = sum of row values times random odd 64-bit multipliers (wrapping)
+_BAND_MULT = (
+    _rng.randint(0, 1 << 62, size=(BANDS, ROWS)).astype(np.uint64) * np.uint64(2) + np.uint64(1)
+)
+
+
+def _words(title: Optional[str]) -> List[str]:
+    return [w for w in _WORD_RE.findall((title or "").lower()) if w not in STOPWORDS]
+
+
+def _model_numbers(title: Optional[str]) -> Set[str]:
+    """Tokens with a digit in them: model numbers, sizes, generations."""
+    return set(_MODEL_RE.findall((title or "").lower()))
+
+
+def _one_edit(a: str, b: str) -> bool:
+    """A typo apart; short tokens ("14" vs "15", "m18") must match exactly."""
+    if max(len(a), len(b)) < 5 or abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        return sum(x != y for x, y in zip(a, b)) <= 1
+    if len(a) > len(b):
+        a, b = b, a
+    return any(b[:i] + b[i + 1:] == a for i in range(len(b)))
+
+
+def _models_conflict(a: Set[str], b: Set[str]) -> bool:
+    """
+    Both titles name a model number the other lacks (and it isn't a typo
+    of one): "iphone 14" vs "iphone 15", "dewalt h8085" vs "dewalt m4598".
+    Those titles share every other word, so similarity alone can't tell.
+    """
+    only_a, only_b = a - b, b - a
+    if not only_a or not only_b:
+        return False
+    return not any(_one_edit(x, y) for x in only_a for y in only_b)
+
+
+def shingles(title: Optional[str], price: Optional[float], location: Optional[str]) -> Set[str]:
+    words = _words(title)
+    out = {f"w:{w}" for w in words}
+    for w in words:
+        padded = f" {w} "
+        out.update([f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)])
+    if price is not None and float(price) > 0:
+        # ~15% wide log-scale buckets
+        out.add(f"p:{int(np.log(float(price)) / np.log(1.15))}")
+    if location:
+        out.add(f"l:{location.split(',')[0].strip().lower()}")
+    return out
+
+
+def signature(features: Iterable[str]) -> np.ndarray:
+    """MinHash signature (NUM_PERM uint32s) of a shingle set."""
+    hashes = np.fromiter(
+        (zlib.crc32(f.encode("utf-8")) for f in features), dtype=np.uint64
+    )
+    if hashes.size == 0:
+        return np.full(NUM_PERM, 0xFFFFFFFF, dtype=np.uint32)
+    perms = (np.outer(hashes, _A) + _B) % _PRIME
+    return (perms.min(axis=0) & 0xFFFFFFFF).astype(np.uint32)
+
+
+def signatures(feature_sets: Sequence[Set[str]]) -> np.ndarray:
+    """signature() of many shingle sets: an (n, NUM_PERM) uint32 array."""
+    out = np.full((len(feature_sets), NUM_PERM), 0xFFFFFFFF, dtype=np.uint32)
+    for start in range(0, len(feature_sets), _SIG_BLOCK):
+        block = feature_sets[start:start + _SIG_BLOCK]
+        sizes = np.fromiter(map(len, block), dtype=np.int64, count=len(block))
+        hashes = np.fromiter(
+            (zlib.crc32(f.encode("utf-8")) for fs in block for f in fs), dtype=np.uint64
+        )
+        if hashes.size == 0:
+            continue
+        perms = (np.outer(hashes, _A) + _B) % _PRIME
+        # min over each set's slice of rows; empty sets keep the sentinel
+        filled = np.flatnonzero(sizes)
+        offsets = (np.cumsum(sizes) - sizes)[filled]
+        out[start + filled] = np.minimum.reduceat(perms, offsets, axis=0) & 0xFFFFFFFF
+    return out
+
+
+def band_keys(sig: np.ndarray) -> List[int]:
+    """One signed 64-bit key per band (each band has its own multipliers)."""
+    rows = sig.reshape(BANDS, ROWS).astype(np.uint64)
+    return (rows * _BAND_MULT).sum(axis=1).view(np.int64).tolist()
+
+
+def band_keys_many(sigs: np.ndarray) -> List[List[int]]:
+    """band_keys() for each row of a signatures() array."""
+    rows = sigs.reshape(len(sigs), BANDS, ROWS).astype(np.uint64)
+    return (rows * _BAND_MULT).sum(axis=2).view(np.int64).tolist()
+
+
+def similarity(a: Set[str], b: Set[str]) -> float:
+    """Jaccard similarity of two shingle sets."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _prices_close(a: Optional[float], b: Optional[float]) -> bool:
+    if a is None or b is None:
+        return True
+    a, b = float(a), float(b)
+    top = max(a, b)
+    return top <= 0 or abs(a - b) <= PRICE_TOLERANCE * top
+
+
+def index_listing(
+    conn,
+    listing_id: int,
+    title: Optional[str],
+    price: Optional[float],
+    location: Optional[str],
+) -> int:
+    """
+    Sign a just-inserted listing, link it to its near-duplicate group (or
+    start one) and add it to the band index. No commit. Returns its
+    group_id (== listing_id unless it's a duplicate).
+    """
+    features = shingles(title, price, location)
+    keys = band_keys(signature(features))
+    cur = conn.cursor()
+
+    marks = ",".join("?" * len(keys))
+    cur.execute(
+        f"SELECT m.group_id, l.title, l.price, l.location "
+        f"FROM listing_minhash m JOIN listings l ON l.id = m.listing_id "
+        f"WHERE m.listing_id IN ("
+        f"SELECT listing_id FROM listing_lsh WHERE lsh_key IN ({marks}) AND listing_id != ? "
+        f"GROUP BY listing_id ORDER BY COUNT(*) DESC LIMIT ?)",
+        (*keys, listing_id, MAX_CANDIDATES),
+    )
+    group_id, best = listing_id, 0.0
+    for cgroup, ctitle, cprice, clocation in cur.fetchall():
+        if not _prices_close(price, cprice):
+            continue
+        sim = similarity(features, shingles(ctitle, cprice, clocation))
+        if sim < MATCH_SIMILARITY or sim <= best:
+            continue
+        if _models_conflict(_model_numbers(title), _model_numbers(ctitle)):
+            continue
+        best, group_id = sim, cgroup
+
+    cur.execute(
+        "INSERT OR REPLACE INTO listing_minhash (listing_id, band_keys, group_id) VALUES (?, ?, ?)",
+        (listing_id, np.array(keys, dtype=np.int64).tobytes(), group_id),
+    )
+    cur.executemany(
+        "INSERT OR IGNORE INTO listing_lsh (lsh_key, listing_id) VALUES (?, ?)",
+        [(k, listing_id) for k in keys],
+    )
+    return group_id
+
+
+def index_listings(
+    conn,
+    rows: Sequence[Tuple[int, Optional[str], Optional[float], Optional[str]]],
+) -> List[int]:
+    """
+    index_listing() for many just-inserted (listing_id, title, price,
+    location) rows, in insert order: one numpy pass for the signatures,
+    one band-index read per _IN_CHUNK keys, candidates ranked in memory,
+    and executemany writes. A listing can still match one earlier in the
+    same batch. No commit. Returns their group_ids.
+    """
+    if not rows:
+        return []
+    features = [shingles(title, price, location) for _, title, price, location in rows]
+    keys = band_keys_many(signatures(features))
+    cur = conn.cursor()
+
+    # listings already indexed under any of the batch's keys
+    indexed: Dict[int, List[int]] = {}
+    wanted = list({k for row_keys in keys for k in row_keys})
+    for start in range(0, len(wanted), _IN_CHUNK):
+        part = wanted[start:start + _IN_CHUNK]
+        cur.execute(
+            f"SELECT lsh_key, listing_id FROM listing_lsh WHERE lsh_key IN ({','.join('?' * len(part))})",
+            part,
+        )
+        for key, lid in cur.fetchall():
+            indexed.setdefault(key, []).append(lid)
+
+    # rank candidates like index_listing's query, counting earlier batch rows too
+    position = {row[0]: i for i, row in enumerate(rows)}
+    seen: Dict[int, List[int]] = {}
+    ranked: List[List[int]] = []
+    for (listing_id, *_), row_keys in zip(rows, keys):
+        counts = Counter(chain.from_iterable(indexed.get(key, ()) for key in row_keys))
+        counts.update(chain.from_iterable(seen.get(key, ()) for key in row_keys))
+        counts.pop(listing_id, None)
+        ranked.append([lid for lid, _ in counts.most_common(MAX_CANDIDATES)])
+        for key in row_keys:
+            seen.setdefault(key, []).append(listing_id)
+
+    # group / title / price / location of the candidates not in this batch
+    known: Dict[int, tuple] = {}
+    outside = list({lid for cands in ranked for lid in cands if lid not in position})
+    for start in range(0, len(outside), _IN_CHUNK):
+        part = outside[start:start + _IN_CHUNK]
+        cur.execute(
+            f"SELECT m.listing_id, m.group_id, l.title, l.price, l.location "
+            f"FROM listing_minhash m JOIN listings l ON l.id = m.listing_id "
+            f"WHERE m.listing_id IN ({','.join('?' * len(part))})",
+            part,
+        )
+        for lid, *rest in cur.fetchall():
+            known[lid] = tuple(rest)
+
+    groups: List[int] = []
+    outside_shingles: Dict[int, Set[str]] = {}
+    for i, ((listing_id, title, price, _), cands) in enumerate(zip(rows, ranked)):
+        group_id, best = listing_id, 0.0
+        for lid in cands:
+            j = position.get(lid)
+            if j is not None:
+                if j >= i:
+                    continue
+                cgroup, ctitle, cprice = groups[j], rows[j][1], rows[j][2]
+                cfeatures = features[j]
+            elif lid in known:
+                cgroup, ctitle, cprice, clocation = known[lid]
+                cfeatures = outside_shingles.get(lid)
+                if cfeatures is None:
+                    cfeatures = outside_shingles[lid] = shingles(ctitle, cprice, clocation)
+            else:
+                continue
+            if not _prices_close(price, cprice):
+                continue
+            sim = similarity(features[i], cfeatures)
+            if sim < MATCH_SIMILARITY or sim <= best:
+                continue
+            if _models_conflict(_model_numbers(title), _model_numbers(ctitle)):
+                continue
+            best, group_id = sim, cgroup
+        groups.append(group_id)
+
+    cur.executemany(
+        "INSERT OR REPLACE INTO listing_minhash (listing_id, band_keys, group_id) VALUES (?, ?, ?)",
+        [
+            (row[0], np.array(row_keys, dtype=np.int64).tobytes(), group_id)
+            for row, row_keys, group_id in zip(rows, keys, groups)
+        ],
+    )
+    cur.executemany(
+        "INSERT OR IGNORE INTO listing_lsh (lsh_key, listing_id) VALUES (?, ?)",
+        [(k, row[0]) for row, row_keys in zip(rows, keys) for k in row_keys],
+    )
+    return groups
+
+
+def duplicate_groups(conn, listing_ids: Sequence[int]) -> Dict[int, int]:
+    """{listing_id: group_id} for the given ids (unindexed ids are left out)."""
+    if not listing_ids:
+        return {}
+    cur = conn.cursor()
+    marks = ",".join("?" * len(listing_ids))
+    cur.execute(
+        f"SELECT listing_id, group_id FROM listing_minhash WHERE listing_id IN ({marks})",
+        list(listing_ids),
+    )
+    return dict(cur.fetchall())
+
+
+def one_per_group(conn, listing_ids: Sequence[int]) -> List[int]:
+    """
+    listing_ids minus near-duplicates: a listing is dropped when its group
+    started with another listing (already handled when that one came in)
+    or when an earlier id in `listing_ids` is in the same group.
+    """
+    groups = duplicate_groups(conn, listing_ids)
+    batch = set(listing_ids)
+    seen: Set[int] = set()
+    out = []
+    for lid in listing_ids:
+        group = groups.get(lid, lid)
+        if group in seen or (group != lid and group not in batch):
+            continue
+        seen.add(group)
+        out.append(lid)
+    return out
+
+
+def claim_notification(conn, listing_id: int) -> bool:
+    """
+    Mark the listing's duplicate group as notified. True if this call got
+    there first (send the email), False if the group was already notified.
+    Listings that aren't indexed always return True. Commits.
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT group_id FROM listing_minhash WHERE listing_id = ?", (listing_id,))
+    row = cur.fetchone()
+    if row is None:
+        return True
+    cur.execute(
+        "UPDATE listing_minhash SET notified_at = ? WHERE listing_id = ? AND notified_at IS NULL",
+        (datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"), row[0]),
+    )
+    claimed = cur.rowcount == 1
+    conn.commit()
+    return claimed
+
+
+def forget_listings(conn, listing_ids: Sequence[int]) -> None:
+    """Drop listings from the index (no commit); used when they're archived."""
+    if not listing_ids:
+        return
+    ids = list(listing_ids)
+    cur = conn.cursor()
+    marks = ",".join("?" * len(ids))
+    cur.execute(
+        f"SELECT listing_id, band_keys, group_id, notified_at FROM listing_minhash "
+        f"WHERE listing_id IN ({marks})",
+        ids,
+    )
+    rows = cur.fetchall()
+    # listing_lsh is keyed (lsh_key, listing_id); each listing keeps its keys
+    cur.executemany(
+        "DELETE FROM listing_lsh WHERE lsh_key = ? AND listing_id = ?",
+        [(key, lid) for lid, blob, _g, _n in rows for key in np.frombuffer(blob, dtype=np.int64).tolist()],
+    )
+    cur.execute(f"DELETE FROM listing_minhash WHERE listing_id IN ({marks})", ids)
+    # groups that started with one of them now start with their next member,
+    # which takes over the group's notified_at
+    for lid, _blob, group_id, notified_at in rows:
+        if lid != group_id:
+            continue
+        cur.execute(
+            "SELECT MIN(listing_id) FROM listing_minhash WHERE group_id = ?", (group_id,)
+        )
+        leader = cur.fetchone()[0]
+        if leader is None:
+            continue
+        cur.execute("UPDATE listing_minhash SET group_id = ? WHERE group_id = ?", (leader, group_id))
+        cur.execute(
+            "UPDATE listing_minhash SET notified_at = COALESCE(notified_at, ?) WHERE listing_id = ?",
+            (notified_at, leader),
+        )
+
+
+__all__ = [
+    "NUM_PERM",
+    "BANDS",
+    "ROWS",
+    "MATCH_SIMILARITY",
+    "shingles",
+    "signature",
+    "signatures",
+    "band_keys",
+    "band_keys_many",
+    "similarity",
+    "index_listing",
+    "index_listings",
+    "duplicate_groups",
+    "one_per_group",
+    "claim_notification",
+    "forget_listings",
+]
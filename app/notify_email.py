@@ -1,6 +1,5 @@
 import os, smtplib, ssl
 from email.message import EmailMessage
-import certifi
 
 SMTP_HOST = os.getenv("SMTP_HOST", "")
 SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
@@ -22,6 +21,8 @@ def send_deal_email(subject: str, body: str) -> dict:
 
     try:
         # Use certifi CA bundle for macOS/Python SSL trust
+        import certifi
+
         context = ssl.create_default_context(cafile=certifi.where())
         if SMTP_PORT == 465:
             with smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, context=context) as s:
@@ -36,3 +37,24 @@ def send_deal_email(subject: str, body: str) -> dict:
         return {"ok": True, "error": None}
     except Exception as e:
         return {"ok": False, "error": str(e)}
+
+def notify_deal(database, listing) -> bool:
+    """
+    Email a scored deal once per near-duplicate group, like
+    /refresh_comps?notify=true. `listing` is a mapping with id, title, url,
+    price, estimated_resale, profit and roi. True if an email went out.
+    """
+    from .near_dupes import claim_notification  # numpy; only the notify paths need it
+
+    listing_id = listing["id"]
+    if not database.run_raw(lambda c: claim_notification(c, listing_id)):
+        return False
+    subj = "[FlipFinder] Deal — {}".format((listing["title"] or "")[:60])
+    body = (
+        "Title: {title}\n"
+        "FB price: {price}\n"
+        "Resale est: {estimated_resale}\n"
+        "Profit est: {profit} | ROI: {roi:.0%}\n"
+        "URL: {url}\n"
+    ).format(**{**listing, "roi": float(listing["roi"] or 0)})
+    return send_deal_email(subj, body).get("ok", False)
@@ -0,0 +1,123 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+
+from fastapi import Request, Response
+
+# Rendered-page cache for read-mostly endpoints (the flipfinder dashboard).
+#
+# An entry is the finished response body, keyed by the endpoint and its
+# query parameters, and tagged with the Database.generation it was built
+# under. Any committed write bumps the generation, which makes every entry
+# stale at once; nothing has to work out which pages a write touched.
+# Between writes a repeat load is a dict lookup: no query, no template.
+#
+# Each body gets an ETag (a hash of its bytes) and responses carry
+# "Cache-Control: no-cache", so browsers revalidate with If-None-Match and
+# get an empty 304 while the page is unchanged.
+#
+# The generation only sees this process's writes. Entries also expire
+# after MAX_AGE_S so writes from CLI scripts or another worker show up
+# within that long.
+
+MAX_ENTRIES = 256
+MAX_AGE_S = 60.0
+
+
+class CachedPage(NamedTuple):
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+    generation: int
+    stored_at: float
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class PageCache:
+    def __init__(
+        self,
+        generation: Callable[[], int],
+        max_entries: int = MAX_ENTRIES,
+        max_age_s: float = MAX_AGE_S,
+    ):
+        self._generation = generation
+        self.max_entries = max_entries
+        self.max_age_s = max_age_s
+        self._entries: "OrderedDict[Hashable, CachedPage]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[CachedPage]:
+        """The entry for `key` if it's still current, else None."""
+        with self._lock:
+            page = self._entries.get(key)
+            if page is None:
+                return None
+            if (
+                page.generation != self._generation()
+                or time.monotonic() - page.stored_at > self.max_age_s
+            ):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return page
+
+    def build(self, key: Hashable, render: Callable[[], Tuple[bytes, Dict[str, str]]]) -> CachedPage:
+        """Run render() -> (body, headers) and store the result."""
+        # read before rendering: if a write lands mid-render, the entry is
+        # already stale when stored and the next request builds it again
+        generation = self._generation()
+        body, headers = render()
+        page = CachedPage(
+            body=body,
+            etag='"%s"' % hashlib.blake2b(body, digest_size=12).hexdigest(),
+            headers=headers,
+            generation=generation,
+            stored_at=time.monotonic(),
+        )
+        with self._lock:
+            self._entries[key] = page
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return page
+
+    def respond(
+        self,
+        request: Request,
+        key: Hashable,
+        render: Callable[[], Tuple[bytes, Dict[str, str]]],
+        media_type: str = "text/html; charset=utf-8",
+    ) -> Response:
+        """
+        The cached page for `key` (rendered on a miss), or a 304 when the
+        request's If-None-Match already names it.
+        """
+        page = self.get(key)
+        if page is None:
+            self.misses += 1
+            page = self.build(key, render)
+        else:
+            self.hits += 1
+        headers = {**page.headers, "ETag": page.etag, "Cache-Control": "no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), page.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=page.body, media_type=media_type, headers=headers)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+__all__ = ["PageCache", "CachedPage", "MAX_ENTRIES", "MAX_AGE_S"]
@@ -0,0 +1,41 @@
+import base64
+import json
+from typing import Any, Optional, Sequence, Tuple
+
+# Opaque keyset-pagination cursors.
+#
+# A cursor is the sort key of the last row on a page (e.g. [created_at, id]
+# or [id]) plus the name of the ordering it belongs to, JSON-encoded and
+# base64'd. The next page is "rows strictly after that key", which an index
+# answers in the same time however deep the client has scrolled, and rows
+# inserted meanwhile can't shift later pages the way OFFSET does.
+
+
+def encode_cursor(kind: str, key: Sequence[Any]) -> str:
+    raw = json.dumps([kind, list(key)], separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: Optional[str], kind: str) -> Optional[Tuple[Any, ...]]:
+    """
+    Return the sort key stored in `token`, or None for the first page.
+    Raises ValueError for garbage or a cursor issued for another ordering.
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        got_kind, key = json.loads(raw)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if got_kind != kind or not isinstance(key, list):
+        raise ValueError("Cursor does not belong to this listing")
+    return tuple(key)
+
+
+def split_page(rows: list, limit: int) -> Tuple[list, bool]:
+    """
+    Queries fetch limit + 1 rows; the extra one only tells us whether there
+    is a next page.
+    """
+    return rows[:limit], len(rows) > limit
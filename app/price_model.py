@@ -0,0 +1,276 @@
+import os
+import re
+import threading
+import zlib
+from datetime import datetime, timezone
+from itertools import chain
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Offline resale estimates learned from our own sold comps.
+#
+# Every eBay lookup we make is kept in sold_comps (a title and the price it
+# sold for; record_sold_comps()). The model is a Bayesian ridge regression
+# of log(price) on hashed title tokens (words and word pairs), so
+# "dewalt drill 20v" is priced from everything we've seen sell with those
+# words in it.
+#
+# Ridge only needs A = X'X, b = X'y and y'y, so new comps are folded in
+# without revisiting old ones (learn(), a Woodbury update of the inverse),
+# and that's all that is saved to disk. The inverse also gives each
+# estimate its own uncertainty: a title made of well-known tokens gets a
+# tight interval, one with words we've barely seen gets a wide one.
+# confidence = exp(-std of the log-price estimate), so 0.75 means about
+# +/-30%. The comps service only asks eBay when confidence is below
+# MIN_CONFIDENCE (flipfinder/services/comps.py).
+#
+# The active model is immutable and swapped by reference, like the pricing
+# rules: get_price_model() loads MODEL_PATH once, catch_up() folds in comps
+# recorded since it was saved, and scripts/train_price_model.py saves it.
+
+N_FEATURES = 2048  # hash buckets; bucket 0 is the intercept
+RIDGE = 1.0  # prior precision of each token weight (log-price units)
+# log-price variance an unseen word adds: it could move the price by ~e x
+UNSEEN_WORD_VAR = 1.0
+MIN_SAMPLES = 50  # below this the model is never confident
+MIN_CONFIDENCE = float(os.getenv("FF_MODEL_MIN_CONFIDENCE", "0.75"))
+MODEL_PATH = os.getenv("FF_PRICE_MODEL_PATH", "price_model.npz")
+# above this many new rows, refitting from A beats the Woodbury update
+_WOODBURY_MAX = N_FEATURES // 8
+
+# listing noise that says nothing about what the item is worth
+STOPWORDS = {
+    "a", "an", "and", "the", "for", "with", "in", "of", "to", "on", "or",
+    "obo", "firm", "must", "go", "sale", "pickup", "only", "asap", "pending",
+    "sold", "price", "negotiable", "moving", "need", "gone",
+}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def title_tokens(title: Optional[str]) -> Tuple[List[str], List[str]]:
+    """(words, adjacent word pairs) of a title, lowercased, noise words dropped."""
+    words = [w for w in _WORD_RE.findall((title or "").lower()) if w not in STOPWORDS]
+    return words, [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def _hashes(tokens: Iterable[str]) -> List[int]:
+    return [zlib.crc32(t.encode("utf-8")) for t in tokens]
+
+
+def _buckets(hashes: Iterable[int]) -> np.ndarray:
+    """Sorted unique bucket indices, intercept included."""
+    idx = {0}
+    idx.update(h % (N_FEATURES - 1) + 1 for h in hashes)
+    return np.fromiter(sorted(idx), dtype=np.intp, count=len(idx))
+
+
+def _design(rows: Sequence[np.ndarray]) -> np.ndarray:
+    X = np.zeros((len(rows), N_FEATURES))
+    for i, idx in enumerate(rows):
+        X[i, idx] = 1.0
+    return X
+
+
+def _penalty() -> np.ndarray:
+    lam = np.full(N_FEATURES, RIDGE)
+    lam[0] = 1e-6  # leave the intercept (the overall price level) free
+    return lam
+
+
+class PriceModel:
+    """
+    A fitted model. Treat as immutable: learn() returns a new one, so a
+    reader holding the old one never sees half an update.
+
+    `vocab` holds the hash of every token trained on. With 2048 buckets an
+    unseen word often lands in a bucket some other word has trained, and
+    would borrow its weight and its certainty; predict() leaves unseen
+    tokens out instead, and each unseen word adds UNSEEN_WORD_VAR to the
+    estimate's variance.
+    """
+
+    def __init__(self, A: np.ndarray, b: np.ndarray, yy: float, n: int,
+                 vocab: frozenset = frozenset(), last_id: int = 0,
+                 cov: Optional[np.ndarray] = None):
+        self.A, self.b, self.yy, self.n = A, b, float(yy), int(n)
+        self.vocab, self.last_id = vocab, int(last_id)
+        lam = _penalty()
+        if cov is None:
+            cov = np.linalg.inv(A + np.diag(lam))
+        self.cov = cov
+        self.w = cov @ b
+        # residual variance, on the effective degrees of freedom the ridge used
+        sse = self.yy - 2.0 * float(self.w @ b) + float(self.w @ A @ self.w)
+        dof = N_FEATURES - float(lam @ np.diag(cov))
+        self.sigma2 = max(sse, 0.0) / max(self.n - dof, 1.0) if self.n else 1.0
+
+    @classmethod
+    def empty(cls) -> "PriceModel":
+        A = np.zeros((N_FEATURES, N_FEATURES))
+        return cls(A, np.zeros(N_FEATURES), 0.0, 0, cov=np.diag(1.0 / _penalty()))
+
+    def learn(self, titles: Sequence[str], prices: Sequence[float], last_id: Optional[int] = None) -> "PriceModel":
+        """This model plus (title, sold price) samples; prices <= 0 are skipped."""
+        last_id = self.last_id if last_id is None else last_id
+        keep = [(t, float(p)) for t, p in zip(titles, prices) if p is not None and float(p) > 0]
+        if not keep:
+            return PriceModel(self.A, self.b, self.yy, self.n, self.vocab, last_id, self.cov)
+        hashes = [_hashes(chain(*title_tokens(t))) for t, _ in keep]
+        rows = [_buckets(h) for h in hashes]
+        y = np.log([p for _, p in keep])
+        # X'X and X'y straight from the index lists; X itself is mostly zeros
+        pairs = np.concatenate([(r[:, None] * N_FEATURES + r).ravel() for r in rows])
+        A = self.A + np.bincount(pairs, minlength=N_FEATURES * N_FEATURES).reshape(
+            N_FEATURES, N_FEATURES)
+        b = self.b + np.bincount(
+            np.concatenate(rows), weights=np.repeat(y, [len(r) for r in rows]),
+            minlength=N_FEATURES,
+        )
+        cov = None
+        if len(keep) <= _WOODBURY_MAX:
+            # (P + X'X)^-1 = C - C X' (I + X C X')^-1 X C, with C = P^-1
+            X = _design(rows)
+            CX = self.cov @ X.T
+            cov = self.cov - CX @ np.linalg.solve(np.eye(len(keep)) + X @ CX, CX.T)
+        vocab = self.vocab.union(chain.from_iterable(hashes))
+        return PriceModel(A, b, self.yy + float(y @ y), self.n + len(keep), vocab, last_id, cov)
+
+    def predict(self, title: Optional[str]) -> Tuple[Optional[float], float]:
+        """(estimated resale, confidence in [0, 1]); (None, 0.0) when untrained."""
+        if self.n == 0:
+            return None, 0.0
+        words, pairs = title_tokens(title)
+        known = [h for h in _hashes(chain(words, pairs)) if h in self.vocab]
+        unseen = sum(h not in self.vocab for h in _hashes(words))
+        idx = _buckets(known)
+        mean = float(self.w[idx].sum())
+        var = self.sigma2 * (1.0 + float(self.cov[np.ix_(idx, idx)].sum())) + unseen * UNSEEN_WORD_VAR
+        confidence = float(np.exp(-np.sqrt(var))) if self.n >= MIN_SAMPLES else 0.0
+        return round(float(np.exp(mean)), 2), round(confidence, 3)
+
+    def confident(self, title: Optional[str], min_confidence: float = MIN_CONFIDENCE) -> Optional[float]:
+        """The estimate if it's at least min_confidence, else None (ask eBay)."""
+        price, confidence = self.predict(title)
+        return price if price is not None and confidence >= min_confidence else None
+
+    def save(self, path: str = MODEL_PATH) -> None:
+        tmp = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp, A=self.A, b=self.b, yy=self.yy, n=self.n, last_id=self.last_id,
+            vocab=np.fromiter(sorted(self.vocab), dtype=np.uint32, count=len(self.vocab)),
+            n_features=N_FEATURES,
+        )
+        os.replace(tmp, path)  # readers never see a half-written file
+
+    @classmethod
+    def load(cls, path: str = MODEL_PATH) -> "PriceModel":
+        with np.load(path) as f:
+            if int(f["n_features"]) != N_FEATURES:
+                raise ValueError(f"{path} was trained with {int(f['n_features'])} features")
+            return cls(f["A"], f["b"], float(f["yy"]), int(f["n"]),
+                       frozenset(f["vocab"].tolist()), int(f["last_id"]))
+
+
+# ---------------------------------------------------------------------------
+# sold_comps (DB-API connection; ORM writer jobs pass s.connection().connection)
+# ---------------------------------------------------------------------------
+
+def record_sold_comps(conn, rows: Iterable[Dict[str, Any]]) -> int:
+    """
+    Insert sold comps (no commit). Each dict has title and price, plus
+    optionally source and listing_id. Returns the number inserted.
+    """
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    values = [
+        (r["title"], float(r["price"]), r.get("source", "ebay"), r.get("listing_id"), now)
+        for r in rows
+        if r.get("title") and r.get("price") is not None and float(r["price"]) > 0
+    ]
+    if values:
+        conn.cursor().executemany(
+            "INSERT INTO sold_comps (title, price, source, listing_id, observed_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            values,
+        )
+    return len(values)
+
+
+def train(conn, model: Optional[PriceModel] = None, batch: int = 5000) -> PriceModel:
+    """`model` (or an empty one) plus every sold comp recorded after its last_id."""
+    model = model or PriceModel.empty()
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT id, title, price FROM sold_comps WHERE id > ? ORDER BY id",
+        (model.last_id,),
+    )
+    titles: List[str] = []
+    prices: List[float] = []
+    last_id = model.last_id
+    while True:
+        rows = cur.fetchmany(batch)
+        if not rows:
+            break
+        titles.extend(r[1] for r in rows)
+        prices.extend(r[2] for r in rows)
+        last_id = rows[-1][0]
+    # one learn() for the lot: a single refit instead of one per batch
+    return model.learn(titles, prices, last_id=last_id) if last_id != model.last_id else model
+
+
+_active: Optional[PriceModel] = None
+_swap_lock = threading.Lock()
+_train_lock = threading.Lock()  # one catch_up() at a time; the rest find it done
+
+
+def get_price_model() -> PriceModel:
+    """The active model: MODEL_PATH, loaded on first use (empty if missing)."""
+    model = _active
+    if model is None:
+        with _swap_lock:
+            if _active is None:
+                _set_active(_load_or_empty(MODEL_PATH))
+            model = _active
+    return model
+
+
+def _load_or_empty(path: str) -> PriceModel:
+    if not os.path.exists(path):
+        return PriceModel.empty()
+    try:
+        return PriceModel.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[WARN] price model {path} not loaded, starting empty: {e}")
+        return PriceModel.empty()
+
+
+def _set_active(model: PriceModel) -> None:
+    global _active
+    _active = model
+
+
+def catch_up(conn) -> PriceModel:
+    """
+    Fold comps recorded since the active model's last_id into it (by this
+    process or any other) and make that the active model.
+    """
+    with _train_lock:
+        model = train(conn, get_price_model())
+        if model is not _active:
+            _set_active(model)
+        return model
+
+
+__all__ = [
+    "N_FEATURES",
+    "MIN_CONFIDENCE",
+    "MIN_SAMPLES",
+    "MODEL_PATH",
+    "PriceModel",
+    "title_tokens",
+    "record_sold_comps",
+    "train",
+    "get_price_model",
+    "catch_up",
+]
@@ -0,0 +1,142 @@
+import csv
+import os
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, TextIO
+
+# Top-k deal ranking (deals_report.py, recheck_recent.py).
+#
+# Every comps write stores rank_score next to profit / roi, and comps_at,
+# when those comps were computed (flipfinder/services/comps.py). Ranking
+# is then a walk down ix_listings_rank_score that stops after N rows,
+# whatever the table size, instead of re-scoring every listing over HTTP
+# and sorting the lot.
+#
+# stale_ids() lists what needs new comps first: never scored, or scored
+# more than a TTL ago. Callers refresh only those (in batches, see
+# flipfinder/services/ranking.py) and then read top_k().
+
+# ROI above this doesn't push a listing further up the ranking; a $40
+# flip at 900% shouldn't outrank a $400 one at 150%
+RANK_ROI_CAP = 2.0
+COMPS_TTL_HOURS = float(os.getenv("FF_COMPS_TTL_HOURS", "24"))
+
+# rank_score() in SQL, for backfilling rows scored before the column existed
+RANK_SCORE_SQL = (
+    f"ROUND(profit * (1.0 + MIN(MAX(COALESCE(roi, 0.0), 0.0), {RANK_ROI_CAP})), 2)"
+)
+
+RANK_COLUMNS = [
+    "id", "title", "price", "currency", "location", "url", "created_at",
+    "estimated_resale", "profit", "roi", "is_deal", "rank_score", "comps_at",
+]
+
+
+def rank_score(profit: Optional[float], roi: Optional[float]) -> Optional[float]:
+    """profit * (1 + roi), roi clamped to [0, RANK_ROI_CAP]; None if unscored."""
+    if profit is None:
+        return None
+    weight = 1.0 + min(max(float(roi or 0.0), 0.0), RANK_ROI_CAP)
+    return round(float(profit) * weight, 2)
+
+
+def comps_timestamp(now: Optional[datetime] = None) -> str:
+    """comps_at value for comps computed `now` (UTC, like created_at)."""
+    return (now or datetime.now(timezone.utc)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _since(days: Optional[float]) -> Optional[str]:
+    if days is None:
+        return None
+    return comps_timestamp(datetime.now(timezone.utc) - timedelta(days=days))
+
+
+def stale_ids(
+    conn,
+    ttl_hours: float = COMPS_TTL_HOURS,
+    days: Optional[float] = None,
+    ids: Optional[Sequence[int]] = None,
+) -> List[int]:
+    """
+    Ids of listings whose comps are missing or older than ttl_hours.
+    `days` limits it to listings created in the last `days` days, `ids` to
+    those listings.
+    """
+    where: List[str] = []
+    params: List[Any] = []
+    since = _since(days)
+    if since is not None:
+        where.append("created_at >= ?")
+        params.append(since)
+    if ids is not None:
+        if not ids:
+            return []
+        where.append(f"id IN ({','.join('?' * len(ids))})")
+        params.extend(ids)
+    extra = "".join(f" AND {w}" for w in where)
+    cutoff = comps_timestamp(datetime.now(timezone.utc) - timedelta(hours=ttl_hours))
+    cur = conn.cursor()
+    # two seeks on ix_listings_comps_at; with OR, SQLite walks all of it
+    cur.execute(
+        f"SELECT id FROM listings WHERE comps_at IS NULL{extra} "
+        f"UNION ALL SELECT id FROM listings WHERE comps_at < ?{extra}",
+        (*params, cutoff, *params),
+    )
+    return [r[0] for r in cur.fetchall()]
+
+
+def top_k(
+    conn,
+    n: int,
+    days: Optional[float] = None,
+    deals_only: bool = False,
+    ids: Optional[Sequence[int]] = None,
+) -> Iterator[tuple]:
+    """
+    The n best-ranked scored listings as RANK_COLUMNS tuples, streamed off
+    the rank_score index. Same filters as stale_ids(), plus deals_only.
+    """
+    where = ["rank_score IS NOT NULL"]
+    params: List[Any] = []
+    since = _since(days)
+    if since is not None:
+        where.append("created_at >= ?")
+        params.append(since)
+    if deals_only:
+        where.append("is_deal = 1")
+    if ids is not None:
+        if not ids:
+            return iter(())
+        where.append(f"id IN ({','.join('?' * len(ids))})")
+        params.extend(ids)
+    cur = conn.cursor()
+    cur.execute(
+        f"SELECT {', '.join(RANK_COLUMNS)} FROM listings WHERE {' AND '.join(where)} "
+        "ORDER BY rank_score DESC, id DESC LIMIT ?",
+        (*params, n),
+    )
+    return iter(cur)
+
+
+def write_ranked(rows: Iterable[tuple], out: TextIO) -> int:
+    """CSV of RANK_COLUMNS rows, written as they arrive. Returns the row count."""
+    w = csv.writer(out)
+    w.writerow(RANK_COLUMNS)
+    count = 0
+    for row in rows:
+        w.writerow([float(v) if isinstance(v, Decimal) else v for v in row])
+        count += 1
+    return count
+
+
+__all__ = [
+    "RANK_ROI_CAP",
+    "COMPS_TTL_HOURS",
+    "RANK_SCORE_SQL",
+    "RANK_COLUMNS",
+    "rank_score",
+    "comps_timestamp",
+    "stale_ids",
+    "top_k",
+    "write_ranked",
+]
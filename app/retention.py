@@ -0,0 +1,401 @@
+import os
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .migrations import LISTING_COLUMNS
+
+# Retention: moves cold listings out of the hot `listings` table.
+#
+# - Listings older than ARCHIVE_AFTER_DAYS, or labelled with one of
+#   ARCHIVE_LABELS ("pass"), move to an archive SQLite file next to the main
+#   one (flipfinder.db -> flipfinder_archive.db). Their bulky text columns
+#   are stored zlib-compressed, and the file is only ATTACHed while a batch
+#   or an /archive request needs it.
+# - Listings older than RAW_HTML_AFTER_DAYS lose raw_html from the hot
+#   table; a compressed copy goes to the archive's listing_html table.
+# - An archived listing's price_history rows move with it.
+#
+# Everything runs in batches of BATCH_SIZE rows, each its own short writer
+# job (Database.run_raw), so scrapes and notes interleave with a long
+# archive run instead of waiting behind it. A batch copies to the archive
+# and commits there before deleting from the hot table: a crash in between
+# only means the rows are copied again (INSERT OR REPLACE) next time.
+#
+# Note that an archived URL is unknown to the scrape dedupe: if it shows up
+# again it comes back as a new listing.
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+RAW_HTML_AFTER_DAYS = int(os.getenv("RAW_HTML_AFTER_DAYS", "14"))
+ARCHIVE_LABELS: Tuple[str, ...] = ("pass",)
+
+BATCH_SIZE = 500
+# breather between batches so queued writes get the writer
+BATCH_PAUSE_S = 0.05
+
+# background schedule (start_retention): a pass every RETENTION_INTERVAL_S
+# (0 disables it), a full VACUUM at most every VACUUM_EVERY_S
+RETENTION_INTERVAL_S = int(os.getenv("RETENTION_INTERVAL_S", "3600"))
+VACUUM_EVERY_S = 24 * 3600
+
+ARCHIVE_ALIAS = "archive"
+COMPRESSED_COLUMNS = ("description", "photos")
+
+_TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def compress_text(value: Optional[str]) -> Optional[bytes]:
+    if value is None:
+        return None
+    return zlib.compress(str(value).encode("utf-8"), 6)
+
+
+def decompress_text(value: Optional[bytes]) -> Optional[str]:
+    if value is None:
+        return None
+    return zlib.decompress(value).decode("utf-8")
+
+
+def archive_path_for(db_path: str) -> str:
+    """flipfinder.db -> flipfinder_archive.db (ARCHIVE_DB_PATH overrides)."""
+    override = os.getenv("ARCHIVE_DB_PATH")
+    if override:
+        return override
+    stem, ext = os.path.splitext(db_path)
+    return f"{stem}_archive{ext or '.db'}"
+
+
+def _main_path(conn) -> str:
+    cur = conn.cursor()
+    cur.execute("PRAGMA database_list")
+    for _seq, name, path in cur.fetchall():
+        if name == "main":
+            return path
+    raise RuntimeError("connection has no main database")
+
+
+def _archive_ddl() -> List[str]:
+    cols = []
+    for name, ddl in LISTING_COLUMNS:
+        if name in COMPRESSED_COLUMNS:
+            ddl = "BLOB"
+        cols.append(f"    {name} {ddl.replace(' NOT NULL', '')}")
+    return [
+        f"CREATE TABLE IF NOT EXISTS {ARCHIVE_ALIAS}.listings (\n"
+        "    id INTEGER NOT NULL PRIMARY KEY,\n"
+        + ",\n".join(cols)
+        + ",\n    archived_at VARCHAR,\n    archive_reason VARCHAR\n)",
+        f"CREATE INDEX IF NOT EXISTS {ARCHIVE_ALIAS}.ix_archived_listings_label "
+        "ON listings (label)",
+        f"CREATE TABLE IF NOT EXISTS {ARCHIVE_ALIAS}.listing_html (\n"
+        "    listing_id INTEGER NOT NULL PRIMARY KEY,\n"
+        "    raw_html BLOB,\n"
+        "    archived_at VARCHAR\n)",
+        f"CREATE TABLE IF NOT EXISTS {ARCHIVE_ALIAS}.price_history (\n"
+        "    id INTEGER NOT NULL PRIMARY KEY,\n"
+        "    listing_id INTEGER NOT NULL,\n"
+        "    observed_at VARCHAR NOT NULL,\n"
+        "    price NUMERIC(12, 2),\n"
+        "    prev_price NUMERIC(12, 2)\n)",
+        f"CREATE INDEX IF NOT EXISTS {ARCHIVE_ALIAS}.ix_archived_price_history_listing "
+        "ON price_history (listing_id, observed_at)",
+    ]
+
+
+@contextmanager
+def attached_archive(conn, create: bool = False) -> Iterator[bool]:
+    """
+    ATTACH the archive file to a DB-API connection as `archive` for the
+    duration of the block; yields False (nothing attached) when the file
+    doesn't exist and create is False. Must be entered outside a
+    transaction.
+    """
+    path = archive_path_for(_main_path(conn))
+    if not create and not os.path.exists(path):
+        yield False
+        return
+    conn.create_function("zcompress", 1, compress_text, deterministic=True)
+    cur = conn.cursor()
+    cur.execute(f"ATTACH DATABASE ? AS {ARCHIVE_ALIAS}", (path,))
+    try:
+        if create:
+            for ddl in _archive_ddl():
+                cur.execute(ddl)
+            # archive files made before a listings column was added
+            cur.execute(f"PRAGMA {ARCHIVE_ALIAS}.table_info(listings)")
+            have = {r[1] for r in cur.fetchall()}
+            for name, ddl in LISTING_COLUMNS:
+                if name not in have:
+                    ddl = "BLOB" if name in COMPRESSED_COLUMNS else ddl.replace(" NOT NULL", "")
+                    cur.execute(f"ALTER TABLE {ARCHIVE_ALIAS}.listings ADD COLUMN {name} {ddl}")
+        yield True
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        cur.execute(f"DETACH DATABASE {ARCHIVE_ALIAS}")
+
+
+def _cutoff(days: int, now: Optional[datetime] = None) -> str:
+    now = now or datetime.now(timezone.utc)
+    return (now - timedelta(days=days)).strftime(_TS_FORMAT)
+
+
+def _placeholders(ids: List[int]) -> str:
+    return ",".join("?" * len(ids))
+
+
+def archive_batch(conn, now: Optional[datetime] = None, limit: int = BATCH_SIZE) -> int:
+    """
+    Move up to `limit` listings due for the archive out of the hot table.
+    Returns how many moved (fewer than `limit` means nothing is left).
+    """
+    from .fts import fts_exists, sync_fts
+    from .near_dupes import forget_listings
+
+    cur = conn.cursor()
+    labels = _placeholders(list(ARCHIVE_LABELS))
+    cur.execute(f"SELECT id FROM listings WHERE label IN ({labels}) LIMIT ?",
+                (*ARCHIVE_LABELS, limit))
+    ids = [r[0] for r in cur.fetchall()]
+    if len(ids) < limit:
+        cur.execute(
+            "SELECT id FROM listings WHERE created_at < ? ORDER BY created_at LIMIT ?",
+            (_cutoff(ARCHIVE_AFTER_DAYS, now), limit),
+        )
+        ids = list(dict.fromkeys(ids + [r[0] for r in cur.fetchall()]))[:limit]
+    if not ids:
+        return 0
+
+    marks = _placeholders(ids)
+    names = [name for name, _ddl in LISTING_COLUMNS]
+    select = [f"zcompress({n})" if n in COMPRESSED_COLUMNS else n for n in names]
+    archived_at = datetime.now(timezone.utc).strftime(_TS_FORMAT)
+    with attached_archive(conn, create=True):
+        cur.execute(
+            f"INSERT OR REPLACE INTO {ARCHIVE_ALIAS}.listings "
+            f"(id, {', '.join(names)}, archived_at, archive_reason) "
+            f"SELECT id, {', '.join(select)}, ?, "
+            f"CASE WHEN label IN ({labels}) THEN 'label' ELSE 'age' END "
+            f"FROM main.listings WHERE id IN ({marks})",
+            (archived_at, *ARCHIVE_LABELS, *ids),
+        )
+        cur.execute(
+            f"INSERT OR REPLACE INTO {ARCHIVE_ALIAS}.listing_html (listing_id, raw_html, archived_at) "
+            f"SELECT id, zcompress(raw_html), ? FROM main.listings "
+            f"WHERE id IN ({marks}) AND raw_html IS NOT NULL",
+            (archived_at, *ids),
+        )
+        cur.execute(
+            f"INSERT OR REPLACE INTO {ARCHIVE_ALIAS}.price_history "
+            f"(id, listing_id, observed_at, price, prev_price) "
+            f"SELECT id, listing_id, observed_at, price, prev_price "
+            f"FROM main.price_history WHERE listing_id IN ({marks})",
+            ids,
+        )
+        conn.commit()  # the archive copy is durable before anything is deleted
+
+        cur.execute(f"DELETE FROM listing_rule_matches WHERE listing_id IN ({marks})", ids)
+        cur.execute(f"DELETE FROM price_history WHERE listing_id IN ({marks})", ids)
+        forget_listings(conn, ids)
+        cur.execute(f"DELETE FROM listings WHERE id IN ({marks})", ids)
+        conn.commit()
+    if fts_exists(conn):
+        # the delete triggers logged these; apply now rather than on the
+        # next /search
+        sync_fts(conn)
+    return len(ids)
+
+
+def strip_raw_html_batch(conn, now: Optional[datetime] = None, limit: int = BATCH_SIZE) -> int:
+    """
+    Move raw_html of up to `limit` listings older than RAW_HTML_AFTER_DAYS
+    to the archive (compressed) and NULL it in the hot table.
+    """
+    cur = conn.cursor()
+    # ix_listings_raw_html_pending only holds rows that still have raw_html
+    cur.execute(
+        "SELECT id FROM listings WHERE raw_html IS NOT NULL AND created_at < ? "
+        "ORDER BY created_at LIMIT ?",
+        (_cutoff(RAW_HTML_AFTER_DAYS, now), limit),
+    )
+    ids = [r[0] for r in cur.fetchall()]
+    if not ids:
+        return 0
+
+    marks = _placeholders(ids)
+    archived_at = datetime.now(timezone.utc).strftime(_TS_FORMAT)
+    with attached_archive(conn, create=True):
+        cur.execute(
+            f"INSERT OR REPLACE INTO {ARCHIVE_ALIAS}.listing_html (listing_id, raw_html, archived_at) "
+            f"SELECT id, zcompress(raw_html), ? FROM main.listings WHERE id IN ({marks})",
+            (archived_at, *ids),
+        )
+        conn.commit()
+        cur.execute(f"UPDATE listings SET raw_html = NULL WHERE id IN ({marks})", ids)
+        conn.commit()
+    return len(ids)
+
+
+def analyze(conn) -> None:
+    """Refresh planner statistics (sampled, so it stays quick on big tables)."""
+    cur = conn.cursor()
+    cur.execute("PRAGMA analysis_limit=1000")
+    cur.execute("ANALYZE")
+    conn.commit()
+
+
+def vacuum(conn) -> None:
+    """
+    Rebuild the file to hand the pages freed by archiving back to the OS,
+    then ANALYZE. Blocks writers for its duration, hence the daily schedule.
+    """
+    conn.commit()
+    cur = conn.cursor()
+    cur.execute("VACUUM")
+    cur.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    analyze(conn)
+
+
+def run_retention(database, now: Optional[datetime] = None, full_vacuum: bool = False) -> Dict[str, int]:
+    """
+    One retention pass through `database`'s writer: archive, strip raw_html,
+    then ANALYZE if anything changed (VACUUM too with full_vacuum).
+    Returns {"archived", "html_stripped"}.
+    """
+    stats = {"archived": 0, "html_stripped": 0}
+    if not database.is_sqlite:
+        return stats
+
+    for key, step in (("archived", archive_batch), ("html_stripped", strip_raw_html_batch)):
+        while True:
+            n = database.run_raw(lambda conn: step(conn, now))
+            stats[key] += n
+            if n < BATCH_SIZE:
+                break
+            time.sleep(BATCH_PAUSE_S)
+
+    if full_vacuum:
+        database.run_raw(vacuum)
+    elif stats["archived"] or stats["html_stripped"]:
+        database.run_raw(analyze)
+    return stats
+
+
+def archived_row(conn, listing_id: int, with_html: bool = False) -> Optional[Dict[str, Any]]:
+    """An archived listing as a dict (text decompressed), or None."""
+    with attached_archive(conn) as attached:
+        if not attached:
+            return None
+        cur = conn.cursor()
+        cur.execute(f"SELECT * FROM {ARCHIVE_ALIAS}.listings WHERE id = ?", (listing_id,))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        out = dict(zip([d[0] for d in cur.description], row))
+        for name in COMPRESSED_COLUMNS:
+            out[name] = decompress_text(out[name])
+        if with_html:
+            cur.execute(
+                f"SELECT raw_html FROM {ARCHIVE_ALIAS}.listing_html WHERE listing_id = ?",
+                (listing_id,),
+            )
+            html = cur.fetchone()
+            out["raw_html"] = decompress_text(html[0]) if html else None
+        return out
+
+
+ARCHIVE_SUMMARY_COLUMNS = (
+    "id", "title", "price", "currency", "url", "location", "label",
+    "created_at", "archived_at", "archive_reason",
+)
+
+
+def archived_rows(
+    conn,
+    limit: int,
+    label: Optional[str] = None,
+    before_id: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Archived listings, newest id first, after the keyset `before_id`."""
+    with attached_archive(conn) as attached:
+        if not attached:
+            return []
+        where, params = [], []
+        if label:
+            where.append("label = ?")
+            params.append(label)
+        if before_id is not None:
+            where.append("id < ?")
+            params.append(before_id)
+        cur = conn.cursor()
+        cur.execute(
+            f"SELECT {', '.join(ARCHIVE_SUMMARY_COLUMNS)} FROM {ARCHIVE_ALIAS}.listings"
+            + (f" WHERE {' AND '.join(where)}" if where else "")
+            + " ORDER BY id DESC LIMIT ?",
+            (*params, limit),
+        )
+        return [dict(zip(ARCHIVE_SUMMARY_COLUMNS, row)) for row in cur.fetchall()]
+
+
+_worker: Optional[Tuple[threading.Thread, threading.Event]] = None
+
+
+def start_retention(database, interval_s: int = RETENTION_INTERVAL_S) -> None:
+    """
+    Run retention passes in a daemon thread every interval_s seconds, with
+    a VACUUM once a day. Call stop_retention() on shutdown.
+    """
+    global _worker
+    if _worker is not None or interval_s <= 0 or not database.is_sqlite:
+        return
+
+    stop = threading.Event()
+
+    def run() -> None:
+        last_vacuum = time.monotonic()
+        while not stop.wait(interval_s):
+            full_vacuum = time.monotonic() - last_vacuum >= VACUUM_EVERY_S
+            try:
+                stats = run_retention(database, full_vacuum=full_vacuum)
+                if full_vacuum:
+                    last_vacuum = time.monotonic()
+                if any(stats.values()):
+                    print(f"[DEBUG] retention: {stats}")
+            except Exception as e:
+                # next pass tries again
+                print(f"[ERROR] Retention pass failed: {e}")
+
+    thread = threading.Thread(target=run, name="listings-retention", daemon=True)
+    thread.start()
+    _worker = (thread, stop)
+
+
+def stop_retention(timeout: float = 5.0) -> None:
+    global _worker
+    if _worker is None:
+        return
+    thread, stop = _worker
+    stop.set()
+    thread.join(timeout)
+    _worker = None
+
+
+__all__ = [
+    "ARCHIVE_AFTER_DAYS",
+    "RAW_HTML_AFTER_DAYS",
+    "ARCHIVE_LABELS",
+    "archive_path_for",
+    "attached_archive",
+    "archive_batch",
+    "strip_raw_html_batch",
+    "analyze",
+    "vacuum",
+    "run_retention",
+    "archived_row",
+    "archived_rows",
+    "start_retention",
+    "stop_retention",
+]
@@ -0,0 +1,129 @@
+import sqlite3
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Connection pragmas and the managed listings indexes, shared by every
+# engine and raw sqlite3 connection that opens flipfinder.db.
+#
+# journal_mode=WAL is stored in the database file; the rest are per
+# connection, so they're applied every time one is opened.
+
+PRAGMAS: List[Tuple[str, object]] = [
+    # readers no longer block the writer (and vice versa)
+    ("journal_mode", "WAL"),
+    # in WAL mode NORMAL only fsyncs at checkpoints; a power cut can lose
+    # the last commits but never corrupts the database
+    ("synchronous", "NORMAL"),
+    # read pages straight from the OS page cache instead of copying them
+    ("mmap_size", 256 * 1024 * 1024),
+    # negative = KiB, so 64 MiB of page cache per connection
+    ("cache_size", -64 * 1024),
+    # ORDER BY / GROUP BY temp b-trees stay off disk
+    ("temp_store", "MEMORY"),
+]
+
+# How long a connection waits for another one's write lock before giving
+# up with "database is locked" (sqlite3's default is 5 s).
+BUSY_TIMEOUT_S = 30
+
+# name -> columns. Every index covers a WHERE/ORDER BY some endpoint
+# runs; scripts/check_query_plans.py fails if one of them goes back to a
+# full table scan. Migration steps create them by name (app/migrations.py),
+# so a new index needs a new step there, and a released index's columns
+# never change -- give the new definition a new name.
+LISTING_INDEXES: Dict[str, Sequence[str]] = {
+    # dashboard "deals" table: is_deal = 1 AND profit/roi thresholds, newest
+    # first. (created_at, id) right after is_deal so the index also gives the
+    # page order (with profit there instead, SQLite falls back to walking
+    # every listing by date); profit/roi are checked before touching the row.
+    "ix_listings_deals": ("is_deal", "created_at", "id", "profit", "roi"),
+    # dashboard "recent" table; the implicit trailing rowid makes it the
+    # (created_at, id) keyset order too
+    "ix_listings_created_at": ("created_at",),
+    # /recent, /search, /export label filter and /labels counts
+    "ix_listings_label": ("label",),
+    # min_price / max_price filters
+    "ix_listings_price": ("price",),
+    # de-duplicating scraped listings: the scrape router looks up
+    # (source, url) per item, intake looks up external_id
+    "ix_listings_source_url": ("source", "url"),
+    "ix_listings_external_id": ("external_id",),
+    # deals_report.py top-k: walked backwards from the best score, stops
+    # at N; comps_at finds the listings whose comps went stale
+    "ix_listings_rank_score": ("rank_score",),
+    "ix_listings_comps_at": ("comps_at",),
+    # flipfinder/services/recrawl.py: the listings due for a revisit, and
+    # (both NULL) the new ones not scheduled yet -- without checked_at that
+    # seek would also walk every sold / removed listing
+    "ix_listings_next_check_at": ("next_check_at", "checked_at"),
+}
+
+
+def apply_pragmas(conn) -> None:
+    """Run PRAGMAS on a freshly opened DB-API connection."""
+    cur = conn.cursor()
+    try:
+        for name, value in PRAGMAS:
+            cur.execute(f"PRAGMA {name}={value}")
+    except sqlite3.DatabaseError as e:
+        # e.g. another process is mid-switch to WAL; the connection still
+        # works, just untuned
+        print("[WARN] SQLite pragma not applied:", e)
+    finally:
+        cur.close()
+
+
+def connect(path: str, **kwargs) -> sqlite3.Connection:
+    """sqlite3.connect() with PRAGMAS applied."""
+    kwargs.setdefault("timeout", BUSY_TIMEOUT_S)
+    conn = sqlite3.connect(path, **kwargs)
+    apply_pragmas(conn)
+    return conn
+
+
+def ensure_indexes(conn, names: Optional[Sequence[str]] = None) -> List[str]:
+    """
+    Create any missing LISTING_INDEXES (only `names`, if given) on a DB-API
+    connection and commit.
+    Skipped: indexes whose columns an existing index already starts with
+    (e.g. app's uq_source_url) and indexes over columns this database
+    doesn't have (an app-only schema has no analytics columns). Refreshes
+    the planner statistics when something was created. Returns the names
+    created.
+    """
+    cur = conn.cursor()
+    cur.execute("PRAGMA table_info(listings)")
+    have = {r[1] for r in cur.fetchall()}
+    if not have:
+        return []
+    cur.execute("PRAGMA index_list(listings)")
+    index_list = cur.fetchall()
+    existing = [r[1] for r in index_list]
+    covered = set()
+    # a partial index (r[4]) only covers some rows, so it can't stand in
+    for index in [r[1] for r in index_list if not r[4]]:
+        cur.execute(f"PRAGMA index_info({index})")
+        cols = tuple(r[2] for r in cur.fetchall())
+        covered.update(cols[:i] for i in range(1, len(cols) + 1))
+
+    created = []
+    for name, columns in LISTING_INDEXES.items():
+        if names is not None and name not in names:
+            continue
+        if name in existing or tuple(columns) in covered or not set(columns) <= have:
+            continue
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON listings ({', '.join(columns)})")
+        created.append(name)
+    if created:
+        cur.execute("ANALYZE listings")
+    conn.commit()
+    return created
+
+
+__all__ = [
+    "PRAGMAS",
+    "BUSY_TIMEOUT_S",
+    "LISTING_INDEXES",
+    "apply_pragmas",
+    "connect",
+    "ensure_indexes",
+]
@@ -12,3 +12,16 @@ def parse_price(text: str):
         return None, "CAD"
     # convert to float so it is always JSON-serializable
     return float(Decimal(nums[0])), "CAD"
+
+# Marketplace puts a listing's state in front of its title:
+# "Pending · iPhone 13 128gb", "Sold · Teak dresser"
+STATUS_MARKER_RE = re.compile(r"^\s*(pending|sold|available)\s*·\s*", re.I)
+
+def parse_status(title: str):
+    """ "Pending · iPhone 13" -> ("pending", "iPhone 13"); no marker -> (None, title) """
+    if not title:
+        return None, title
+    m = STATUS_MARKER_RE.match(title)
+    if not m:
+        return None, title
+    return m.group(1).lower(), title[m.end():].strip()
@@ -1,60 +1,181 @@
-import csv, os, sqlite3, datetime, json, urllib.request, re
+import csv, os, sys, re, datetime, time
+from itertools import islice
 
-API = "http://127.0.0.1:8000"
+from app.migrations import migrate
+from app.near_dupes import index_listings
+from app.sqlite_tuning import connect
+
+# ---- knobs you can tweak ----
+CHUNK = 5_000                                            # CSV rows per lookup + near-dupe pass
+COMPS_BATCH = 1_000                                      # listings per comps batch
+CONCURRENCY = int(os.getenv("FF_CONCURRENCY", "8"))      # parallel eBay lookups (--ebay)
+# the /refresh_comps?notify=true bars a deal has to clear to be emailed
+NOTIFY_MIN_PROFIT = float(os.getenv("NOTIFY_MIN_PROFIT", "40"))
+NOTIFY_MIN_ROI = float(os.getenv("NOTIFY_MIN_ROI", "35"))  # percent
+
+_IN_CHUNK = 900                                          # urls per "IN (...)" (old SQLite caps at 999)
+COLUMNS = ("title", "price", "url", "currency", "location", "label", "source", "note", "created_at")
+INSERT = f"INSERT INTO listings ({','.join(COLUMNS)}) VALUES ({','.join('?' * len(COLUMNS))})"
+_PRICE = re.compile(r'(\d[\d,]*\.?\d*)')
 
 def parse_price(s):
     if not s: return None
-    m = re.search(r'(\d[\d,]*\.?\d*)', s)
+    m = _PRICE.search(s)
     return float(m.group(1).replace(',', '')) if m else None
 
-def insert_row(row):
-    db = os.getenv("DATABASE_URL","sqlite:///flipfinder.db").replace("sqlite:///","")
-    con = sqlite3.connect(db)
+def parse_prices(values):
+    """parse_price over a whole column: "$250", "CA$1,999.00", "" -> floats / None."""
+    search = _PRICE.search
+    matches = [search(v) if v else None for v in values]
+    return [float(m.group(1).replace(',', '')) if m else None for m in matches]
+
+def read_chunks(path, size=CHUNK):
+    """Stream the CSV as lists of rows (rows without a url, or commented out, are dropped)."""
+    with open(path, newline='') as f:
+        rows = (r for r in csv.DictReader(f) if r.get("url") and not r["url"].startswith("#"))
+        while chunk := list(islice(rows, size)):
+            yield chunk
+
+def insert_chunk(con, chunk, now):
+    """
+    Insert one chunk's new rows, taking each id from lastrowid. The caller
+    holds the write lock (BEGIN IMMEDIATE), so nobody can insert between
+    the lookup and the INSERTs. Returns (new_ids, existing_ids).
+    """
+    by_url = {}
+    for r in chunk:
+        by_url.setdefault(r["url"], r)   # first row wins on repeats
+    urls = list(by_url)
+    existing = {}
+    for i in range(0, len(urls), _IN_CHUNK):
+        part = urls[i:i + _IN_CHUNK]
+        existing.update(con.execute(
+            f"SELECT url, id FROM listings WHERE source = 'facebook' "
+            f"AND url IN ({','.join('?' * len(part))})",
+            part,
+        ).fetchall())
+    fresh = [r for u, r in by_url.items() if u not in existing]
+    prices = parse_prices([r.get("price") for r in fresh])
+    rows = [
+        (r.get("title") or "", price, r["url"], r.get("currency") or "CAD",
+         r.get("location") or None, "watch", "facebook", "csv import", now)
+        for r, price in zip(fresh, prices)
+    ]
     cur = con.cursor()
-    cols = [c[1] for c in cur.execute("PRAGMA table_info(listings)").fetchall()]
-    now = datetime.datetime.now(datetime.UTC).isoformat(timespec="seconds")
-
-    data = {
-        "title": row.get("title") or "",
-        "price": parse_price(row.get("price")),
-        "url": row.get("url"),
-        "currency": row.get("currency") or "CAD",
-        "location": row.get("location") or None,
-        "label": "watch",
-        "source": "facebook",
-        "note": "csv import",
-        "created_at": now,
-    }
-    keys = [k for k in data if k in cols]
-    cur.execute(
-        f"INSERT INTO listings ({','.join(keys)}) VALUES ({','.join(['?']*len(keys))})",
-        [data[k] for k in keys]
+    new_ids = []
+    for row in rows:
+        cur.execute(INSERT, row)
+        new_ids.append(cur.lastrowid)
+    # link relists / cross-posts of something we already have
+    index_listings(con, [(i, r[0], r[1], r[4]) for i, r in zip(new_ids, rows)])
+    return new_ids, list(existing.values())
+
+def import_rows(con, path):
+    """All chunks in one transaction. Returns (new_ids, existing_ids)."""
+    now = datetime.datetime.now(datetime.UTC).strftime("%Y-%m-%d %H:%M:%S")
+    new_ids, existing_ids = [], []
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        for chunk in read_chunks(path):
+            added, seen = insert_chunk(con, chunk, now)
+            new_ids += added
+            existing_ids += seen
+        con.commit()
+    except BaseException:
+        con.rollback()
+        raise
+    return new_ids, existing_ids
+
+def worth_emailing(data):
+    """
+    Like /refresh_comps?notify=true: only a deal priced off the market
+    (eBay sold prices or the local model trained on them, never rules
+    alone) whose profit and ROI clear NOTIFY_MIN_PROFIT / NOTIFY_MIN_ROI.
+    There's no sold count here, so NOTIFY_MIN_SCORE doesn't apply.
+    """
+    return (
+        data.get("resale_source") not in (None, "rules")
+        and data["profit"] >= NOTIFY_MIN_PROFIT
+        and data["roi"] * 100 >= NOTIFY_MIN_ROI
+    )
+
+def score(db_url, listing_ids, lookup_ebay=False, notify=False, concurrency=CONCURRENCY):
+    """
+    Comps for the imported listings, in-process, COMPS_BATCH at a time:
+    one query + one executemany UPDATE per batch, eBay lookups (if any)
+    at most `concurrency` at once. With notify, emails the deals that pass
+    worth_emailing() (once per near-duplicate group). Returns (scored,
+    deals, notified).
+    """
+    from sqlalchemy.orm import sessionmaker
+
+    from app.db_access import open_database
+    from app.notify_email import notify_deal
+    from flipfinder.models import Listing
+    from flipfinder.services.comps import refresh_comps_for_listing_ids
+
+    database = open_database(db_url)
+    Session = sessionmaker(bind=database.read_engine, autoflush=False)
+    scored = deals = notified = 0
+    for start in range(0, len(listing_ids), COMPS_BATCH):
+        batch = listing_ids[start:start + COMPS_BATCH]
+        s = Session()
+        try:
+            out = refresh_comps_for_listing_ids(
+                s, batch, lookup_ebay=lookup_ebay, concurrency=concurrency,
+                skip_unchanged=not lookup_ebay,
+            )
+            hits = [r for r in out.values() if r.get("data", {}).get("is_deal")]
+            emails = [r for r in hits if worth_emailing(r["data"])] if notify else []
+            if emails:
+                info = {
+                    lid: {"id": lid, "title": title, "url": url}
+                    for lid, title, url in s.query(Listing.id, Listing.title, Listing.url)
+                    .filter(Listing.id.in_([r["listing_id"] for r in emails]))
+                }
+                notified += sum(
+                    notify_deal(database, {**r["data"], **info[r["listing_id"]], "price": r["data"]["asking_price"]})
+                    for r in emails
+                )
+        finally:
+            s.close()
+        scored += sum(1 for r in out.values() if r["success"] and not r.get("skipped"))
+        deals += len(hits)
+        print(f"[DEBUG] comps {start + len(batch)}/{len(listing_ids)}")
+    return scored, deals, notified
+
+def main(path, lookup_ebay=False, notify=None):
+    # emails need market prices (see worth_emailing), so they default to --ebay
+    notify = lookup_ebay if notify is None else notify
+    db_url = os.getenv("DATABASE_URL", "sqlite:///flipfinder.db")
+    con = connect(db_url.replace("sqlite:///", ""))
+    try:
+        migrate(con)  # once, not per row
+        t0 = time.perf_counter()
+        new_ids, existing_ids = import_rows(con, path)
+        took_insert = time.perf_counter() - t0
+    finally:
+        con.close()
+    print(f"imported {len(new_ids)} new, {len(existing_ids)} already saved ({took_insert:.1f}s)")
+
+    t0 = time.perf_counter()
+    scored, deals, notified = score(db_url, new_ids + existing_ids, lookup_ebay, notify)
+    print(
+        f"\n✅ imported {len(new_ids)} listings | comps {scored} scored, {deals} deals, "
+        f"{notified} emailed ({time.perf_counter() - t0:.1f}s)"
     )
-    con.commit()
-    new_id = cur.execute("SELECT id FROM listings ORDER BY id DESC LIMIT 1").fetchone()[0]
-    con.close()
-    return new_id
-
-def refresh(id, notify=True):
-    url = f"{API}/listing/{id}/refresh_comps" + ("?notify=true" if notify else "")
-    req = urllib.request.Request(url, method="POST")
-    with urllib.request.urlopen(req) as r:
-        return json.loads(r.read().decode())
-
-def main(path):
-    added = []
-    with open(path, newline='') as f:
-        for row in csv.DictReader(f):
-            if not row.get("url"): continue
-            new_id = insert_row(row)
-            out = refresh(new_id, notify=True)
-            added.append((new_id, out.get("estimate",{})))
-            print(f"ID {new_id} → {out.get('estimate')}")
-    print(f"\n✅ imported {len(added)} listings")
 
 if __name__ == "__main__":
-    import sys
-    if len(sys.argv)<2:
-        print("usage: python bulk_add_from_csv.py watchlist.csv")
+    args = sys.argv[1:]
+    paths = [a for a in args if not a.startswith("--")]
+    if len(paths) != 1:
+        print(
+            "usage: python bulk_add_from_csv.py watchlist.csv [--ebay] [--no-notify]\n"
+            "  --ebay       price the imported listings off eBay sold comps (slower)\n"
+            "  --no-notify  with --ebay, don't email deals; by default it emails each\n"
+            "               deal priced off the market that clears NOTIFY_MIN_PROFIT and\n"
+            "               NOTIFY_MIN_ROI, once per near-duplicate group. Without --ebay\n"
+            "               nothing is emailed."
+        )
         raise SystemExit(2)
-    main(sys.argv[1])
+    main(paths[0], lookup_ebay="--ebay" in args, notify=False if "--no-notify" in args else None)
@@ -1,22 +1,55 @@
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import HTMLResponse, StreamingResponse
 import sqlite3
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from app.pagination import decode_cursor, encode_cursor, split_page
+from app.sqlite_tuning import connect
+from flipfinder.services.batch import compute_profit_metrics_batch
 
 DB_PATH = Path("flipfinder.db")
+PAGE_SIZE = 200
+MAX_PAGE_SIZE = 20_000
+
+# Only what the table shows (and rescore_rows needs); SELECT * dragged
+# raw_html and description along for every row.
+COLUMNS = ("id", "title", "price", "estimated_resale", "profit", "roi", "is_deal", "url", "created_at")
+
+# Compiled once at import. Pages are streamed in chunks of STREAM_CHUNK
+# template outputs (~100 rows, ~25 KB) instead of being built as one
+# string; each chunk is a hop to the threadpool, so not much smaller.
+TEMPLATES_DIR = Path(__file__).resolve().parent / "flipfinder" / "templates"
+STREAM_CHUNK = 2000
+_env = Environment(
+    loader=FileSystemLoader(str(TEMPLATES_DIR)),
+    autoescape=select_autoescape(["html"]),
+    finalize=lambda value: "" if value is None else value,
+)
+PAGE_TEMPLATE = _env.get_template("raw_listings.html")
+ROWS_TEMPLATE = _env.get_template("_raw_listing_rows.html")
 
 app = FastAPI(title="FlipFinder – Raw Listings Viewer (DEBUG)")
 
-def load_rows(limit: int = 200) -> List[Dict[str, Any]]:
+def load_rows(limit: int = 200, before_id: Optional[int] = None) -> List[Dict[str, Any]]:
     if not DB_PATH.exists():
         print("DB does not exist at:", DB_PATH.resolve())
         return []
-    conn = sqlite3.connect(str(DB_PATH))
+    conn = connect(str(DB_PATH))
     conn.row_factory = sqlite3.Row
     cur = conn.cursor()
+    columns = ", ".join(COLUMNS)
     try:
-        cur.execute("SELECT * FROM listings ORDER BY id DESC LIMIT ?", (limit,))
+        if before_id is None:
+            cur.execute(f"SELECT {columns} FROM listings ORDER BY id DESC LIMIT ?", (limit,))
+        else:
+            # keyset page: walks the primary key, same cost at any depth
+            cur.execute(
+                f"SELECT {columns} FROM listings WHERE id < ? ORDER BY id DESC LIMIT ?",
+                (before_id, limit),
+            )
         rows = [dict(r) for r in cur.fetchall()]
         print(f"Loaded {len(rows)} rows from {DB_PATH.resolve()}")
     except Exception as e:
@@ -25,151 +58,71 @@ def load_rows(limit: int = 200) -> List[Dict[str, Any]]:
     conn.close()
     return rows
 
-@app.get("/dashboard", response_class=HTMLResponse)
-def dashboard():
-    rows = load_rows(limit=200)
-    db_exists = DB_PATH.exists()
-    db_abs = DB_PATH.resolve()
-    row_count = len(rows)
-
-    html_rows = ""
-    for row in rows:
-        id_ = row.get("id", "")
-        title = (row.get("title") or "").replace("\n", " ")
-        price = row.get("price", "")
-        est_resale = row.get("estimated_resale", "")
-        profit = row.get("profit", "")
-        roi = row.get("roi", "")
-        is_deal = row.get("is_deal", "")
-        url = row.get("url", "")
-        created_at = row.get("created_at", "")
-
-        url_html = f'<a href="{url}" target="_blank">link</a>' if url else ""
+def rescore_rows(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Recompute profit / roi / is_deal for rows that already have a resale
+    estimate, so the view reflects the current deal thresholds. One
+    vectorized call for the whole page.
+    """
+    scored = [r for r in rows if r.get("estimated_resale") is not None]
+    if not scored:
+        return rows
+    metrics = compute_profit_metrics_batch(
+        [r.get("price") for r in scored],
+        [r.get("estimated_resale") for r in scored],
+    )
+    for i, row in enumerate(scored):
+        row["profit"] = float(metrics["profit"][i])
+        row["roi"] = float(metrics["roi"][i])
+        row["is_deal"] = int(metrics["is_deal"][i])
+    return rows
 
-        html_rows += f"""
-        <tr>
-          <td>{id_}</td>
-          <td>{title[:100]}{"…" if title and len(title) > 100 else ""}</td>
-          <td>{price}</td>
-          <td>{est_resale}</td>
-          <td>{profit}</td>
-          <td>{roi}</td>
-          <td>{is_deal}</td>
-          <td>{url_html}</td>
-          <td>{created_at}</td>
-        </tr>
-        """
+def load_page(
+    cursor: Optional[str] = None, limit: int = PAGE_SIZE
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    One page of `limit` rows, newest id first, plus the cursor for the
+    next page (None on the last one). Raises ValueError for a bad cursor.
+    """
+    after = decode_cursor(cursor, "dashboard")
+    rows = load_rows(limit=limit + 1, before_id=after[0] if after else None)
+    rows, more = split_page(rows, limit)
+    next_cursor = encode_cursor("dashboard", [rows[-1]["id"]]) if more else None
+    return rescore_rows(rows), next_cursor
 
-    if not html_rows:
-        html_rows = '<tr><td colspan="9">No rows found in listings table (DEBUG: row_count = 0).</td></tr>'
+def stream_template(template, **context) -> Iterator[str]:
+    stream = template.stream(**context)
+    stream.enable_buffering(STREAM_CHUNK)
+    return stream
 
-    html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-      <meta charset="utf-8" />
-      <title>FlipFinder – Raw Listings (DEBUG)</title>
-      <style>
-        body {{
-          font-family: system-ui, -apple-system, BlinkMacSystemFont, "Segoe UI", sans-serif;
-          margin: 0;
-          padding: 0;
-          background: #0b0b10;
-          color: #f5f5f7;
-        }}
-        header {{
-          padding: 16px 24px;
-          border-bottom: 1px solid #222;
-          display: flex;
-          justify-content: space-between;
-          align-items: center;
-        }}
-        h1 {{
-          margin: 0;
-          font-size: 20px;
-        }}
-        .badge {{
-          font-size: 12px;
-          padding: 4px 10px;
-          border-radius: 999px;
-          background: #1d1d27;
-          border: 1px solid #333;
-          color: #9ca3af;
-        }}
-        .container {{
-          padding: 16px 24px 32px;
-        }}
-        table {{
-          width: 100%;
-          border-collapse: collapse;
-          margin-top: 8px;
-          font-size: 13px;
-        }}
-        thead {{
-          background: #111827;
-        }}
-        th, td {{
-          padding: 8px 10px;
-          border-bottom: 1px solid #111827;
-          vertical-align: top;
-        }}
-        th {{
-          text-align: left;
-          color: #9ca3af;
-          font-weight: 500;
-          white-space: nowrap;
-        }}
-        tr:nth-child(even) {{
-          background: #050509;
-        }}
-        tr:hover {{
-          background: #111827;
-        }}
-        a {{
-          color: #60a5fa;
-          text-decoration: none;
-        }}
-        a:hover {{
-          text-decoration: underline;
-        }}
-        .debug {{
-          font-size: 12px;
-          color: #9ca3af;
-          margin-top: 4px;
-        }}
-      </style>
-    </head>
-    <body>
-      <header>
-        <div>
-          <h1>FlipFinder – Raw Listings (DEBUG)</h1>
-          <div class="debug">
-            DB exists: {db_exists} • Path: {db_abs} • Rows loaded: {row_count}
-          </div>
-        </div>
-        <div class="badge">flipfinder.db</div>
-      </header>
-      <div class="container">
-        <table>
-          <thead>
-            <tr>
-              <th>ID</th>
-              <th>Title</th>
-              <th>Price</th>
-              <th>Est. Resale</th>
-              <th>Profit</th>
-              <th>ROI</th>
-              <th>Deal</th>
-              <th>URL</th>
-              <th>Created</th>
-            </tr>
-          </thead>
-          <tbody>
-            {html_rows}
-          </tbody>
-        </table>
-      </div>
-    </body>
-    </html>
+@app.get("/dashboard/rows", response_class=HTMLResponse)
+def dashboard_rows(cursor: str, limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
     """
-    return HTMLResponse(content=html)
+    The next page of table rows for "Load more"; the cursor after it is in
+    the X-Next-Cursor header (empty on the last page).
+    """
+    try:
+        rows, next_cursor = load_page(cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        stream_template(ROWS_TEMPLATE, rows=rows),
+        media_type="text/html; charset=utf-8",
+        headers={"X-Next-Cursor": next_cursor or ""},
+    )
+
+@app.get("/dashboard", response_class=HTMLResponse)
+def dashboard(limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    rows, next_cursor = load_page(limit=limit)
+    return StreamingResponse(
+        stream_template(
+            PAGE_TEMPLATE,
+            rows=rows,
+            next_cursor=next_cursor,
+            limit=limit,
+            db_exists=DB_PATH.exists(),
+            db_abs=DB_PATH.resolve(),
+            row_count=len(rows),
+        ),
+        media_type="text/html; charset=utf-8",
+    )
@@ -1,42 +1,72 @@
-import json, urllib.request, csv, sys
-
-API = "http://127.0.0.1:8000"
-
-def recent(limit=100):
-    with urllib.request.urlopen(f"{API}/recent?limit={limit}") as r:
-        return json.loads(r.read().decode())["rows"]
-
-def refresh(id):
-    req = urllib.request.Request(f"{API}/listing/{id}/refresh_comps", method="POST")
-    with urllib.request.urlopen(req) as r:
-        return json.loads(r.read().decode())
-
-def main(limit=50, out="deals.csv"):
-    rows = recent(limit)
-    scored = []
-    for r in rows:
-        j = refresh(r["id"])
-        est = j.get("estimate",{})
-        scored.append({
-            "id": r["id"],
-            "title": r["title"],
-            "price": r.get("price"),
-            "url": r.get("url"),
-            "profit": est.get("profit"),
-            "roi_percent": est.get("roi_percent"),
-            "score": est.get("score"),
-            "decision": est.get("decision"),
-        })
-    scored.sort(key=lambda x: (
-        (x["score"] or -1),
-        (x["profit"] or -1),
-        (x["roi_percent"] or -1)
-    ), reverse=True)
-
-    with open(out,"w",newline="") as f:
-        w=csv.DictWriter(f, fieldnames=scored[0].keys())
-        w.writeheader(); w.writerows(scored)
-    print(f"✅ wrote {out} with {len(scored)} rows")
+import os, sys, time
+
+from app.migrations import migrate
+from app.ranking import COMPS_TTL_HOURS, stale_ids, top_k, write_ranked
+from app.sqlite_tuning import connect
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///flipfinder.db")
+
+def session_factory():
+    """Sessions on the shared read pool; comps writes go to its writer thread."""
+    from sqlalchemy.orm import sessionmaker
+    from app.db_access import open_database
+
+    return sessionmaker(bind=open_database(DATABASE_URL).read_engine, autoflush=False)
+
+def refresh(con, ttl=COMPS_TTL_HOURS, days=None, ids=None, workers=4, lookup_ebay=False, log=sys.stdout):
+    """New comps for the listings (in the window) whose comps are older than ttl hours."""
+    stale = stale_ids(con, ttl_hours=ttl, days=days, ids=ids)
+    if not stale:
+        return
+    from flipfinder.services.ranking import refresh_stale
+
+    t0 = time.perf_counter()
+    stats = refresh_stale(session_factory(), stale, workers=workers, lookup_ebay=lookup_ebay)
+    print(f"refreshed comps for {stats['refreshed']} stale listings "
+          f"({stats['deals']} deals, {time.perf_counter() - t0:.1f}s)", file=log)
+
+def main(n=50, out="deals.csv", days=None, ttl=COMPS_TTL_HOURS, workers=4,
+         lookup_ebay=False, deals_only=False):
+    to_stdout = out == "-"
+    log = sys.stderr if to_stdout else sys.stdout
+    con = connect(DATABASE_URL.replace("sqlite:///", ""))
+    try:
+        migrate(con)
+        refresh(con, ttl=ttl, days=days, workers=workers, lookup_ebay=lookup_ebay, log=log)
+        t0 = time.perf_counter()
+        rows = top_k(con, n, days=days, deals_only=deals_only)
+        if to_stdout:
+            count = write_ranked(rows, sys.stdout)
+        else:
+            with open(out, "w", newline="") as f:
+                count = write_ranked(rows, f)
+        took = time.perf_counter() - t0
+        top = list(top_k(con, min(n, 10), days=days, deals_only=deals_only))
+    finally:
+        con.close()
+    print(f"✅ wrote {'stdout' if to_stdout else out} with {count} rows ({took * 1000:.0f} ms)", file=log)
     # Print top 10 to console
-    for s in scored[:10]:
-        print(f'[{s["id"]}] {s["title"][:60]} | profit={s["profit"]} roi%={s["roi_percent"]} score={s["score"]} decision={s["decision"]}')
+    for id, title, *_, profit, roi, is_deal, score, _comps_at in top:
+        print(f'[{id}] {(title or "")[:60]} | profit={profit} roi={roi or 0:.0%} '
+              f'score={score} deal={bool(is_deal)}', file=log)
+
+def _opt(args, name, default, cast=str):
+    for a in args:
+        if a.startswith(f"--{name}="):
+            return cast(a.split("=", 1)[1])
+    return default
+
+if __name__ == "__main__":
+    # Usage: python deals_report.py [N] [out.csv | -] [--days=7] [--ttl=24]
+    #                               [--workers=4] [--ebay] [--deals-only]
+    args = sys.argv[1:]
+    pos = [a for a in args if not a.startswith("--")]
+    main(
+        n=int(pos[0]) if pos else 50,
+        out=pos[1] if len(pos) > 1 else "deals.csv",
+        days=_opt(args, "days", None, float),
+        ttl=_opt(args, "ttl", COMPS_TTL_HOURS, float),
+        workers=_opt(args, "workers", 4, int),
+        lookup_ebay="--ebay" in args,
+        deals_only="--deals-only" in args,
+    )
@@ -0,0 +1,4 @@
+from flipfinder.cli import main
+
+# python -m flipfinder <command> ...  (see flipfinder/cli.py)
+raise SystemExit(main())
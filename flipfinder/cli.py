@@ -0,0 +1,107 @@
+import os
+import runpy
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# One entry point for the helper scripts:
+#
+#   python -m flipfinder <command> [args...]
+#
+# Each command is an existing script, run exactly as `python <script>`
+# would (same argv handling, same `if __name__ == "__main__"` block). This
+# module imports nothing from the app itself: a command's module is only
+# imported once that command is picked, so `report` never loads FastAPI
+# or Playwright and `--help` loads neither. scripts/bench_startup.py keeps
+# it that way.
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# command -> (module run as __main__, one-line help)
+COMMANDS: Dict[str, Tuple[str, str]] = {
+    "add": ("add_listing", "add one listing and score it via the API"),
+    "import": ("bulk_add_from_csv", "bulk import a watchlist CSV, then score it"),
+    "report": ("deals_report", "top-N deals CSV (refreshes stale comps first)"),
+    "recheck": ("recheck_recent", "re-score the 25 newest listings"),
+    "analyze": ("scripts.bulk_analyze", "analyze a file of Marketplace URLs"),
+    "search": ("scripts.search_cli", "scrape a Marketplace search"),
+    "login": ("fb_login_and_save_cookies", "log into Facebook and save cookies"),
+    "install-browsers": ("install_playwright", "install Playwright's Chromium"),
+    "migrate": ("scripts.init_db", "bring the schema up to date"),
+    "migrate-fts": ("scripts.migrate_fts", "create / rebuild the search index"),
+    "rescore": ("scripts.rescore_all", "re-score listings after rule changes"),
+    "archive": ("scripts.archive_listings", "move old / passed listings to the archive"),
+    "dedupe-index": ("scripts.build_dedupe_index", "rebuild the near-duplicate index"),
+    "crawl": ("scripts.crawl_keywords", "search the keywords the crawl planner picks"),
+    "recrawl": ("scripts.recrawl", "revisit due listings for sold / pending / removed"),
+    "train-model": ("scripts.train_price_model", "fold new sold comps into the resale model"),
+    "check-analytics": ("scripts.check_analytics", "compare rollups against the table"),
+    "check-plans": ("scripts.check_query_plans", "EXPLAIN the hot queries"),
+}
+
+# `serve <name>` -> uvicorn import string
+APPS: Dict[str, str] = {
+    "flipfinder": "flipfinder.main:app",
+    "api": "app.api:app",
+    "dashboard": "dashboard:app",
+}
+
+
+def usage() -> str:
+    width = max(len(c) for c in COMMANDS)
+    lines = ["usage: python -m flipfinder <command> [args...]", "", "commands:"]
+    for name, (_, help_text) in COMMANDS.items():
+        lines.append(f"  {name:<{width}}  {help_text}")
+    lines.append(
+        f"  {'serve':<{width}}  run an app with uvicorn: serve [{'|'.join(APPS)}] "
+        "[--host=0.0.0.0] [--port=8000] [--reload]"
+    )
+    return "\n".join(lines)
+
+
+def _opt(args: List[str], name: str, default: str) -> str:
+    for a in args:
+        if a.startswith(f"--{name}="):
+            return a.split("=", 1)[1]
+    return default
+
+
+def serve(args: List[str]) -> int:
+    names = [a for a in args if not a.startswith("--")]
+    name = names[0] if names else "flipfinder"
+    if name not in APPS:
+        print(f"[ERROR] unknown app {name!r}; pick one of: {', '.join(APPS)}")
+        return 2
+    import uvicorn  # only `serve` needs it
+
+    uvicorn.run(
+        APPS[name],
+        host=_opt(args, "host", "127.0.0.1"),
+        port=int(_opt(args, "port", os.getenv("PORT", "8000"))),
+        reload="--reload" in args,
+    )
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help", "help"):
+        print(usage())
+        return 0
+    command, args = argv[0], argv[1:]
+    # the scripts live at the repo root / in scripts/, not inside the package
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    if command == "serve":
+        return serve(args)
+    if command not in COMMANDS:
+        print(f"[ERROR] unknown command {command!r}\n")
+        print(usage())
+        return 2
+    module = COMMANDS[command][0]
+    sys.argv = [module, *args]
+    runpy.run_module(module, run_name="__main__", alter_sys=True)
+    return 0
+
+
+__all__ = ["COMMANDS", "APPS", "main", "usage"]
@@ -1,11 +1,13 @@
 import os
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
+from app.db_access import open_database
+
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:////Users/harmandulay/flipfinder/flipfinder.db")
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args, future=True)
+# same read pool / writer thread as app.db and flipfinder.db for one file
+database = open_database(DATABASE_URL)
+engine = database.read_engine
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False, future=True)
 
 def get_db():
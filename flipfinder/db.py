@@ -1,14 +1,15 @@
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+from app.db_access import open_database
+
 # Use a relative SQLite path so it works both locally and on Render
 DATABASE_URL = "sqlite:///./flipfinder.db"
 
-# SQLAlchemy engine and session factory
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False},  # needed for SQLite + FastAPI
-)
+# Read-only connection pool + single writer thread (app/db_access.py),
+# shared with app/db.py when both point at the same file. Sessions read;
+# writes go through app.db_access.write(db, job).
+database = open_database(DATABASE_URL)
+engine = database.read_engine
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -18,15 +19,16 @@ Base = declarative_base()
 
 def init_db() -> None:
     """
-    Ensure all tables are created.
+    Bring the schema up to date. Call once at startup.
 
-    On a fresh Render deploy there is no flipfinder.db file yet,
-    so we create the schema on startup. We import models here to
-    avoid circular imports (db -> models -> db).
+    On a fresh Render deploy there is no flipfinder.db file yet, so
+    this creates it; on an existing one it applies whatever versioned
+    migrations (app/migrations.py) haven't run yet. Shared with the
+    app/ side so both model sets see the same listings table.
     """
-    from . import models  # local import to avoid circular dependency
+    from app.migrations import migrate  # local import, like the models
 
-    Base.metadata.create_all(bind=engine)
+    database.run_raw(migrate)
 
 
 def get_db():
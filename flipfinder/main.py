@@ -1,20 +1,39 @@
 from pathlib import Path
 
-from fastapi import FastAPI, Request, Depends
+from fastapi import FastAPI, Request, Depends, HTTPException
 from fastapi.responses import HTMLResponse
+from sqlalchemy import tuple_
 from starlette.templating import Jinja2Templates
 
-from .db import get_db, init_db
+from app.pagination import decode_cursor, encode_cursor, split_page
+
+from app.live_routes import router as live_deals_router
+from app.page_cache import PageCache
+from app.retention import start_retention, stop_retention
+
+from .db import SessionLocal, database, get_db, init_db
 from . import models
 from .routers import facebook as facebook_router
+from .routers import prices as prices_router
+from .services.recrawl import start_recrawl, stop_recrawl
+from .services.rules import start_rules_watcher, stop_rules_watcher
 
 BASE_DIR = Path(__file__).resolve().parent
 TEMPLATES_DIR = BASE_DIR / "templates"
 
 templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
 
+# Rows per dashboard table page; "Load more" fetches the next one.
+PAGE_SIZE = 50
+
+# Rendered dashboard pages, dropped whenever a write commits (see
+# app/page_cache.py): between scrapes, reloads skip the queries and Jinja.
+page_cache = PageCache(lambda: database.generation)
+
 app = FastAPI()
 app.include_router(facebook_router.router)
+app.include_router(prices_router.router)
+app.include_router(live_deals_router)  # /ws/deals, /sse/deals
 
 
 @app.on_event("startup")
@@ -23,8 +42,72 @@ def on_startup():
     Ensure the database schema exists when the app starts.
     On Render, this will create flipfinder.db and all tables
     if they are missing.
+
+    Also starts watching data/pricing_rules.yaml so rule edits are picked
+    up (and the affected listings re-scored) without a redeploy, the
+    retention thread that moves old / passed listings to the archive, and
+    the recrawler that revisits listings for sold / pending / removed.
     """
     init_db()
+    start_rules_watcher(SessionLocal)
+    start_retention(database)
+    start_recrawl(SessionLocal, database)
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    stop_rules_watcher()
+    stop_retention()
+    stop_recrawl()
+
+
+def _deals_query(db, min_profit: float, min_roi: float):
+    return (
+        db.query(models.Listing)
+        .filter(models.Listing.is_deal == True)
+        .filter(models.Listing.profit >= min_profit)
+        .filter(models.Listing.roi >= min_roi)
+    )
+
+
+def _recent_query(db, min_profit: float, min_roi: float):
+    return db.query(models.Listing)
+
+
+SECTIONS = {"deals": _deals_query, "recent": _recent_query}
+
+
+def _page(query, section: str, cursor=None, limit: int = PAGE_SIZE):
+    """
+    One page of `query`, newest first, ordered by (created_at, id) with
+    NULL created_at last (SQLite's DESC order). Returns (rows, next_cursor).
+    Raises ValueError for a bad cursor.
+    """
+    L = models.Listing
+    order = (L.created_at.desc(), L.id.desc())
+    after = decode_cursor(cursor, section)
+    if after is None:
+        rows = query.order_by(*order).limit(limit + 1).all()
+    else:
+        created_at, last_id = after
+        rows = []
+        if created_at is not None:
+            # a plain row-value range is one seek on ix_listings_created_at;
+            # OR-ing in "created_at IS NULL" made SQLite scan from the top
+            rows = (
+                query.filter(tuple_(L.created_at, L.id) < tuple_(created_at, last_id))
+                .order_by(*order).limit(limit + 1).all()
+            )
+            last_id = None
+        if len(rows) <= limit:
+            # past the dated rows: the NULL created_at tail, by id
+            tail = query.filter(L.created_at.is_(None))
+            if last_id is not None:
+                tail = tail.filter(L.id < last_id)
+            rows += tail.order_by(*order).limit(limit + 1 - len(rows)).all()
+    rows, more = split_page(rows, limit)
+    next_cursor = encode_cursor(section, [rows[-1].created_at, rows[-1].id]) if more else None
+    return rows, next_cursor
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -35,35 +118,49 @@ def root(
     radius_km: int = 50,
     db=Depends(get_db),
 ):
-    # Extra safety: also ensure schema exists on first request.
-    # This is cheap and idempotent for SQLite.
-    init_db()
+    def render():
+        deals, deals_cursor = _page(_deals_query(db, min_profit, min_roi), "deals")
+        recent, recent_cursor = _page(_recent_query(db, min_profit, min_roi), "recent")
+        html = templates.get_template("dashboard.html").render(
+            request=request,
+            deals=deals,
+            recent=recent,
+            deals_cursor=deals_cursor,
+            recent_cursor=recent_cursor,
+            min_profit=min_profit,
+            min_roi=min_roi,
+            radius_km=radius_km,
+        )
+        return html.encode("utf-8"), {}
 
-    deals = (
-        db.query(models.Listing)
-        .filter(models.Listing.is_deal == True)
-        .filter(models.Listing.profit >= min_profit)
-        .filter(models.Listing.roi >= min_roi)
-        .order_by(models.Listing.created_at.desc())
-        .limit(50)
-        .all()
-    )
+    return page_cache.respond(request, ("dashboard", min_profit, min_roi, radius_km), render)
 
-    recent = (
-        db.query(models.Listing)
-        .order_by(models.Listing.created_at.desc())
-        .limit(50)
-        .all()
-    )
 
-    return templates.TemplateResponse(
-        "dashboard.html",
-        {
-            "request": request,
-            "deals": deals,
-            "recent": recent,
-            "min_profit": min_profit,
-            "min_roi": min_roi,
-            "radius_km": radius_km,
-        },
-    )
+@app.get("/listings/{section}", response_class=HTMLResponse)
+def listing_rows(
+    request: Request,
+    section: str,
+    cursor: str,
+    min_profit: float = 150.0,
+    min_roi: float = 0.35,
+    db=Depends(get_db),
+):
+    """
+    The next page of a dashboard table as <tr> rows, for "Load more".
+    The cursor for the page after it is in the X-Next-Cursor header
+    (empty when this was the last page).
+    """
+    if section not in SECTIONS:
+        raise HTTPException(status_code=404, detail="Unknown section")
+
+    def render():
+        try:
+            rows, next_cursor = _page(SECTIONS[section](db, min_profit, min_roi), section, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        html = templates.get_template("_listing_rows.html").render(
+            request=request, rows=rows, show_deal=section == "recent"
+        )
+        return html.encode("utf-8"), {"X-Next-Cursor": next_cursor or ""}
+
+    return page_cache.respond(request, (section, cursor, min_profit, min_roi), render)
@@ -10,6 +10,8 @@ from sqlalchemy import (
 from .db import Base
 
 
+# The schema is owned by app/migrations.py (shared with app/models.py);
+# a new column here needs a migration step there too.
 class Listing(Base):
     __tablename__ = "listings"
 
@@ -38,3 +40,65 @@ class Listing(Base):
     profit = Column(Numeric)           # profit NUMERIC
     roi = Column(Float)                # roi NUMERIC/REAL
     is_deal = Column(Integer)          # is_deal INTEGER (0/1)
+    search_keyword = Column(String(200))  # scrape query that first found it (analytics)
+    rank_score = Column(Float)         # profit weighted by ROI (app/ranking.py), indexed
+    comps_at = Column(String)          # UTC time profit / roi / rank_score were computed
+    status = Column(String(20))        # available / pending / sold / removed (services/recrawl.py)
+    checked_at = Column(String)        # UTC time of the last revisit
+    next_check_at = Column(String)     # next revisit due; NULL once sold / removed
+
+
+class ListingRuleMatch(Base):
+    __tablename__ = "listing_rule_matches"
+
+    # What each listing was last scored with: the pricing rule it matched
+    # (so a rule edit only re-scores the listings it can affect) and a
+    # fingerprint of its inputs plus the versions used (so bulk re-scores
+    # skip listings where nothing changed).
+    listing_id = Column(Integer, primary_key=True)
+    rule_name = Column(String(100), index=True)  # NULL = no rule matched
+    rules_version = Column(String(40))
+    comps_version = Column(String(40))
+    inputs_fingerprint = Column(String(40))
+
+
+class PriceHistory(Base):
+    __tablename__ = "price_history"
+
+    # Append-only: one row each time a re-scrape sees a listing's price
+    # change (services/prices.py). prev_price is the price it replaced, so
+    # a drop is price < prev_price.
+    id = Column(Integer, primary_key=True)
+    listing_id = Column(Integer, nullable=False)
+    observed_at = Column(String, nullable=False)  # UTC "%Y-%m-%d %H:%M:%S"
+    price = Column(Numeric(12, 2))
+    prev_price = Column(Numeric(12, 2))
+
+
+class CrawlRun(Base):
+    __tablename__ = "crawl_runs"
+
+    # Append-only: one row per keyword search the crawler ran
+    # (services/planner.py); what the planner simulation replays.
+    id = Column(Integer, primary_key=True)
+    keyword = Column(String(200), nullable=False)
+    started_at = Column(String, nullable=False)  # UTC "%Y-%m-%d %H:%M:%S"
+    seconds = Column(Float, nullable=False)      # browser time the search took
+    found = Column(Integer, nullable=False)
+    new_listings = Column(Integer, nullable=False)
+    deals = Column(Integer, nullable=False)
+
+
+class KeywordStat(Base):
+    __tablename__ = "keyword_stats"
+
+    # Per-keyword totals over crawl_runs, decayed with age (older runs count
+    # for less), updated with each run. runs is the plain count, weight the
+    # decayed one.
+    keyword = Column(String(200), primary_key=True)
+    runs = Column(Integer, nullable=False)
+    weight = Column(Float, nullable=False)
+    minutes = Column(Float, nullable=False)
+    new_listings = Column(Float, nullable=False)
+    deals = Column(Float, nullable=False)
+    last_run_at = Column(String)
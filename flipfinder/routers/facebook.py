@@ -1,8 +1,14 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from sqlalchemy.orm import Session
 
+from app.db_access import write
+from app.live_deals import listing_payload, publish_new
+from app.near_dupes import index_listing, one_per_group
+
 from .. import models
 from ..scrapers.facebook import search_marketplace
+from ..services.comps import refresh_comps_for_listing_ids
+from ..services.prices import record_price, utc_timestamp
 
 
 def run_facebook_search(
@@ -32,57 +38,76 @@ def run_facebook_search(
         location=effective_location,
     )
 
-    listing_ids: List[int] = []
-
-    for item in items:
-        url = item["url"]
-
-        listing = (
-            db.query(models.Listing)
-            .filter(models.Listing.source == "facebook")
-            .filter(models.Listing.url == url)
-            .one_or_none()
-        )
-
-        if listing is None:
-            # New listing
-            listing = models.Listing(
-                source="facebook",
-                url=url,
-                title=item.get("title") or "",
-                price=item.get("price"),
-                currency=item.get("currency") or "CAD",
-                location=item.get("location"),
-                description=item.get("description"),
+    def upsert(s: Session):
+        listing_ids: List[int] = []
+        dropped: List[int] = []
+        created: List[Dict[str, Any]] = []
+        observed_at = utc_timestamp()
+
+        for item in items:
+            url = item["url"]
+
+            listing = (
+                s.query(models.Listing)
+                .filter(models.Listing.source == "facebook")
+                .filter(models.Listing.url == url)
+                .one_or_none()
             )
-            db.add(listing)
-            db.flush()  # get listing.id
-            print(f"[DEBUG] Created new listing id={listing.id} url={url}")
-        else:
-            # Update existing listing fields
-            listing.title = item.get("title") or listing.title
-            listing.price = item.get("price") or listing.price
-            listing.currency = item.get("currency") or listing.currency
-            listing.location = item.get("location") or listing.location
-            listing.description = item.get("description") or listing.description
-            print(f"[DEBUG] Updated listing id={listing.id} url={url}")
-
-        listing_ids.append(listing.id)
-
-    db.commit()
+
+            if listing is None:
+                # New listing
+                listing = models.Listing(
+                    source="facebook",
+                    url=url,
+                    title=item.get("title") or "",
+                    price=item.get("price"),
+                    currency=item.get("currency") or "CAD",
+                    location=item.get("location"),
+                    description=item.get("description"),
+                    search_keyword=query,
+                )
+                s.add(listing)
+                s.flush()  # get listing.id
+                index_listing(s.connection().connection, listing.id, listing.title, listing.price, listing.location)
+                created.append(listing_payload(listing))
+                print(f"[DEBUG] Created new listing id={listing.id} url={url}")
+            else:
+                # Update existing listing fields
+                if record_price(s, listing, item.get("price"), observed_at):
+                    dropped.append(listing.id)
+                listing.title = item.get("title") or listing.title
+                listing.price = item.get("price") or listing.price
+                listing.currency = item.get("currency") or listing.currency
+                listing.location = item.get("location") or listing.location
+                listing.description = item.get("description") or listing.description
+                listing.search_keyword = listing.search_keyword or query
+                print(f"[DEBUG] Updated listing id={listing.id} url={url}")
+
+            listing_ids.append(listing.id)
+        return listing_ids, dropped, created
+
+    listing_ids, dropped, created = write(db, upsert)
+    publish_new(created)
     print(f"[DEBUG] Upserted {len(listing_ids)} Facebook listings")
+    if dropped:
+        refresh_comps_for_listing_ids(db, dropped)
 
     return listing_ids
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, List, Optional
 
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
+from app.db_access import write
+from app.live_deals import listing_payload, publish_new
+from app.near_dupes import index_listing, one_per_group
+
 from ..db import get_db
 from .. import models
-from ..services.comps import refresh_comps_for_listing_id
+from ..services.comps import refresh_comps_for_listing_ids
+from ..services.prices import record_price, utc_timestamp
 from ..scrapers.facebook import search_marketplace  # real Playwright scraper
 
 
@@ -104,83 +129,112 @@ def run_facebook_search(
     max_results: int,
     radius_km: int,
     location: Optional[str],
+    search: Callable[..., List[Dict[str, Any]]] = search_marketplace,
 ) -> List[int]:
     """
     Call the REAL Playwright scraper and upsert rows into `listings`.
 
-    - Uses search_marketplace(query, max_results, radius_km, location).
+    - Uses search_marketplace(query, max_results, radius_km, location), or
+      `search` with the same arguments (a crawl worker passes its
+      long-running browser's MarketplaceBrowser.search).
     - If an item has no URL, we generate a synthetic one so the row can still
       be saved and won't break the UNIQUE(source, url) constraint.
     """
 
-    items = search_marketplace(
+    items = search(
         query=query,
         max_results=max_results,
         radius_km=radius_km,
         location=location,
     )
-    listing_ids: List[int] = []
-
     now_ts = int(datetime.utcnow().timestamp())
 
-    for idx, item in enumerate(items):
-        raw_url = item.get("url")
-
-        # If no URL provided by scraper, synthesize a unique one
-        if raw_url:
-            url = raw_url
-        else:
-            safe_query = query.replace(" ", "_")
-            url = f"fb-debug://{safe_query}/{now_ts}/{idx}"
-
-        # Check if listing already exists for this (source, url)
-        existing = (
-            db.query(models.Listing)
-            .filter_by(source="facebook", url=url)
-            .first()
-        )
-
-        if existing:
-            listing = existing
-            # Update some useful fields
-            if item.get("title"):
-                listing.title = item["title"]
-            if item.get("price") is not None:
-                listing.price = item["price"]
-            if item.get("currency"):
-                listing.currency = item["currency"]
-            if item.get("location"):
-                listing.location = item["location"]
-            if item.get("posted_at_text"):
-                listing.posted_at_text = item["posted_at_text"]
-            if item.get("seller"):
-                listing.seller = item["seller"]
-            if item.get("raw_html"):
-                listing.raw_html = item["raw_html"]
-            if item.get("photos") is not None:
-                listing.photos = item["photos"]
-        else:
-            listing = models.Listing(
-                source="facebook",
-                url=url,
-                title=item.get("title") or "",
-                description=item.get("description"),
-                price=item.get("price"),
-                currency=item.get("currency") or "CA$",
-                location=item.get("location"),
-                posted_at_text=item.get("posted_at_text"),
-                seller=item.get("seller"),
-                photos=item.get("photos"),
-                raw_html=item.get("raw_html"),
-                created_at=datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+    # one writer job for the whole batch, so concurrent scrapes queue up
+    # instead of fighting over the lock
+    def upsert(s: Session):
+        listing_ids: List[int] = []
+        dropped: List[int] = []
+        created: List[Dict[str, Any]] = []
+        observed_at = utc_timestamp()
+
+        for idx, item in enumerate(items):
+            raw_url = item.get("url")
+
+            # If no URL provided by scraper, synthesize a unique one
+            if raw_url:
+                url = raw_url
+            else:
+                safe_query = query.replace(" ", "_")
+                url = f"fb-debug://{safe_query}/{now_ts}/{idx}"
+
+            # Check if listing already exists for this (source, url)
+            existing = (
+                s.query(models.Listing)
+                .filter_by(source="facebook", url=url)
+                .first()
             )
-            db.add(listing)
 
-        # Ensure it has an ID before we run comps later
-        db.flush()
-        listing_ids.append(listing.id)
-
-    db.commit()
+            if existing:
+                listing = existing
+                # Update some useful fields
+                if item.get("title"):
+                    listing.title = item["title"]
+                if item.get("price") is not None:
+                    # keep the old price in price_history before overwriting
+                    if record_price(s, listing, item["price"], observed_at):
+                        dropped.append(listing.id)
+                    listing.price = item["price"]
+                if item.get("currency"):
+                    listing.currency = item["currency"]
+                if item.get("location"):
+                    listing.location = item["location"]
+                if item.get("posted_at_text"):
+                    listing.posted_at_text = item["posted_at_text"]
+                if item.get("seller"):
+                    listing.seller = item["seller"]
+                if item.get("raw_html"):
+                    listing.raw_html = item["raw_html"]
+                if item.get("photos") is not None:
+                    listing.photos = item["photos"]
+                if not listing.search_keyword:
+                    listing.search_keyword = query
+                if item.get("status"):
+                    listing.status = item["status"]
+            else:
+                listing = models.Listing(
+                    source="facebook",
+                    url=url,
+                    title=item.get("title") or "",
+                    description=item.get("description"),
+                    price=item.get("price"),
+                    currency=item.get("currency") or "CA$",
+                    location=item.get("location"),
+                    posted_at_text=item.get("posted_at_text"),
+                    seller=item.get("seller"),
+                    photos=item.get("photos"),
+                    raw_html=item.get("raw_html"),
+                    created_at=datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+                    search_keyword=query,
+                    status=item.get("status"),
+                )
+                s.add(listing)
+
+            # Ensure it has an ID before we run comps later
+            s.flush()
+            if not existing:
+                # link relists / cross-posts into one duplicate group
+                index_listing(s.connection().connection, listing.id, listing.title, listing.price, listing.location)
+                created.append(listing_payload(listing))
+            listing_ids.append(listing.id)
+        return listing_ids, dropped, created
+
+    listing_ids, dropped, created = write(db, upsert)
+    publish_new(created)
+    if dropped:
+        # re-score just the listings that got cheaper; the scrape endpoint's
+        # skip_unchanged refresh then finds them current
+        print(f"[DEBUG] Price drops on {len(dropped)} listings: {dropped}")
+        refresh_comps_for_listing_ids(db, dropped)
     return listing_ids
 
 
@@ -194,7 +248,7 @@ def scrape_facebook(
 
       1. Uses Playwright scraper to fetch items.
       2. Upserts them into `listings`.
-      3. Runs comps on each listing.
+      3. Runs comps on all of them in one batch.
       4. Filters by min_profit / min_roi for the `profits` dict.
     """
 
@@ -208,8 +262,13 @@ def scrape_facebook(
 
     profits: Dict[int, Any] = {}
 
-    for lid in listing_ids:
-        comp = refresh_comps_for_listing_id(db, lid) or {}
+    # comps once per duplicate group: relists of something already scored
+    # (or of another result in this batch) are skipped
+    unique_ids = one_per_group(db.connection().connection, listing_ids)
+    comps_by_id = refresh_comps_for_listing_ids(db, unique_ids, skip_unchanged=True)
+
+    for lid in unique_ids:
+        comp = comps_by_id.get(lid) or {}
         if not comp.get("success"):
             continue
 
@@ -223,6 +282,7 @@ def scrape_facebook(
         "found": len(listing_ids),
         "inserted": len(listing_ids),
         "skipped_existing": 0,
+        "duplicates": len(listing_ids) - len(unique_ids),
         "created_ids": listing_ids,
         "emails_sent": 0,
         "profits": profits,
@@ -0,0 +1,42 @@
+from typing import Any, Dict
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from ..db import get_db
+from ..services.prices import drops_within, latest_drops, price_history
+
+
+router = APIRouter(prefix="/prices", tags=["prices"])
+
+
+@router.get("/drops")
+def get_latest_drops(
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+) -> Dict[str, Any]:
+    """The most recent price drops seen on re-scrape, newest first."""
+    return {"drops": latest_drops(db, limit)}
+
+
+@router.get("/drops/recent")
+def get_recent_drops(
+    hours: float = Query(24, gt=0, le=24 * 30),
+    min_drop_pct: float = Query(10.0, ge=0, le=100),
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_db),
+) -> Dict[str, Any]:
+    """Listings now at least min_drop_pct cheaper than before a drop in the last `hours`."""
+    return {
+        "hours": hours,
+        "min_drop_pct": min_drop_pct,
+        "listings": drops_within(db, hours=hours, min_drop_pct=min_drop_pct, limit=limit),
+    }
+
+
+@router.get("/{listing_id}")
+def get_price_history(listing_id: int, db: Session = Depends(get_db)) -> Dict[str, Any]:
+    return {"listing_id": listing_id, "history": price_history(db, listing_id)}
+
+
+__all__ = ["router"]
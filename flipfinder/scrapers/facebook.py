@@ -1,16 +1,19 @@
+import os
 import re
 import sys
 import subprocess
 from typing import List, Dict, Any, Optional
 from urllib.parse import quote_plus
 
-from playwright.sync_api import (
-    sync_playwright,
-    TimeoutError as PlaywrightTimeoutError,
-    Error as PlaywrightError,
-)
+from app.utils import parse_status
 
-FACEBOOK_MARKETPLACE_BASE = "https://www.facebook.com/marketplace"
+# FF_MARKETPLACE_BASE points the scraper at a local copy of the pages
+# (scripts/bench_crawl_workers.py serves one)
+FACEBOOK_MARKETPLACE_BASE = os.getenv("FF_MARKETPLACE_BASE", "https://www.facebook.com/marketplace")
+# how long a results page gets to render its cards before they're read
+PAGE_SETTLE_MS = int(os.getenv("FF_PAGE_SETTLE_MS", "5000"))
+# same for an item page (app/fbm_analyzer.py waits as long)
+ITEM_SETTLE_MS = int(os.getenv("FF_ITEM_SETTLE_MS", "1500"))
 
 PRICE_RE = re.compile(r"^(?:CA\$|\$)?\s*([0-9][0-9.,]*)")
 
@@ -22,10 +25,13 @@ def _parse_card_text(text: str) -> Dict[str, Any]:
 
     Example pattern:
         "CA$400\nMilwaukee m18 fuel 2 tool combo kit\nToronto, ON"
+
+    A "Pending · " / "Sold · " marker in front of the title goes to status.
     """
     lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
     price = None
     title = ""
+    status = None
     location = None
     currency = "CA$"
 
@@ -43,7 +49,7 @@ def _parse_card_text(text: str) -> Dict[str, Any]:
             currency = "$"
 
         if len(lines) >= 2:
-            title = lines[1]
+            status, title = parse_status(lines[1])
         if len(lines) >= 3:
             location = lines[2]
 
@@ -51,6 +57,7 @@ def _parse_card_text(text: str) -> Dict[str, Any]:
         "price": price,
         "currency": currency,
         "title": title,
+        "status": status,
         "location": location,
     }
 
@@ -99,16 +106,7 @@ def _install_playwright_browsers_if_needed() -> None:
     )
 
 
-def search_marketplace(
-    query: str,
-    max_results: int = 30,
-    radius_km: int = 50,
-    location: Optional[str] = None,
-) -> List[Dict[str, Any]]:
-    """
-    Scrape Facebook Marketplace search results.
-    """
-
+def _search_url(query: str, radius_km: int, location: Optional[str]) -> str:
     if location:
         search_text = f"{query} {location}"
     else:
@@ -116,11 +114,24 @@ def search_marketplace(
 
     url_query = quote_plus(search_text)
 
-    search_url = (
+    return (
         f"{FACEBOOK_MARKETPLACE_BASE}/search/?query={url_query}"
         f"&radiusKm={radius_km}"
     )
 
+
+def _scrape_search(
+    browser,
+    query: str,
+    max_results: int,
+    radius_km: int,
+    location: Optional[str],
+) -> List[Dict[str, Any]]:
+    """One search on an already-running browser, in a fresh page."""
+    from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+    search_url = _search_url(query, radius_km, location)
+
     print(f"[DEBUG] FB URL: {search_url}")
     print(f"[DEBUG] Raw location input: {location!r}")
 
@@ -129,23 +140,14 @@ def search_marketplace(
 
     results: List[Dict[str, Any]] = []
 
-    with sync_playwright() as p:
-        try:
-            browser = p.chromium.launch(headless=True)
-        except PlaywrightError as e:
-            if "Executable doesn't exist" in str(e):
-                _install_playwright_browsers_if_needed()
-            raise
-
-        page = browser.new_page()
-
+    page = browser.new_page()
+    try:
         try:
             page.goto(search_url, timeout=60_000)
-            page.wait_for_timeout(5_000)
+            page.wait_for_timeout(PAGE_SETTLE_MS)
 
             cards = page.locator('a[role="link"][href*="/marketplace/item/"]').all()
         except PlaywrightTimeoutError:
-            browser.close()
             return []
 
         print(f"[DEBUG] Found {len(cards)} raw FB cards")
@@ -174,6 +176,7 @@ def search_marketplace(
                 "price": parsed["price"],
                 "currency": parsed["currency"],
                 "location": parsed["location"],
+                "status": parsed["status"],
                 "description": None,
                 "posted_at_text": None,
                 "seller": None,
@@ -181,8 +184,169 @@ def search_marketplace(
                 "raw_html": None,
             }
             results.append(item)
-
-        browser.close()
+    finally:
+        page.close()
 
     print(f"[DEBUG] Kept {len(results)} items after location filter")
     return results
+
+
+# what Marketplace shows instead of an item that was deleted or sold and
+# taken down (lower-cased)
+UNAVAILABLE_MARKERS = (
+    "this listing isn't available",
+    "this listing is no longer available",
+    "this content isn't available",
+    "listing unavailable",
+)
+
+
+# where a logged-out headless browser gets sent instead of the item
+LOGIN_WALL_PATHS = ("/login", "/checkpoint")
+
+
+def _scrape_item(browser, url: str) -> Dict[str, Any]:
+    """
+    Revisit one item page, in a fresh page: {"status", "title", "price",
+    "currency"}. status is "removed" on a 404 / 410 or when Marketplace
+    says the item is gone (UNAVAILABLE_MARKERS), else the title's marker
+    ("pending", "sold") or "available". Anything else that isn't the item
+    page -- another error status, a login or checkpoint redirect, a page
+    without a title -- raises RuntimeError: a failed revisit, not news
+    about the listing.
+    """
+    from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+    page = browser.new_page()
+    try:
+        try:
+            response = page.goto(url, timeout=60_000, wait_until="domcontentloaded")
+            page.wait_for_timeout(ITEM_SETTLE_MS)
+        except PlaywrightTimeoutError:
+            raise RuntimeError(f"timed out loading {url}")
+        if response is not None and response.status in (404, 410):
+            return {"status": "removed", "title": None, "price": None, "currency": None}
+        if response is None or not 200 <= response.status < 300:
+            raise RuntimeError(f"HTTP {response.status if response else 'no response'} for {url}")
+        if any(path in page.url for path in LOGIN_WALL_PATHS):
+            raise RuntimeError(f"sent to {page.url} instead of {url}")
+        body = page.inner_text("body").lower()
+        if any(marker in body for marker in UNAVAILABLE_MARKERS):
+            return {"status": "removed", "title": None, "price": None, "currency": None}
+        if "/marketplace/item/" not in page.url:
+            raise RuntimeError(f"sent to {page.url} instead of {url}")
+
+        heading = page.locator('div[role="main"] h1, h1').first
+        raw_title = heading.inner_text().strip() if heading.count() else ""
+        status, title = parse_status(raw_title)
+        if not title:
+            raise RuntimeError(f"no listing title on {url}")
+        price_el = page.locator('div[role="main"] span:has-text("$")').first
+        parsed = _parse_card_text(price_el.inner_text() if price_el.count() else "")
+        return {
+            "status": status or "available",
+            "title": title,
+            "price": parsed["price"],
+            "currency": parsed["currency"] if parsed["price"] is not None else None,
+        }
+    finally:
+        page.close()
+
+
+def _launch(p):
+    from playwright.sync_api import Error as PlaywrightError
+
+    try:
+        return p.chromium.launch(headless=True)
+    except PlaywrightError as e:
+        if "Executable doesn't exist" in str(e):
+            _install_playwright_browsers_if_needed()
+        raise
+
+
+def search_marketplace(
+    query: str,
+    max_results: int = 30,
+    radius_km: int = 50,
+    location: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Scrape Facebook Marketplace search results.
+    """
+    # Playwright is only needed once a scrape actually runs
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as p:
+        browser = _launch(p)
+        try:
+            return _scrape_search(browser, query, max_results, radius_km, location)
+        finally:
+            browser.close()
+
+
+class MarketplaceBrowser:
+    """
+    A Chromium kept running across searches, for a process that does many
+    of them (the crawl workers in flipfinder/services/crawler.py, the
+    recrawler's pool threads): launching one costs about as much as a
+    search. Each search or item revisit gets a fresh page. The browser is
+    relaunched after RECYCLE_AFTER of them, so a leak in a long-lived one
+    can't pile up, and after any that raised.
+
+    Playwright's sync API is tied to the thread that started it, so use one
+    per process (or thread).
+    """
+
+    RECYCLE_AFTER = 50
+
+    def __init__(self):
+        self._playwright = None
+        self._browser = None
+        self._searches = 0
+
+    def search(
+        self,
+        query: str,
+        max_results: int = 30,
+        radius_km: int = 50,
+        location: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """search_marketplace() on this browser."""
+        return self._run(_scrape_search, query, max_results, radius_km, location)
+
+    def item(self, url: str) -> Dict[str, Any]:
+        """Revisit one item page: its status, title and price."""
+        return self._run(_scrape_item, url)
+
+    def _run(self, scrape, *args):
+        if self._browser is None or self._searches >= self.RECYCLE_AFTER:
+            self._relaunch()
+        self._searches += 1
+        try:
+            return scrape(self._browser, *args)
+        except Exception:
+            self._close_browser()
+            raise
+
+    def _relaunch(self) -> None:
+        from playwright.sync_api import sync_playwright
+
+        self._close_browser()
+        if self._playwright is None:
+            self._playwright = sync_playwright().start()
+        self._browser = _launch(self._playwright)
+        self._searches = 0
+
+    def _close_browser(self) -> None:
+        browser, self._browser = self._browser, None
+        if browser is not None:
+            try:
+                browser.close()
+            except Exception as e:
+                print("[WARN] closing browser:", e)
+
+    def close(self) -> None:
+        self._close_browser()
+        if self._playwright is not None:
+            self._playwright.stop()
+            self._playwright = None
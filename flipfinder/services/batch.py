@@ -0,0 +1,219 @@
+import math
+from typing import Dict, Any, Iterable, Optional, Union
+
+import numpy as np
+
+from app.estimator import (
+    DEFAULT_FEE_RATE,
+    BUY_MIN_PROFIT,
+    BUY_MIN_ROI,
+    MAYBE_MIN_PROFIT,
+    MAYBE_MIN_ROI,
+    NO_DATA_LABEL,
+    BUY_LABEL,
+    MAYBE_LABEL,
+    PASS_LABEL,
+)
+from .comps import MIN_PROFIT, MIN_ROI
+
+
+# ---------------------------------------------------------------------------
+# VECTORIZED DEAL EVALUATION
+#
+# Array versions of comps.compute_profit_metrics, app.estimator.estimate_profit,
+# app.estimator.decision_label and app.score.deal_score. Every function here
+# must return exactly what the scalar version would for each element, so the
+# scalar ones stay the reference implementation.
+#
+# Missing values (None in the scalar API) are NaN in the arrays, both on the
+# way in and on the way out.
+# ---------------------------------------------------------------------------
+
+ArrayLike = Union[np.ndarray, Iterable[Optional[float]], float]
+
+REASON_MISSING = "missing_price_or_resale"
+REASON_BELOW_PROFIT = "below_min_profit"
+REASON_BELOW_ROI = "below_min_roi"
+REASON_DEAL = "meets_all_thresholds"
+
+# Outcomes are computed as small integer codes and mapped to strings with one
+# fancy-index, which is much cheaper than selecting between string arrays.
+_REASONS = np.array(
+    [REASON_MISSING, REASON_BELOW_PROFIT, REASON_BELOW_ROI, REASON_DEAL], dtype=object
+)
+_DECISIONS = np.array([NO_DATA_LABEL, BUY_LABEL, MAYBE_LABEL, PASS_LABEL], dtype=object)
+
+
+def as_float_array(values: ArrayLike) -> np.ndarray:
+    """
+    Convert a list of prices (floats, Decimals from Numeric columns or None)
+    into a float64 array with NaN for None.
+    """
+    if isinstance(values, np.ndarray) and values.dtype.kind == "f":
+        return values.astype(np.float64, copy=False)
+    if np.isscalar(values) or values is None:
+        return np.array([np.nan if values is None else float(values)])
+    return np.array(
+        [np.nan if v is None else float(v) for v in values], dtype=np.float64
+    )
+
+
+def round_like_python(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """
+    Element-wise round(x, ndigits) with Python's exact semantics.
+
+    np.round scales by 10**ndigits first, which can tip values that sit
+    right on a rounding boundary the other way. We take the fast path for
+    everything and redo only those near-boundary elements with round().
+    """
+    out = np.round(values, ndigits)
+    scaled = values * (10.0 ** ndigits)
+    frac = np.abs(scaled - np.floor(scaled) - 0.5)
+    suspect = np.isfinite(values) & (
+        (frac < 1e-6 * np.maximum(1.0, np.abs(scaled)))
+        | (np.abs(scaled) >= 2.0 ** 52)
+    )
+    for i in np.flatnonzero(suspect):
+        out[i] = round(float(values[i]), ndigits)
+    return out
+
+
+def compute_profit_metrics_batch(
+    asking_prices: ArrayLike,
+    estimated_resales: ArrayLike,
+) -> Dict[str, np.ndarray]:
+    """
+    Vectorized comps.compute_profit_metrics.
+
+    Returns arrays under the same keys: profit, roi, is_deal, reason.
+    """
+    price = np.nan_to_num(as_float_array(asking_prices), nan=0.0)
+    resale = np.nan_to_num(as_float_array(estimated_resales), nan=0.0)
+    price, resale = np.broadcast_arrays(price, resale)
+
+    missing = (price <= 0) | (resale <= 0)
+    profit = resale - price
+    roi = np.divide(profit, price, out=np.zeros_like(profit), where=price > 0)
+
+    code = np.select([missing, profit < MIN_PROFIT, roi < MIN_ROI], [0, 1, 2], default=3)
+
+    return {
+        "profit": np.where(missing, 0.0, round_like_python(profit, 2)),
+        "roi": np.where(missing, 0.0, round_like_python(roi, 3)),
+        "is_deal": code == 3,
+        "reason": _REASONS[code],
+    }
+
+
+def estimate_profit_batch(
+    fb_prices: ArrayLike,
+    ebay_avgs: ArrayLike,
+    fee_rates: ArrayLike = DEFAULT_FEE_RATE,
+) -> Dict[str, np.ndarray]:
+    """
+    Vectorized app.estimator.estimate_profit: profit and roi_percent arrays.
+    """
+    fb = as_float_array(fb_prices)
+    avg = as_float_array(ebay_avgs)
+    fee = as_float_array(fee_rates)
+    fb, avg, fee = np.broadcast_arrays(fb, avg, fee)
+
+    net = avg * (1.0 - fee)
+    profit = net - fb
+    roi = np.full_like(profit, np.nan)
+    np.divide(profit, fb, out=roi, where=fb > 0)
+    roi = roi * 100.0
+
+    return {
+        "profit": round_like_python(profit, 2),
+        "roi_percent": round_like_python(roi, 1),
+    }
+
+
+def decision_label_batch(profits: ArrayLike, rois: ArrayLike) -> np.ndarray:
+    """
+    Vectorized app.estimator.decision_label (roi in percent).
+    """
+    profit = as_float_array(profits)
+    roi = as_float_array(rois)
+    profit, roi = np.broadcast_arrays(profit, roi)
+
+    code = np.select(
+        [
+            np.isnan(profit) | np.isnan(roi),
+            (profit >= BUY_MIN_PROFIT) & (roi >= BUY_MIN_ROI),
+            (profit >= MAYBE_MIN_PROFIT) & (roi >= MAYBE_MIN_ROI),
+        ],
+        [0, 1, 2],
+        default=3,
+    )
+    return _DECISIONS[code]
+
+
+def deal_score_batch(
+    fb_prices: ArrayLike,
+    avg_solds: ArrayLike,
+    counts: ArrayLike,
+) -> np.ndarray:
+    """
+    Vectorized app.score.deal_score.
+    """
+    fb = as_float_array(fb_prices)
+    avg = as_float_array(avg_solds)
+    count = as_float_array(counts)
+    fb, avg, count = np.broadcast_arrays(fb, avg, count)
+
+    # Comp counts take few distinct values, so use math.log1p on each of
+    # them rather than np.log1p, whose SIMD kernels may differ in the last ulp.
+    weight = np.full_like(count, np.nan)
+    known = ~np.isnan(count)
+    uniques, inverse = np.unique(np.maximum(0, count[known]), return_inverse=True)
+    weight[known] = np.array([math.log1p(u) for u in uniques])[inverse]
+
+    return round_like_python((avg - fb) * weight, 2)
+
+
+def evaluate_batch(
+    asking_prices: ArrayLike,
+    resale_estimates: ArrayLike,
+    comp_counts: Optional[ArrayLike] = None,
+    fee_rates: ArrayLike = DEFAULT_FEE_RATE,
+) -> Dict[str, Any]:
+    """
+    Score many listings in one call.
+
+    - profit / roi / is_deal / reason: comps.compute_profit_metrics on the
+      gross resale estimate (the comps service thresholds).
+    - net_profit / roi_percent / decision: app.estimator on the resale after
+      fees.
+    - score: app.score.deal_score (NaN everywhere if comp_counts is None).
+    """
+    price = as_float_array(asking_prices)
+    resale = as_float_array(resale_estimates)
+
+    metrics = compute_profit_metrics_batch(price, resale)
+    est = estimate_profit_batch(price, resale, fee_rates)
+    decision = decision_label_batch(est["profit"], est["roi_percent"])
+    if comp_counts is None:
+        score = np.full(np.broadcast(price, resale).shape, np.nan)
+    else:
+        score = deal_score_batch(price, resale, comp_counts)
+
+    return {
+        **metrics,
+        "net_profit": est["profit"],
+        "roi_percent": est["roi_percent"],
+        "decision": decision,
+        "score": score,
+    }
+
+
+__all__ = [
+    "as_float_array",
+    "round_like_python",
+    "compute_profit_metrics_batch",
+    "estimate_profit_batch",
+    "decision_label_batch",
+    "deal_score_batch",
+    "evaluate_batch",
+]
@@ -1,10 +1,16 @@
-import re
 import asyncio
-from dataclasses import dataclass
-from typing import Dict, Any, Optional, List, Pattern
+import hashlib
+from typing import Dict, Any, Optional, List, Pattern, Tuple
 
+from sqlalchemy import update
 from sqlalchemy.orm import Session
+
+from app.db_access import write
+from app.live_deals import listing_payload, publish_deals
+from app.ranking import comps_timestamp, rank_score
+
 from .. import models
+from .rules import PricingRule, _compile, get_ruleset, record_rule_matches
 
 
 # ---------------------------------------------------------------------------
@@ -15,160 +21,21 @@ MAX_BUY_PRICE: float = 1_000_000.0  # effectively no cap
 MIN_PROFIT: float = 150.0
 MIN_ROI: float = 0.35
 
+# Bump _COMPS_LOGIC_VERSION whenever the scoring maths below changes; the
+# thresholds are folded in automatically. Listings scored under a different
+# COMPS_VERSION are re-scored by rescore_stale().
+_COMPS_LOGIC_VERSION = 1
+COMPS_VERSION: str = hashlib.sha1(
+    f"{_COMPS_LOGIC_VERSION}|{MAX_BUY_PRICE}|{MIN_PROFIT}|{MIN_ROI}".encode()
+).hexdigest()[:12]
+
 
 # ---------------------------------------------------------------------------
 # KEYWORD RULE ENGINE
+#
+# The rules themselves are loaded from data/pricing_rules.yaml by rules.py.
 # ---------------------------------------------------------------------------
 
-@dataclass
-class PricingRule:
-    name: str
-    pattern: Pattern
-    multiplier: float
-    min_resale_floor: float
-    notes: str = ""
-
-
-def _compile(pattern: str) -> Pattern:
-    return re.compile(pattern, flags=re.IGNORECASE)
-
-
-# Furniture / casegoods rules (what you already had)
-PRICING_RULES: List[PricingRule] = [
-    PricingRule(
-        name="designer_midcentury_casegoods",
-        pattern=_compile(
-            r"(eames|herman miller|knoll|ligne roset|roche bobois|"
-            r"paul mccobb|milo baughman|g[\s-]?plan|mcintosh|"
-            r"broyhill bras|broyhill emphasis|drexel|henredon)"
-        ),
-        multiplier=3.0,
-        min_resale_floor=900.0,
-        notes="Top-tier designer casegoods.",
-    ),
-    PricingRule(
-        name="teak_rosewood_walnut_casegoods",
-        pattern=_compile(
-            r"(teak|rosewood|walnut|danish modern|danish teak|scandinavian)"
-        ),
-        multiplier=2.6,
-        min_resale_floor=650.0,
-        notes="Solid wood mid-century furniture.",
-    ),
-    PricingRule(
-        name="burl_travertine_marble_lucite_brass",
-        pattern=_compile(
-            r"(burl wood|burlwood|travertine|marble top|onyx top|lucite|acrylic|"
-            r"brass base|bronze base)"
-        ),
-        multiplier=2.8,
-        min_resale_floor=700.0,
-        notes="High-end materials with strong resale.",
-    ),
-    PricingRule(
-        name="modern_premium_brands",
-        pattern=_compile(
-            r"(restoration hardware|^rh\b|west elm|article|cb2|eq3|"
-            r"bo concept|boconcept|crate & barrel|crate and barrel)"
-        ),
-        multiplier=2.2,
-        min_resale_floor=550.0,
-        notes="Modern premium retail brands.",
-    ),
-    PricingRule(
-        name="generic_luxury_casegoods",
-        pattern=_compile(
-            r"(mid century|midcentury|mcm|vintage walnut|vintage oak|"
-            r"solid oak|solid wood|campaign dresser|parsons table|"
-            r"brutalist|postmodern|italian modern)"
-        ),
-        multiplier=2.0,
-        min_resale_floor=500.0,
-        notes="General high-value casegoods.",
-    ),
-    PricingRule(
-        name="cane_rattan_details",
-        pattern=_compile(
-            r"(cane front|cane doors|cane panels|caning|rattan front|rattan doors)"
-        ),
-        multiplier=1.9,
-        min_resale_floor=450.0,
-        notes="Cane and rattan furniture.",
-    ),
-
-    # -----------------------------------------------------------------------
-    # NEW: high-value electronics / tools / apparel rules
-    # -----------------------------------------------------------------------
-
-    PricingRule(
-        name="apple_macbook_laptops",
-        pattern=_compile(
-            r"(macbook\s*(air|pro)\b|macbook m1|macbook m2|macbook m3|macbook m4)"
-        ),
-        multiplier=1.7,
-        min_resale_floor=900.0,
-        notes="Modern MacBook laptops with strong resale.",
-    ),
-    PricingRule(
-        name="high_end_apple_devices",
-        pattern=_compile(
-            r"(iphone 1[3-9]\b|iphone\s?15\s?pro|max\b|iphone\s?14\s?pro|max\b|"
-            r"apple watch ultra)"
-        ),
-        multiplier=1.6,
-        min_resale_floor=700.0,
-        notes="Recent iPhones / Apple Watch Ultra.",
-    ),
-    PricingRule(
-        name="premium_gaming_consoles",
-        pattern=_compile(
-            r"(playstation 5|ps5\b|xbox series x)"
-        ),
-        multiplier=1.5,
-        min_resale_floor=500.0,
-        notes="Current-gen gaming consoles.",
-    ),
-    PricingRule(
-        name="concept2_and_large_fitness",
-        pattern=_compile(
-            r"(concept2 rower|concept 2 rower|concept2\b|concept 2\b|"
-            r"rogue echo bike|rogue squat rack|peloton bike)"
-        ),
-        multiplier=1.5,
-        min_resale_floor=800.0,
-        notes="Big-ticket fitness gear.",
-    ),
-    PricingRule(
-        name="milwaukee_dewalt_festool_tools",
-        pattern=_compile(
-            r"(milwaukee.*(m18|fuel)|dewalt.*flexvolt|festool)"
-        ),
-        multiplier=1.6,
-        min_resale_floor=500.0,
-        notes="Pro-grade cordless tools with strong resale.",
-    ),
-    PricingRule(
-        name="premium_outerwear",
-        pattern=_compile(
-            r"(canada goose|arcteryx|arc'teryx|patagonia down sweater|moncler)"
-        ),
-        multiplier=1.6,
-        min_resale_floor=600.0,
-        notes="High-end technical or luxury outerwear.",
-    ),
-    PricingRule(
-        name="premium_strollers_car_seats",
-        pattern=_compile(
-            r"(uppababy vista|uppa baby vista|nuna exec|nuna rava|"
-            r"thule chariot)"
-        ),
-        multiplier=1.5,
-        min_resale_floor=500.0,
-        notes="High-end baby gear (strollers, car seats, chariots).",
-    ),
-]
-
-
 # We keep this around if you later want to gate furniture-specific rules,
 # but we no longer block non-furniture items from matching rules.
 CASEGOOD_FOCUS_PATTERN: Pattern = _compile(
@@ -184,6 +51,20 @@ def _normalize_text(title: str, description: Optional[str]) -> str:
     return f"{title} {desc}".lower()
 
 
+def scoring_fingerprint(
+    title: Optional[str],
+    description: Optional[str],
+    price: Optional[float],
+) -> str:
+    """
+    Hash of everything a rule-based score depends on from the listing
+    itself. Price is normalised to cents so Decimal/float round-trips agree.
+    """
+    price_text = "" if price is None else f"{float(price):.2f}"
+    raw = "\x1f".join([title or "", description or "", price_text])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
 def _match_best_rule(text: str) -> Optional[PricingRule]:
     """
     Return the first pricing rule whose regex matches the text.
@@ -192,10 +73,7 @@ def _match_best_rule(text: str) -> Optional[PricingRule]:
     which meant only mid-century casegoods ever got a rule. Now we
     allow ANY rule to fire (electronics, tools, jackets, etc.).
     """
-    for rule in PRICING_RULES:
-        if rule.pattern.search(text):
-            return rule
-    return None
+    return get_ruleset().matcher.match(text)
 
 
 def estimate_rule_based_resale(
@@ -206,12 +84,14 @@ def estimate_rule_based_resale(
     price = float(asking_price or 0.0)
     text = _normalize_text(listing_title, listing_description)
 
-    best_rule = _match_best_rule(text)
+    ruleset = get_ruleset()
+    best_rule = ruleset.matcher.match(text)
     if not best_rule or price <= 0:
         return {
             "rule_based_resale": 0.0,
             "applied_rule": None,
             "notes": "no_match",
+            "rules_version": ruleset.version,
         }
 
     rough = price * best_rule.multiplier
@@ -221,6 +101,7 @@ def estimate_rule_based_resale(
         "rule_based_resale": float(round(rb, 2)),
         "applied_rule": best_rule.name,
         "notes": best_rule.notes,
+        "rules_version": ruleset.version,
     }
 
 
@@ -297,25 +178,42 @@ async def evaluate_listing_comps(
         "deal_reason": metrics["reason"],
         "rule_applied": rule_result.get("applied_rule"),
         "rule_notes": rule_result.get("notes"),
+        "rules_version": rule_result.get("rules_version"),
         "max_buy_price": MAX_BUY_PRICE,
         "min_profit": MIN_PROFIT,
         "min_roi": MIN_ROI,
     }
 
-    if hasattr(listing, "estimated_resale"):
-        listing.estimated_resale = result["estimated_resale"]
-    if hasattr(listing, "profit"):
-        listing.profit = metrics["profit"]
-    if hasattr(listing, "roi"):
-        listing.roi = metrics["roi"]
-    if hasattr(listing, "is_deal"):
-        listing.is_deal = metrics["is_deal"]
+    listing_id = getattr(listing, "id", None)
+    if listing_id is None:
+        return result
+
+    values = {
+        "estimated_resale": result["estimated_resale"],
+        "profit": metrics["profit"],
+        "roi": metrics["roi"],
+        "is_deal": metrics["is_deal"],
+        "rank_score": rank_score(metrics["profit"], metrics["roi"]),
+        "comps_at": comps_timestamp(),
+    }
+    state = _score_state_row(listing, result)
+    became_deal = bool(values["is_deal"]) and not getattr(listing, "is_deal", None)
+    payload = {**listing_payload(listing), **values} if became_deal else None
+
+    def save(s: Session) -> None:
+        s.execute(
+            update(models.Listing).where(models.Listing.id == listing_id).values(**values)
+        )
+        record_rule_matches(s, [state])
 
+    # write() expires `db`, so `listing` reloads with the new values
     try:
-        db.add(listing)
-        db.commit()
-    except Exception:
-        db.rollback()
+        write(db, save)
+    except Exception as e:
+        print(f"[WARN] could not save comps for listing {listing_id}: {e}")
+    else:
+        if payload:
+            publish_deals([payload])
 
     return result
 
@@ -331,6 +229,161 @@ def evaluate_listing_comps_sync(
     )
 
 
+def _evaluate_many(
+    listings: List["models.Listing"],
+    ebay_resales: Optional[List[Optional[float]]] = None,
+    sources: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    evaluate_listing_comps for many listings without touching the DB.
+
+    Rule matching is per listing; the profit / ROI / deal maths runs as one
+    vectorized call. Each dict has the same keys evaluate_listing_comps
+    returns. `sources` names where each market resale came from ("ebay"
+    when not given; "model" for the local price model).
+    """
+    from .batch import compute_profit_metrics_batch  # avoid circular import
+
+    prices = [getattr(listing, "price", None) for listing in listings]
+    rule_results = [
+        estimate_rule_based_resale(
+            getattr(listing, "title", "") or "",
+            getattr(listing, "description", "") or "",
+            price,
+        )
+        for listing, price in zip(listings, prices)
+    ]
+
+    finals: List[float] = []
+    used: List[str] = []
+    for i, rule_result in enumerate(rule_results):
+        rule_resale = rule_result["rule_based_resale"]
+        ebay_resale = ebay_resales[i] if ebay_resales else None
+        if ebay_resale and ebay_resale > rule_resale:
+            finals.append(float(ebay_resale))
+            used.append(sources[i] if sources else "ebay")
+        else:
+            finals.append(float(rule_resale))
+            used.append("rules")
+
+    metrics = compute_profit_metrics_batch(prices, finals)
+
+    results: List[Dict[str, Any]] = []
+    for i, rule_result in enumerate(rule_results):
+        results.append({
+            "asking_price": float(prices[i] or 0.0),
+            "estimated_resale": round(finals[i], 2),
+            "resale_source": used[i],
+            "profit": float(metrics["profit"][i]),
+            "roi": float(metrics["roi"][i]),
+            "is_deal": bool(metrics["is_deal"][i]),
+            "deal_reason": metrics["reason"][i],
+            "rule_applied": rule_result.get("applied_rule"),
+            "rule_notes": rule_result.get("notes"),
+            "rules_version": rule_result.get("rules_version"),
+            "max_buy_price": MAX_BUY_PRICE,
+            "min_profit": MIN_PROFIT,
+            "min_roi": MIN_ROI,
+        })
+    return results
+
+
+def _score_state_row(listing: "models.Listing", comps: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "listing_id": listing.id,
+        "rule_name": comps["rule_applied"],
+        "rules_version": comps["rules_version"],
+        "comps_version": COMPS_VERSION,
+        "inputs_fingerprint": scoring_fingerprint(
+            getattr(listing, "title", None),
+            getattr(listing, "description", None),
+            getattr(listing, "price", None),
+        ),
+    }
+
+
+def _save_evaluated(
+    db: Session,
+    listings: List["models.Listing"],
+    evaluated: List[Dict[str, Any]],
+    sold_comps: Optional[List[Dict[str, Any]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Write scores back with one executemany UPDATE plus their
+    listing_rule_matches rows (and any eBay medians fetched for them, as
+    sold_comps), as a single writer job, then announce the listings that
+    just became deals on the live feed. Returns the UPDATE rows (id + the
+    score columns, rank_score and comps_at included).
+    """
+    now = comps_timestamp()
+    rows = [
+        {
+            "id": listing.id,
+            "estimated_resale": comps["estimated_resale"],
+            "profit": comps["profit"],
+            "roi": comps["roi"],
+            "is_deal": int(comps["is_deal"]),
+            "rank_score": rank_score(comps["profit"], comps["roi"]),
+            "comps_at": now,
+        }
+        for listing, comps in zip(listings, evaluated)
+    ]
+    if not rows:
+        return rows
+    # built here: the job runs on the writer thread, which mustn't touch
+    # `db` or lazy-load from its objects
+    states = [_score_state_row(listing, comps) for listing, comps in zip(listings, evaluated)]
+    new_deals = [
+        {**listing_payload(listing), **row}
+        for listing, row in zip(listings, rows)
+        if row["is_deal"] and not listing.is_deal
+    ]
+
+    def save(s: Session) -> None:
+        s.execute(update(models.Listing), rows)
+        record_rule_matches(s, states)
+        if sold_comps:
+            from app.price_model import record_sold_comps
+
+            record_sold_comps(s.connection().connection, sold_comps)
+
+    write(db, save)
+    publish_deals(new_deals)
+    return rows
+
+
+def _is_current(
+    title: Optional[str],
+    description: Optional[str],
+    price: Optional[float],
+    state: Optional[Any],
+    rules_version: str,
+) -> bool:
+    # `state` is a ListingRuleMatch or any row with the same three columns.
+    return (
+        state is not None
+        and state.rules_version == rules_version
+        and state.comps_version == COMPS_VERSION
+        and state.inputs_fingerprint == scoring_fingerprint(title, description, price)
+    )
+
+
+def rescore_listings(
+    db: Session,
+    listings: List["models.Listing"],
+) -> int:
+    """
+    Rule-based re-score of many listings in one pass, committed once.
+    Used by bulk re-scores where no eBay lookups are wanted.
+    """
+    if not listings:
+        return 0
+
+    evaluated = _evaluate_many(listings)
+    _save_evaluated(db, listings, evaluated)
+    return len(listings)
+
+
 def refresh_comps_for_listing_id(
     db: Session,
     listing_id: int,
@@ -364,13 +417,204 @@ def refresh_comps_for_listing_id(
     }
 
 
+async def _lookup_ebay_resales(
+    listings: List["models.Listing"],
+    concurrency: int,
+) -> List[Optional[float]]:
+    from .ebay import clean_title, sold_median
+
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(listing: "models.Listing") -> Optional[float]:
+        keyword = clean_title(getattr(listing, "title", "") or "")
+        if not keyword:
+            return None
+        async with sem:
+            return await sold_median(keyword)
+
+    return await asyncio.gather(*(one(listing) for listing in listings))
+
+
+def _market_resales(
+    db: Session,
+    listings: List["models.Listing"],
+    concurrency: int,
+) -> Tuple[List[Optional[float]], List[str], List[Dict[str, Any]]]:
+    """
+    Market resale per listing: the local price model's estimate where it
+    is confident (app/price_model.py), an eBay sold median for the rest.
+    Returns (resales, sources, sold comps to record); once recorded, the
+    medians are what the next batch's model learns from.
+    """
+    from app.price_model import catch_up  # numpy, only when pricing
+
+    model = catch_up(db.connection().connection)
+    resales = [model.confident(getattr(listing, "title", None)) for listing in listings]
+    sources = ["model" if r is not None else "ebay" for r in resales]
+    ask = [listing for listing, r in zip(listings, resales) if r is None]
+    if not ask:
+        return resales, sources, []
+
+    fetched = iter(asyncio.run(_lookup_ebay_resales(ask, concurrency)))
+    resales = [r if r is not None else next(fetched) for r in resales]
+    comps = [
+        {"title": listing.title, "price": r, "source": "ebay_median", "listing_id": listing.id}
+        for listing, r, source in zip(listings, resales, sources)
+        if source == "ebay" and r
+    ]
+    return resales, sources, comps
+
+
+def refresh_comps_for_listing_ids(
+    db: Session,
+    listing_ids: List[int],
+    lookup_ebay: bool = False,
+    concurrency: int = 8,
+    skip_unchanged: bool = False,
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Batch version of refresh_comps_for_listing_id.
+
+    Loads every row in one query, optionally prices them at market (the
+    local price model where it's confident, eBay sold medians fetched
+    concurrently on a single event loop for the rest), and writes
+    estimated_resale / profit / roi / is_deal back with one executemany
+    UPDATE in one transaction.
+
+    With skip_unchanged=True (rules-only refreshes), listings whose inputs
+    fingerprint, rules version and comps version all match their last score
+    are not re-scored; their entry carries the stored values and
+    "skipped": True.
+
+    Returns {listing_id: <same dict refresh_comps_for_listing_id returns>}.
+    """
+    ids = list(dict.fromkeys(listing_ids))
+    if not ids:
+        return {}
+
+    listings = db.query(models.Listing).filter(models.Listing.id.in_(ids)).all()
+
+    out: Dict[int, Dict[str, Any]] = {}
+    if skip_unchanged and not lookup_ebay and listings:
+        states = {
+            state.listing_id: state
+            for state in db.query(models.ListingRuleMatch).filter(
+                models.ListingRuleMatch.listing_id.in_([listing.id for listing in listings])
+            )
+        }
+        rules_version = get_ruleset().version
+        dirty = []
+        for listing in listings:
+            if _is_current(
+                listing.title, listing.description, listing.price,
+                states.get(listing.id), rules_version,
+            ):
+                out[listing.id] = {
+                    "success": True,
+                    "skipped": True,
+                    "listing_id": listing.id,
+                    "estimated_profit": float(listing.profit or 0.0),
+                    "roi": float(listing.roi or 0.0),
+                    "estimated_resale": float(listing.estimated_resale or 0.0),
+                }
+            else:
+                dirty.append(listing)
+        listings = dirty
+
+    market_resales = market_sources = None
+    sold_comps: List[Dict[str, Any]] = []
+    if lookup_ebay and listings:
+        market_resales, market_sources, sold_comps = _market_resales(db, listings, concurrency)
+
+    evaluated = _evaluate_many(listings, market_resales, market_sources)
+
+    rows = _save_evaluated(db, listings, evaluated, sold_comps)
+
+    for row, comps in zip(rows, evaluated):
+        out[row["id"]] = {
+            "success": True,
+            "listing_id": row["id"],
+            "data": comps,
+            "estimated_profit": comps.get("profit", 0.0),
+            "roi": comps.get("roi", 0.0),
+            "estimated_resale": comps.get("estimated_resale", 0.0),
+        }
+
+    for listing_id in ids:
+        if listing_id not in out:
+            out[listing_id] = {
+                "success": False,
+                "reason": "listing_not_found",
+                "listing_id": listing_id,
+                "estimated_profit": 0.0,
+                "roi": 0.0,
+            }
+
+    return out
+
+
+def rescore_stale(
+    db: Session,
+    chunk_size: int = 1000,
+    force: bool = False,
+) -> Dict[str, int]:
+    """
+    Rules-only re-score of the whole table, skipping listings whose title,
+    description and price, rules version and comps version are unchanged
+    since their last score (unless force=True).
+
+    Walks the table by id in chunks and only reads the fingerprint inputs,
+    then loads and re-scores just the dirty rows.
+    Returns {"checked", "rescored", "skipped"}.
+    """
+    Listing, State = models.Listing, models.ListingRuleMatch
+    rules_version = get_ruleset().version
+    checked = rescored = 0
+    last_id = 0
+
+    while True:
+        rows = (
+            db.query(
+                Listing.id, Listing.title, Listing.description, Listing.price,
+                State.rules_version, State.comps_version, State.inputs_fingerprint,
+            )
+            .outerjoin(State, State.listing_id == Listing.id)
+            .filter(Listing.id > last_id)
+            .order_by(Listing.id)
+            .limit(chunk_size)
+            .all()
+        )
+        if not rows:
+            break
+        last_id = rows[-1].id
+        checked += len(rows)
+
+        # Each row carries the joined state columns (NULL if never scored).
+        dirty = [
+            row.id
+            for row in rows
+            if force
+            or not _is_current(row.title, row.description, row.price, row, rules_version)
+        ]
+        if dirty:
+            refresh_comps_for_listing_ids(db, dirty)
+            rescored += len(dirty)
+
+    return {"checked": checked, "rescored": rescored, "skipped": checked - rescored}
+
+
 __all__ = [
     "MAX_BUY_PRICE",
     "MIN_PROFIT",
     "MIN_ROI",
+    "COMPS_VERSION",
+    "scoring_fingerprint",
     "estimate_rule_based_resale",
     "compute_profit_metrics",
     "evaluate_listing_comps",
     "evaluate_listing_comps_sync",
+    "rescore_listings",
     "refresh_comps_for_listing_id",
+    "refresh_comps_for_listing_ids",
+    "rescore_stale",
 ]
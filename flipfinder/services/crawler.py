@@ -0,0 +1,366 @@
+import importlib
+import multiprocessing
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .. import models
+from .prices import utc_timestamp
+
+# ---------------------------------------------------------------------------
+# SHARDED CRAWLER
+#
+# One browser per process caps a crawl at one search at a time, however
+# many cores the box has. Here the searches to run go into a work queue in
+# the database (crawl_queue), and a supervisor starts N worker processes,
+# each with its own long-running browser (MarketplaceBrowser), that take
+# tasks off it and write through the same upsert path as the scrape
+# endpoint (run_facebook_search).
+#
+# A worker leases a task: status 'leased', its name, and due_at = now +
+# LEASE_S. While the search runs a heartbeat thread pushes due_at forward
+# every HEARTBEAT_S. A worker that dies stops heartbeating, its lease runs
+# out, and the next lease() call anywhere puts the task back in the queue
+# (or marks it failed after MAX_ATTEMPTS). A search that raises goes back
+# with a backoff of RETRY_BACKOFF_S, doubling per attempt. complete() and
+# fail() only touch a task the caller still holds, so a worker that was
+# presumed dead can't overwrite whoever took its task over.
+#
+# The queue functions take a DB-API connection and commit themselves; in
+# the app they run as Database.run_raw() jobs on the process's writer.
+# Each lease is one short write transaction, so N processes contend for the
+# SQLite lock for milliseconds per search, not for the search itself.
+# ---------------------------------------------------------------------------
+
+LEASE_S = float(os.getenv("FF_CRAWL_LEASE_S", "120"))
+HEARTBEAT_S = LEASE_S / 4
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF_S = 30.0
+POLL_S = 2.0                  # idle worker: how often to look for work
+SUPERVISE_S = 1.0
+# "module:callable" making a worker's browser: an object with
+# search(query, max_results, radius_km, location) and close()
+SEARCHER = "flipfinder.scrapers.facebook:MarketplaceBrowser"
+
+
+class Task(NamedTuple):
+    id: int
+    keyword: str
+    location: str
+    attempts: int
+
+
+# ---------------------------------------------------------------------------
+# one search
+# ---------------------------------------------------------------------------
+
+def crawl_keyword(
+    db: Session,
+    keyword: str,
+    location: Optional[str],
+    radius_km: int,
+    max_results: int,
+    search: Optional[Callable[..., List[Dict[str, Any]]]] = None,
+) -> Tuple[List[int], Any]:
+    """
+    One search: upsert, score, log it for the planner (record_run, also
+    when the search raises -- the browser time was still spent). Returns
+    (listing ids, the keyword's updated KeywordStats).
+    """
+    from app.near_dupes import one_per_group
+    from ..routers.facebook import run_facebook_search
+    from .comps import refresh_comps_for_listing_ids
+    from .planner import record_run
+
+    max_id = db.query(func.max(models.Listing.id)).scalar() or 0
+    t0 = time.perf_counter()
+    try:
+        if search is None:
+            ids = run_facebook_search(db, keyword, max_results, radius_km, location)
+        else:
+            ids = run_facebook_search(db, keyword, max_results, radius_km, location, search=search)
+    except Exception:
+        record_run(db, keyword, time.perf_counter() - t0, 0, 0, 0)
+        raise
+    seconds = time.perf_counter() - t0
+    new_ids = {i for i in ids if i > max_id}
+    comps = refresh_comps_for_listing_ids(
+        db, one_per_group(db.connection().connection, ids), skip_unchanged=True
+    )
+    deals = sum(
+        1 for lid, c in comps.items()
+        if lid in new_ids and c.get("success") and (c.get("data") or {}).get("is_deal")
+    )
+    return ids, record_run(db, keyword, seconds, len(ids), len(new_ids), deals)
+
+
+# ---------------------------------------------------------------------------
+# the queue (DB-API connection; each call is one committed transaction)
+# ---------------------------------------------------------------------------
+
+def enqueue(conn, tasks: Iterable[Tuple[str, Optional[str]]], now: Optional[float] = None) -> int:
+    """
+    Queue (keyword, location) searches. One already queued or running is
+    skipped. Returns how many were added.
+    """
+    now = time.time() if now is None else now
+    stamp = utc_timestamp()
+    cur = conn.cursor()
+    added = 0
+    for keyword, location in tasks:
+        cur.execute(
+            "INSERT OR IGNORE INTO crawl_queue "
+            "(keyword, location, status, due_at, attempts, enqueued_at) "
+            "VALUES (?, ?, 'queued', ?, 0, ?)",
+            (keyword, location or "", now, stamp),
+        )
+        added += cur.rowcount
+    conn.commit()
+    return added
+
+
+def _requeue_expired(cur, now: float) -> int:
+    cur.execute(
+        "UPDATE crawl_queue SET "
+        "  status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+        "  finished_at = CASE WHEN attempts >= ? THEN ? END, "
+        "  error = 'lease expired (' || worker || ')', "
+        "  worker = NULL, due_at = ? "
+        "WHERE status = 'leased' AND due_at < ?",
+        (MAX_ATTEMPTS, MAX_ATTEMPTS, utc_timestamp(), now, now),
+    )
+    if cur.rowcount:
+        print(f"[WARN] crawl queue: {cur.rowcount} expired leases taken back")
+    return cur.rowcount
+
+
+def requeue_expired(conn, now: Optional[float] = None) -> int:
+    """Take back tasks whose worker stopped heartbeating. Returns how many."""
+    n = _requeue_expired(conn.cursor(), time.time() if now is None else now)
+    conn.commit()
+    return n
+
+
+def lease(conn, worker: str, now: Optional[float] = None) -> Optional[Task]:
+    """Lease the next due task to `worker` (None if there isn't one)."""
+    now = time.time() if now is None else now
+    cur = conn.cursor()
+    _requeue_expired(cur, now)
+    cur.execute(
+        "UPDATE crawl_queue SET status = 'leased', worker = ?, attempts = attempts + 1, "
+        "  due_at = ?, heartbeat_at = ? "
+        "WHERE id = (SELECT id FROM crawl_queue WHERE status = 'queued' AND due_at <= ? "
+        "            ORDER BY due_at, id LIMIT 1) "
+        "RETURNING id, keyword, location, attempts",
+        (worker, now + LEASE_S, now, now),
+    )
+    row = cur.fetchone()
+    conn.commit()
+    return Task(*row) if row else None
+
+
+def heartbeat(conn, task: Task, worker: str, now: Optional[float] = None) -> bool:
+    """Extend `worker`'s lease on task. False if it no longer holds it."""
+    now = time.time() if now is None else now
+    cur = conn.cursor()
+    cur.execute(
+        "UPDATE crawl_queue SET due_at = ?, heartbeat_at = ? "
+        "WHERE id = ? AND worker = ? AND status = 'leased'",
+        (now + LEASE_S, now, task.id, worker),
+    )
+    conn.commit()
+    return cur.rowcount == 1
+
+
+def complete(conn, task: Task, worker: str, found: int) -> bool:
+    """Mark task done. False if `worker` had lost it (the result still stands)."""
+    cur = conn.cursor()
+    cur.execute(
+        "UPDATE crawl_queue SET status = 'done', finished_at = ?, found = ?, error = NULL "
+        "WHERE id = ? AND worker = ? AND status = 'leased'",
+        (utc_timestamp(), found, task.id, worker),
+    )
+    conn.commit()
+    return cur.rowcount == 1
+
+
+def fail(conn, task: Task, worker: str, error: str, now: Optional[float] = None) -> bool:
+    """Put task back with a backoff, or mark it failed after MAX_ATTEMPTS."""
+    now = time.time() if now is None else now
+    gave_up = task.attempts >= MAX_ATTEMPTS
+    cur = conn.cursor()
+    cur.execute(
+        "UPDATE crawl_queue SET status = ?, due_at = ?, finished_at = ?, error = ?, worker = NULL "
+        "WHERE id = ? AND worker = ? AND status = 'leased'",
+        (
+            "failed" if gave_up else "queued",
+            now + RETRY_BACKOFF_S * 2 ** (task.attempts - 1),
+            utc_timestamp() if gave_up else None,
+            error[:500],
+            task.id,
+            worker,
+        ),
+    )
+    conn.commit()
+    return cur.rowcount == 1
+
+
+def counts(conn) -> Dict[str, int]:
+    """Tasks per status."""
+    cur = conn.cursor()
+    cur.execute("SELECT status, COUNT(*) FROM crawl_queue GROUP BY status")
+    out = {"queued": 0, "leased": 0, "done": 0, "failed": 0}
+    out.update(dict(cur.fetchall()))
+    return out
+
+
+# ---------------------------------------------------------------------------
+# workers and supervisor
+# ---------------------------------------------------------------------------
+
+def _load(spec: str) -> Callable:
+    module, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(module), attr)
+
+
+def _heartbeats(database, task: Task, worker: str, stop: threading.Event) -> None:
+    while not stop.wait(HEARTBEAT_S):
+        try:
+            if not database.run_raw(lambda c: heartbeat(c, task, worker)):
+                print(f"[WARN] {worker} lost its lease on {task.keyword!r}")
+                return
+        except Exception as e:
+            print(f"[WARN] {worker} heartbeat failed: {e}")
+
+
+def work(
+    name: str,
+    searcher: str = SEARCHER,
+    radius_km: int = 50,
+    max_results: int = 30,
+    drain: bool = True,
+) -> int:
+    """
+    A worker process: lease, search, complete, repeat. With drain it exits
+    once nothing is queued or leased; otherwise it keeps polling. Returns
+    the number of tasks it completed.
+    """
+    from ..db import SessionLocal, database
+
+    worker = f"{name}-{os.getpid()}"
+    browser = _load(searcher)()
+    done = 0
+    try:
+        while True:
+            task = database.run_raw(lambda c: lease(c, worker))
+            if task is None:
+                left = database.run_raw(counts)
+                if drain and not left["queued"] and not left["leased"]:
+                    return done
+                time.sleep(POLL_S)
+                continue
+
+            stop = threading.Event()
+            beat = threading.Thread(
+                target=_heartbeats, args=(database, task, worker, stop), daemon=True
+            )
+            beat.start()
+            db = SessionLocal()
+            try:
+                ids, _stats = crawl_keyword(
+                    db, task.keyword, task.location or None, radius_km, max_results,
+                    search=browser.search,
+                )
+            except Exception as e:
+                print(f"[ERROR] {worker}: search {task.keyword!r} failed: {e}")
+                database.run_raw(lambda c: fail(c, task, worker, f"{type(e).__name__}: {e}"))
+                continue
+            finally:
+                stop.set()
+                beat.join()
+                db.close()
+            database.run_raw(lambda c: complete(c, task, worker, len(ids)))
+            done += 1
+    finally:
+        close = getattr(browser, "close", None)
+        if close is not None:
+            close()
+
+
+def _work_entry(name: str, searcher: str, radius_km: int, max_results: int, drain: bool) -> None:
+    work(name, searcher, radius_km, max_results, drain)
+
+
+def run_workers(
+    n: int,
+    searcher: str = SEARCHER,
+    radius_km: int = 50,
+    max_results: int = 30,
+    drain: bool = True,
+) -> Dict[str, int]:
+    """
+    Supervisor: run n worker processes over the queue until it's drained
+    (or forever, without drain), restarting any that die. The dead one's
+    lease runs out and another worker picks its task up. Returns the
+    queue's counts at the end.
+    """
+    from ..db import database
+
+    # spawn, not fork: the parent already runs a writer thread and holds
+    # SQLite connections, neither of which survives a fork
+    ctx = multiprocessing.get_context("spawn")
+    restarts_left = 3 * n
+
+    def start(i: int):
+        p = ctx.Process(
+            target=_work_entry,
+            args=(f"w{i}", searcher, radius_km, max_results, drain),
+            name=f"crawl-worker-{i}",
+        )
+        p.start()
+        return p
+
+    procs = [start(i) for i in range(n)]
+    print(f"[DEBUG] crawl supervisor: {n} workers")
+    try:
+        while True:
+            time.sleep(SUPERVISE_S)
+            for i, p in enumerate(procs):
+                if p.is_alive() or p.exitcode == 0 or p.exitcode is None:
+                    continue
+                if restarts_left <= 0:
+                    continue
+                print(f"[WARN] crawl worker w{i} died (exit {p.exitcode}); restarting it")
+                restarts_left -= 1
+                procs[i] = start(i)
+            if not any(p.is_alive() for p in procs):
+                break
+    except KeyboardInterrupt:
+        print("[WARN] crawl supervisor interrupted; stopping workers")
+        for p in procs:
+            p.terminate()
+    for p in procs:
+        p.join()
+    return database.run_raw(counts)
+
+
+__all__ = [
+    "LEASE_S",
+    "MAX_ATTEMPTS",
+    "SEARCHER",
+    "Task",
+    "crawl_keyword",
+    "enqueue",
+    "requeue_expired",
+    "lease",
+    "heartbeat",
+    "complete",
+    "fail",
+    "counts",
+    "work",
+    "run_workers",
+]
@@ -1,40 +1,54 @@
 from sqlalchemy import select, insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+
+from app.db_access import write
+from app.live_deals import publish_new
+from app.near_dupes import index_listing
+
 from ..models import Listing  # assumes you have a Listing model
 
 def intake_listings(db: Session, items: list[dict]) -> tuple[list[int], int]:
-    created_ids: list[int] = []
-    skipped = 0
-    for it in items:
-        existing = db.execute(
-            select(Listing.id).where(
-                Listing.source == it["source"],
-                Listing.external_id == it["external_id"]
+    def job(s: Session) -> tuple[list[int], int, list[dict]]:
+        created_ids: list[int] = []
+        created: list[dict] = []
+        skipped = 0
+        for it in items:
+            existing = s.execute(
+                select(Listing.id).where(
+                    Listing.source == it["source"],
+                    Listing.external_id == it["external_id"]
+                )
+            ).scalar_one_or_none()
+            if existing:
+                skipped += 1
+                continue
+            stmt = insert(Listing).values(
+                source=it["source"],
+                external_id=it["external_id"],
+                source_url=it["source_url"],
+                url=it.get("source_url") or "",  # url is NOT NULL in DB
+                title=it["title"],
+                price=it["price"],
+                currency=it["currency"],
+                location=it["location"],
+                posted_at=it["posted_at"],
             )
-        ).scalar_one_or_none()
-        if existing:
-            skipped += 1
-            continue
-        stmt = insert(Listing).values(
-            source=it["source"],
-            external_id=it["external_id"],
-            source_url=it["source_url"],
-            url=it.get("source_url") or "",  # url is NOT NULL in DB
-            title=it["title"],
-            price=it["price"],
-            currency=it["currency"],
-            location=it["location"],
-            posted_at=it["posted_at"],
-        )
-        try:
-            res = db.execute(stmt)
-            db.commit()
-            new_id = res.lastrowid
-            if not new_id:
-                new_id = db.execute(select(Listing.id).order_by(Listing.id.desc())).scalar_one()
-            created_ids.append(new_id)
-        except IntegrityError:
-            db.rollback()
-            skipped += 1
+            try:
+                # a savepoint per item, so a duplicate only drops that item
+                with s.begin_nested():
+                    res = s.execute(stmt)
+                new_id = res.lastrowid
+                if not new_id:
+                    new_id = s.execute(select(Listing.id).order_by(Listing.id.desc())).scalar_one()
+                index_listing(s.connection().connection, new_id, it["title"], it["price"], it["location"])
+                created_ids.append(new_id)
+                created.append({**it, "id": new_id, "url": it.get("source_url")})
+            except IntegrityError:
+                skipped += 1
+        return created_ids, skipped, created
+
+    # the whole batch is one writer job (see app/db_access.py)
+    created_ids, skipped, created = write(db, job)
+    publish_new(created)
     return created_ids, skipped
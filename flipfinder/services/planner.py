@@ -0,0 +1,219 @@
+import os
+import random
+from dataclasses import dataclass, replace
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.db_access import write
+
+from .. import models
+from .prices import TS_FORMAT, utc_timestamp
+
+# ---------------------------------------------------------------------------
+# KEYWORD CRAWL PLANNER
+#
+# Which keywords to search next, given a budget of browser minutes. Each
+# keyword is an arm of a multi-armed bandit. Its payoff rate is the yield
+# per browser minute, where a deal counts 1 and a never-seen listing
+# counts NEW_LISTING_VALUE. That extra term lets keywords tell each other
+# apart before any deals turn up.
+#
+# Thompson sampling: the rate gets a Gamma posterior (Gamma-Poisson on the
+# yield over the minutes spent), each round draws one rate per keyword, and
+# the round is filled with the highest draws that fit the budget. Proven
+# keywords win most rounds. Barely-tried ones draw from a wide posterior,
+# so they keep getting the odd slot, and a dud stops getting them once
+# its posterior narrows.
+#
+# Totals decay with a HALF_LIFE_DAYS half-life, so what a keyword yielded
+# months ago counts for less than last week, and a keyword left alone
+# drifts back toward being explored.
+# ---------------------------------------------------------------------------
+
+NEW_LISTING_VALUE = 0.05      # 20 new listings are worth one deal
+PRIOR_YIELD = 0.5             # Gamma prior: 0.5 yield over 5 minutes
+PRIOR_MINUTES = 5.0
+DEFAULT_RUN_MINUTES = 1.0     # cost guess for a keyword never run
+HALF_LIFE_DAYS = float(os.getenv("FF_PLANNER_HALF_LIFE_DAYS", "14"))
+
+DATA_DIR = Path(__file__).resolve().parents[2] / "data"
+# the production keyword lists (data/test_*.txt are for trying things out)
+KEYWORD_FILES = ["flip_keywords.txt", "luxury_furniture_keywords.txt", "seed_keywords.txt"]
+
+
+@dataclass(frozen=True)
+class KeywordStats:
+    keyword: str
+    runs: int = 0
+    weight: float = 0.0  # runs, decayed like the totals
+    minutes: float = 0.0
+    new_listings: float = 0.0
+    deals: float = 0.0
+    last_run_at: Optional[str] = None
+
+    @property
+    def run_minutes(self) -> float:
+        """Expected browser minutes for one search of this keyword."""
+        return self.minutes / self.weight if self.weight > 0 and self.minutes > 0 else DEFAULT_RUN_MINUTES
+
+    @property
+    def yield_(self) -> float:
+        return self.deals + NEW_LISTING_VALUE * self.new_listings
+
+
+def load_keywords(files: Optional[Iterable[str]] = None) -> List[str]:
+    """Keywords from data/ files (KEYWORD_FILES by default), deduplicated, in order."""
+    out: Dict[str, None] = {}
+    for name in files or KEYWORD_FILES:
+        path = Path(name) if os.path.sep in name else DATA_DIR / name
+        for line in path.read_text(encoding="utf-8").splitlines():
+            kw = " ".join(line.lower().split())
+            if kw and not kw.startswith("#"):
+                out.setdefault(kw, None)
+    return list(out)
+
+
+def _days_between(earlier: Optional[str], now: str) -> float:
+    if not earlier:
+        return 0.0
+    delta = datetime.strptime(now, TS_FORMAT) - datetime.strptime(earlier, TS_FORMAT)
+    return max(delta.total_seconds() / 86400.0, 0.0)
+
+
+def decayed(stats: KeywordStats, now: str) -> KeywordStats:
+    """stats as seen from `now`: totals scaled by the half-life decay."""
+    f = 0.5 ** (_days_between(stats.last_run_at, now) / HALF_LIFE_DAYS)
+    if f >= 1.0:
+        return stats
+    return replace(
+        stats, weight=stats.weight * f, minutes=stats.minutes * f,
+        new_listings=stats.new_listings * f, deals=stats.deals * f,
+    )
+
+
+def with_run(
+    stats: KeywordStats,
+    seconds: float,
+    new_listings: int,
+    deals: int,
+    now: str,
+) -> KeywordStats:
+    """stats after one more run that took `seconds` of browser time."""
+    d = decayed(stats, now)
+    return replace(
+        d,
+        runs=stats.runs + 1,
+        weight=d.weight + 1.0,
+        minutes=d.minutes + seconds / 60.0,
+        new_listings=d.new_listings + new_listings,
+        deals=d.deals + deals,
+        last_run_at=now,
+    )
+
+
+def choose(
+    stats: Dict[str, KeywordStats],
+    keywords: Iterable[str],
+    budget_minutes: float,
+    rng: Optional[random.Random] = None,
+    now: Optional[str] = None,
+) -> List[str]:
+    """
+    Keywords to search this round, best draw first, at most once each,
+    expected minutes within budget_minutes (the top draw always runs).
+    """
+    rng = rng or random.Random()
+    now = now or utc_timestamp()
+    draws = []
+    for kw in keywords:
+        s = decayed(stats.get(kw) or KeywordStats(kw), now)
+        rate = rng.gammavariate(PRIOR_YIELD + s.yield_, 1.0 / (PRIOR_MINUTES + s.minutes))
+        draws.append((rate, kw, s.run_minutes))
+    draws.sort(reverse=True)
+
+    picked: List[str] = []
+    spent = 0.0
+    for _, kw, cost in draws:
+        if picked and spent + cost > budget_minutes:
+            continue  # a cheaper one further down may still fit
+        picked.append(kw)
+        spent += cost
+    return picked
+
+
+# ---------------------------------------------------------------------------
+# persistence (keyword_stats, crawl_runs)
+# ---------------------------------------------------------------------------
+
+def _from_row(row: "models.KeywordStat") -> KeywordStats:
+    return KeywordStats(
+        keyword=row.keyword, runs=row.runs, weight=row.weight, minutes=row.minutes,
+        new_listings=row.new_listings, deals=row.deals, last_run_at=row.last_run_at,
+    )
+
+
+def load_stats(db: Session, keywords: Optional[Iterable[str]] = None) -> Dict[str, KeywordStats]:
+    q = db.query(models.KeywordStat)
+    if keywords is not None:
+        q = q.filter(models.KeywordStat.keyword.in_(list(keywords)))
+    return {row.keyword: _from_row(row) for row in q}
+
+
+def plan(
+    db: Session,
+    keywords: List[str],
+    budget_minutes: float,
+    rng: Optional[random.Random] = None,
+) -> List[str]:
+    """choose() over the persisted stats."""
+    return choose(load_stats(db, keywords), keywords, budget_minutes, rng)
+
+
+def record_run(
+    db: Session,
+    keyword: str,
+    seconds: float,
+    found: int,
+    new_listings: int,
+    deals: int,
+    started_at: Optional[str] = None,
+) -> KeywordStats:
+    """Log one search in crawl_runs and fold it into keyword_stats."""
+    now = started_at or utc_timestamp()
+
+    def save(s: Session) -> KeywordStats:
+        row = s.get(models.KeywordStat, keyword)
+        updated = with_run(
+            _from_row(row) if row else KeywordStats(keyword), seconds, new_listings, deals, now
+        )
+        if row is None:
+            row = models.KeywordStat(keyword=keyword)
+            s.add(row)
+        row.runs, row.weight, row.minutes = updated.runs, updated.weight, updated.minutes
+        row.new_listings, row.deals = updated.new_listings, updated.deals
+        row.last_run_at = updated.last_run_at
+        s.add(models.CrawlRun(
+            keyword=keyword, started_at=now, seconds=seconds,
+            found=found, new_listings=new_listings, deals=deals,
+        ))
+        return updated
+
+    return write(db, save)
+
+
+__all__ = [
+    "NEW_LISTING_VALUE",
+    "HALF_LIFE_DAYS",
+    "KEYWORD_FILES",
+    "KeywordStats",
+    "load_keywords",
+    "decayed",
+    "with_run",
+    "choose",
+    "load_stats",
+    "plan",
+    "record_run",
+]
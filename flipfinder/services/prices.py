@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from .. import models
+
+# Price history for re-scraped listings.
+#
+# The scrape upsert calls record_price() before overwriting listings.price;
+# it appends a price_history row only when the price actually changed. A
+# drop (price < prev_price) is what ix_price_history_drops indexes, so the
+# two questions below never look at rises or at unchanged listings.
+
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def utc_timestamp() -> str:
+    return datetime.now(timezone.utc).strftime(TS_FORMAT)
+
+
+def _cents(value: Any) -> int:
+    return int(round(float(value) * 100))
+
+
+def record_price(
+    db: Session,
+    listing: "models.Listing",
+    new_price: Optional[float],
+    observed_at: Optional[str] = None,
+) -> bool:
+    """
+    Append a price_history row if `new_price` differs from listing.price
+    (to the cent); the caller still sets listing.price. No commit.
+    Returns True when it's a drop.
+    """
+    old = listing.price
+    if new_price is None or old is None or listing.id is None:
+        return False
+    if _cents(old) == _cents(new_price):
+        return False
+    db.add(models.PriceHistory(
+        listing_id=listing.id,
+        observed_at=observed_at or utc_timestamp(),
+        price=new_price,
+        prev_price=old,
+    ))
+    return _cents(new_price) < _cents(old)
+
+
+def _drop_row(listing: "models.Listing", was: Any, now: Any, at: str) -> Dict[str, Any]:
+    was, now = float(was), float(now) if now is not None else None
+    return {
+        "listing_id": listing.id,
+        "title": listing.title,
+        "url": listing.url,
+        "observed_at": at,
+        "prev_price": was,
+        "price": now,
+        "drop_pct": round((was - now) / was * 100, 1) if was and now is not None else None,
+        "profit": float(listing.profit) if listing.profit is not None else None,
+        "is_deal": bool(listing.is_deal),
+    }
+
+
+def latest_drops(db: Session, limit: int = 50) -> List[Dict[str, Any]]:
+    """The newest `limit` price drops, newest first (one walk of the drops index)."""
+    H = models.PriceHistory
+    rows = (
+        db.query(H, models.Listing)
+        .join(models.Listing, models.Listing.id == H.listing_id)
+        .filter(H.price < H.prev_price)
+        .order_by(H.observed_at.desc())
+        .limit(limit)
+        .all()
+    )
+    return [_drop_row(listing, h.prev_price, h.price, h.observed_at) for h, listing in rows]
+
+
+def drops_within(
+    db: Session,
+    hours: float = 24,
+    min_drop_pct: float = 10.0,
+    limit: int = 100,
+) -> List[Dict[str, Any]]:
+    """
+    Listings whose current price is at least min_drop_pct below the highest
+    price they dropped from in the last `hours`, biggest drop first.
+    """
+    H, L = models.PriceHistory, models.Listing
+    since = (datetime.now(timezone.utc) - timedelta(hours=hours)).strftime(TS_FORMAT)
+    # aggregate the window's drops first (a range on ix_price_history_drops),
+    # then fetch those listings by id. SQLite can't tell how selective
+    # `since` is and would rather walk every listing, or all of
+    # ix_price_history_listing, to get the GROUP BY order for free; the
+    # "+ 0" takes that option away.
+    window = (
+        select(
+            H.listing_id.label("listing_id"),
+            func.max(H.prev_price).label("was"),
+            func.max(H.observed_at).label("at"),
+        )
+        .where(H.price < H.prev_price, H.observed_at >= since)
+        .group_by(H.listing_id + 0)
+        .subquery()
+    )
+    rows = (
+        db.query(L, window.c.was, window.c.at)
+        .join(window, window.c.listing_id == L.id)
+        .filter(window.c.was - L.price >= window.c.was * (min_drop_pct / 100.0))
+        .order_by(((window.c.was - L.price) / window.c.was).desc())
+        .limit(limit)
+        .all()
+    )
+    return [_drop_row(listing, was, listing.price, at) for listing, was, at in rows]
+
+
+def price_history(db: Session, listing_id: int) -> List[Dict[str, Any]]:
+    """Every recorded change for one listing, oldest first."""
+    H = models.PriceHistory
+    rows = (
+        db.query(H)
+        .filter(H.listing_id == listing_id)
+        .order_by(H.observed_at, H.id)
+        .all()
+    )
+    return [
+        {
+            "observed_at": h.observed_at,
+            "prev_price": float(h.prev_price) if h.prev_price is not None else None,
+            "price": float(h.price) if h.price is not None else None,
+        }
+        for h in rows
+    ]
+
+
+__all__ = ["record_price", "latest_drops", "drops_within", "price_history", "utc_timestamp"]
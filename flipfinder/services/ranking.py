@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from sqlalchemy.orm import Session
+
+from .comps import refresh_comps_for_listing_ids
+
+# Batch size for refresh_stale(): one read + one executemany UPDATE each.
+REFRESH_BATCH = 500
+REFRESH_WORKERS = 4
+
+
+def refresh_stale(
+    session_factory: Callable[[], Session],
+    listing_ids: List[int],
+    workers: int = REFRESH_WORKERS,
+    lookup_ebay: bool = False,
+    concurrency: int = 8,
+) -> Dict[str, int]:
+    """
+    New comps for listing_ids (app.ranking.stale_ids() picks them), split
+    into REFRESH_BATCH-sized batches run by a pool of `workers` threads,
+    each with its own session. Writes still queue on the one writer
+    thread; the pool overlaps one batch's reads and rule matching, and its
+    eBay lookups (at most `concurrency` per batch), with another's commit.
+
+    Every refreshed listing gets rank_score and comps_at, so it isn't stale
+    again until the TTL runs out. Returns {"refreshed", "deals", "missing"}.
+    """
+    batches = [
+        listing_ids[i:i + REFRESH_BATCH] for i in range(0, len(listing_ids), REFRESH_BATCH)
+    ]
+
+    def run(batch: List[int]) -> Dict[int, Dict]:
+        db = session_factory()
+        try:
+            return refresh_comps_for_listing_ids(
+                db, batch, lookup_ebay=lookup_ebay, concurrency=concurrency
+            )
+        finally:
+            db.close()
+
+    stats = {"refreshed": 0, "deals": 0, "missing": 0}
+    if not batches:
+        return stats
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(batches)))) as pool:
+        for out in pool.map(run, batches):
+            for result in out.values():
+                if not result["success"]:
+                    stats["missing"] += 1
+                    continue
+                stats["refreshed"] += 1
+                stats["deals"] += bool(result["data"]["is_deal"])
+    return stats
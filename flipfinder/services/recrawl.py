@@ -0,0 +1,355 @@
+import importlib
+import math
+import os
+import queue
+import threading
+from concurrent.futures import Future, as_completed
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.db_access import write
+from app.near_dupes import forget_listings, index_listing
+
+from .. import models
+from .prices import TS_FORMAT, record_price, utc_timestamp
+
+# ---------------------------------------------------------------------------
+# RECRAWL SCHEDULER
+#
+# Revisits listing pages to find out whether they sold, went pending, were
+# taken down or changed price, and keeps listings.status current.
+#
+# Each listing carries next_check_at. The interval after a revisit starts
+# at MIN_INTERVAL_MIN for a brand-new listing and doubles every DOUBLING_H
+# hours of age (capped at MAX_INTERVAL_H), so a listing is revisited
+# often while it's young -- when it's most likely to sell -- and every few
+# days once it has sat unsold for a while. Deals and pending listings are
+# revisited DEAL_FACTOR times as often. Sold and removed listings are
+# terminal: next_check_at goes NULL and they drop out of the schedule. A
+# listing's first revisit is one interval after the recrawler first sees
+# it.
+#
+# An APScheduler job ticks every RECRAWL_INTERVAL_S. A tick claims due
+# listings in one short writer job -- deals and pending ones first, then
+# the most overdue relative to their own interval. It checks the hour's
+# budget in recrawl_budget (PER_HOUR revisits per UTC hour across every
+# process that runs this), then bumps the claimed listings' next_check_at
+# by CLAIM_MIN so no other tick takes them. It hands them to a pool of
+# CONCURRENCY threads, each with its own long-running browser. Each result
+# is written back as it arrives. A revisit that fails keeps its claim and
+# is simply due again CLAIM_MIN later.
+# ---------------------------------------------------------------------------
+
+RECRAWL_INTERVAL_S = int(os.getenv("FF_RECRAWL_INTERVAL_S", "60"))  # 0 disables
+PER_HOUR = int(os.getenv("FF_RECRAWL_PER_HOUR", "120"))
+CONCURRENCY = int(os.getenv("FF_RECRAWL_CONCURRENCY", "3"))
+
+MIN_INTERVAL_MIN = 60.0       # a brand-new listing: hourly
+DOUBLING_H = 24.0             # ... then half as often per day of age
+MAX_INTERVAL_H = 72.0
+DEAL_FACTOR = 4.0             # deals / pending listings: 4x as often
+CLAIM_MIN = 15                # a claimed revisit that never reports back
+TERMINAL = ("sold", "removed")
+# "module:callable" making a pool thread's browser: an object with
+# item(url) -> {"status", "title", "price", "currency"} and close()
+FETCHER = "flipfinder.scrapers.facebook:MarketplaceBrowser"
+
+
+def _parse_ts(value: Optional[str]) -> Optional[datetime]:
+    try:
+        return datetime.strptime(value, TS_FORMAT) if value else None
+    except ValueError:
+        return None
+
+
+def next_interval(
+    created_at: Optional[str],
+    is_deal: Optional[int],
+    status: Optional[str],
+    now: datetime,
+) -> Optional[timedelta]:
+    """How long until the next revisit; None for a terminal listing."""
+    if status in TERMINAL:
+        return None
+    created = _parse_ts(created_at)
+    age_h = max((now - created).total_seconds() / 3600.0, 0.0) if created else 0.0
+    # capped before the power so a years-old listing can't overflow it
+    doublings = min(age_h / DOUBLING_H, math.log2(MAX_INTERVAL_H * 60 / MIN_INTERVAL_MIN))
+    minutes = MIN_INTERVAL_MIN * 2 ** doublings
+    if is_deal or status == "pending":
+        minutes /= DEAL_FACTOR
+    return timedelta(minutes=minutes)
+
+
+# ---------------------------------------------------------------------------
+# claiming due listings (DB-API connection, commits itself)
+# ---------------------------------------------------------------------------
+
+def _priority(row: Tuple, now: datetime) -> Tuple[bool, float]:
+    """
+    Sort key for a due (id, url, created_at, is_deal, status,
+    next_check_at) row: deals and pending listings first, then by how many
+    of its own current intervals the listing is overdue.
+    """
+    _id, _url, created_at, is_deal, status, next_check_at = row
+    interval = next_interval(created_at, is_deal, status, now) or timedelta(hours=MAX_INTERVAL_H)
+    due_at = _parse_ts(next_check_at) or now
+    overdue = (now - due_at).total_seconds() / interval.total_seconds()
+    return not (is_deal or status == "pending"), -overdue
+
+
+def claim_due(conn, limit: int, now: Optional[datetime] = None) -> List[Tuple[int, str]]:
+    """
+    Claim up to `limit` due listings within the hour's budget. Returns
+    their (id, url), highest priority first (see _priority).
+    """
+    now = now or _parse_ts(utc_timestamp())
+    stamp = now.strftime(TS_FORMAT)
+    hour = now.strftime("%Y-%m-%d %H")
+    cur = conn.cursor()
+    # listings never revisited yet: first one a full interval from now, not
+    # from when they were found -- otherwise a backlog of old listings (a
+    # database that predates the recrawler) would all be due at once, ahead
+    # of every new listing and deal. Sold / removed ones stay unscheduled.
+    cur.execute(
+        "SELECT id, created_at, is_deal, status FROM listings "
+        "WHERE next_check_at IS NULL AND checked_at IS NULL "
+        "AND (status IS NULL OR status NOT IN ('sold', 'removed'))"
+    )
+    cur.executemany(
+        "UPDATE listings SET next_check_at = ? WHERE id = ?",
+        [
+            ((now + next_interval(created_at, is_deal, status, now)).strftime(TS_FORMAT), listing_id)
+            for listing_id, created_at, is_deal, status in cur.fetchall()
+        ],
+    )
+    cur.execute("SELECT used FROM recrawl_budget WHERE hour = ?", (hour,))
+    row = cur.fetchone()
+    take = min(limit, PER_HOUR - (row[0] if row else 0))
+    if take <= 0:
+        conn.commit()
+        return []
+    # normally only a few ticks' worth is due (new listings are scheduled
+    # an interval out), so ranking it in Python is cheap
+    cur.execute(
+        "SELECT id, url, created_at, is_deal, status, next_check_at FROM listings "
+        "WHERE next_check_at <= ?",
+        (stamp,),
+    )
+    due = [(r[0], r[1]) for r in sorted(cur.fetchall(), key=lambda r: _priority(r, now))[:take]]
+    if due:
+        # checked_at is left alone: only a revisit that reports back sets it
+        until = (now + timedelta(minutes=CLAIM_MIN)).strftime(TS_FORMAT)
+        cur.executemany(
+            "UPDATE listings SET next_check_at = ? WHERE id = ?",
+            [(until, listing_id) for listing_id, _ in due],
+        )
+        cur.execute(
+            "INSERT INTO recrawl_budget (hour, used) VALUES (?, ?) "
+            "ON CONFLICT (hour) DO UPDATE SET used = used + excluded.used",
+            (hour, len(due)),
+        )
+        cur.execute("DELETE FROM recrawl_budget WHERE hour < ?",
+                    ((now - timedelta(days=2)).strftime("%Y-%m-%d %H"),))
+    conn.commit()
+    return due
+
+
+def apply_revisit(db: Session, listing_id: int, result: Dict[str, Any]) -> bool:
+    """
+    Write one revisit's result: status, title, price (through
+    price_history), checked_at and the next due time. A new title is
+    signed again for near-duplicates and marks the comps stale. Returns
+    True when the price dropped, so the caller re-scores it.
+    """
+    observed_at = utc_timestamp()
+    now = _parse_ts(observed_at)
+
+    def save(s: Session) -> bool:
+        listing = s.get(models.Listing, listing_id)
+        if listing is None:  # archived meanwhile
+            return False
+        status = result.get("status") or "available"
+        dropped = False
+        if status != "removed":
+            retitled = bool(result.get("title")) and result["title"] != listing.title
+            if retitled:
+                listing.title = result["title"]
+                listing.comps_at = None  # comps were for the old title
+            price = result.get("price")
+            if price is not None:
+                dropped = record_price(s, listing, price, observed_at)
+                listing.price = price
+            if retitled:
+                conn = s.connection().connection
+                forget_listings(conn, [listing_id])
+                index_listing(conn, listing_id, listing.title, listing.price, listing.location)
+        if status != listing.status:
+            print(f"[DEBUG] listing {listing_id}: {listing.status or 'available'} -> {status}")
+        listing.status = status
+        listing.checked_at = observed_at
+        interval = next_interval(listing.created_at, listing.is_deal, status, now)
+        listing.next_check_at = (now + interval).strftime(TS_FORMAT) if interval else None
+        return dropped
+
+    return write(db, save)
+
+
+# ---------------------------------------------------------------------------
+# the pool: CONCURRENCY threads, one browser each
+# ---------------------------------------------------------------------------
+
+_STOP = object()
+
+
+class RevisitPool:
+    """
+    Fixed threads fed from one queue. Playwright's sync API is tied to the
+    thread that started it, so each thread owns its browser for its whole
+    life and closes it on the way out.
+    """
+
+    def __init__(self, size: int = CONCURRENCY, fetcher: str = FETCHER):
+        self.size = size
+        self.fetcher = fetcher
+        self._queue: "queue.Queue" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+
+    def submit(self, url: str) -> "Future[Dict[str, Any]]":
+        if not self._threads:
+            for i in range(self.size):
+                t = threading.Thread(target=self._run, name=f"recrawl-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+        fut: "Future[Dict[str, Any]]" = Future()
+        self._queue.put((url, fut))
+        return fut
+
+    def close(self) -> None:
+        threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(_STOP)
+        for t in threads:
+            t.join()
+
+    def _run(self) -> None:
+        module, _, attr = self.fetcher.partition(":")
+        browser = None
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    return
+                url, fut = item
+                if not fut.set_running_or_notify_cancel():
+                    continue
+                try:
+                    if browser is None:
+                        browser = getattr(importlib.import_module(module), attr)()
+                    fut.set_result(browser.item(url))
+                except Exception as e:
+                    fut.set_exception(e)
+        finally:
+            if browser is not None:
+                browser.close()
+
+
+def tick(session_factory, database, pool: RevisitPool, limit: Optional[int] = None) -> Dict[str, int]:
+    """
+    One scheduler pass: claim what's due (within budget), revisit it
+    through the pool, write back the results, re-score price drops.
+    """
+    from .comps import refresh_comps_for_listing_ids
+
+    if limit is None:
+        # an even pace through the hour; recrawl_budget is the hard cap
+        limit = max(pool.size, math.ceil(PER_HOUR * RECRAWL_INTERVAL_S / 3600))
+    due = database.run_raw(lambda c: claim_due(c, limit))
+    stats = {"claimed": len(due), "revisited": 0, "failed": 0, "terminal": 0, "dropped": 0}
+    if not due:
+        return stats
+
+    futures = {pool.submit(url): listing_id for listing_id, url in due}
+    dropped: List[int] = []
+    db = session_factory()
+    try:
+        for fut in as_completed(futures):
+            listing_id = futures[fut]
+            try:
+                result = fut.result()
+            except Exception as e:
+                # keeps its claim: due again CLAIM_MIN from now
+                print(f"[WARN] revisit of listing {listing_id} failed: {e}")
+                stats["failed"] += 1
+                continue
+            if apply_revisit(db, listing_id, result):
+                dropped.append(listing_id)
+            stats["revisited"] += 1
+            stats["terminal"] += result.get("status") in TERMINAL
+        stats["dropped"] = len(dropped)
+        if dropped:
+            refresh_comps_for_listing_ids(db, dropped)
+    finally:
+        db.close()
+    return stats
+
+
+# ---------------------------------------------------------------------------
+# background schedule
+# ---------------------------------------------------------------------------
+
+_scheduler = None
+_pool: Optional[RevisitPool] = None
+
+
+def start_recrawl(session_factory, database, interval_s: int = RECRAWL_INTERVAL_S) -> None:
+    """Tick every interval_s seconds on an APScheduler background thread."""
+    global _scheduler, _pool
+    if _scheduler is not None or interval_s <= 0:
+        return
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    pool = RevisitPool()
+
+    def run() -> None:
+        try:
+            stats = tick(session_factory, database, pool)
+            if stats["claimed"]:
+                print(f"[DEBUG] recrawl: {stats}")
+        except Exception as e:
+            # next tick tries again
+            print(f"[ERROR] Recrawl tick failed: {e}")
+
+    scheduler = BackgroundScheduler(daemon=True)
+    # one tick at a time; ticks missed while one ran long are dropped
+    scheduler.add_job(
+        run, "interval", seconds=interval_s, id="recrawl",
+        max_instances=1, coalesce=True, next_run_time=datetime.now(),
+    )
+    scheduler.start()
+    _scheduler, _pool = scheduler, pool
+
+
+def stop_recrawl() -> None:
+    global _scheduler, _pool
+    if _scheduler is None:
+        return
+    _scheduler.shutdown(wait=True)
+    _pool.close()
+    _scheduler, _pool = None, None
+
+
+__all__ = [
+    "PER_HOUR",
+    "CONCURRENCY",
+    "TERMINAL",
+    "next_interval",
+    "claim_due",
+    "apply_revisit",
+    "RevisitPool",
+    "tick",
+    "start_recrawl",
+    "stop_recrawl",
+]
@@ -0,0 +1,450 @@
+import hashlib
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from re import _constants as _sre_constants, _parser as _sre_parser
+from typing import Any, Callable, Dict, List, Optional, Pattern, Set, Tuple
+
+import yaml
+from sqlalchemy import insert, or_
+from sqlalchemy.orm import Session
+
+from .. import models
+
+
+# ---------------------------------------------------------------------------
+# PRICING RULES
+#
+# Rules live in data/pricing_rules.yaml (override with PRICING_RULES_PATH).
+# Each file version is compiled once into an immutable RuleSet; swapping the
+# active RuleSet is a single reference assignment, so readers always see one
+# complete version. listing_rule_matches records which rule each listing
+# matched, so a rule edit only re-scores the listings it can affect.
+# ---------------------------------------------------------------------------
+
+DEFAULT_RULES_PATH = Path(
+    os.getenv(
+        "PRICING_RULES_PATH",
+        str(Path(__file__).resolve().parents[2] / "data" / "pricing_rules.yaml"),
+    )
+)
+
+
+@dataclass
+class PricingRule:
+    name: str
+    pattern: Pattern
+    multiplier: float
+    min_resale_floor: float
+    notes: str = ""
+
+
+def _compile(pattern: str) -> Pattern:
+    return re.compile(pattern, flags=re.IGNORECASE)
+
+
+class RuleMatcher:
+    """
+    Pricing rules compiled once into a literal prefilter plus the original
+    confirming regexes.
+
+    For every rule we pull out a set of literal keywords such that any match
+    of the rule must contain at least one of them (e.g. "milwaukee" for
+    `milwaukee.*(m18|fuel)`). A plain substring check is far cheaper than a
+    case-insensitive regex scan, so most rules are ruled out without running
+    their regex at all. Rules are still tried strictly in list order, so the
+    first matching rule wins exactly as before.
+
+    Rules we can't extract keywords from are always confirmed by regex, and
+    non-ASCII text skips the prefilter (IGNORECASE folds a few non-ASCII
+    characters that str.lower() doesn't).
+    """
+
+    def __init__(self, rules: List[PricingRule]):
+        self.rules: List[PricingRule] = list(rules)
+        self._entries: List[tuple] = [
+            (rule, _required_literals(rule.pattern)) for rule in self.rules
+        ]
+
+    def match(self, text: str) -> Optional[PricingRule]:
+        if not text.isascii():
+            for rule in self.rules:
+                if rule.pattern.search(text):
+                    return rule
+            return None
+
+        lowered = text.lower()
+        for rule, literals in self._entries:
+            if literals is not None and not any(lit in lowered for lit in literals):
+                continue
+            if rule.pattern.search(text):
+                return rule
+        return None
+
+
+def _required_literals(pattern: Pattern) -> Optional[frozenset]:
+    """
+    Lowercased ASCII literals, one of which appears in every match of
+    `pattern`, or None if we can't tell.
+    """
+    try:
+        parsed = _sre_parser.parse(pattern.pattern, pattern.flags)
+    except Exception:
+        return None
+    literals = _literals_for_sequence(list(parsed))
+    if not literals or not all(lit.isascii() for lit in literals):
+        return None
+    return frozenset(lit.lower() for lit in literals)
+
+
+def _literals_for_sequence(items: list) -> Optional[set]:
+    # Each candidate is a set of alternatives that a match must contain;
+    # keep the one whose shortest alternative is longest (most selective).
+    candidates: List[set] = []
+    run: List[str] = []
+
+    def flush() -> None:
+        if run:
+            candidates.append({"".join(run)})
+            run.clear()
+
+    for op, av in items:
+        if op is _sre_constants.LITERAL:
+            run.append(chr(av))
+            continue
+        flush()
+        if op is _sre_constants.SUBPATTERN:
+            sub = _literals_for_sequence(list(av[-1]))
+        elif op is _sre_constants.BRANCH:
+            sub = set()
+            for branch in av[1]:
+                branch_literals = _literals_for_sequence(list(branch))
+                if branch_literals is None:
+                    sub = None
+                    break
+                sub |= branch_literals
+        elif op in (_sre_constants.MAX_REPEAT, _sre_constants.MIN_REPEAT) and av[0] >= 1:
+            sub = _literals_for_sequence(list(av[2]))
+        else:
+            sub = None
+        if sub:
+            candidates.append(sub)
+    flush()
+
+    if not candidates:
+        return None
+    return max(candidates, key=lambda c: min(len(lit) for lit in c))
+
+
+@dataclass(frozen=True)
+class RuleSet:
+    version: str  # sha1 of the rules file contents
+    rules: Tuple[PricingRule, ...]
+    matcher: RuleMatcher = field(repr=False)
+
+
+@dataclass
+class RuleDiff:
+    # Listings indexed to any of these rules must be re-scored...
+    rule_names: Set[str]
+    # ...and so must listings that matched no rule, if a pattern was added
+    # or changed (it may match them now).
+    include_unmatched: bool
+
+    @property
+    def empty(self) -> bool:
+        return not self.rule_names and not self.include_unmatched
+
+
+def parse_rules(text: str) -> List[PricingRule]:
+    """
+    Parse the YAML rules document. Raises ValueError on anything malformed
+    so a bad edit never replaces a working rule set.
+    """
+    try:
+        doc = yaml.safe_load(text) or {}
+    except yaml.YAMLError as e:
+        raise ValueError(f"pricing rules file is not valid YAML: {e}") from e
+    entries = doc.get("rules") if isinstance(doc, dict) else None
+    if not isinstance(entries, list):
+        raise ValueError("pricing rules file must have a top-level 'rules' list")
+
+    rules: List[PricingRule] = []
+    seen: Set[str] = set()
+    for i, entry in enumerate(entries):
+        try:
+            name = str(entry["name"])
+            pattern = entry["pattern"]
+            if isinstance(pattern, list):
+                pattern = "".join(str(p) for p in pattern)
+            rule = PricingRule(
+                name=name,
+                pattern=_compile(pattern),
+                multiplier=float(entry["multiplier"]),
+                min_resale_floor=float(entry["min_resale_floor"]),
+                notes=str(entry.get("notes") or ""),
+            )
+        except (KeyError, TypeError, ValueError, re.error) as e:
+            raise ValueError(f"invalid pricing rule #{i + 1}: {e!r}") from e
+        if name in seen:
+            raise ValueError(f"duplicate pricing rule name: {name!r}")
+        seen.add(name)
+        rules.append(rule)
+    return rules
+
+
+def _version_of(raw: bytes) -> str:
+    return hashlib.sha1(raw).hexdigest()[:12]
+
+
+def _ruleset_from_bytes(raw: bytes) -> RuleSet:
+    rules = parse_rules(raw.decode("utf-8"))
+    return RuleSet(version=_version_of(raw), rules=tuple(rules), matcher=RuleMatcher(rules))
+
+
+def load_ruleset(path: Optional[Path] = None) -> RuleSet:
+    return _ruleset_from_bytes(Path(path or DEFAULT_RULES_PATH).read_bytes())
+
+
+_active_ruleset: Optional[RuleSet] = None
+_swap_lock = threading.Lock()
+
+
+def get_ruleset() -> RuleSet:
+    """
+    The active RuleSet. Callers should grab it once per evaluation so the
+    matched rule and the recorded version always agree.
+    """
+    ruleset = _active_ruleset
+    if ruleset is None:
+        with _swap_lock:
+            if _active_ruleset is None:
+                _set_active(load_ruleset())
+            ruleset = _active_ruleset
+    return ruleset
+
+
+def _set_active(ruleset: RuleSet) -> None:
+    global _active_ruleset
+    _active_ruleset = ruleset
+
+
+def reload_rules(path: Optional[Path] = None) -> Optional[Tuple[RuleSet, RuleSet]]:
+    """
+    Re-read the rules file and swap it in if its contents changed.
+
+    Returns (old, new) when a new version was activated, None when the file
+    is unchanged. A malformed file raises ValueError and leaves the active
+    rules in place.
+    """
+    path = Path(path or DEFAULT_RULES_PATH)
+    old = get_ruleset()
+    raw = path.read_bytes()
+    if _version_of(raw) == old.version:
+        return None
+
+    new = _ruleset_from_bytes(raw)
+    with _swap_lock:
+        old = _active_ruleset
+        _set_active(new)
+    return old, new
+
+
+def diff_rulesets(old: RuleSet, new: RuleSet) -> RuleDiff:
+    """
+    Work out which indexed listings a rule change can affect.
+
+    Rules are first-match-wins, so if the first k rules keep the same names
+    and patterns in the same order, every listing matched by one of them
+    still matches it. Everything from the first differing position onward
+    (plus unmatched listings) may land on a different rule. Separately, any
+    rule whose multiplier / floor / notes changed affects its own listings.
+    """
+    old_keys = [(r.name, r.pattern) for r in old.rules]
+    new_keys = [(r.name, r.pattern) for r in new.rules]
+
+    k = 0
+    while k < min(len(old_keys), len(new_keys)) and old_keys[k] == new_keys[k]:
+        k += 1
+
+    names = {r.name for r in old.rules[k:]}
+    new_by_name = {r.name: r for r in new.rules}
+    for rule in old.rules:
+        updated = new_by_name.get(rule.name)
+        if updated is not None and (
+            updated.multiplier != rule.multiplier
+            or updated.min_resale_floor != rule.min_resale_floor
+            or updated.notes != rule.notes
+        ):
+            names.add(rule.name)
+
+    return RuleDiff(rule_names=names, include_unmatched=k < len(new_keys))
+
+
+# ---------------------------------------------------------------------------
+# RULE MATCH INDEX
+# ---------------------------------------------------------------------------
+
+def record_rule_matches(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """
+    Upsert listing_rule_matches rows (no commit). Each dict needs
+    listing_id, rule_name and rules_version; the comps service also passes
+    inputs_fingerprint and comps_version. Delete + insert keeps it to two
+    statements on any backend.
+    """
+    if not rows:
+        return
+    ids = [row["listing_id"] for row in rows]
+    db.query(models.ListingRuleMatch).filter(
+        models.ListingRuleMatch.listing_id.in_(ids)
+    ).delete(synchronize_session=False)
+    db.execute(insert(models.ListingRuleMatch), rows)
+
+
+def affected_listing_ids(db: Session, diff: RuleDiff) -> List[int]:
+    """
+    IDs of listings a RuleDiff can change, including listings that were
+    never indexed (scored before the index existed).
+    """
+    if diff.empty:
+        return []
+
+    Listing, Match = models.Listing, models.ListingRuleMatch
+    conditions = [Match.listing_id.is_(None)]
+    if diff.rule_names:
+        conditions.append(Match.rule_name.in_(sorted(diff.rule_names)))
+    if diff.include_unmatched:
+        conditions.append(Match.rule_name.is_(None))
+
+    rows = (
+        db.query(Listing.id)
+        .outerjoin(Match, Match.listing_id == Listing.id)
+        .filter(or_(*conditions))
+        .order_by(Listing.id)
+        .all()
+    )
+    return [r[0] for r in rows]
+
+
+def rescore_affected(
+    session_factory: Callable[[], Session],
+    diff: RuleDiff,
+    chunk_size: int = 500,
+) -> int:
+    """
+    Re-score the listings a rule change affects, in chunks, each chunk in
+    its own session and transaction. Returns the number re-scored.
+    """
+    from .comps import refresh_comps_for_listing_ids  # avoid circular import
+
+    db = session_factory()
+    try:
+        ids = affected_listing_ids(db, diff)
+    finally:
+        db.close()
+
+    for start in range(0, len(ids), chunk_size):
+        db = session_factory()
+        try:
+            refresh_comps_for_listing_ids(db, ids[start:start + chunk_size])
+        finally:
+            db.close()
+    return len(ids)
+
+
+# ---------------------------------------------------------------------------
+# FILE WATCHER
+# ---------------------------------------------------------------------------
+
+def apply_rules_change(
+    session_factory: Callable[[], Session],
+    path: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """
+    Reload the rules file and re-score whatever the change affects.
+    """
+    try:
+        swapped = reload_rules(path)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] Pricing rules not reloaded, keeping current version: {e}")
+        return {"reloaded": False, "error": str(e)}
+
+    if swapped is None:
+        return {"reloaded": False}
+
+    old, new = swapped
+    diff = diff_rulesets(old, new)
+    print(
+        f"[DEBUG] Pricing rules {old.version} -> {new.version}; "
+        f"affected rules={sorted(diff.rule_names)} unmatched={diff.include_unmatched}"
+    )
+    rescored = rescore_affected(session_factory, diff)
+    print(f"[DEBUG] Re-scored {rescored} listings after rules change")
+    return {"reloaded": True, "version": new.version, "rescored": rescored}
+
+
+_watcher: Optional[Tuple[threading.Thread, threading.Event]] = None
+
+
+def start_rules_watcher(
+    session_factory: Callable[[], Session],
+    path: Optional[Path] = None,
+) -> None:
+    """
+    Watch the rules file in a daemon thread and apply changes as they land.
+    Call stop_rules_watcher() on shutdown.
+    """
+    global _watcher
+    from watchfiles import watch
+
+    if _watcher is not None:
+        return
+
+    path = Path(path or DEFAULT_RULES_PATH).resolve()
+    stop = threading.Event()
+
+    def run() -> None:
+        get_ruleset()
+        for changes in watch(path.parent, stop_event=stop):
+            if any(Path(changed).resolve() == path for _, changed in changes):
+                try:
+                    apply_rules_change(session_factory, path)
+                except Exception as e:
+                    # Keep watching; the next save gets another try.
+                    print(f"[ERROR] Applying pricing rules change failed: {e}")
+
+    thread = threading.Thread(target=run, name="pricing-rules-watcher", daemon=True)
+    thread.start()
+    _watcher = (thread, stop)
+
+
+def stop_rules_watcher(timeout: float = 5.0) -> None:
+    global _watcher
+    if _watcher is None:
+        return
+    thread, stop = _watcher
+    stop.set()
+    thread.join(timeout)
+    _watcher = None
+
+
+__all__ = [
+    "DEFAULT_RULES_PATH",
+    "PricingRule",
+    "RuleMatcher",
+    "RuleSet",
+    "RuleDiff",
+    "parse_rules",
+    "load_ruleset",
+    "get_ruleset",
+    "reload_rules",
+    "diff_rulesets",
+    "record_rule_matches",
+    "affected_listing_ids",
+    "rescore_affected",
+    "apply_rules_change",
+    "start_rules_watcher",
+    "stop_rules_watcher",
+]
@@ -1,25 +1,37 @@
-import json, urllib.request, sys
+import sys
 
-API = "http://127.0.0.1:8000"
+from app.migrations import migrate
+from app.ranking import COMPS_TTL_HOURS, RANK_COLUMNS, top_k
+from app.sqlite_tuning import connect
+from deals_report import DATABASE_URL, refresh
 
-def recent(limit=25):
-    with urllib.request.urlopen(f"{API}/recent?limit={limit}") as r:
-        return json.loads(r.read().decode())["rows"]
+def main(limit=25, ttl=COMPS_TTL_HOURS, lookup_ebay=False, notify=False):
+    con = connect(DATABASE_URL.replace("sqlite:///", ""))
+    try:
+        migrate(con)
+        ids = [r[0] for r in con.execute("SELECT id FROM listings ORDER BY id DESC LIMIT ?", (limit,))]
+        refresh(con, ttl=ttl, ids=ids, lookup_ebay=lookup_ebay)
+        rows = list(top_k(con, limit, ids=ids))
+    finally:
+        con.close()
+    for id, title, *_, profit, roi, is_deal, score, comps_at in rows:
+        print(f'[{id}] {(title or "")[:50]} → profit={profit} roi={roi or 0:.0%} score={score} '
+              f'deal={bool(is_deal)} (comps {comps_at})')
+    if notify:
+        from app.db_access import open_database
+        from app.notify_email import notify_deal
 
-def refresh(id, notify=False):
-    url = f"{API}/listing/{id}/refresh_comps" + ("?notify=true" if notify else "")
-    req = urllib.request.Request(url, method="POST")
-    with urllib.request.urlopen(req) as r:
-        return json.loads(r.read().decode())
-
-def main(limit=25, notify=False):
-    rows = recent(limit)
-    for r in rows:
-        out = refresh(r["id"], notify=notify)
-        est = out.get("estimate", {})
-        print(f'[{r["id"]}] {r["title"][:50]} → profit={est.get("profit")} roi%={est.get("roi_percent")} score={est.get("score")}')
+        database = open_database(DATABASE_URL)
+        sent = sum(notify_deal(database, dict(zip(RANK_COLUMNS, r))) for r in rows if r[RANK_COLUMNS.index("is_deal")])
+        print(f"emailed {sent} deals")
     print("✅ rechecked")
 
 if __name__ == "__main__":
-    notify = "--notify" in sys.argv
-    main(limit=25, notify=notify)
+    # Usage: python recheck_recent.py [--notify] [--force] [--ebay]
+    # --force re-scores all 25 even if their comps are younger than the TTL
+    main(
+        limit=25,
+        ttl=0 if "--force" in sys.argv else COMPS_TTL_HOURS,
+        lookup_ebay="--ebay" in sys.argv,
+        notify="--notify" in sys.argv,
+    )
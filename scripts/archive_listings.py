@@ -0,0 +1,23 @@
+import sys, time
+
+from app.retention import ARCHIVE_AFTER_DAYS, RAW_HTML_AFTER_DAYS, run_retention
+from flipfinder.db import database, init_db
+
+
+def main(full_vacuum: bool = False):
+    init_db()
+    t0 = time.perf_counter()
+    stats = run_retention(database, full_vacuum=full_vacuum)
+    elapsed = time.perf_counter() - t0
+    database.close()
+    print(
+        f"✅ archived {stats['archived']} (older than {ARCHIVE_AFTER_DAYS} days or passed) | "
+        f"raw_html moved for {stats['html_stripped']} (older than {RAW_HTML_AFTER_DAYS} days)"
+        + (" | vacuumed" if full_vacuum else "")
+        + f" ({elapsed:.1f}s)"
+    )
+
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.archive_listings [--vacuum]   (e.g. nightly from cron)
+    main(full_vacuum="--vacuum" in sys.argv)
@@ -0,0 +1,129 @@
+import os, random, sqlite3, sys, tempfile, time
+
+from app.analytics import DIMENSIONS, ROLLUP_TABLE, _recompute_sql, check_rollups, read_rollups
+from app.migrations import migrate
+from app.sqlite_tuning import apply_pragmas
+from scripts.bench_near_dupes import CITIES
+from scripts.bench_rule_matcher import BRANDS, FILLER
+
+# ---- knobs you can tweak ----
+N_LISTINGS = 500_000
+BATCH = 1_000         # listings per transaction, about one scrape
+RESCORE_SHARE = 0.2   # share re-scored afterwards (a rules edit)
+SEED = 43
+KEYWORDS = [f"{b} {w}" for b in BRANDS[:40] for w in ("dresser", "drill", "jacket")]
+RULES = [f"rule_{i}" for i in range(60)] + [None]
+
+
+def _listing(rnd: random.Random, i: int):
+    price = round(rnd.uniform(5, 3000), 2)
+    resale = round(price * rnd.uniform(0.5, 2.2), 2)
+    profit = round(resale - price, 2)
+    roi = profit / price
+    day = 1 + i * 180 // N_LISTINGS
+    return (
+        "facebook", f"bench://{i}", " ".join([rnd.choice(BRANDS)] + rnd.sample(FILLER, 3)),
+        price, "CAD", f"{rnd.choice(CITIES)}, ON", rnd.choice(KEYWORDS),
+        f"2025-{1 + day // 31:02d}-{1 + day % 28:02d} 12:00:00",
+        resale, profit, roi, int(profit >= 150 and roi >= 0.35),
+    )
+
+
+INSERT = (
+    "INSERT INTO listings (source, url, title, price, currency, location, search_keyword, "
+    "created_at, estimated_resale, profit, roi, is_deal) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)"
+)
+
+
+def _open(path: str, triggers: bool) -> sqlite3.Connection:
+    con = sqlite3.connect(path)
+    apply_pragmas(con)
+    migrate(con)
+    if not triggers:
+        for (name,) in con.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE ?",
+            (f"{ROLLUP_TABLE}%",),
+        ).fetchall():
+            con.execute(f"DROP TRIGGER {name}")
+        con.commit()
+    return con
+
+
+def _load(con: sqlite3.Connection, n: int) -> float:
+    """Insert + score like the scrape router and comps do; returns seconds."""
+    rnd = random.Random(SEED)
+    t0 = time.perf_counter()
+    for start in range(0, n, BATCH):
+        rows = [_listing(rnd, i) for i in range(start, min(n, start + BATCH))]
+        con.executemany(INSERT, rows)
+        con.executemany(
+            "INSERT INTO listing_rule_matches (listing_id, rule_name, rules_version) "
+            "SELECT id, ?, 'v1' FROM listings WHERE source = 'facebook' AND url = ?",
+            [(rnd.choice(RULES), r[1]) for r in rows],
+        )
+        con.commit()
+    return time.perf_counter() - t0
+
+
+def _rescore(con: sqlite3.Connection, n: int) -> float:
+    """Re-score a share of the listings the way _save_evaluated() does."""
+    rnd = random.Random(SEED + 1)
+    ids = rnd.sample(range(1, n + 1), int(n * RESCORE_SHARE))
+    t0 = time.perf_counter()
+    for start in range(0, len(ids), BATCH):
+        chunk = ids[start:start + BATCH]
+        updates = []
+        for lid in chunk:
+            profit = round(rnd.uniform(-500, 1500), 2)
+            roi = rnd.uniform(-0.5, 2.0)
+            updates.append((profit, roi, int(profit >= 150 and roi >= 0.35), lid))
+        con.executemany("UPDATE listings SET profit = ?, roi = ?, is_deal = ? WHERE id = ?", updates)
+        con.execute(
+            f"DELETE FROM listing_rule_matches WHERE listing_id IN ({','.join('?' * len(chunk))})", chunk
+        )
+        con.executemany(
+            "INSERT INTO listing_rule_matches (listing_id, rule_name, rules_version) VALUES (?, ?, 'v2')",
+            [(lid, rnd.choice(RULES)) for lid in chunk],
+        )
+        con.commit()
+    return time.perf_counter() - t0
+
+
+def _best(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(n: int = N_LISTINGS):
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = _open(os.path.join(tmp, "plain.db"), triggers=False)
+        con = _open(os.path.join(tmp, "rollups.db"), triggers=True)
+        load_plain, load = _load(plain, n), _load(con, n)
+        rescore_plain, rescore = _rescore(plain, n), _rescore(con, n)
+        rescored = int(n * RESCORE_SHARE)
+
+        print(f"{n} listings, {len(KEYWORDS)} keywords, {len(RULES)} rules, "
+              f"{len(CITIES)} cities, ~180 days")
+        print(f"{'':<26}{'no rollups':>12}{'rollups':>12}")
+        print(f"{'insert + score /s':<26}{n / load_plain:>12.0f}{n / load:>12.0f}")
+        print(f"{'re-score /s':<26}{rescored / rescore_plain:>12.0f}{rescored / rescore:>12.0f}")
+
+        print(f"\n{'per dimension':<12}{'GROUP BY listings':>20}{'/analytics read':>18}")
+        for dim in DIMENSIONS:
+            full = _best(lambda: con.execute(_recompute_sql(dim)).fetchall())
+            read = _best(lambda: read_rollups(con, dim, order="deal_rate", limit=1000))
+            print(f"{dim:<12}{full * 1e3:>17.0f} ms{read * 1e3:>15.2f} ms")
+
+        diffs = check_rollups(con)
+        print(f"\nconsistency check: {'ok' if not diffs else f'{len(diffs)} rows differ'}")
+        plain.close()
+        con.close()
+
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.bench_analytics [n_listings]
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else N_LISTINGS)
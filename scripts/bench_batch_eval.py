@@ -0,0 +1,90 @@
+import math, random, sys, time
+from typing import List, Optional
+
+from app.estimator import estimate_profit, decision_label
+from app.score import deal_score
+from flipfinder.services.comps import compute_profit_metrics
+from flipfinder.services.batch import evaluate_batch
+
+# ---- knobs you can tweak ----
+N_LISTINGS = 100_000
+SEED = 27
+
+
+def _maybe(rnd: random.Random, value: float) -> Optional[float]:
+    return None if rnd.random() < 0.05 else value
+
+
+def synthetic_inputs(n: int, seed: int = SEED):
+    rnd = random.Random(seed)
+    prices, resales, counts, fees = [], [], [], []
+    for _ in range(n):
+        # whole cents, like real listings, plus some zero / negative edge cases
+        price = round(rnd.choice([0.0, rnd.uniform(-5, 5), rnd.uniform(1, 3000)]), 2)
+        resale = round(price * rnd.uniform(0.5, 3.5) + rnd.choice([0.0, 0.005]), 3)
+        prices.append(_maybe(rnd, price))
+        resales.append(_maybe(rnd, resale))
+        counts.append(_maybe(rnd, rnd.randint(0, 60)))
+        fees.append(rnd.choice([0.13, 0.1, 0.15]))
+    return prices, resales, counts, fees
+
+
+def scalar(prices, resales, counts, fees) -> List[tuple]:
+    out = []
+    for p, r, c, f in zip(prices, resales, counts, fees):
+        m = compute_profit_metrics(p, r)
+        est = estimate_profit(p, r, fee_rate=f)
+        try:
+            score = deal_score(p, r, c)
+        except Exception:
+            score = None
+        out.append((
+            m["profit"], m["roi"], m["is_deal"], m["reason"],
+            est["profit"], est["roi_percent"],
+            decision_label(est["profit"], est["roi_percent"]),
+            score,
+        ))
+    return out
+
+
+def main(n: int = N_LISTINGS):
+    prices, resales, counts, fees = synthetic_inputs(n)
+
+    t0 = time.perf_counter()
+    expected = scalar(prices, resales, counts, fees)
+    t_scalar = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    res = evaluate_batch(prices, resales, counts, fees)
+    t_batch = time.perf_counter() - t0
+
+    keys = ["profit", "roi", "is_deal", "reason", "net_profit", "roi_percent", "decision", "score"]
+    mismatches = 0
+    for i, row in enumerate(expected):
+        for k, want in zip(keys, row):
+            got = res[k][i]
+            if want is None:
+                ok = math.isnan(got)
+            elif isinstance(want, bool):
+                ok = bool(got) == want
+            elif isinstance(want, str):
+                ok = got == want
+            else:
+                ok = float(got) == want
+            if not ok:
+                mismatches += 1
+                if mismatches <= 10:
+                    print(f"mismatch row={i} key={k} want={want!r} got={got!r}")
+
+    print(f"listings:   {n}")
+    print(f"scalar:     {t_scalar * 1000:.1f} ms")
+    print(f"batch:      {t_batch * 1000:.1f} ms")
+    print(f"speedup:    {t_scalar / t_batch:.1f}x")
+    print(f"mismatches: {mismatches}")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.bench_batch_eval [n_listings]
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else N_LISTINGS)
@@ -0,0 +1,147 @@
+import math, os, random, sys, tempfile
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+# Replays past crawl runs (crawl_runs) to compare keyword schedules at the
+# same browser-time budget: the old uniform sweep, the bandit planner
+# (flipfinder/services/planner.py) starting from nothing, and an oracle
+# that already knows each keyword's average yield. Each simulated search of
+# a keyword draws one of that keyword's recorded runs at random.
+#
+# Without --db it first records a synthetic history (a few uniform sweeps
+# over the real keyword lists, where a handful of keywords carry most of
+# the deals) into a scratch database through record_run(), then replays it.
+
+# ---- knobs you can tweak ----
+ROUNDS = 200
+BUDGET_MINUTES = 20.0     # per round
+HOURS_PER_ROUND = 6
+HISTORY_SWEEPS = 8        # synthetic history: uniform sweeps recorded
+SEED = 48
+
+
+def _synthetic_history(db_path: str):
+    from flipfinder.db import SessionLocal, init_db
+    from flipfinder.services.planner import load_keywords, record_run
+
+    rnd = random.Random(SEED)
+    init_db()
+    keywords = load_keywords()
+    # a few keywords are where the deals are; most rarely or never produce one
+    truth = {
+        kw: {
+            "deals": rnd.choice([0.0] * 6 + [0.05, 0.1, 0.2, 0.5, 1.5]),
+            "new": rnd.uniform(2, 25),
+            "seconds": rnd.uniform(30, 150),
+        }
+        for kw in keywords
+    }
+    db = SessionLocal()
+    start = datetime(2025, 1, 1)
+    try:
+        for sweep in range(HISTORY_SWEEPS):
+            for i, kw in enumerate(keywords):
+                t = truth[kw]
+                at = start + timedelta(hours=sweep * 24, seconds=i * 90)
+                new = sum(rnd.random() < t["new"] / 30 for _ in range(30))
+                deals = min(new, _poisson(rnd, t["deals"]))
+                record_run(db, kw, max(rnd.gauss(t["seconds"], t["seconds"] * 0.2), 5.0),
+                           30, new, deals, at.strftime("%Y-%m-%d %H:%M:%S"))
+    finally:
+        db.close()
+
+
+def _poisson(rnd: random.Random, lam: float) -> int:
+    n, p, limit = 0, 1.0, math.exp(-lam)
+    while True:
+        p *= rnd.random()
+        if p < limit:
+            return n
+        n += 1
+
+
+def _history(db_path: str):
+    import sqlite3
+
+    con = sqlite3.connect(db_path)
+    runs = defaultdict(list)
+    for kw, seconds, new, deals in con.execute(
+        "SELECT keyword, seconds, new_listings, deals FROM crawl_runs ORDER BY id"
+    ):
+        runs[kw].append((max(seconds, 1.0) / 60.0, new, deals))
+    con.close()
+    return dict(runs)
+
+
+def simulate(runs, rounds: int, budget: float, policy: str, seed: int = SEED):
+    """(deals, browser minutes, distinct keywords searched) over `rounds` rounds."""
+    from flipfinder.services.planner import KeywordStats, choose, with_run
+
+    rnd = random.Random(seed)
+    keywords = sorted(runs)
+    mean_rate = {
+        kw: sum(r[2] for r in rs) / sum(r[0] for r in rs) for kw, rs in runs.items()
+    }
+    mean_cost = {kw: sum(r[0] for r in rs) / len(rs) for kw, rs in runs.items()}
+    stats = {}
+    deals = minutes = 0.0
+    searched = set()
+    cursor = 0
+    clock = datetime(2025, 6, 1)
+    for _ in range(rounds):
+        now = clock.strftime("%Y-%m-%d %H:%M:%S")
+        if policy == "planner":
+            picked = choose(stats, keywords, budget, rnd, now)
+        elif policy == "oracle":
+            picked, spent = [], 0.0
+            for kw in sorted(keywords, key=mean_rate.get, reverse=True):
+                if spent + mean_cost[kw] <= budget:
+                    picked.append(kw)
+                    spent += mean_cost[kw]
+        else:  # uniform: carry on the sweep where the last round stopped
+            picked, spent = [], 0.0
+            while spent < budget:
+                kw = keywords[cursor % len(keywords)]
+                cursor += 1
+                picked.append(kw)
+                spent += mean_cost[kw]
+        for kw in picked:
+            cost, new, d = rnd.choice(runs[kw])
+            deals += d
+            minutes += cost
+            searched.add(kw)
+            if policy == "planner":
+                stats[kw] = with_run(stats.get(kw) or KeywordStats(kw), cost * 60, new, d, now)
+        clock += timedelta(hours=HOURS_PER_ROUND)
+    return deals, minutes, len(searched)
+
+
+def main(db_path=None, rounds=ROUNDS, budget=BUDGET_MINUTES):
+    with tempfile.TemporaryDirectory() as tmp:
+        if db_path is None:
+            # flipfinder opens ./flipfinder.db, so import it from inside tmp
+            os.chdir(tmp)
+            os.environ["DATABASE_URL"] = "sqlite:///flipfinder.db"
+            _synthetic_history("flipfinder.db")
+            db_path = "flipfinder.db"
+        runs = _history(db_path)
+        if not runs:
+            print(f"no crawl_runs in {db_path}")
+            return
+        n_runs = sum(len(r) for r in runs.values())
+        print(f"\nreplaying {n_runs} runs of {len(runs)} keywords: "
+              f"{rounds} rounds x {budget:.0f} browser minutes")
+        results = {p: simulate(runs, rounds, budget, p) for p in ("uniform", "planner", "oracle")}
+        base = results["uniform"][0] / results["uniform"][1]
+        for policy, (deals, minutes, searched) in results.items():
+            rate = deals / minutes
+            print(f"  {policy:<10}{deals:>8.0f} deals  {minutes:>8.0f} min  "
+                  f"{rate:>7.3f} deals/min  ({rate / base:.1f}x uniform, {searched} keywords tried)")
+
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.bench_crawl_planner [--db=flipfinder.db] [rounds]
+    args = sys.argv[1:]
+    db = next((a.split("=", 1)[1] for a in args if a.startswith("--db=")), None)
+    nums = [a for a in args if not a.startswith("--")]
+    main(os.path.abspath(db) if db else None, int(nums[0]) if nums else ROUNDS)
@@ -0,0 +1,173 @@
+import os, re, sys, tempfile, threading, time, zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from urllib.request import urlopen
+
+# Throughput of the sharded crawler (flipfinder/services/crawler.py) with
+# 1, 2, 4, ... worker processes, against a local fixture server that
+# answers Marketplace search URLs with a page of cards after LATENCY_S
+# (standing in for Facebook's page load, which is what a search waits on).
+# Then a crash check: a worker dies mid-search, and its task has to come
+# back through the expired lease and still get done.
+#
+# Workers use Playwright's Chromium when it launches here (pointed at the
+# fixture through FF_MARKETPLACE_BASE); without it they fetch the same
+# pages over plain HTTP and parse them with the scraper's own card parser
+# (HttpSearcher below), which still exercises the queue, leases and the
+# shared upsert path, just not the browser.
+#
+# Usage: python -m scripts.bench_crawl_workers [--http] [max workers]
+
+# ---- knobs you can tweak ----
+WORKERS = [1, 2, 4, 8]
+TASKS = 48               # searches per run
+LATENCY_S = 0.5          # fixture page load
+CARDS = 30               # listings per results page
+LEASE_S = 30
+CRASH_LEASE_S = 3        # short, so the crash check doesn't wait long
+CRASH_KEYWORD = "bench crash"
+
+_requests = []           # (start, end) of every search the fixture served
+_requests_lock = threading.Lock()
+
+
+class _Fixture(BaseHTTPRequestHandler):
+    def do_GET(self):
+        t0 = time.time()
+        url = urlparse(self.path)
+        query = parse_qs(url.query).get("query", [""])[0]
+        time.sleep(LATENCY_S)
+        seed = zlib.crc32(query.encode())
+        cards = "".join(
+            f'<a role="link" href="{self._base()}/item/{seed}{i}/">'
+            f"<div>CA${50 + (seed + i * 37) % 900}</div><div>{query} no {i}</div>"
+            f"<div>Toronto, ON</div></a>"
+            for i in range(CARDS)
+        )
+        body = f"<html><body>{cards}</body></html>".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with _requests_lock:
+            _requests.append((t0, time.time()))
+
+    def _base(self):
+        return f"http://{self.headers['Host']}/marketplace"
+
+    def log_message(self, *args):
+        pass
+
+
+CARD_RE = re.compile(r'<a role="link" href="([^"]+/marketplace/item/[^"]+)">(.*?)</a>', re.S)
+
+
+class HttpSearcher:
+    """MarketplaceBrowser stand-in without a browser: plain GET + the scraper's card parser."""
+
+    def search(self, query, max_results=30, radius_km=50, location=None):
+        from flipfinder.scrapers import facebook
+
+        if query == CRASH_KEYWORD:
+            marker = os.path.abspath("crashed.marker")
+            if not os.path.exists(marker):
+                open(marker, "w").close()
+                os._exit(1)  # dies holding the lease
+
+        with urlopen(facebook._search_url(query, radius_km, location), timeout=60) as r:
+            html = r.read().decode()
+        keywords = facebook._normalize_location_keywords(location)
+        items = []
+        for href, inner in CARD_RE.findall(html)[:max_results]:
+            text = re.sub(r"<[^>]+>", "\n", inner)
+            parsed = facebook._parse_card_text(text)
+            if facebook._location_matches(parsed["location"], keywords):
+                items.append({"url": href, **parsed})
+        return items
+
+    def close(self):
+        pass
+
+
+def _chromium_works() -> bool:
+    try:
+        from playwright.sync_api import sync_playwright
+
+        with sync_playwright() as p:
+            p.chromium.launch(headless=True).close()
+        return True
+    except Exception:
+        return False
+
+
+def main(max_workers=max(WORKERS), http_only=False):
+    tmp = tempfile.TemporaryDirectory()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Fixture)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        # flipfinder opens ./flipfinder.db, and the workers inherit the cwd
+        os.chdir(tmp.name)
+        os.environ["FF_MARKETPLACE_BASE"] = f"http://127.0.0.1:{server.server_port}/marketplace"
+        # read by each worker process when it starts
+        os.environ["FF_CRAWL_LEASE_S"] = str(LEASE_S)
+        os.environ["FF_PAGE_SETTLE_MS"] = "100"
+        from flipfinder.db import database, init_db
+        from flipfinder.services.crawler import counts, enqueue, run_workers
+
+        init_db()
+        if not http_only and _chromium_works():
+            searcher, how = "flipfinder.scrapers.facebook:MarketplaceBrowser", "Chromium"
+        else:
+            searcher, how = "scripts.bench_crawl_workers:HttpSearcher", "plain HTTP (no Chromium here)"
+        print(
+            f"\n{TASKS} searches, {LATENCY_S}s fixture page load, workers via {how}, "
+            f"{os.cpu_count()} CPU(s)"
+        )
+
+        base = None
+        for n in [w for w in WORKERS if w <= max_workers]:
+            _requests.clear()
+            tasks = [(f"bench item {n} {i}", "Toronto, ON") for i in range(TASKS)]
+            database.run_raw(lambda c: enqueue(c, tasks))
+            t0 = time.perf_counter()
+            left = run_workers(n, searcher=searcher)
+            wall = time.perf_counter() - t0
+            # throughput over the searching itself, not the process start-up
+            busy = max(e for _, e in _requests) - min(s for s, _ in _requests)
+            rate = len(_requests) / busy
+            base = base or rate
+            print(
+                f"  {n} workers: {left['done']:>4} done  {busy:6.1f}s busy ({wall:5.1f}s wall)  "
+                f"{rate:6.2f} searches/s  {rate / base:4.1f}x  ({rate / base / n:.0%} of linear)"
+            )
+
+        # crash check: one worker dies mid-search holding the lease
+        if searcher.endswith("HttpSearcher"):
+            os.environ["FF_CRAWL_LEASE_S"] = str(CRASH_LEASE_S)
+            database.run_raw(lambda c: enqueue(c, [(CRASH_KEYWORD, "Toronto, ON")]))
+            t0 = time.perf_counter()
+            run_workers(2, searcher=searcher)
+            row = database.run_raw(
+                lambda c: c.execute(
+                    "SELECT status, attempts, error FROM crawl_queue WHERE keyword = ?",
+                    (CRASH_KEYWORD,),
+                ).fetchone()
+            )
+            ok = row[0] == "done" and row[1] == 2
+            print(
+                f"  crash check: {'ok' if ok else 'FAILED'} -- status={row[0]} after "
+                f"{row[1]} attempts ({time.perf_counter() - t0:.1f}s, lease {CRASH_LEASE_S}s)"
+            )
+        print(f"  queue: {database.run_raw(counts)}")
+        database.close()
+    finally:
+        server.shutdown()
+        os.chdir("/")
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    nums = [a for a in args if not a.startswith("--")]
+    main(int(nums[0]) if nums else max(WORKERS), http_only="--http" in args)
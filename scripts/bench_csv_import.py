@@ -0,0 +1,96 @@
+import csv, os, sqlite3, sys, tempfile, time
+
+# ---- knobs you can tweak ----
+N_ROWS = 50_000
+OLD_SAMPLE = 500      # rows pushed through the old per-row path (extrapolated)
+SEED = 44
+
+
+def write_csv(path: str, n: int, offset: int = 0) -> None:
+    """A watchlist export: varied titles, ~10% relists (bench_near_dupes)."""
+    from scripts.bench_near_dupes import generate
+
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["url", "title", "price", "currency", "location"])
+        for i, (_, title, price, city, _) in enumerate(generate(n, seed=SEED + offset)):
+            w.writerow([
+                f"https://www.facebook.com/marketplace/item/{10**15 + offset + i}/",
+                title, f"CA${price:,.2f}", "CAD", city,
+            ])
+
+
+def old_per_row(csv_path: str, db_path: str) -> float:
+    """
+    The previous loop minus its HTTP hop: insert + commit per row, then one
+    single-listing comps call per row. Returns seconds per row.
+    """
+    from bulk_add_from_csv import parse_price
+    from app.near_dupes import index_listing
+    from app.sqlite_tuning import connect
+    from flipfinder.db import SessionLocal
+    from flipfinder.services.comps import refresh_comps_for_listing_id
+
+    con = connect(db_path)
+    with open(csv_path, newline="") as f:
+        rows = [r for _, r in zip(range(OLD_SAMPLE), csv.DictReader(f))]
+    t0 = time.perf_counter()
+    for r in rows:
+        cur = con.execute(
+            "INSERT INTO listings (title, price, url, currency, location, label, source, note, created_at) "
+            "VALUES (?, ?, ?, ?, ?, 'watch', 'facebook', 'csv import', datetime('now'))",
+            (r["title"], parse_price(r["price"]), r["url"], r["currency"], r["location"]),
+        )
+        index_listing(con, cur.lastrowid, r["title"], parse_price(r["price"]), r["location"])
+        con.commit()
+        s = SessionLocal()
+        try:
+            refresh_comps_for_listing_id(s, cur.lastrowid)
+        finally:
+            s.close()
+    con.close()
+    return (time.perf_counter() - t0) / len(rows)
+
+
+def main(n: int = N_ROWS):
+    with tempfile.TemporaryDirectory() as tmp:
+        # flipfinder opens ./flipfinder.db, so import it from inside tmp
+        os.chdir(tmp)
+        os.environ["DATABASE_URL"] = "sqlite:///flipfinder.db"
+        import bulk_add_from_csv
+        from flipfinder.db import init_db
+
+        init_db()
+        csv_path = os.path.join(tmp, "watchlist.csv")
+        write_csv(csv_path, n)
+
+        t0 = time.perf_counter()
+        bulk_add_from_csv.main(csv_path, notify=False)
+        took = time.perf_counter() - t0
+
+        con = sqlite3.connect("flipfinder.db")
+        stored, scored = con.execute(
+            "SELECT COUNT(*), COUNT(estimated_resale) FROM listings"
+        ).fetchone()
+        con.close()
+
+        # a second run over the same file: everything is already saved
+        t0 = time.perf_counter()
+        bulk_add_from_csv.main(csv_path, notify=False)
+        again = time.perf_counter() - t0
+
+        old_csv = os.path.join(tmp, "old.csv")
+        write_csv(old_csv, OLD_SAMPLE, offset=n)
+        per_row = old_per_row(old_csv, "flipfinder.db")
+
+        print(f"\n{n} CSV rows (rules-only comps, no eBay, no email)")
+        print(f"  {'streamed import + batch comps':<36}{took:>8.1f} s  ({n / took:,.0f} rows/s)")
+        print(f"  {'re-import, all rows already saved':<36}{again:>8.1f} s")
+        print(f"  {'old per-row loop, extrapolated':<36}{per_row * n:>8.1f} s  "
+              f"(+ one HTTP round trip per row)")
+        print(f"  stored {stored}, scored {scored}")
+
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.bench_csv_import [n_rows]
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else N_ROWS)
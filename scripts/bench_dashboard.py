@@ -0,0 +1,117 @@
+import asyncio, os, random, sqlite3, sys, tempfile, time, tracemalloc
+from pathlib import Path
+
+import dashboard
+from flipfinder.db import Base
+from flipfinder import models  # noqa: F401  (full listings schema incl. analytics)
+from sqlalchemy import create_engine
+from scripts.bench_indexes import seed_listings
+
+# ---- knobs you can tweak ----
+PAGE_SIZES = (200, 2_000, 20_000)
+RAW_HTML_BYTES = 8_000     # stored per listing; real scraped pages are bigger
+DESCRIPTION_BYTES = 600
+SEED = 40
+
+
+def _seed(path: str, n: int):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+    con = sqlite3.connect(path)
+    seed_listings(con, n)
+    rnd = random.Random(SEED)
+    page = "".join(rnd.choice("<div class=x>abcdefghij</div>\n") for _ in range(RAW_HTML_BYTES))
+    con.execute("UPDATE listings SET raw_html = ?, description = ?",
+                (page, "d" * DESCRIPTION_BYTES))
+    con.commit()
+    con.close()
+
+
+def _old_dashboard(path: str, limit: int) -> int:
+    # what /dashboard used to do: SELECT * and one string built with +=
+    # (its page chrome, a few KB, is left out)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    rows = [dict(r) for r in conn.execute("SELECT * FROM listings ORDER BY id DESC LIMIT ?", (limit + 1,))]
+    conn.close()
+    rows = dashboard.rescore_rows(rows[:limit])
+    html_rows = ""
+    for row in rows:
+        title = (row.get("title") or "").replace("\n", " ")
+        url = row.get("url", "")
+        url_html = f'<a href="{url}" target="_blank">link</a>' if url else ""
+        html_rows += f"""
+        <tr>
+          <td>{row.get("id", "")}</td>
+          <td>{title[:100]}{"…" if title and len(title) > 100 else ""}</td>
+          <td>{row.get("price", "")}</td>
+          <td>{row.get("estimated_resale", "")}</td>
+          <td>{row.get("profit", "")}</td>
+          <td>{row.get("roi", "")}</td>
+          <td>{row.get("is_deal", "")}</td>
+          <td>{url_html}</td>
+          <td>{row.get("created_at", "")}</td>
+        </tr>
+        """
+    return len(html_rows.encode("utf-8"))
+
+
+def _new_dashboard(limit: int, t0: float):
+    # the /dashboard handler, its body consumed the way the server sends it
+    response = dashboard.dashboard(limit=limit)
+
+    async def consume():
+        first, size = None, 0
+        async for chunk in response.body_iterator:
+            if first is None:
+                first = time.perf_counter() - t0
+            size += len(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+        return first, size
+
+    return asyncio.run(consume())
+
+
+def _measure(fn):
+    # best of 3 plain runs; peak Python heap from a separate traced run
+    best = None
+    for _ in range(3):
+        t0 = time.perf_counter()
+        first, size = fn(t0)
+        total = time.perf_counter() - t0
+        if best is None or total < best[1]:
+            best = (first, total, size)
+    tracemalloc.start()
+    fn(time.perf_counter())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return (*best, peak)
+
+
+def _report(name, rows, first, total, size, peak):
+    print(f"{name:<18}{rows:>8}{first * 1000:>12.1f}{total * 1000:>10.1f}"
+          f"{size / 1e6:>9.2f}{peak / 1e6:>10.1f}")
+
+
+def main(sizes=PAGE_SIZES):
+    n = max(sizes) + 1
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "flipfinder.db")
+        _seed(path, n)
+        dashboard.DB_PATH = Path(path)
+        print(f"{n} listings, {RAW_HTML_BYTES} B raw_html + {DESCRIPTION_BYTES} B description each "
+              f"({os.path.getsize(path) / 1e6:.0f} MB)\n")
+        print(f"{'dashboard':<18}{'rows':>8}{'1st byte ms':>12}{'total ms':>10}"
+              f"{'MB out':>9}{'peak MB':>10}")
+        for limit in sizes:
+            def old(t0, limit=limit):
+                size = _old_dashboard(path, limit)
+                return time.perf_counter() - t0, size  # nothing is sent until the end
+
+            _report("old (SELECT *, +=)", limit, *_measure(old))
+            _report("new (streamed)", limit, *_measure(lambda t0, limit=limit: _new_dashboard(limit, t0)))
+
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.bench_dashboard [page sizes...]
+    main(tuple(int(a) for a in sys.argv[1:]) or PAGE_SIZES)
@@ -0,0 +1,131 @@
+import os, sqlite3, tempfile, threading, time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+
+from app.db_access import Database
+from app.migrations import migrate
+from app.sqlite_tuning import apply_pragmas
+from scripts.bench_indexes import seed_listings
+
+# ---- knobs you can tweak ----
+N_THREADS = 16
+WRITES_PER_THREAD = 200
+N_READS = 200
+N_LISTINGS = 50_000
+
+# One "write" is what a scrape does per item: look the (source, url) up,
+# then insert or update it.
+UPSERT_SELECT = "SELECT id FROM listings WHERE source = 'facebook' AND url = :url"
+UPSERT_INSERT = (
+    "INSERT INTO listings (source, url, title, price) VALUES ('facebook', :url, :title, :price)"
+)
+UPSERT_UPDATE = "UPDATE listings SET title = :title, price = :price WHERE id = :id"
+
+# heavy enough that the time is spent inside SQLite, which releases the
+# GIL; tiny page queries are bound by Python, not by the connection count
+READ = "SELECT label, count(*), avg(price) FROM listings GROUP BY label"
+
+
+def _upsert(s: Session, url: str, i: int) -> None:
+    params = {"url": url, "title": f"bench item {i}", "price": float(i % 500)}
+    found = s.execute(text(UPSERT_SELECT), params).scalar()
+    if found is None:
+        s.execute(text(UPSERT_INSERT), params)
+    else:
+        s.execute(text(UPSERT_UPDATE), dict(params, id=found))
+
+
+def _hammer(write_one) -> tuple:
+    """
+    N_THREADS threads each doing WRITES_PER_THREAD upserts.
+    Returns (seconds, "database is locked" errors, lost upsert races).
+    """
+    locked, races = [], []
+
+    def worker(k: int):
+        for i in range(WRITES_PER_THREAD):
+            # half new urls, half updates of a shared hot set
+            url = f"w{k}-{i}" if i % 2 else f"hot-{i % 50}"
+            try:
+                write_one(url, i)
+            except OperationalError as e:
+                locked.append(e)
+            except IntegrityError as e:
+                # another thread inserted the url between our SELECT and INSERT
+                races.append(e)
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(N_THREADS)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - t0, len(locked), len(races)
+
+
+def _report(name: str, total: int, secs: float, locked: int, races: int) -> None:
+    print(f"{name:<22}{total / secs:>8.0f} writes/s  "
+          f"{locked} 'database is locked', {races} lost upsert races")
+
+
+def bench_writes(path: str) -> None:
+    total = N_THREADS * WRITES_PER_THREAD
+
+    # before: every caller opens its own session and commits its own write
+    # (sqlite3's default 5 s busy timeout)
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+
+    def independent(url, i):
+        with Session(engine) as s:
+            _upsert(s, url, i)
+            s.commit()
+
+    _report("independent sessions", total, *_hammer(independent))
+    engine.dispose()
+
+    # after: every write is a job for the single writer
+    db = Database(f"sqlite:///{path}")
+    _report("writer queue", total, *_hammer(lambda url, i: db.write(lambda s: _upsert(s, url, i))))
+    db.close()
+
+
+def bench_reads(path: str) -> None:
+    db = Database(f"sqlite:///{path}")
+    base = None
+    for n in sorted({1, 2, 4, os.cpu_count() or 4}):
+        def worker():
+            with db.read_engine.connect() as conn:
+                for _ in range(N_READS // n):
+                    conn.exec_driver_sql(READ).fetchall()
+
+        threads = [threading.Thread(target=worker) for _ in range(n)]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        rate = N_READS / (time.perf_counter() - t0)
+        base = base or rate
+        print(f"read pool, {n:>2} threads: {rate:>8.0f} reads/s  ({rate / base:.1f}x)")
+    db.close()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        con = sqlite3.connect(path)
+        apply_pragmas(con)
+        migrate(con)
+        seed_listings(con, N_LISTINGS)
+        con.close()
+
+        print(f"{N_THREADS} threads x {WRITES_PER_THREAD} upserts, {N_LISTINGS} listings")
+        bench_writes(path)
+        bench_reads(path)
+
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.bench_db_access
+    main()
@@ -0,0 +1,115 @@
+import csv, io, os, random, sqlite3, sys, tempfile, time, tracemalloc
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.export import build_export_sql, parse_columns, stream_export
+from app.models import Listing
+from flipfinder.db import Base
+from flipfinder import models  # noqa: F401  (full listings schema incl. analytics)
+from scripts.bench_rule_matcher import BRANDS, FILLER
+
+# ---- knobs you can tweak ----
+N_LISTINGS = 1_000_000
+OLD_MAX = 200_000   # the old all-in-memory export gets slow / huge past this
+COLUMNS = "id,title,price,currency,location,url,estimated_resale,profit,roi"
+SEED = 33
+
+
+def _seed(path: str, n: int):
+    rnd = random.Random(SEED)
+    con = sqlite3.connect(path)
+    con.executemany(
+        "INSERT INTO listings (source, url, title, description, price, currency, location,"
+        " estimated_resale, profit, roi, is_deal) VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+        (
+            ("facebook", f"bench://{i}",
+             " ".join(rnd.sample(FILLER, 3) + [rnd.choice(BRANDS)]),
+             " ".join(rnd.choice(FILLER) for _ in range(30)),
+             p, "CAD", "Toronto, ON", r, round(r - p, 2), round((r - p) / p, 3), int(r - p > 150))
+            for i in range(n)
+            for p, r in [(round(rnd.uniform(5, 3000), 2), round(rnd.uniform(5, 4000), 2))]
+        ),
+    )
+    con.commit()
+    con.close()
+
+
+def _old_export(engine, limit: int) -> int:
+    # what /export.csv used to do: every ORM object, then one big string
+    db = sessionmaker(bind=engine)()
+    try:
+        rows = db.query(Listing).order_by(Listing.id.desc()).limit(limit).all()
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        w.writerow(["id", "title", "price", "currency", "location", "url"])
+        for r in rows:
+            w.writerow([
+                r.id,
+                (r.title or "").replace("\n", " ").strip(),
+                float(r.price) if r.price is not None else "",
+                r.currency or "",
+                (r.location or "").replace("\n", " ").strip(),
+                r.url or "",
+            ])
+        return len(buf.getvalue())
+    finally:
+        db.close()
+
+
+def _measure(fn):
+    # timings from a plain run; peak Python heap from a second, traced run
+    # (tracemalloc slows everything down several times)
+    t0 = time.perf_counter()
+    first, size = fn(t0)
+    total = time.perf_counter() - t0
+    tracemalloc.start()
+    fn(time.perf_counter())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first, total, size, peak
+
+
+def _report(name, rows, first, total, size, peak):
+    print(f"{name:<22}{rows:>9}{first * 1000:>12.1f}{total:>9.2f}"
+          f"{size / 1e6:>10.1f}{peak / 1e6:>11.1f}")
+
+
+def main(n: int = N_LISTINGS):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        engine = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(bind=engine)
+        t0 = time.perf_counter()
+        _seed(path, n)
+        print(f"seeded {n} listings in {time.perf_counter() - t0:.1f}s\n")
+        print(f"{'export':<22}{'rows':>9}{'1st byte ms':>12}{'total s':>9}"
+              f"{'MB out':>10}{'peak MB':>11}")
+
+        old_n = min(n, OLD_MAX)
+
+        def old(t0):
+            size = _old_export(engine, old_n)
+            return time.perf_counter() - t0, size  # nothing is sent until the end
+
+        _report("old /export.csv", old_n, *_measure(old))
+
+        cols = parse_columns(COLUMNS)
+        for fmt in ("csv", "ndjson"):
+            for rows in sorted({old_n, n}):
+                def streaming(t0, fmt=fmt, rows=rows):
+                    stmt, params = build_export_sql(cols, limit=rows)
+                    first, size = None, 0
+                    for chunk in stream_export(engine, fmt, cols, stmt, params):
+                        if first is None:
+                            first = time.perf_counter() - t0
+                        size += len(chunk)
+                    return first, size
+
+                _report(f"streaming {fmt}", rows, *_measure(streaming))
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.bench_export [n_listings]
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else N_LISTINGS)
@@ -0,0 +1,141 @@
+import itertools, os, random, sqlite3, sys, tempfile, time
+
+from sqlalchemy import create_engine
+
+from app.db import Base
+from app import models  # noqa: F401  (registers the listings table)
+from app.fts import candidate_window, ensure_fts, fts_match_query, search_sql, sync_fts
+from scripts.bench_rule_matcher import BRANDS, FILLER
+
+# ---- knobs you can tweak ----
+SIZES = [100_000, 1_000_000]
+VOCAB_SIZE = 20_000
+QUERIES = ["eames", "macbook pro", "teak sideboard", "milw", "snowblower", "dyson"]
+LIMIT = 25
+REPEAT = 5
+SEED = 31
+
+LIKE_SQL = """
+    SELECT id, title, price, url, label FROM listings
+    WHERE (title LIKE ? OR description LIKE ?)
+      AND price IS NOT NULL AND price <= ?
+    ORDER BY id DESC LIMIT ?
+"""
+
+
+def _vocab(rnd: random.Random):
+    # Zipf-distributed made-up words so descriptions have a realistic mix of
+    # very common and very rare terms.
+    words = ["".join(rnd.choice("abcdefghiklmnoprstuvw") for _ in range(rnd.randint(3, 9)))
+             for _ in range(VOCAB_SIZE)]
+    cum = list(itertools.accumulate(1.0 / (i + 1) for i in range(VOCAB_SIZE)))
+    return words, cum
+
+
+def _seed(con: sqlite3.Connection, n: int, start: int = 0):
+    rnd = random.Random(SEED + start)
+    words_, cum = _vocab(random.Random(SEED))
+    labels = [None, None, "watch", "buy", "pass"]
+
+    def rows():
+        for i in range(start, start + n):
+            words = rnd.sample(FILLER, rnd.randint(2, 5))
+            if rnd.random() < 0.6:
+                words.insert(rnd.randint(0, len(words)), rnd.choice(BRANDS))
+            desc = rnd.choices(words_, cum_weights=cum, k=rnd.randint(10, 60))
+            desc += rnd.sample(FILLER, 3)
+            yield ("facebook", f"bench://{i}", " ".join(words), " ".join(desc),
+                   round(rnd.uniform(5, 3000), 2), rnd.choice(labels))
+
+    con.executemany(
+        "INSERT INTO listings (source, url, title, description, price, label) VALUES (?,?,?,?,?,?)",
+        rows(),
+    )
+    con.commit()
+    return words_
+
+
+def _time(fn) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def run(n: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        Base.metadata.create_all(bind=create_engine(f"sqlite:///{path}"))
+        con = sqlite3.connect(path)
+
+        t0 = time.perf_counter()
+        vocab = _seed(con, n)
+        t_seed = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        ensure_fts(con)
+        t_backfill = time.perf_counter() - t0
+
+        # write cost: the same kind of inserts with and without the triggers
+        t0 = time.perf_counter()
+        _seed(con, 10_000, start=n)
+        t_insert_fts = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        sync_fts(con)
+        t_sync = time.perf_counter() - t0
+        triggers = [r[0] for r in con.execute(
+            "SELECT sql FROM sqlite_master WHERE type='trigger' AND name LIKE 'listings_fts_a_'")]
+        for name in ("ai", "ad", "au"):
+            con.execute(f"DROP TRIGGER listings_fts_{name}")
+        t0 = time.perf_counter()
+        _seed(con, 10_000, start=n + 10_000)
+        t_insert_plain = time.perf_counter() - t0
+        # that batch was never indexed, so drop it before the triggers return
+        con.execute("DELETE FROM listings WHERE id > ?", (n + 10_000,))
+        for sql in triggers:
+            con.execute(sql)
+        con.commit()
+
+        print(f"\nlistings: {n}  (seed {t_seed:.1f}s, FTS backfill {t_backfill:.1f}s)")
+        print(f"10k inserts: {t_insert_plain * 1000:.0f} ms plain, "
+              f"{t_insert_fts * 1000:.0f} ms with FTS triggers, "
+              f"then {t_sync * 1000:.0f} ms to sync them into the index")
+        print(f"{'query':<16}{'matches':>9}{'LIKE ms':>10}{'FTS ms':>10}{'speedup':>10}")
+        # plus one very common and one mid-frequency description word
+        for q in QUERIES + [vocab[0], vocab[500]]:
+            match = fts_match_query(q)
+            n_match = con.execute(
+                "SELECT COUNT(*) FROM listings_fts WHERE listings_fts MATCH ?", (match,)
+            ).fetchone()[0]
+            pat = f"%{q}%"
+            t_like = _time(lambda: con.execute(LIKE_SQL, (pat, pat, 1500.0, LIMIT)).fetchall())
+
+            def fts_search():
+                window = candidate_window(con, match, max_price=1500.0)
+                if window is None:
+                    return []
+                sql, params = search_sql(
+                    match, "l.id, l.title, l.price, l.url, l.label", LIMIT, window,
+                    max_price=1500.0,
+                )
+                return con.execute(sql, params).fetchall()
+
+            t_fts = _time(fts_search)
+            print(f"{q:<16}{n_match:>9}{t_like * 1000:>10.2f}{t_fts * 1000:>10.2f}"
+                  f"{t_like / t_fts:>9.1f}x")
+        # raises if the trigger-fed index drifted from the listings table
+        con.execute("INSERT INTO listings_fts(listings_fts) VALUES ('integrity-check')")
+        print("index integrity: ok")
+        con.close()
+
+
+def main(sizes=SIZES):
+    for n in sizes:
+        run(n)
+
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.bench_fts_search [n_listings ...]
+    main([int(a) for a in sys.argv[1:]] or SIZES)
@@ -0,0 +1,164 @@
+import datetime, os, random, sqlite3, sys, tempfile, time
+
+from sqlalchemy import create_engine
+
+from app.sqlite_tuning import LISTING_INDEXES, apply_pragmas, ensure_indexes
+from flipfinder.db import Base
+from flipfinder import models  # noqa: F401  (registers the listings table)
+from scripts.bench_rule_matcher import BRANDS, FILLER
+
+# ---- knobs you can tweak ----
+N_LISTINGS = 1_000_000
+REPEAT = 5
+SEED = 34
+
+# The statements behind each endpoint (column lists trimmed), with
+# representative parameters. scripts/check_query_plans.py checks the real
+# ones against the indexes; this only times them.
+QUERIES = {
+    "dashboard deals, page 1": (
+        "SELECT * FROM listings WHERE is_deal = 1 AND profit >= ? AND roi >= ? "
+        "ORDER BY created_at DESC, id DESC LIMIT 51",
+        (150.0, 0.35),
+    ),
+    "dashboard deals, deep page": (
+        "SELECT * FROM listings WHERE is_deal = 1 AND profit >= ? AND roi >= ? "
+        "AND (created_at, id) < (?, ?) "
+        "ORDER BY created_at DESC, id DESC LIMIT 51",
+        (150.0, 0.35, "{deep_created_at}", "{deep_id}"),
+    ),
+    "dashboard recent, page 1": (
+        "SELECT * FROM listings ORDER BY created_at DESC, id DESC LIMIT 51", (),
+    ),
+    "dashboard recent, deep page": (
+        "SELECT * FROM listings WHERE (created_at, id) < (?, ?) "
+        "ORDER BY created_at DESC, id DESC LIMIT 51",
+        ("{deep_created_at}", "{deep_id}"),
+    ),
+    "/recent?label=buy": (
+        "SELECT * FROM listings WHERE label = ? ORDER BY id DESC LIMIT 21", ("buy",),
+    ),
+    # a wide band matches often enough that walking ids from the top finds
+    # a page quickly; a narrow one is where the price index pays off
+    "/recent, wide price band": (
+        "SELECT * FROM listings WHERE price IS NOT NULL AND price >= ? "
+        "AND price IS NOT NULL AND price <= ? ORDER BY id DESC LIMIT 21",
+        (2950.0, 3000.0),
+    ),
+    "/recent, narrow price band": (
+        "SELECT * FROM listings WHERE price IS NOT NULL AND price >= ? "
+        "AND price IS NOT NULL AND price <= ? ORDER BY id DESC LIMIT 21",
+        (2999.5, 3000.0),
+    ),
+    "/labels": (
+        "SELECT label, count(id) FROM listings GROUP BY label", (),
+    ),
+    "/export?label=buy": (
+        "SELECT id, title, price, currency, location, url FROM listings "
+        "WHERE label = ? ORDER BY id DESC",
+        ("buy",),
+    ),
+    "scrape dedupe (source, url)": (
+        "SELECT * FROM listings WHERE source = ? AND url = ?",
+        ("facebook", "bench://{deep_id}"),
+    ),
+    "intake dedupe (external_id)": (
+        "SELECT id FROM listings WHERE source = ? AND external_id = ?",
+        ("facebook", "fb-{deep_id}"),
+    ),
+}
+
+
+def seed_listings(con: sqlite3.Connection, n: int, start: int = 0, seed: int = SEED):
+    """
+    Listings shaped like a scraped DB: created_at rising with id (a few
+    NULL), a third not yet scored, ~10% deals, mostly unlabelled.
+    """
+    rnd = random.Random(seed + start)
+    t0 = datetime.datetime(2025, 1, 1)
+
+    def rows():
+        for i in range(start, start + n):
+            created = None if rnd.random() < 0.02 else (
+                t0 + datetime.timedelta(seconds=i * 30 + rnd.randint(0, 600))
+            ).strftime("%Y-%m-%d %H:%M:%S")
+            price = round(rnd.uniform(5, 3000), 2)
+            resale = profit = roi = is_deal = None
+            if rnd.random() < 0.67:
+                resale = round(price * rnd.uniform(0.5, 2.2), 2)
+                profit = round(resale - price, 2)
+                roi = profit / price
+                is_deal = int(profit >= 150 and roi >= 0.35)
+            words = rnd.sample(FILLER, rnd.randint(2, 5))
+            words.insert(0, rnd.choice(BRANDS))
+            yield ("facebook", f"bench://{i}", " ".join(words), price, "CAD",
+                   created, rnd.choice([None] * 12 + ["watch", "buy", "pass"]),
+                   f"fb-{i}" if i % 2 else None, resale, profit, roi, is_deal)
+
+    con.executemany(
+        "INSERT INTO listings (source, url, title, price, currency, created_at, label, "
+        "external_id, estimated_resale, profit, roi, is_deal) "
+        "VALUES (?,?,?,?,?,?,?,?,?,?,?,?)",
+        rows(),
+    )
+    con.commit()
+
+
+def _time(fn) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _run_queries(con: sqlite3.Connection, fill: dict) -> dict:
+    out = {}
+    for name, (sql, params) in QUERIES.items():
+        params = tuple(p.format(**fill) if isinstance(p, str) else p for p in params)
+        out[name] = _time(lambda: con.execute(sql, params).fetchall())
+    return out
+
+
+def main(n: int = N_LISTINGS):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        Base.metadata.create_all(bind=create_engine(f"sqlite:///{path}"))
+        con = sqlite3.connect(path)
+        t0 = time.perf_counter()
+        seed_listings(con, n)
+        t_seed = time.perf_counter() - t0
+
+        # a cursor ~90% of the way down the newest-first order
+        deep_created_at, deep_id = con.execute(
+            "SELECT created_at, id FROM listings WHERE created_at IS NOT NULL "
+            "ORDER BY created_at DESC, id DESC LIMIT 1 OFFSET ?", (n * 9 // 10,)
+        ).fetchone()
+        fill = {"deep_created_at": deep_created_at, "deep_id": deep_id}
+
+        before = _run_queries(con, fill)
+        con.close()
+
+        # reopen the way the app does now: pragmas at connect, then indexes
+        con = sqlite3.connect(path)
+        apply_pragmas(con)
+        t0 = time.perf_counter()
+        created = ensure_indexes(con)
+        t_index = time.perf_counter() - t0
+        after = _run_queries(con, fill)
+        size = os.path.getsize(path) / 1e6
+        con.close()
+
+    print(f"listings: {n}  (seed {t_seed:.1f}s)")
+    print(f"indexes:  {len(created)}/{len(LISTING_INDEXES)} built + ANALYZE in {t_index:.1f}s; "
+          f"db {size:.0f} MB afterwards")
+    print(f"{'query':<30}{'before ms':>11}{'after ms':>11}{'speedup':>10}")
+    for name in QUERIES:
+        b, a = before[name], after[name]
+        print(f"{name:<30}{b * 1000:>11.2f}{a * 1000:>11.3f}{b / a:>9.1f}x")
+
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.bench_indexes [n_listings]
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else N_LISTINGS)
@@ -0,0 +1,184 @@
+import os, random, sqlite3, sys, tempfile, time
+
+from app.migrations import migrate
+from app.near_dupes import MAX_CANDIDATES, band_keys, index_listing, shingles, signature, similarity
+from app.sqlite_tuning import apply_pragmas
+from scripts.bench_rule_matcher import BRANDS
+
+# ---- knobs you can tweak ----
+N_LISTINGS = 1_000_000
+RELIST_RATE = 0.10  # share of inserts that relist / cross-post an earlier item
+REPORT_EVERY = 100_000
+COMMIT_EVERY = 1_000  # the scrape upsert commits about this many at once
+SEED = 39
+SCAN_SAMPLE = 100_000
+
+ITEMS = ["dresser", "coffee table", "sideboard", "chair", "sofa", "lamp", "desk",
+         "snowblower", "tv", "go-kart", "bike", "stroller", "jacket", "rack",
+         "vacuum", "drill", "monitor", "speaker", "guitar", "camera", "tent"]
+ATTRS = ["black", "white", "oak", "grey", "red", "blue", "leather", "vintage",
+         "small", "large", "king", "queen", "cordless", "electric", "4k",
+         "wireless", "kids", "adult", "folding", "solid wood", "glass"]
+FILLER = ["obo", "must go", "like new", "barely used", "pickup only", "firm",
+          "great condition", "moving sale"]
+CITIES = ["Toronto", "Hamilton", "Mississauga", "Oakville", "Burlington",
+          "Brampton", "Markham", "Vaughan"]
+
+INSERT = (
+    "INSERT INTO listings (source, url, title, price, currency, location, created_at) "
+    "VALUES ('facebook', ?, ?, ?, 'CAD', ?, '2025-01-01 00:00:00')"
+)
+
+
+def _new_item(rnd: random.Random) -> dict:
+    code = f"{rnd.choice('abcdefghjkmnpqrstuvwxyz')}{rnd.randint(10, 9999)}"
+    words = [rnd.choice(BRANDS), rnd.choice(ITEMS), code] + rnd.sample(ATTRS, rnd.randint(1, 3))
+    return {"words": words, "price": round(rnd.uniform(20, 3000), 2), "city": rnd.choice(CITIES)}
+
+
+def _relist(rnd: random.Random, item: dict) -> tuple:
+    """How the same item comes back: reordered, re-worded, re-priced."""
+    words = list(item["words"])
+    rnd.shuffle(words)
+    if rnd.random() < 0.3:  # a typo
+        i = rnd.randrange(len(words))
+        w = words[i]
+        if len(w) > 4:
+            j = rnd.randrange(len(w))
+            words[i] = w[:j] + w[j + 1:]
+    words += rnd.sample(FILLER, rnd.randint(0, 2))
+    title = " ".join(words)
+    if rnd.random() < 0.5:
+        title = title.title()
+    price = round(item["price"] * rnd.uniform(0.85, 1.05), 2)
+    city = item["city"] + (", ON" if rnd.random() < 0.5 else "")
+    return title, price, city
+
+
+def generate(n: int, seed: int = SEED):
+    """(url, title, price, location, item_no) rows; item_no is the ground truth."""
+    rnd = random.Random(seed)
+    items = []
+    for i in range(n):
+        if items and rnd.random() < RELIST_RATE:
+            k = rnd.randrange(len(items))
+            title, price, city = _relist(rnd, items[k])
+        else:
+            k = len(items)
+            items.append(_new_item(rnd))
+            it = items[k]
+            title = " ".join(it["words"] + rnd.sample(FILLER, rnd.randint(0, 1)))
+            price, city = it["price"], it["city"] + ", ON"
+        yield (f"bench://{i}", title, price, city, k)
+
+
+def _open(path: str) -> sqlite3.Connection:
+    con = sqlite3.connect(path)
+    apply_pragmas(con)
+    migrate(con)
+    return con
+
+
+def _insert_all(con: sqlite3.Connection, rows: list, with_index: bool) -> list:
+    """Insert every row, returning (rows so far, seconds) at each REPORT_EVERY."""
+    marks, t0 = [], time.perf_counter()
+    cur = con.cursor()
+    for i, (url, title, price, city, _item) in enumerate(rows, 1):
+        cur.execute(INSERT, (url, title, price, city))
+        if with_index:
+            index_listing(con, cur.lastrowid, title, price, city)
+        if i % COMMIT_EVERY == 0:
+            con.commit()
+        if i % REPORT_EVERY == 0 or i == len(rows):
+            if i == len(rows):
+                con.commit()
+            marks.append((i, time.perf_counter() - t0))
+    return marks
+
+
+def _accuracy(con: sqlite3.Connection, rows: list) -> tuple:
+    # listing ids are 1..n in insert order, so row i is listing i + 1
+    item_of = {i + 1: row[4] for i, row in enumerate(rows)}
+    first_of: dict = {}
+    for lid in sorted(item_of):
+        first_of.setdefault(item_of[lid], lid)
+    linked = correct = relists = found = 0
+    for lid, group in con.execute("SELECT listing_id, group_id FROM listing_minhash"):
+        is_relist = first_of[item_of[lid]] != lid
+        relists += is_relist
+        if group != lid:
+            linked += 1
+            if item_of[group] == item_of[lid]:
+                correct += 1
+                found += is_relist
+    return relists, found, linked, correct
+
+
+def _lookup_vs_scan(con: sqlite3.Connection, rows: list, samples: int = 200) -> tuple:
+    """Candidate lookup through listing_lsh vs comparing against every listing."""
+    rnd = random.Random(SEED)
+    probes = [rows[rnd.randrange(len(rows))] for _ in range(samples)]
+    sigs = [signature(shingles(t, p, c)) for _, t, p, c, _ in probes]
+
+    t0 = time.perf_counter()
+    found = 0
+    for sig in sigs:
+        keys = band_keys(sig)
+        found += len(con.execute(
+            f"SELECT listing_id FROM listing_lsh WHERE lsh_key IN ({','.join('?' * len(keys))}) "
+            f"GROUP BY listing_id ORDER BY COUNT(*) DESC LIMIT ?",
+            (*keys, MAX_CANDIDATES),
+        ).fetchall())
+    lookup = (time.perf_counter() - t0) / samples
+
+    # without the index: compare with every listing. Timed over the first
+    # SCAN_SAMPLE (shingle sets built up front, which a real scan couldn't
+    # do) and scaled to the full table, since it's linear.
+    every = [
+        shingles(t, p, c)
+        for t, p, c in con.execute("SELECT title, price, location FROM listings LIMIT ?", (SCAN_SAMPLE,))
+    ]
+    t0 = time.perf_counter()
+    for _, t, p, c, _ in probes[:3]:
+        mine = shingles(t, p, c)
+        [similarity(mine, other) for other in every]
+    scan = (time.perf_counter() - t0) / 3 * len(rows) / len(every)
+    return lookup, scan, found / samples
+
+
+def main(n: int = N_LISTINGS):
+    rows = list(generate(n))
+    with tempfile.TemporaryDirectory() as tmp:
+        plain_path = os.path.join(tmp, "plain.db")
+        con = _open(plain_path)
+        plain = _insert_all(con, rows, with_index=False)
+        con.close()
+        plain_size = os.path.getsize(plain_path)
+
+        path = os.path.join(tmp, "dedupe.db")
+        con = _open(path)
+        indexed = _insert_all(con, rows, with_index=True)
+        relists, found, linked, correct = _accuracy(con, rows)
+        lookup, scan, per_insert = _lookup_vs_scan(con, rows)
+        con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        size = os.path.getsize(path)
+        con.close()
+
+    print(f"listings: {n}  ({relists} relists of an earlier item)")
+    print(f"{'inserted':>10}{'plain/s':>10}{'+dedupe/s':>11}   (rate over each block)")
+    prev_p = prev_d = (0, 0.0)
+    for (i, tp), (_, td) in zip(plain, indexed):
+        print(f"{i:>10}{(i - prev_p[0]) / (tp - prev_p[1]):>10.0f}"
+              f"{(i - prev_d[0]) / (td - prev_d[1]):>11.0f}")
+        prev_p, prev_d = (i, tp), (i, td)
+    print(f"overall: plain {n / plain[-1][1]:.0f}/s, with dedupe {n / indexed[-1][1]:.0f}/s")
+    print(f"recall:    {found / max(relists, 1):.1%} of relists linked to their item")
+    print(f"precision: {correct / max(linked, 1):.1%} of links correct ({linked} links)")
+    print(f"candidate lookup {lookup * 1e3:.3f} ms ({per_insert:.1f} candidates) "
+          f"vs comparing with every listing {scan * 1e3:.0f} ms")
+    print(f"db size: {plain_size / 1e6:.0f} MB plain, {size / 1e6:.0f} MB with the index")
+
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.bench_near_dupes [n_listings]
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else N_LISTINGS)
@@ -0,0 +1,54 @@
+import os, sqlite3, sys, tempfile, time
+
+# ---- knobs you can tweak ----
+N_LISTINGS = 200_000
+REQUESTS = 200
+
+
+def _time(fn, n: int = REQUESTS) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n
+
+
+def main(n: int = N_LISTINGS):
+    with tempfile.TemporaryDirectory() as tmp:
+        # flipfinder opens ./flipfinder.db, so import it from inside tmp
+        os.chdir(tmp)
+        from fastapi.testclient import TestClient
+        from flipfinder.main import app, page_cache
+        from scripts.bench_indexes import seed_listings
+
+        with TestClient(app) as client:
+            con = sqlite3.connect("flipfinder.db")
+            seed_listings(con, n)
+            con.commit()
+            con.close()
+
+            def uncached():
+                page_cache.clear()
+                assert client.get("/").status_code == 200
+
+            def cached():
+                assert client.get("/").status_code == 200
+
+            etag = client.get("/").headers["etag"]
+
+            def revalidated():
+                assert client.get("/", headers={"If-None-Match": etag}).status_code == 304
+
+            print(f"GET / on {n} listings, mean of {REQUESTS} requests (in-process client)")
+            for name, fn in (
+                ("no cache (queries + render)", uncached),
+                ("cache hit", cached),
+                ("If-None-Match -> 304", revalidated),
+            ):
+                print(f"  {name:<30}{_time(fn) * 1000:>8.2f} ms")
+            size = len(client.get("/").content)
+            print(f"  body {size / 1e3:.0f} KB on a 200, 0 KB on a 304")
+
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.bench_page_cache [n_listings]
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else N_LISTINGS)
@@ -0,0 +1,113 @@
+import math, os, random, sqlite3, statistics, sys, tempfile, time
+
+from app.migrations import migrate
+from app.price_model import MIN_CONFIDENCE, PriceModel, record_sold_comps, train
+
+# ---- knobs you can tweak ----
+N_COMPS = 20_000      # sold comps the model is trained on
+N_HELD_OUT = 2_000    # new listings it's asked to price
+N_INCREMENT = 100     # comps folded in by one incremental update
+NOISE = 0.15          # log-scale spread of sold prices around the "true" value
+SEED = 47
+
+# what an item is worth: base price per product, times brand and
+# attribute factors, times noise
+PRODUCTS = {
+    "dresser": 300, "coffee table": 180, "sideboard": 650, "chair": 90,
+    "sofa": 500, "lamp": 60, "desk": 220, "snowblower": 700, "tv": 400,
+    "bike": 350, "stroller": 280, "jacket": 250, "drill": 150, "monitor": 200,
+    "guitar": 450, "camera": 600, "rower": 900, "tent": 140, "speaker": 120,
+}
+BRANDS = {
+    "ikea": 0.5, "west elm": 1.2, "herman miller": 3.0, "eames": 4.0,
+    "teak": 1.6, "walnut": 1.4, "dewalt": 1.3, "milwaukee": 1.4, "sony": 1.2,
+    "samsung": 1.1, "canada goose": 2.5, "arcteryx": 2.0, "uppababy": 1.8,
+    "concept2": 1.5, "fender": 1.6, "yamaha": 1.1, "no name": 0.6, "vintage": 1.3,
+}
+ATTRS = {
+    "large": 1.2, "small": 0.85, "king": 1.3, "queen": 1.1, "leather": 1.4,
+    "4k": 1.3, "cordless": 1.2, "new in box": 1.5, "damaged": 0.4,
+    "black": 1.0, "oak": 1.1, "kids": 0.6, "pro": 1.5, "set of 2": 1.8,
+}
+# products that never sold in the training comps: the model should know it
+# can't price these and send them to eBay
+UNSEEN = {"treadmill": 800, "kayak": 650, "record player": 180, "espresso machine": 350}
+UNSEEN_SHARE = 0.2
+FILLER = ["obo", "must go", "pickup only", "moving sale", "firm", "asap", "pending"]
+
+
+def generate(n: int, rnd: random.Random, products=PRODUCTS):
+    """(title, sold price, true value) triples drawn from the value model above."""
+    brands, attrs = list(BRANDS), list(ATTRS)
+    for _ in range(n):
+        product, brand = rnd.choice(list(products)), rnd.choice(brands)
+        picked = rnd.sample(attrs, rnd.randint(0, 2))
+        value = products[product] * BRANDS[brand] * math.prod(ATTRS[a] for a in picked)
+        words = [brand] + picked + [product] + rnd.sample(FILLER, rnd.randint(0, 2))
+        if rnd.random() < 0.3:
+            rnd.shuffle(words)
+        price = round(value * math.exp(rnd.gauss(0, NOISE)), 2)
+        yield " ".join(words).title() if rnd.random() < 0.5 else " ".join(words), price, value
+
+
+def main(n: int = N_COMPS):
+    rnd = random.Random(SEED)
+    with tempfile.TemporaryDirectory() as tmp:
+        con = sqlite3.connect(os.path.join(tmp, "bench.db"))
+        migrate(con)
+        comps = list(generate(n, rnd))
+        record_sold_comps(con, ({"title": t, "price": p} for t, p, _ in comps))
+        con.commit()
+
+        t0 = time.perf_counter()
+        model = train(con)
+        trained = time.perf_counter() - t0
+
+        path = os.path.join(tmp, "price_model.npz")
+        model.save(path)
+        size_mb = os.path.getsize(path) / 1e6
+        t0 = time.perf_counter()
+        model = PriceModel.load(path)
+        loaded = time.perf_counter() - t0
+
+        extra = list(generate(N_INCREMENT, rnd))
+        t0 = time.perf_counter()
+        model.learn([t for t, _, _ in extra], [p for _, p, _ in extra])
+        increment = time.perf_counter() - t0
+
+        n_unseen = int(N_HELD_OUT * UNSEEN_SHARE)
+        held_out = list(generate(N_HELD_OUT - n_unseen, rnd)) + list(generate(n_unseen, rnd, UNSEEN))
+        t0 = time.perf_counter()
+        predictions = [model.predict(t) for t, _, _ in held_out]
+        per_call = (time.perf_counter() - t0) / len(held_out)
+
+        def err(pred, value):
+            return abs(pred - value) / value
+
+        errors = [err(pred, value) for (pred, _), (_, _, value) in zip(predictions, held_out)]
+        sure = [c >= MIN_CONFIDENCE for _, c in predictions]
+        confident = [e for e, ok in zip(errors, sure) if ok]
+        seen_sure = sum(sure[:N_HELD_OUT - n_unseen]) / (N_HELD_OUT - n_unseen)
+        unseen_sure = sum(sure[N_HELD_OUT - n_unseen:]) / max(n_unseen, 1)
+        con.close()
+
+    print(f"\nresale model on {n} sold comps ({N_HELD_OUT} new listings priced, "
+          f"{UNSEEN_SHARE:.0%} of unseen products)")
+    print(f"  {'train from scratch':<40}{trained:>8.2f} s")
+    print(f"  {f'fold in {N_INCREMENT} new comps':<40}{increment * 1000:>8.1f} ms")
+    print(f"  {'load from disk':<40}{loaded * 1000:>8.1f} ms  ({size_mb:.1f} MB)")
+    print(f"  {'predict one title':<40}{per_call * 1e6:>8.1f} µs")
+    print(f"  {'median error, all listings':<40}{statistics.median(errors):>8.1%}")
+    print(f"  {f'confident (>= {MIN_CONFIDENCE})':<40}{len(confident) / len(errors):>8.1%}  "
+          "of listings skip eBay")
+    print(f"  {'  known products':<40}{seen_sure:>8.1%}")
+    print(f"  {'  products never seen in comps':<40}{unseen_sure:>8.1%}")
+    if confident:
+        within = sum(e <= 0.3 for e in confident) / len(confident)
+        print(f"  {'median error, confident only':<40}{statistics.median(confident):>8.1%}")
+        print(f"  {'confident and within 30%':<40}{within:>8.1%}")
+
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.bench_price_model [n_comps]
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else N_COMPS)
@@ -0,0 +1,73 @@
+import contextlib, io, os, sqlite3, sys, tempfile, time
+
+# ---- knobs you can tweak ----
+N_LISTINGS = 10_000
+TOP = 50
+STALE_SHARE = 0.1     # share of listings whose comps age past the TTL
+OLD_SAMPLE = 200      # listings re-scored one by one for the old approach
+
+
+def main(n: int = N_LISTINGS):
+    with tempfile.TemporaryDirectory() as tmp:
+        # flipfinder opens ./flipfinder.db, so import it from inside tmp
+        os.chdir(tmp)
+        os.environ["DATABASE_URL"] = "sqlite:///flipfinder.db"
+        import deals_report
+        from app.ranking import stale_ids, top_k, write_ranked
+        from flipfinder.db import SessionLocal, init_db
+        from flipfinder.services.comps import refresh_comps_for_listing_id
+        from scripts.bench_indexes import seed_listings
+
+        init_db()
+        con = sqlite3.connect("flipfinder.db")
+        seed_listings(con, n)
+        con.commit()
+
+        def report():
+            with contextlib.redirect_stdout(io.StringIO()):
+                deals_report.main(n=TOP, out=os.path.join(tmp, "deals.csv"))
+
+        # first run: nothing has comps_at yet, so everything is refreshed
+        t0 = time.perf_counter()
+        report()
+        first = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        report()
+        fresh = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        assert not stale_ids(con)
+        write_ranked(top_k(con, TOP), io.StringIO())
+        query = time.perf_counter() - t0
+
+        con.execute(
+            "UPDATE listings SET comps_at = '2000-01-01 00:00:00' WHERE id % ? = 0",
+            (round(1 / STALE_SHARE),),
+        )
+        con.commit()
+        t0 = time.perf_counter()
+        report()
+        partial = time.perf_counter() - t0
+
+        # the old way, minus HTTP: re-score every listing one at a time, then sort
+        ids = [r[0] for r in con.execute("SELECT id FROM listings LIMIT ?", (OLD_SAMPLE,))]
+        db = SessionLocal()
+        t0 = time.perf_counter()
+        for lid in ids:
+            refresh_comps_for_listing_id(db, lid)
+        old = (time.perf_counter() - t0) / len(ids) * n
+        db.close()
+        con.close()
+
+        print(f"\nrank top {TOP} of {n} listings (rules-only comps)")
+        print(f"  {'first run, all comps refreshed':<40}{first:>8.2f} s")
+        print(f"  {'comps fresh (deals_report end to end)':<40}{fresh * 1000:>8.1f} ms")
+        print(f"  {'comps fresh (stale check + top-k)':<40}{query * 1000:>8.1f} ms")
+        print(f"  {f'{STALE_SHARE:.0%} stale, refreshed then ranked':<40}{partial:>8.2f} s")
+        print(f"  {'old: re-score each one, sort (est.)':<40}{old:>8.1f} s  (+ one HTTP call each)")
+
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.bench_ranking [n_listings]
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else N_LISTINGS)
@@ -0,0 +1,239 @@
+import os, random, re, sys, tempfile, threading, time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+# Two parts:
+#
+# 1. Schedule. Simulates N_LISTINGS listings scraped over a month, each
+#    selling at some point (deals sooner), revisited either every hour or
+#    on the adaptive schedule (flipfinder/services/recrawl.py:
+#    next_interval). Reports revisits spent and how long a sale went
+#    unnoticed.
+# 2. Pool and budget. Real ticks (claim, revisit, write back) against a
+#    local fixture server whose item pages answer after LATENCY_S, some of
+#    them pending / sold / removed, with 1 and CONCURRENCY pool threads.
+#    The hourly budget must cap each tick, and terminal listings must drop
+#    out of the schedule.
+#
+# Pool threads would use Playwright's Chromium; this bench fetches the
+# fixture pages over plain HTTP instead (HttpItemFetcher) so it runs
+# without a browser.
+#
+# Usage: python -m scripts.bench_recrawl
+
+# ---- knobs you can tweak ----
+N_LISTINGS = 2_000
+DAYS = 30
+DEAL_SHARE = 0.1
+# most listings sell within a day or two or sit for weeks (deals go faster):
+# (share that sells fast, mean days to sell when fast, when not)
+SELL_FAST = {False: (0.5, 1.0, 20.0), True: (0.8, 0.3, 20.0)}
+N_PAGES = 120            # listings in the pool/budget part
+LATENCY_S = 0.3
+CONCURRENCY = 4
+SEED = 50
+
+
+# ---------------------------------------------------------------------------
+# 1. schedule
+# ---------------------------------------------------------------------------
+
+def simulate(interval_h):
+    """
+    interval_h(age hours, is deal, created_at, now) -> hours until the
+    next revisit. Returns (revisits, mean hours a sale went unnoticed,
+    the same for deals).
+    """
+    rnd = random.Random(SEED)
+    start = datetime(2025, 1, 1)
+    revisits, lags, deal_lags = 0, [], []
+    for _ in range(N_LISTINGS):
+        created_h = rnd.uniform(0, DAYS * 24)
+        deal = rnd.random() < DEAL_SHARE
+        fast, fast_days, slow_days = SELL_FAST[deal]
+        days = rnd.expovariate(1 / (fast_days if rnd.random() < fast else slow_days))
+        sells_h = created_h + days * 24
+        created_at = (start + timedelta(hours=created_h)).strftime("%Y-%m-%d %H:%M:%S")
+        # first revisit one interval after the listing is found
+        t = created_h + interval_h(0.0, deal, created_at, start + timedelta(hours=created_h))
+        while t < DAYS * 24:
+            revisits += 1
+            if t >= sells_h:
+                lags.append(t - sells_h)
+                if deal:
+                    deal_lags.append(t - sells_h)
+                break
+            t += interval_h(t - created_h, deal, created_at, start + timedelta(hours=t))
+    return revisits, sum(lags) / len(lags), sum(deal_lags) / len(deal_lags)
+
+
+def _adaptive(_age_h, deal, created_at, now):
+    from flipfinder.services.recrawl import next_interval
+
+    return next_interval(created_at, deal, "available", now).total_seconds() / 3600
+
+
+def _fixed_for(revisits: int) -> float:
+    """The fixed interval (hours) that spends the same number of revisits."""
+    lo, hi = 0.05, 200.0
+    for _ in range(25):
+        mid = (lo + hi) / 2
+        if simulate(lambda *_: mid)[0] > revisits:
+            lo = mid
+        else:
+            hi = mid
+    return hi
+
+
+# ---------------------------------------------------------------------------
+# 2. pool and budget
+# ---------------------------------------------------------------------------
+
+_STATES = ["available"] * 6 + ["pending", "sold", "removed"]
+
+
+class _Fixture(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(LATENCY_S)
+        n = int(re.search(r"/item/(\d+)", self.path).group(1))
+        state = _STATES[n % len(_STATES)]
+        if state == "removed":
+            self.send_response(404)
+            self.end_headers()
+            return
+        marker = "" if state == "available" else f"{state.title()} · "
+        body = (
+            f"<html><body><div role='main'><h1>{marker}Teak dresser {n}</h1>"
+            f"<span>CA${200 + n % 7}</span></div></body></html>"
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class HttpItemFetcher:
+    """MarketplaceBrowser.item() stand-in without a browser."""
+
+    def item(self, url):
+        from app.utils import parse_price, parse_status
+
+        try:
+            with urlopen(url, timeout=30) as r:
+                html = r.read().decode()
+        except HTTPError as e:
+            if e.code in (404, 410):
+                return {"status": "removed", "title": None, "price": None, "currency": None}
+            raise
+        status, title = parse_status(re.search(r"<h1>(.*?)</h1>", html).group(1))
+        price, currency = parse_price(re.search(r"<span>(.*?)</span>", html).group(1))
+        return {"status": status or "available", "title": title, "price": price, "currency": currency}
+
+    def close(self):
+        pass
+
+
+def _seed_listings(port: int, n: int) -> None:
+    import sqlite3
+
+    con = sqlite3.connect("flipfinder.db")
+    now = datetime.now(timezone.utc)
+    created = (now - timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S")
+    # already scheduled, and due a minute ago
+    due = (now - timedelta(minutes=1)).strftime("%Y-%m-%d %H:%M:%S")
+    con.executemany(
+        "INSERT INTO listings (source, url, title, price, currency, created_at, next_check_at) "
+        "VALUES ('facebook', ?, ?, 210, 'CA$', ?, ?)",
+        [(f"http://127.0.0.1:{port}/marketplace/item/{i}/", f"Teak dresser {i}", created, due)
+         for i in range(n)],
+    )
+    con.commit()
+    con.close()
+
+
+def _tick(recrawl, session_factory, database, size, fetcher, limit):
+    pool = recrawl.RevisitPool(size, fetcher)
+    try:
+        t0 = time.perf_counter()
+        stats = recrawl.tick(session_factory, database, pool, limit=limit)
+        return stats, time.perf_counter() - t0
+    finally:
+        pool.close()
+
+
+def pool_and_budget():
+    from flipfinder.db import SessionLocal, database, init_db
+    from flipfinder.services import recrawl
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Fixture)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        init_db()
+        _seed_listings(server.server_port, N_PAGES)
+        fetcher = "scripts.bench_recrawl:HttpItemFetcher"
+        recrawl.PER_HOUR = N_PAGES
+        half = N_PAGES // 2
+        print(f"\n{N_PAGES} due listings, {LATENCY_S}s page load, budget {recrawl.PER_HOUR}/hour")
+        for size in (1, CONCURRENCY):
+            stats, elapsed = _tick(recrawl, SessionLocal, database, size, fetcher, half)
+            print(
+                f"  pool of {size}: {stats['revisited']:>3} revisited in {elapsed:5.1f}s "
+                f"({stats['revisited'] / elapsed:5.1f}/s)  {stats['terminal']} sold/removed"
+            )
+
+        # everything still scheduled is due again, but the hour's budget is spent
+        overdue = (datetime.now(timezone.utc) - timedelta(minutes=1)).strftime("%Y-%m-%d %H:%M:%S")
+
+        def make_due(c):
+            c.execute("UPDATE listings SET next_check_at = ? WHERE next_check_at IS NOT NULL", (overdue,))
+            c.commit()
+
+        database.run_raw(make_due)
+        over, _ = _tick(recrawl, SessionLocal, database, 1, fetcher, N_PAGES)
+        print(f"  budget spent: a further tick claimed {over['claimed']}")
+        recrawl.PER_HOUR = 10 * N_PAGES
+        again, _ = _tick(recrawl, SessionLocal, database, CONCURRENCY, fetcher, N_PAGES)
+        print(f"  budget raised: claimed {again['claimed']} (sold / removed ones stay off the schedule)")
+
+        rows = database.run_raw(lambda c: c.execute(
+            "SELECT status, COUNT(*), SUM(next_check_at IS NULL) FROM listings "
+            "WHERE checked_at IS NOT NULL GROUP BY status ORDER BY status"
+        ).fetchall())
+        for status, count, unscheduled in rows:
+            print(f"  {status:<10} {count:>4}  {unscheduled:>4} off the schedule")
+        database.close()
+    finally:
+        server.shutdown()
+
+
+def main():
+    tmp = tempfile.TemporaryDirectory()
+    try:
+        # flipfinder opens ./flipfinder.db: import it from inside tmp
+        os.chdir(tmp.name)
+        print(f"\n{N_LISTINGS} listings over {DAYS} days, revisited until they sell")
+        adaptive = simulate(_adaptive)
+        fixed_h = _fixed_for(adaptive[0])
+        for name, (revisits, lag, deal_lag) in (
+            ("hourly", simulate(lambda *_: 1.0)),
+            (f"every {fixed_h:.1f}h", simulate(lambda *_: fixed_h)),
+            ("adaptive", adaptive),
+        ):
+            print(
+                f"  {name:<12}{revisits:>8} revisits   sale noticed after "
+                f"{lag:5.1f}h on average, {deal_lag:5.1f}h for deals"
+            )
+        pool_and_budget()
+    finally:
+        os.chdir("/")
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import os, random, sys, tempfile, time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from flipfinder.db import Base
+from flipfinder import models
+from flipfinder.services.comps import (
+    refresh_comps_for_listing_id,
+    refresh_comps_for_listing_ids,
+)
+from scripts.bench_rule_matcher import BRANDS, FILLER
+
+# ---- knobs you can tweak ----
+N_LISTINGS = 500
+SEED = 28
+
+
+def _session_factory(path: str):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def _seed(Session, n: int):
+    rnd = random.Random(SEED)
+    db = Session()
+    for i in range(n):
+        words = rnd.sample(FILLER, 3) + [rnd.choice(BRANDS)]
+        rnd.shuffle(words)
+        db.add(models.Listing(
+            source="facebook",
+            url=f"bench://{i}",
+            title=" ".join(words),
+            price=round(rnd.uniform(20, 1500), 2),
+        ))
+    db.commit()
+    ids = [row.id for row in db.query(models.Listing.id).all()]
+    db.close()
+    return ids
+
+
+def _snapshot(Session):
+    db = Session()
+    rows = db.query(
+        models.Listing.id, models.Listing.estimated_resale,
+        models.Listing.profit, models.Listing.roi, models.Listing.is_deal,
+    ).order_by(models.Listing.id).all()
+    db.close()
+    return [tuple(r) for r in rows]
+
+
+def main(n: int = N_LISTINGS):
+    with tempfile.TemporaryDirectory() as tmp:
+        Session = _session_factory(os.path.join(tmp, "bench.db"))
+        ids = _seed(Session, n)
+
+        db = Session()
+        t0 = time.perf_counter()
+        for lid in ids:
+            refresh_comps_for_listing_id(db, lid)
+        t_single = time.perf_counter() - t0
+        db.close()
+        expected = _snapshot(Session)
+
+        db = Session()
+        db.query(models.Listing).update({
+            models.Listing.estimated_resale: None,
+            models.Listing.profit: None,
+            models.Listing.roi: None,
+            models.Listing.is_deal: None,
+        })
+        db.commit()
+
+        t0 = time.perf_counter()
+        refresh_comps_for_listing_ids(db, ids)
+        t_batch = time.perf_counter() - t0
+        db.close()
+        got = _snapshot(Session)
+
+    print(f"listings:    {n}")
+    print(f"per-listing: {t_single * 1000:.1f} ms")
+    print(f"batch:       {t_batch * 1000:.1f} ms")
+    print(f"speedup:     {t_single / t_batch:.1f}x")
+    print(f"identical:   {got == expected}")
+    if got != expected:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.bench_refresh_comps [n_listings]
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else N_LISTINGS)
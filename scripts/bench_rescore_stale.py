@@ -0,0 +1,60 @@
+import os, random, sys, tempfile, time
+
+from sqlalchemy import create_engine, insert, update
+from sqlalchemy.orm import sessionmaker
+
+from flipfinder.db import Base
+from flipfinder import models
+from flipfinder.services.comps import rescore_stale
+from scripts.bench_rule_matcher import BRANDS, FILLER
+
+# ---- knobs you can tweak ----
+N_LISTINGS = 100_000
+CHANGED_FRACTION = 0.01
+SEED = 30
+
+
+def main(n: int = N_LISTINGS):
+    rnd = random.Random(SEED)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        db = Session()
+        db.execute(insert(models.Listing), [
+            {
+                "source": "facebook",
+                "url": f"bench://{i}",
+                "title": " ".join(rnd.sample(FILLER, 3) + [rnd.choice(BRANDS)]),
+                "price": round(rnd.uniform(20, 1500), 2),
+            }
+            for i in range(n)
+        ])
+        db.commit()
+
+        t0 = time.perf_counter()
+        full = rescore_stale(db, force=True)
+        t_full = time.perf_counter() - t0
+
+        changed = rnd.sample(range(1, n + 1), int(n * CHANGED_FRACTION))
+        db.execute(update(models.Listing), [
+            {"id": lid, "price": round(rnd.uniform(20, 1500), 2)} for lid in changed
+        ])
+        db.commit()
+
+        t0 = time.perf_counter()
+        incremental = rescore_stale(db)
+        t_incr = time.perf_counter() - t0
+        db.close()
+
+    print(f"listings:     {n} ({len(changed)} changed)")
+    print(f"full:         {t_full:.2f}s  {full}")
+    print(f"incremental:  {t_incr:.2f}s  {incremental}")
+    if incremental["rescored"] != len(changed):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.bench_rescore_stale [n_listings]
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else N_LISTINGS)
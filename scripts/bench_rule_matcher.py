@@ -0,0 +1,76 @@
+import random, sys, time
+from typing import List, Optional, Sequence
+
+from flipfinder.services.comps import _normalize_text
+from flipfinder.services.rules import PricingRule, RuleMatcher, get_ruleset
+
+# ---- knobs you can tweak ----
+N_TITLES = 100_000
+SEED = 26
+
+BRANDS = [
+    "eames", "herman miller", "teak", "walnut", "danish modern", "travertine",
+    "lucite", "west elm", "cb2", "mid century", "solid oak", "brutalist",
+    "cane front", "macbook pro", "macbook m2", "iphone 14", "iphone 15 pro",
+    "apple watch ultra", "ps5", "xbox series x", "concept2 rower",
+    "peloton bike", "milwaukee m18 fuel", "dewalt flexvolt", "festool",
+    "canada goose", "arcteryx", "uppababy vista", "nuna rava",
+]
+FILLER = [
+    "dresser", "coffee table", "sideboard", "chair", "sofa", "lamp", "desk",
+    "excellent condition", "must go", "pickup only", "like new", "barely used",
+    "toronto", "hamilton", "moving sale", "obo", "with charger", "kit",
+    "snowblower", "tv", "go-kart", "bike", "stroller", "jacket", "rack",
+]
+
+
+def _linear_match(text: str, rules: Sequence[PricingRule]) -> Optional[PricingRule]:
+    # The old implementation: one regex scan per rule, in order.
+    for rule in rules:
+        if rule.pattern.search(text):
+            return rule
+    return None
+
+
+def synthetic_texts(n: int, seed: int = SEED) -> List[str]:
+    rnd = random.Random(seed)
+    out = []
+    for _ in range(n):
+        words = rnd.sample(FILLER, rnd.randint(2, 6))
+        # ~60% of titles mention one or two rule keywords, in random positions
+        for _ in range(rnd.choice([0, 0, 1, 1, 1, 2])):
+            words.insert(rnd.randint(0, len(words)), rnd.choice(BRANDS))
+        title = " ".join(words)
+        description = " ".join(rnd.sample(FILLER, rnd.randint(0, 8)))
+        out.append(_normalize_text(title, description))
+    return out
+
+
+def main(n: int = N_TITLES):
+    texts = synthetic_texts(n)
+    rules = get_ruleset().rules
+    matcher = RuleMatcher(rules)
+
+    t0 = time.perf_counter()
+    linear = [_linear_match(t, rules) for t in texts]
+    t_linear = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    combined = [matcher.match(t) for t in texts]
+    t_combined = time.perf_counter() - t0
+
+    mismatches = sum(1 for a, b in zip(linear, combined) if a is not b)
+    matched = sum(1 for r in combined if r is not None)
+
+    print(f"titles:    {n} ({matched} matched a rule)")
+    print(f"linear:    {t_linear:.3f}s ({t_linear / n * 1e6:.2f} µs/title)")
+    print(f"combined:  {t_combined:.3f}s ({t_combined / n * 1e6:.2f} µs/title)")
+    print(f"speedup:   {t_linear / t_combined:.2f}x")
+    print(f"mismatches: {mismatches}")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.bench_rule_matcher [n_titles]
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else N_TITLES)
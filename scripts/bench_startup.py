@@ -0,0 +1,103 @@
+import os, re, subprocess, sys, tempfile, time
+from pathlib import Path
+
+# Startup cost of the CLI commands (flipfinder/cli.py), measured with
+# `python -X importtime` in a fresh interpreter per module. Fails (exit 1)
+# if a command imports something heavy it has no use for, or its import
+# time blows its budget: a regression guard for the lazy imports.
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# ---- knobs you can tweak ----
+RUNS = 3              # best of N, per module
+WEB = ("fastapi", "starlette", "uvicorn", "playwright")
+ORM = WEB + ("sqlalchemy",)
+NOTHING = ORM + ("numpy", "requests", "dotenv")
+
+# module, modules it must not import, budget (ms of cumulative import time)
+CHECKS = [
+    ("flipfinder.cli", NOTHING, 30),
+    ("deals_report", ORM, 60),
+    ("recheck_recent", ORM, 60),
+    ("scripts.migrate_fts", ORM, 60),
+    ("scripts.check_analytics", ORM, 60),
+    ("scripts.search_cli", ORM, 60),
+    ("bulk_add_from_csv", ORM, 250),
+    ("add_listing", ORM, 250),
+    ("scripts.build_dedupe_index", ORM, 250),
+    ("scripts.train_price_model", ORM, 250),
+    ("scripts.init_db", WEB, 700),
+    ("scripts.rescore_all", WEB, 800),
+    ("scripts.archive_listings", WEB, 800),
+    ("scripts.bulk_analyze", WEB, 900),
+    ("flipfinder.services.comps", WEB, 800),
+]
+# reported for comparison, not checked
+REFERENCE = ["app.api", "flipfinder.main"]
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_time(module: str, cwd: str):
+    """(cumulative µs, set of top-level packages imported) for `import module`."""
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, env=env, capture_output=True, text=True,
+    )
+    if out.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{out.stderr[-2000:]}")
+    total, loaded = 0, set()
+    for line in out.stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if not m:
+            continue
+        loaded.add(m.group(4).split(".")[0])
+        if m.group(4) == module:
+            total = int(m.group(2))
+    return total, loaded
+
+
+def best_of(module: str, cwd: str):
+    times, loaded = [], set()
+    for _ in range(RUNS):
+        total, loaded = import_time(module, cwd)
+        times.append(total)
+    return min(times) / 1000, loaded
+
+
+def cli_help_ms(cwd: str) -> float:
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    best = float("inf")
+    for _ in range(RUNS):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "flipfinder", "--help"],
+                       cwd=cwd, env=env, capture_output=True, check=True)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main() -> int:
+    failed = 0
+    # modules open ./flipfinder.db on import; keep that out of the repo
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"      {'module':<28}{'import':>8}     budget")
+        for module, forbidden, budget in CHECKS:
+            ms, loaded = best_of(module, tmp)
+            problems = [f"imports {name}" for name in forbidden if name in loaded]
+            if ms > budget:
+                problems.append(f"over budget ({budget} ms)")
+            failed += bool(problems)
+            print(f"{'FAIL' if problems else 'ok  '}  {module:<28}{ms:>8.1f} ms  {budget:>4} ms"
+                  + (f"  <- {'; '.join(problems)}" if problems else ""))
+        for module in REFERENCE:
+            ms, _ = best_of(module, tmp)
+            print(f"      {module:<28}{ms:>8.1f} ms  (web app, for comparison)")
+        print(f"\npython -m flipfinder --help: {cli_help_ms(tmp):.0f} ms wall, interpreter included")
+    print(f"\n{len(CHECKS) - failed}/{len(CHECKS)} ok")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.bench_startup
+    raise SystemExit(main())
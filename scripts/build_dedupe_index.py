@@ -0,0 +1,50 @@
+import os, time
+
+from app.migrations import migrate
+from app.near_dupes import index_listing
+from app.sqlite_tuning import connect
+
+BATCH = 1000
+
+
+def main():
+    """
+    Add every listing that isn't in the near-duplicate index yet, oldest
+    first, so the first listing of each group keeps being its leader.
+    New listings are indexed as they come in; this is for the backlog.
+    """
+    db = os.getenv("DATABASE_URL", "sqlite:///flipfinder.db").replace("sqlite:///", "")
+    con = connect(db)
+    try:
+        migrate(con)
+        t0 = time.perf_counter()
+        done = linked = 0
+        last_id = 0
+        while True:
+            rows = con.execute(
+                "SELECT l.id, l.title, l.price, l.location FROM listings l "
+                "WHERE l.id > ? AND NOT EXISTS "
+                "(SELECT 1 FROM listing_minhash m WHERE m.listing_id = l.id) "
+                "ORDER BY l.id LIMIT ?",
+                (last_id, BATCH),
+            ).fetchall()
+            if not rows:
+                break
+            for lid, title, price, location in rows:
+                if index_listing(con, lid, title, price, location) != lid:
+                    linked += 1
+            con.commit()
+            done += len(rows)
+            last_id = rows[-1][0]
+            print(f"[DEBUG] indexed {done} listings")
+        print(
+            f"✅ near-duplicate index: {done} listings added, {linked} linked to an earlier one "
+            f"({time.perf_counter() - t0:.1f}s, {db})"
+        )
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.build_dedupe_index
+    main()
@@ -0,0 +1,41 @@
+import os, sys, time
+
+from app.analytics import check_rollups, rebuild_rollups
+from app.migrations import migrate
+from app.sqlite_tuning import connect
+
+SHOW = 20
+
+
+def main(fix: bool = False) -> int:
+    """
+    Compare the analytics rollups with a full recompute from listings.
+    Exit status 1 when they differ; --fix then rebuilds them.
+    """
+    db = os.getenv("DATABASE_URL", "sqlite:///flipfinder.db").replace("sqlite:///", "")
+    con = connect(db)
+    try:
+        migrate(con)
+        t0 = time.perf_counter()
+        diffs = check_rollups(con)
+        took = time.perf_counter() - t0
+        if not diffs:
+            print(f"✅ analytics rollups match a full recompute ({took:.1f}s, {db})")
+            return 0
+        print(f"[WARN] {len(diffs)} rollup rows differ from a full recompute ({db}):")
+        for d in diffs[:SHOW]:
+            print(f"  {d['dim']:<9}{d['key'][:40]!r:<44}{d['stored_vs_recomputed']}")
+        if len(diffs) > SHOW:
+            print(f"  ... and {len(diffs) - SHOW} more")
+        if fix:
+            rebuild_rollups(con)
+            con.commit()
+            print("rebuilt analytics_rollup from listings")
+        return 1
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.check_analytics [--fix]
+    raise SystemExit(main("--fix" in sys.argv[1:]))
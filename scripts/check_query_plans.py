@@ -0,0 +1,304 @@
+import datetime, os, random, re, sqlite3, sqlite3.dbapi2, sys, tempfile
+
+# EXPLAIN QUERY PLAN regression check for every endpoint query.
+#
+# Builds a throwaway flipfinder.db, calls each endpoint of the three apps
+# through TestClient, records every statement they send to SQLite that
+# reads or writes listings, price_history or the analytics rollups, and
+# explains it. Fails (exit 1) when one of them would scan the whole table
+# or sort every match, unless the CHECKS entry says that's inherent, or
+# when an index the entry expects is no longer used.
+#
+# Usage: python -m scripts.check_query_plans [-v]
+
+N_LISTINGS = 20_000
+N_PRICE_CHANGES = 10_000
+
+_LISTINGS_RE = re.compile(r"\b(FROM|JOIN|UPDATE)\s+(listings|price_history|analytics_rollup)\b", re.I)
+_FULL_SCAN_RE = re.compile(r"^SCAN (listings|l|price_history|listing_minhash|m|listing_lsh|analytics_rollup|crawl_queue)$")
+_SORT = "USE TEMP B-TREE FOR ORDER BY"
+
+# (app, path, expected index names, allowed). allowed may contain "scan"
+# (full table walk is the point) and/or "sort" (rank order no index has).
+# Paths are formatted with the cursors made in _cursors().
+CHECKS = [
+    ("flipfinder", "/", {"ix_listings_deals", "ix_listings_created_at"}, set()),
+    ("flipfinder", "/listings/deals?cursor={deals}", {"ix_listings_deals"}, set()),
+    ("flipfinder", "/listings/recent?cursor={recent}", {"ix_listings_created_at"}, set()),
+    ("flipfinder", "/listings/recent?cursor={recent_null}", {"ix_listings_created_at"}, set()),
+    # newest id first, stopped by LIMIT: a rowid walk is the right plan
+    ("api", "/recent", set(), {"scan"}),
+    ("api", "/recent?cursor={by_id}", set(), set()),
+    ("api", "/recent?label=buy", {"ix_listings_label"}, set()),
+    ("api", "/recent?label=buy&cursor={by_id}", {"ix_listings_label"}, set()),
+    # a narrow price band: seek the range, sort the few hits by id
+    ("api", "/recent?min_price=2990&max_price=3000", {"ix_listings_price"}, {"sort"}),
+    # BM25 rank order can't come from an index
+    ("api", "/search?q=eames", set(), {"sort"}),
+    ("api", "/search?q=eames&label=buy&max_price=500", set(), {"sort"}),
+    ("api", "/search?q=eames&cursor={search}", set(), {"sort"}),
+    # LIKE '%q%' can't use an index; rowid order stops at LIMIT
+    ("api-like", "/search?q=eames", set(), {"scan"}),
+    ("api", "/labels", {"ix_listings_label"}, set()),
+    ("api", "/export?label=buy", {"ix_listings_label"}, set()),
+    # SQLite may walk ids instead of sorting the price range; for a stream
+    # with no LIMIT either is fine
+    ("api", "/export?min_price=2990", set(), {"scan", "sort"}),
+    # everything, streamed in id order
+    ("api", "/export?limit=100", set(), {"scan"}),
+    ("api", "/export.csv", set(), {"scan"}),
+    ("flipfinder", "/prices/drops", {"ix_price_history_drops"}, set()),
+    # ranked by drop size, which no index has
+    ("flipfinder", "/prices/drops/recent?min_drop_pct=20", {"ix_price_history_drops"}, {"sort"}),
+    ("flipfinder", "/prices/{history_id}", {"ix_price_history_listing"}, set()),
+    # rollups only: one primary-key range per dimension; ranking by a
+    # ratio sorts that dimension's keys, never listings
+    ("api", "/analytics", {"USING PRIMARY KEY (dim=?)"}, {"sort"}),
+    ("api", "/analytics?dim=day&from=2025-01-01&to=2025-01-31&order=key",
+     {"USING PRIMARY KEY (dim=? AND key>? AND key<?)"}, set()),
+    ("dashboard", "/dashboard", set(), {"scan"}),
+    ("dashboard", "/dashboard/rows?cursor={dashboard}", set(), set()),
+]
+
+# Statements that don't go through an HTTP endpoint in this sandbox (the
+# scrape router needs a browser) but run once per scraped item:
+# (name, sql, expected index names, allowed) as in CHECKS.
+DIRECT = [
+    # uq_source_url's index, or ix_listings_source_url on older databases
+    ("scrape dedupe", "SELECT * FROM listings WHERE source = 'facebook' AND url = 'bench://7'",
+     set(), set()),
+    ("intake dedupe", "SELECT id FROM listings WHERE source = 'facebook' AND external_id = 'fb-7'",
+     {"ix_listings_external_id"}, set()),
+    # app/near_dupes.py: LSH candidates for each new listing (ten key
+    # seeks; grouping and ranking only touch those matches), then the
+    # per-group lookups behind comps / notifications / archiving
+    ("near-dupe candidates",
+     "SELECT m.group_id, l.title, l.price, l.location "
+     "FROM listing_minhash m JOIN listings l ON l.id = m.listing_id "
+     "WHERE m.listing_id IN (SELECT listing_id FROM listing_lsh "
+     "WHERE lsh_key IN (1,2,3,4,5,6,7,8,9,10) AND listing_id != 7 "
+     "GROUP BY listing_id ORDER BY COUNT(*) DESC LIMIT 50)",
+     {"USING PRIMARY KEY (lsh_key=?)"}, {"sort"}),
+    ("near-dupe groups", "SELECT listing_id, group_id FROM listing_minhash WHERE listing_id IN (7, 8, 9)",
+     set(), set()),
+    ("near-dupe group leader", "SELECT MIN(listing_id) FROM listing_minhash WHERE group_id = 7",
+     {"ix_listing_minhash_group"}, set()),
+    # app/ranking.py (deals_report.py): the top N straight off the score
+    # index, and the stale-comps lookup as two comps_at seeks
+    ("ranking top-k",
+     "SELECT id, title, rank_score FROM listings WHERE rank_score IS NOT NULL "
+     "ORDER BY rank_score DESC, id DESC LIMIT 50",
+     {"ix_listings_rank_score"}, set()),
+    ("ranking top-k deals",
+     "SELECT id, title, rank_score FROM listings WHERE rank_score IS NOT NULL AND is_deal = 1 "
+     "ORDER BY rank_score DESC, id DESC LIMIT 50",
+     {"ix_listings_rank_score"}, set()),
+    ("ranking stale comps",
+     "SELECT id FROM listings WHERE comps_at IS NULL "
+     "UNION ALL SELECT id FROM listings WHERE comps_at < '2025-01-02 00:00:00'",
+     {"ix_listings_comps_at (comps_at=?)", "ix_listings_comps_at (comps_at<?)"}, set()),
+    # flipfinder/services/crawler.py: every lease takes back expired leases,
+    # then picks the next due task -- both seeks on (status, due_at)
+    ("crawl expired leases",
+     "UPDATE crawl_queue SET status = 'queued' WHERE status = 'leased' AND due_at < 1700000000",
+     {"ix_crawl_queue_due"}, set()),
+    ("crawl lease",
+     "SELECT id FROM crawl_queue WHERE status = 'queued' AND due_at <= 1700000000 "
+     "ORDER BY due_at, id LIMIT 1",
+     {"ix_crawl_queue_due"}, set()),
+    # flipfinder/services/recrawl.py: each tick schedules never-revisited
+    # listings (not the sold / removed ones, also NULL next_check_at),
+    # then ranks and claims the due ones
+    ("recrawl new listings",
+     "SELECT id, created_at, is_deal, status FROM listings "
+     "WHERE next_check_at IS NULL AND checked_at IS NULL "
+     "AND (status IS NULL OR status NOT IN ('sold', 'removed'))",
+     {"ix_listings_next_check_at (next_check_at=? AND checked_at=?)"}, set()),
+    ("recrawl due",
+     "SELECT id, url, created_at, is_deal, status, next_check_at FROM listings "
+     "WHERE next_check_at <= '2025-01-02 00:00:00'",
+     {"ix_listings_next_check_at"}, set()),
+]
+
+
+def _capture_statements(log: list):
+    # every sqlite3 connection the apps open (SQLAlchemy's included) logs its
+    # statements with the parameters already bound
+    real_connect = sqlite3.connect
+
+    def connect(*args, **kwargs):
+        conn = real_connect(*args, **kwargs)
+        conn.set_trace_callback(log.append)
+        return conn
+
+    # SQLAlchemy opens connections through sqlite3.dbapi2
+    sqlite3.connect = sqlite3.dbapi2.connect = connect
+
+
+def _cursors(db: str) -> dict:
+    from app.pagination import encode_cursor
+
+    con = sqlite3.connect(db)
+    mid = con.execute("SELECT MAX(id) / 2 FROM listings").fetchone()[0]
+    created_at, rid = con.execute(
+        "SELECT created_at, id FROM listings WHERE created_at IS NOT NULL "
+        "ORDER BY created_at DESC, id DESC LIMIT 1 OFFSET ?", (N_LISTINGS // 2,)
+    ).fetchone()
+    null_id = con.execute(
+        "SELECT MAX(id) FROM listings WHERE created_at IS NULL"
+    ).fetchone()[0]
+    history_id = con.execute("SELECT MAX(listing_id) FROM price_history").fetchone()[0]
+    con.close()
+    return {
+        "deals": encode_cursor("deals", [created_at, rid]),
+        "recent": encode_cursor("recent", [created_at, rid]),
+        "recent_null": encode_cursor("recent", [None, null_id]),
+        "by_id": encode_cursor("recent", [mid]),
+        "search": encode_cursor("search", [-1.0, mid, 1, mid * 2]),
+        "dashboard": encode_cursor("dashboard", [mid]),
+        "history_id": history_id,
+    }
+
+
+def _seed_price_history(con: sqlite3.Connection, n: int) -> None:
+    # re-scrape price changes over the last two days, about half of them drops
+    rnd = random.Random(38)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    rows = []
+    for i in range(n):
+        prev = round(rnd.uniform(20, 2000), 2)
+        at = now - datetime.timedelta(seconds=rnd.randint(0, 2 * 86400))
+        rows.append((rnd.randint(1, N_LISTINGS), at.strftime("%Y-%m-%d %H:%M:%S"),
+                     round(prev * rnd.uniform(0.5, 1.3), 2), prev))
+    con.executemany(
+        "INSERT INTO price_history (listing_id, observed_at, price, prev_price) VALUES (?,?,?,?)",
+        rows,
+    )
+
+
+def _seed_ranking(con: sqlite3.Connection) -> None:
+    # scored listings carry their rank score, most with comps inside the TTL
+    from app.ranking import RANK_SCORE_SQL
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    fresh = (now - datetime.timedelta(hours=1)).strftime("%Y-%m-%d %H:%M:%S")
+    old = (now - datetime.timedelta(days=3)).strftime("%Y-%m-%d %H:%M:%S")
+    con.execute(
+        f"UPDATE listings SET rank_score = {RANK_SCORE_SQL}, "
+        "comps_at = CASE WHEN id % 20 = 0 THEN ? ELSE ? END WHERE profit IS NOT NULL",
+        (old, fresh),
+    )
+
+
+def _seed_recrawl(con: sqlite3.Connection) -> None:
+    # most listings already on the revisit schedule, 1 in 20 sold/removed
+    # (off it), 1 in 50 just scraped and not scheduled yet
+    now = datetime.datetime.now(datetime.timezone.utc)
+    checked = (now - datetime.timedelta(hours=2)).strftime("%Y-%m-%d %H:%M:%S")
+    con.execute(
+        "UPDATE listings SET "
+        "  status = CASE WHEN id % 20 = 0 THEN 'sold' ELSE 'available' END, "
+        "  checked_at = ?, "
+        "  next_check_at = CASE WHEN id % 20 = 0 THEN NULL "
+        "                  ELSE datetime(?, '+' || (id % 4000) || ' minutes') END "
+        "WHERE id % 50 != 0",
+        (checked, checked),
+    )
+
+
+def _plan(con: sqlite3.Connection, sql: str) -> list:
+    return [r[3] for r in con.execute("EXPLAIN QUERY PLAN " + sql)]
+
+
+def _problems(plans: list, expect: set, allowed: set) -> list:
+    lines = [line for _, plan in plans for line in plan]
+    out = []
+    if "scan" not in allowed and any(_FULL_SCAN_RE.match(line) for line in lines):
+        out.append("full table scan")
+    if "sort" not in allowed and _SORT in lines:
+        out.append("sorts every match")
+    for index in sorted(expect):
+        if not any(index in line for line in lines):
+            out.append(f"{index} not used")
+    if not plans:
+        out.append("no listings query captured")
+    return out
+
+
+def main(verbose: bool = False) -> int:
+    tmp = tempfile.mkdtemp()
+    db = os.path.join(tmp, "flipfinder.db")
+    # every app resolves the database from the cwd or DATABASE_URL
+    os.chdir(tmp)
+    os.environ["DATABASE_URL"] = f"sqlite:///{db}"
+
+    log: list = []
+    _capture_statements(log)
+
+    from fastapi.testclient import TestClient
+    from flipfinder.db import init_db
+    from scripts.bench_indexes import seed_listings
+
+    init_db()
+    seed = sqlite3.connect(db)
+    seed_listings(seed, N_LISTINGS)
+    _seed_price_history(seed, N_PRICE_CHANGES)
+    _seed_ranking(seed)
+    _seed_recrawl(seed)
+    seed.execute("ANALYZE")
+    seed.commit()
+    seed.close()
+
+    import app.api as api
+    from app.db import search_index_ready
+    import dashboard
+    import flipfinder.main as ff
+
+    clients = {
+        "flipfinder": TestClient(ff.app),
+        "api": TestClient(api.app),
+        "api-like": TestClient(api.app),
+        "dashboard": TestClient(dashboard.app),
+    }
+    cursors = _cursors(db)
+    explain = sqlite3.connect(db)
+
+    failed = 0
+    # the TestClients aren't started, so on_startup never sets this
+    fts_enabled = search_index_ready()
+    for app_name, path, expect, allowed in CHECKS:
+        path = path.format(**cursors)
+        api.FTS_ENABLED = fts_enabled and app_name != "api-like"
+        del log[:]
+        resp = clients[app_name].get(path)
+        plans = [(sql, _plan(explain, sql)) for sql in log if _LISTINGS_RE.search(sql)]
+        problems = _problems(plans, expect, allowed)
+        if resp.status_code != 200:
+            problems.append(f"HTTP {resp.status_code}")
+        failed += bool(problems)
+        print(f"{'FAIL' if problems else 'ok  '}  {app_name:<11}{path[:60]}"
+              + (f"  <- {'; '.join(problems)}" if problems else ""))
+        if verbose or problems:
+            for sql, plan in plans:
+                print(f"        {' '.join(sql.split())[:140]}")
+                for line in plan:
+                    print(f"          {line}")
+    api.FTS_ENABLED = fts_enabled
+
+    for name, sql, expect, allowed in DIRECT:
+        plans = [(sql, _plan(explain, sql))]
+        problems = _problems(plans, expect, allowed)
+        failed += bool(problems)
+        print(f"{'FAIL' if problems else 'ok  '}  {'direct':<11}{name}"
+              + (f"  <- {'; '.join(problems)}" if problems else ""))
+        if verbose or problems:
+            for line in plans[0][1]:
+                print(f"          {line}")
+    explain.close()
+
+    print(f"\n{len(CHECKS) + len(DIRECT) - failed} ok, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main("-v" in sys.argv[1:]))
@@ -0,0 +1,74 @@
+import random, sys
+
+from flipfinder.db import SessionLocal, database, init_db
+from flipfinder.services.crawler import crawl_keyword, enqueue, run_workers
+from flipfinder.services.planner import load_keywords, plan
+
+# ---- knobs you can tweak ----
+BUDGET_MINUTES = 30.0   # browser minutes per round
+MAX_RESULTS = 30
+RADIUS_KM = 50
+LOCATION = "Toronto, ON"
+
+
+def main(budget=BUDGET_MINUTES, rounds=1, files=None, uniform=False,
+         location=LOCATION, radius_km=RADIUS_KM, max_results=MAX_RESULTS, workers=0):
+    """
+    Each round searches the planner's picks (every keyword with uniform):
+    one after another in this process, or with workers=N queued for N
+    worker processes (flipfinder/services/crawler.py) to share.
+    """
+    init_db()
+    keywords = load_keywords(files)
+    rng = random.Random()
+    db = SessionLocal()
+    try:
+        for r in range(rounds):
+            picked = list(keywords) if uniform else plan(db, keywords, budget, rng)
+            print(f"[DEBUG] round {r + 1}: {len(picked)} of {len(keywords)} keywords")
+            if workers:
+                added = database.run_raw(lambda c: enqueue(c, [(kw, location) for kw in picked]))
+                print(f"[DEBUG] queued {added} searches for {workers} workers")
+                left = run_workers(workers, radius_km=radius_km, max_results=max_results)
+                print(f"[DEBUG] crawl queue: {left}")
+                continue
+            for kw in picked:
+                try:
+                    _ids, s = crawl_keyword(db, kw, location, radius_km, max_results)
+                except Exception as e:
+                    print(f"[ERROR] search {kw!r} failed: {e}")
+                    continue
+                print(
+                    f"  {kw:<40} runs={s.runs:<4} {s.run_minutes:5.1f} min/run  "
+                    f"deals={s.deals:.1f} new={s.new_listings:.0f}"
+                )
+    finally:
+        db.close()
+    print("✅ crawl done")
+
+
+def _opt(args, name, default):
+    for a in args:
+        if a.startswith(f"--{name}="):
+            return a.split("=", 1)[1]
+    return default
+
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.crawl_keywords [--budget=30] [--rounds=1] [--uniform]
+    #          [--files=flip_keywords.txt,...] [--location="Toronto, ON"] [--radius=50] [--max=30]
+    #          [--workers=4]
+    # --uniform sweeps every keyword (still logged for the planner);
+    # --workers=N runs the searches in N processes, one browser each
+    args = sys.argv[1:]
+    files = _opt(args, "files", None)
+    main(
+        budget=float(_opt(args, "budget", BUDGET_MINUTES)),
+        rounds=int(_opt(args, "rounds", 1)),
+        files=files.split(",") if files else None,
+        uniform="--uniform" in args,
+        location=_opt(args, "location", LOCATION),
+        radius_km=int(_opt(args, "radius", RADIUS_KM)),
+        max_results=int(_opt(args, "max", MAX_RESULTS)),
+        workers=int(_opt(args, "workers", 0)),
+    )
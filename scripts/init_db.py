@@ -1,6 +1,7 @@
-from app.db import Base, engine
-from app.models import Listing
+from app.db import migrate_db, search_index_ready
 
 if __name__ == "__main__":
-    Base.metadata.create_all(bind=engine)
-    print("✅ Database tables created")
+    migrate_db()
+    print("✅ Database schema up to date")
+    if search_index_ready():
+        print("✅ Full-text search index ready")
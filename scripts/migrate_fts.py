@@ -0,0 +1,32 @@
+import os, sqlite3, sys, time
+
+from app.fts import ensure_fts, fts_exists, rebuild_fts
+
+
+def main(argv=None):
+    """
+    Create the listings_fts index and its triggers on an existing database
+    and backfill every listing. --rebuild re-indexes from scratch even if
+    the index already exists.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    db = os.getenv("DATABASE_URL", "sqlite:///flipfinder.db").replace("sqlite:///", "")
+    con = sqlite3.connect(db)
+    try:
+        existed = fts_exists(con)
+        t0 = time.perf_counter()
+        if not ensure_fts(con):
+            raise SystemExit(1)
+        if existed and "--rebuild" in argv:
+            rebuild_fts(con)
+            con.commit()
+        n = con.execute("SELECT COUNT(*) FROM listings").fetchone()[0]
+        action = "rebuilt" if existed and "--rebuild" in argv else ("up to date" if existed else "backfilled")
+        print(f"listings_fts {action}: {n} listings in {time.perf_counter() - t0:.2f}s ({db})")
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.migrate_fts [--rebuild]
+    main()
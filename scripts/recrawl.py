@@ -0,0 +1,39 @@
+import sys, time
+
+from flipfinder.db import SessionLocal, database, init_db
+from flipfinder.services.recrawl import RevisitPool, start_recrawl, stop_recrawl, tick
+
+
+def main(once: bool = False):
+    """
+    Revisit due listings: one pass with --once (e.g. from cron), otherwise
+    the same schedule flipfinder.main runs, until Ctrl-C.
+    """
+    init_db()
+    if once:
+        pool = RevisitPool()
+        try:
+            t0 = time.perf_counter()
+            stats = tick(SessionLocal, database, pool)
+        finally:
+            pool.close()
+        print(
+            f"✅ revisited {stats['revisited']} of {stats['claimed']} due | "
+            f"{stats['terminal']} sold/removed | {stats['dropped']} price drops | "
+            f"{stats['failed']} failed ({time.perf_counter() - t0:.1f}s)"
+        )
+        return
+    start_recrawl(SessionLocal, database)
+    print("[DEBUG] recrawler running; Ctrl-C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_recrawl()
+
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.recrawl [--once]
+    main(once="--once" in sys.argv)
@@ -0,0 +1,24 @@
+import sys, time
+
+from flipfinder.db import SessionLocal, init_db
+from flipfinder.services.comps import rescore_stale
+
+
+def main(force: bool = False):
+    init_db()
+    db = SessionLocal()
+    try:
+        t0 = time.perf_counter()
+        stats = rescore_stale(db, force=force)
+        elapsed = time.perf_counter() - t0
+    finally:
+        db.close()
+    print(
+        f"✅ checked {stats['checked']} | re-scored {stats['rescored']} | "
+        f"skipped {stats['skipped']} unchanged ({elapsed:.1f}s)"
+    )
+
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.rescore_all [--force]   (e.g. nightly from cron)
+    main(force="--force" in sys.argv)
@@ -1,8 +1,11 @@
 import os, sqlite3, sys, json
 
+from app.fts import SEARCH_CANDIDATES, candidate_window, fts_exists, fts_match_query, search_sql, sync_fts
+from app.sqlite_tuning import connect
+
 def main():
     if len(sys.argv) < 4:
-        print("Usage: python scripts/search_cli.py '<query>' '<region substring>' <radius_km>")
+        print("Usage: python -m scripts.search_cli '<query>' '<region substring>' <radius_km>")
         raise SystemExit(1)
 
     q = sys.argv[1].strip()
@@ -13,17 +16,35 @@ def main():
         raise SystemExit(1)
 
     db = os.getenv("DATABASE_URL","sqlite:///flipfinder.db").replace("sqlite:///","")
-    con = sqlite3.connect(db); con.row_factory = sqlite3.Row
+    con = connect(db); con.row_factory = sqlite3.Row
     cur = con.cursor()
-    cur.execute("""
-      SELECT id, title, price, currency, url, location, distance_km
-      FROM listings
-      WHERE title LIKE '%'||?||'%' COLLATE NOCASE
-        AND location LIKE '%'||?||'%' COLLATE NOCASE
-        AND (distance_km IS NULL OR distance_km <= ?)
-      ORDER BY id DESC
-      LIMIT 100
-    """, (q, region, radius))
+    match = fts_match_query(q, column="title") if fts_exists(con) else None
+    if match is not None:
+        sync_fts(con)
+        near = ("l.location LIKE '%'||?||'%' COLLATE NOCASE"
+                " AND (l.distance_km IS NULL OR l.distance_km <= ?)")
+        window = candidate_window(con, match, extra_where=near, extra_params=(region, radius))
+        if window and window[0] > 0:
+            print(f"[WARN] only the newest {SEARCH_CANDIDATES} matches were ranked", file=sys.stderr)
+        sql, params = search_sql(
+            match,
+            "l.id, l.title, l.price, l.currency, l.url, l.location, l.distance_km",
+            100,
+            window or (0, -1),
+            extra_where=near,
+            extra_params=(region, radius),
+        )
+        cur.execute(sql, params)
+    else:
+        cur.execute("""
+          SELECT id, title, price, currency, url, location, distance_km
+          FROM listings
+          WHERE title LIKE '%'||?||'%' COLLATE NOCASE
+            AND location LIKE '%'||?||'%' COLLATE NOCASE
+            AND (distance_km IS NULL OR distance_km <= ?)
+          ORDER BY id DESC
+          LIMIT 100
+        """, (q, region, radius))
     print(json.dumps([dict(r) for r in cur.fetchall()], indent=2, ensure_ascii=False))
     con.close()
 
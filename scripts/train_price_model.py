@@ -0,0 +1,36 @@
+import os, sys, time
+
+from app.migrations import migrate
+from app.price_model import MODEL_PATH, PriceModel, train
+from app.sqlite_tuning import connect
+
+
+def main(full: bool = False, path: str = MODEL_PATH):
+    """
+    Fold the sold comps recorded since the saved model into it and save it
+    again (all of them with --full, starting from an empty model).
+    """
+    db = os.getenv("DATABASE_URL", "sqlite:///flipfinder.db").replace("sqlite:///", "")
+    con = connect(db)
+    try:
+        migrate(con)
+        base = PriceModel.load(path) if os.path.exists(path) and not full else None
+        t0 = time.perf_counter()
+        model = train(con, base)
+        elapsed = time.perf_counter() - t0
+    finally:
+        con.close()
+    added = model.n - (base.n if base else 0)
+    if base is not None and added == 0:
+        print(f"✅ price model up to date ({model.n} comps, {path})")
+        return
+    model.save(path)
+    print(
+        f"✅ price model: {added} new comps, {model.n} total, "
+        f"{len(model.vocab)} tokens ({elapsed:.1f}s, {path})"
+    )
+
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.train_price_model [--full]   (e.g. nightly from cron)
+    main(full="--full" in sys.argv)